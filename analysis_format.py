@@ -0,0 +1,299 @@
+"""
+分析結果的文字呈現
+Lazy text rendering for AnalysisResult
+
+analyze_klines 只產生數值與列舉；這裡把它們轉成報告、README 與通知使用的中文說明。
+每個函數只在被呼叫時才組字串，消費端需要哪一段就只產生哪一段。
+render_analysis 產生與原本 analyze_indicators 相同結構的報告 dict。
+"""
+from analysis_result import (AnalysisResult, BollState, DmiState, KcState, KdjState, MacdState, RsiState,
+                             TangleFlag, Trend, VwmaState)
+
+# 技術指標摘要的欄位順序
+INDICATOR_KEYS = ("均線系統", "VWMA", "MACD", "BOLL", "KC", "RSI", "KDJ", "DMI")
+
+def tangled_reason(result):
+    """糾結評分中成立的條件說明"""
+    ma = result.ma
+    reasons = []
+    if ma.tangle_flags & TangleFlag.EXTREME:
+        reasons.append(f"均線極度糾結(間距{ma.convergence_ratio:.2f}%)")
+    elif ma.tangle_flags & TangleFlag.DENSE:
+        reasons.append(f"均線密集糾結(間距{ma.convergence_ratio:.2f}%)")
+    if ma.tangle_flags & TangleFlag.DIVERGING:
+        reasons.append(f"方向分歧(MA5:{ma.ma5_slope:+.2f}% MA10:{ma.ma10_slope:+.2f}% MA20:{ma.ma20_slope:+.2f}%)")
+    elif ma.tangle_flags & TangleFlag.FLAT:
+        reasons.append("均線平緩")
+    if ma.tangle_flags & TangleFlag.CROSSING:
+        reasons.append("價格穿梭均線間")
+    return "，".join(reasons)
+
+def trend_text(result):
+    """趨勢說明 (報告中的 current_trend)"""
+    strength = "強勢" if result.strong else "一般"
+    if result.trend == Trend.TANGLED:
+        return f"均線糾結，{tangled_reason(result)}"
+    if result.trend == Trend.BULLISH:
+        return f"多頭排列，趨勢偏多({strength})"
+    if result.trend == Trend.BEARISH:
+        return f"空頭排列，趨勢偏空({strength})"
+    return f"震盪整理(收斂度{result.ma.convergence_ratio:.2f}%，多空{result.bullish_score}:{result.bearish_score})"
+
+def _ma_text(result):
+    ma = result.ma
+    if result.trend == Trend.TANGLED:
+        return f"⚠️ 均線糾結狀態。{tangled_reason(result)}。" \
+               f"MA5={ma.ma5:.2f}, MA10={ma.ma10:.2f}, MA20={ma.ma20:.2f}，" \
+               f"收斂度{ma.convergence_ratio:.2f}%，等待方向選擇。"
+    if result.trend == Trend.BULLISH:
+        golden_cross = "金叉" if ma.ma5 > ma.ma10 else "準金叉"
+        strength_desc = "強勢突破" if result.strong else "溫和上升"
+        return f"🟢 多頭排列({strength_desc})。MA5（{ma.ma5:.2f}）與MA10（{ma.ma10:.2f}）形成{golden_cross}，" \
+               f"價格站上MA20（{ma.ma20:.2f}），MA20斜率{ma.ma20_slope:+.2f}%，短期動能偏強。"
+    if result.trend == Trend.BEARISH:
+        death_cross = "死叉" if ma.ma5 < ma.ma10 else "準死叉"
+        strength_desc = "強勢下跌" if result.strong else "溫和下降"
+        return f"🔴 空頭排列({strength_desc})。MA5（{ma.ma5:.2f}）與MA10（{ma.ma10:.2f}）形成{death_cross}，" \
+               f"價格跌破MA20（{ma.ma20:.2f}），MA20斜率{ma.ma20_slope:+.2f}%，短期動能偏弱。"
+    return f"🟡 震盪整理。MA5={ma.ma5:.2f}, MA10={ma.ma10:.2f}, MA20={ma.ma20:.2f}，" \
+           f"收斂度{ma.convergence_ratio:.2f}%，方向不明確，觀望為主。"
+
+def _vwma_text(result):
+    v = result.indicators
+    ma5, ma20 = result.ma.ma5, result.ma.ma20
+    vwma_vs_ma5 = ((v.vwma5 - ma5) / ma5) * 100
+    vwma_vs_ma20 = ((v.vwma20 - ma20) / ma20) * 100
+    state = result.states.vwma
+    if state == VwmaState.BULL_CONFIRMED:
+        return f"量價配合良好。VWMA5（{v.vwma5:.2f}）>VWMA10（{v.vwma10:.2f}）>VWMA20（{v.vwma20:.2f}），且VWMA20較MA20高{vwma_vs_ma20:.2f}%，顯示上漲有量能支撐。"
+    if state == VwmaState.BULL_WEAK:
+        return f"量價排列偏多但量能一般。VWMA5（{v.vwma5:.2f}）>VWMA10（{v.vwma10:.2f}）>VWMA20（{v.vwma20:.2f}），VWMA與MA差異{vwma_vs_ma20:.2f}%，量能支撐有限。"
+    if state == VwmaState.BEAR_CONFIRMED:
+        return f"量價背離偏空。VWMA5（{v.vwma5:.2f}）<VWMA10（{v.vwma10:.2f}）<VWMA20（{v.vwma20:.2f}），且VWMA20較MA20低{abs(vwma_vs_ma20):.2f}%，顯示下跌有量能推動。"
+    if state == VwmaState.BEAR_WEAK:
+        return f"量價排列偏空但量能不足。VWMA5（{v.vwma5:.2f}）<VWMA10（{v.vwma10:.2f}）<VWMA20（{v.vwma20:.2f}），VWMA與MA差異{vwma_vs_ma20:.2f}%，下跌缺乏量能。"
+    return f"量價關係複雜。VWMA5={v.vwma5:.2f}, VWMA10={v.vwma10:.2f}, VWMA20={v.vwma20:.2f}，與MA偏差{vwma_vs_ma5:.2f}%，需觀察量價配合度。"
+
+def _macd_text(result):
+    v = result.indicators
+    if result.states.macd == MacdState.GOLDEN_CROSS:
+        return f"金叉運行中。DIF（{v.dif:.4f}）高於DEA（{v.dea:.4f}），且均在零軸上方，柱狀圖為{v.macd_hist:.4f}，顯示多頭動能強勁。"
+    if result.states.macd == MacdState.DEAD_CROSS:
+        return f"死叉運行中但收斂。DIF（{v.dif:.4f}）仍高於零軸，DEA（{v.dea:.4f}）趨平，柱狀圖縮減至{v.macd_hist:.4f}，暗示空頭動能減弱。"
+    return f"MACD指標偏空或震盪。DIF={v.dif:.4f}, DEA={v.dea:.4f}, 柱狀圖={v.macd_hist:.4f}。"
+
+def _boll_text(result):
+    v = result.indicators
+    state = result.states.boll
+    if state == BollState.ABOVE_UPPER:
+        return f"價格突破上軌（{v.bb_upper:.2f}），%B（{v.percent_b:.2%}）顯示超買，注意回調風險。"
+    if state == BollState.NEAR_UPPER:
+        return f"價格貼近上軌（{v.bb_upper:.2f}），%B（{v.percent_b:.2%}）偏高，中軌（{v.bb_middle:.2f}）提供動態支撐。"
+    if state == BollState.BELOW_LOWER:
+        return f"價格跌破下軌（{v.bb_lower:.2f}），%B（{v.percent_b:.2%}）顯示超賣，可能出現反彈。"
+    if state == BollState.NEAR_LOWER:
+        return f"價格貼近下軌（{v.bb_lower:.2f}），%B（{v.percent_b:.2%}）偏低，中軌（{v.bb_middle:.2f}）提供動態壓力。"
+    if state == BollState.UPPER_HALF:
+        return f"價格位於布林帶上半部，%B（{v.percent_b:.2%}）偏強，上軌（{v.bb_upper:.2f}）為壓力位。"
+    if state == BollState.LOWER_HALF:
+        return f"價格位於布林帶下半部，%B（{v.percent_b:.2%}）偏弱，下軌（{v.bb_lower:.2f}）為支撐位。"
+    return f"價格在布林帶中軌附近震盪，%B（{v.percent_b:.2%}）中性，上軌（{v.bb_upper:.2f}）壓力，下軌（{v.bb_lower:.2f}）支撐。"
+
+def _kc_text(result):
+    v = result.indicators
+    if result.states.kc == KcState.NEAR_UPPER:
+        return f"價格突破上軌（{v.kc_upper:.2f}），KC位置（{v.kc_position:.2%}）顯示強勢，中軌（{v.kc_middle:.2f}）成為動態支撐。"
+    if result.states.kc == KcState.NEAR_LOWER:
+        return f"價格跌破下軌（{v.kc_lower:.2f}），KC位置（{v.kc_position:.2%}）顯示弱勢，中軌（{v.kc_middle:.2f}）成為動態阻力。"
+    return f"價格在肯特納通道內運行。上軌={v.kc_upper:.2f}, 中軌={v.kc_middle:.2f}, 下軌={v.kc_lower:.2f}, 位置={v.kc_position:.2%}。"
+
+def _rsi_text(result):
+    rsi14 = result.indicators.rsi14
+    if result.states.rsi == RsiState.OVERBOUGHT:
+        return f"RSI14（{rsi14:.2f}）進入超買區（70），需警惕回調風險。"
+    if result.states.rsi == RsiState.OVERSOLD:
+        return f"RSI14（{rsi14:.2f}）進入超賣區（30），可能出現反彈。"
+    return f"RSI14（{rsi14:.2f}）中性偏強，未達超買區（70），與價格走勢同步。"
+
+def _kdj_text(result):
+    v = result.indicators
+    if result.states.kdj == KdjState.GOLDEN_CROSS:
+        return f"金叉初現。K值（{v.k:.2f}）上穿D值（{v.d:.2f}），J值（{v.j:.2f}）轉強。"
+    if result.states.kdj == KdjState.DEAD_CROSS:
+        return f"死叉運行。K值（{v.k:.2f}）下穿D值（{v.d:.2f}），J值（{v.j:.2f}）轉弱。"
+    return f"KDJ指標震盪或處於極端區域。K值={v.k:.2f}, D值={v.d:.2f}, J值={v.j:.2f}。"
+
+def adx_strength(adx):
+    """ADX 趨勢強度"""
+    return "強勢" if adx >= 25 else "中等" if adx >= 20 else "弱勢"
+
+def _dmi_text(result):
+    v = result.indicators
+    strength = adx_strength(v.adx)
+    state = result.states.dmi
+    if state in (DmiState.BULL_STRONG, DmiState.BULL_MODERATE):
+        higher, momentum = ("高於", "充足") if state == DmiState.BULL_STRONG else ("略高於", "一般")
+        return f"多頭{strength}趨勢。DI+（{v.di_plus:.2f}）{higher}DI-（{v.di_minus:.2f}），ADX（{v.adx:.2f}）顯示{strength}趨勢，上漲動能{momentum}。"
+    if state == DmiState.BULL_WEAK:
+        return f"多頭偏向但趨勢{strength}。DI+（{v.di_plus:.2f}）高於DI-（{v.di_minus:.2f}），但ADX（{v.adx:.2f}）偏低，缺乏明確方向。"
+    if state in (DmiState.BEAR_STRONG, DmiState.BEAR_MODERATE):
+        higher, momentum = ("高於", "充足") if state == DmiState.BEAR_STRONG else ("略高於", "一般")
+        return f"空頭{strength}趨勢。DI-（{v.di_minus:.2f}）{higher}DI+（{v.di_plus:.2f}），ADX（{v.adx:.2f}）顯示{strength}趨勢，下跌動能{momentum}。"
+    if state == DmiState.BEAR_WEAK:
+        return f"空頭偏向但趨勢{strength}。DI-（{v.di_minus:.2f}）高於DI+（{v.di_plus:.2f}），但ADX（{v.adx:.2f}）偏低，缺乏明確方向。"
+    return f"方向不明。DI+（{v.di_plus:.2f}）與DI-（{v.di_minus:.2f}）接近，ADX（{v.adx:.2f}）顯示{strength}趨勢，市場處於整理狀態。"
+
+_INDICATOR_TEXT = {
+    "均線系統": _ma_text,
+    "VWMA": _vwma_text,
+    "MACD": _macd_text,
+    "BOLL": _boll_text,
+    "KC": _kc_text,
+    "RSI": _rsi_text,
+    "KDJ": _kdj_text,
+    "DMI": _dmi_text,
+}
+
+def indicator_text(result, key):
+    """單一指標的說明 (key 為 INDICATOR_KEYS 之一)"""
+    return _INDICATOR_TEXT[key](result)
+
+def indicator_summary(result):
+    """所有指標的說明 (報告中的 technical_indicators_summary)"""
+    return {key: indicator_text(result, key) for key in INDICATOR_KEYS}
+
+# 指標簡述 (通知等只需一句話的場合)；不同列舉的成員整數值會相同，因此依指標分表
+STATE_LABELS = {
+    "VWMA": {VwmaState.BULL_CONFIRMED: "量價配合良好", VwmaState.BULL_WEAK: "量價偏多但量能一般",
+             VwmaState.BEAR_CONFIRMED: "量價背離偏空", VwmaState.BEAR_WEAK: "量價偏空但量能不足",
+             VwmaState.MIXED: "量價關係複雜"},
+    "MACD": {MacdState.GOLDEN_CROSS: "金叉運行中", MacdState.DEAD_CROSS: "死叉運行中但收斂", MacdState.WEAK: "偏空或震盪"},
+    "BOLL": {BollState.ABOVE_UPPER: "突破上軌", BollState.NEAR_UPPER: "貼近上軌", BollState.BELOW_LOWER: "跌破下軌",
+             BollState.NEAR_LOWER: "貼近下軌", BollState.UPPER_HALF: "位於上半部", BollState.LOWER_HALF: "位於下半部",
+             BollState.MIDDLE: "中軌附近震盪"},
+    "KC": {KcState.NEAR_UPPER: "突破上軌", KcState.NEAR_LOWER: "跌破下軌", KcState.INSIDE: "通道內運行"},
+    "RSI": {RsiState.OVERBOUGHT: "超買區", RsiState.OVERSOLD: "超賣區", RsiState.NEUTRAL: "中性"},
+    "KDJ": {KdjState.GOLDEN_CROSS: "金叉初現", KdjState.DEAD_CROSS: "死叉運行", KdjState.EXTREME: "震盪或極端區域"},
+    "DMI": {DmiState.BULL_STRONG: "多頭強勢趨勢", DmiState.BULL_MODERATE: "多頭中等趨勢", DmiState.BULL_WEAK: "多頭偏向",
+            DmiState.BEAR_STRONG: "空頭強勢趨勢", DmiState.BEAR_MODERATE: "空頭中等趨勢", DmiState.BEAR_WEAK: "空頭偏向",
+            DmiState.NEUTRAL: "方向不明"},
+}
+
+def _indicator_state(result, key):
+    states = result.states
+    return {"VWMA": states.vwma, "MACD": states.macd, "BOLL": states.boll, "KC": states.kc,
+            "RSI": states.rsi, "KDJ": states.kdj, "DMI": states.dmi}[key]
+
+def state_label(result, key):
+    """指標狀態的一句話簡述"""
+    if key == "均線系統":
+        label = result.trend.label
+        return f"{label}({'強勢' if result.strong else '一般'})" if result.trend in (Trend.BULLISH, Trend.BEARISH) else label
+    return STATE_LABELS[key][_indicator_state(result, key)]
+
+# README 技術指標總結表的燈號 (與原本比對說明文字的結果相同；
+# BOLL 的說明從未包含原本比對的「接近上/下軌」「位於中軌上/下方」，因此一律為 ⚪)
+_STATUS = {
+    "均線系統": {Trend.BULLISH: "🟢", Trend.BEARISH: "🔴", Trend.RANGING: "⚪", Trend.TANGLED: "⚪"},
+    "VWMA": {VwmaState.BULL_CONFIRMED: "🟢", VwmaState.BULL_WEAK: "🟢", VwmaState.BEAR_CONFIRMED: "🔴",
+             VwmaState.BEAR_WEAK: "⚪", VwmaState.MIXED: "⚪"},
+    "MACD": {MacdState.GOLDEN_CROSS: "🟢", MacdState.DEAD_CROSS: "🔴", MacdState.WEAK: "⚪"},
+    "BOLL": {state: "⚪" for state in BollState},
+    "KC": {KcState.NEAR_UPPER: "🟢", KcState.NEAR_LOWER: "🔴", KcState.INSIDE: "⚪"},
+    "RSI": {RsiState.OVERBOUGHT: "🟢", RsiState.OVERSOLD: "🔴", RsiState.NEUTRAL: "🟢"},
+    "KDJ": {KdjState.GOLDEN_CROSS: "🟢", KdjState.DEAD_CROSS: "🔴", KdjState.EXTREME: "⚪"},
+    "DMI": {DmiState.BULL_STRONG: "🟢", DmiState.BULL_MODERATE: "🟢", DmiState.BULL_WEAK: "🟡",
+            DmiState.BEAR_STRONG: "🔴", DmiState.BEAR_MODERATE: "🔴", DmiState.BEAR_WEAK: "🟠", DmiState.NEUTRAL: "⚪"},
+}
+
+def indicator_status(result, key):
+    """README 技術指標總結表的燈號"""
+    state = result.trend if key == "均線系統" else _indicator_state(result, key)
+    return _STATUS[key][state]
+
+def trade_advice(result):
+    """交易建議 (報告中的 analysis_result)"""
+    current_price = result.current_price
+    major_support = result.major_support
+    major_resistance = result.major_resistance
+    ma20 = result.ma.ma20
+
+    # 根據趨勢類型生成相應的交易建議
+    if result.trend == Trend.BULLISH:
+        direction = f"積極做多。多頭排列確立，價格站穩關鍵支撐{major_support:.2f}且指標共振偏多，突破{major_resistance:.2f}壓力確認趨勢延續。"
+        entry_timing = f"激進者：現價{current_price:.2f}直接做多，突破{major_resistance:.2f}加倉。穩健者：等待回踩{ma20:.2f}（MA20）企穩後進場。"
+    elif result.trend == Trend.BEARISH:
+        direction = f"謹慎做空。空頭排列明確，價格跌破關鍵支撐{major_support:.2f}且指標共振偏空，反彈至{major_resistance:.2f}壓力可考慮做空。"
+        entry_timing = f"激進者：現價{current_price:.2f}輕倉做空，反彈至{major_resistance:.2f}加倉。穩健者：等待反彈至{ma20:.2f}（MA20）阻力後進場。"
+    elif result.trend == Trend.TANGLED:
+        direction = f"觀望等待。均線糾結狀態，方向不明確，等待突破{major_resistance:.2f}或跌破{major_support:.2f}後再做決策。"
+        entry_timing = f"激進者：暫時觀望，等待方向選擇。穩健者：突破{major_resistance:.2f}做多或跌破{major_support:.2f}做空。"
+    else:  # 震盪
+        direction = f"區間操作。震盪整理格局，可在{major_support:.2f}附近做多，{major_resistance:.2f}附近做空，注意控制倉位。"
+        entry_timing = f"激進者：現價{current_price:.2f}可輕倉操作。穩健者：等待接近區間邊界{major_support:.2f}或{major_resistance:.2f}後進場。"
+
+    # 使用 Fibonacci Pivot Points 計算止損和目標價位
+    p = result.pivots
+    s1_pct = ((p.s1 - current_price) / current_price) * 100
+    s2_pct = ((p.s2 - current_price) / current_price) * 100
+    r1_pct = ((p.r1 - current_price) / current_price) * 100
+    r2_pct = ((p.r2 - current_price) / current_price) * 100
+    return {
+        "方向": direction,
+        "入場時機": entry_timing,
+        "止損設定": f"S1: {p.s1:.2f}（{s1_pct:+.1f}%），S2: {p.s2:.2f}（{s2_pct:+.1f}%），或浮動止損3%以內。",
+        "目標價位": f"R1: {p.r1:.2f}（{r1_pct:+.1f}%），R2: {p.r2:.2f}（{r2_pct:+.1f}%）。"
+    }
+
+def render_analysis(result):
+    """
+    產生報告 dict (與原本 analyze_indicators 的輸出結構相同，只含說明文字與數值，不含 typed)
+
+    Returns:
+        dict
+    """
+    ma = result.ma
+    p = result.pivots
+    return {
+        "current_price": result.current_price,
+        "24hr_change_percent": result.change_24h,
+        "1h_change_percent": result.change_1h,
+        "4h_change_percent": result.change_4h,
+        "fibonacci_pivots": {"PP": p.pp, "R1": p.r1, "R2": p.r2, "R3": p.r3, "S1": p.s1, "S2": p.s2, "S3": p.s3},
+        "major_support": result.major_support,
+        "major_resistance": result.major_resistance,
+        "current_trend": trend_text(result),
+        "trend_type": result.trend.label,
+        "ma_analysis": {
+            "convergence_ratio": ma.convergence_ratio,
+            "is_tangled": result.is_tangled,
+            "tangled_reason": tangled_reason(result),
+            "ma5_slope": ma.ma5_slope,
+            "ma10_slope": ma.ma10_slope,
+            "ma20_slope": ma.ma20_slope,
+            "ma_values": {"MA5": ma.ma5, "MA10": ma.ma10, "MA20": ma.ma20, "MA120": ma.ma120},
+        },
+        "technical_indicators_summary": indicator_summary(result),
+        # Funding Rate / Fund Flow 為佔位文字 (公開 API 無此數據)
+        "funding_rate": "0.01000000%（中性），未顯示極端多空情緒。",
+        "volume_change": f"近期成交量：{result.volume_24h:.2f}。上漲時放量，下跌時縮量，量價結構健康。",
+        "fund_flow_data": "24H合約淨流入1.81億USDT（主力偏多），4H淨流入3908萬USDT加速，配合現貨資金同步流入（24H淨流入2916萬USDT），顯示買盤持續。",
+        "analysis_result": trade_advice(result),
+    }
+
+def result_from_report(analysis):
+    """
+    取得單一時間框架的 AnalysisResult
+
+    Args:
+        analysis: AnalysisResult 本身，或含 typed (AnalysisResult 或其 dict) 的報告 dict
+
+    Returns:
+        AnalysisResult: 報告不含 typed (JSON 報告或分析失敗的預設值) 時為 None
+    """
+    if isinstance(analysis, AnalysisResult):
+        return analysis
+    typed = (analysis or {}).get("typed")
+    if not typed:
+        return None
+    return typed if isinstance(typed, AnalysisResult) else AnalysisResult.from_dict(typed)
@@ -0,0 +1,101 @@
+"""
+趨勢判斷參數
+Thresholds used by analyze_indicators for MA tangle detection and trend scoring
+
+預設值即原本寫在 analyze_indicators 中的門檻。調整後的參數可存成 JSON，
+以環境變數 ANALYSIS_PARAMS_FILE 指定，所有分析入口 (本地、雲端、即時串流) 都會使用。
+
+    python param_sweep.py --save-best data/analysis_params.json
+    ANALYSIS_PARAMS_FILE=data/analysis_params.json python analyze_binance_data.py
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, fields, replace
+
+PARAMS_FILE_ENV = "ANALYSIS_PARAMS_FILE"
+
+@dataclass(frozen=True)
+class AnalysisParams:
+    """analyze_indicators 的門檻 (百分比單位與 convergence_ratio、均線斜率相同)"""
+
+    # 均線糾結
+    extreme_convergence: float = 0.5     # 均線間距低於此值：極度糾結 (+3)
+    dense_convergence: float = 0.8       # 均線間距低於此值：密集糾結 (+2)
+    divergence_convergence: float = 2.0  # 方向分歧只在間距低於此值時計分 (+2)
+    crossing_convergence: float = 1.5    # 價格穿梭均線間只在間距低於此值時計分 (+1)
+    slope_threshold: float = 0.2         # 斜率超過 ±此值才算有方向 (方向分歧判斷)
+    flat_slope: float = 0.1              # 三條均線斜率皆在 ±此值內：均線平緩 (+1)
+    tangled_threshold: int = 4           # 糾結評分達到此值判定為糾結
+
+    # 多空評分
+    ma20_slope_threshold: float = 0.3    # MA20 斜率超過 ±此值 (+1)
+    momentum_slope: float = 0.2          # MA5 斜率超過 ±此值 (+1)
+    trend_threshold: int = 3             # 多空評分達到此值判定為多頭/空頭
+    strong_threshold: int = 5            # 多空評分達到此值 (且在 MA120 同側) 為強勢
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        由 dict 建立參數，未指定的欄位使用預設值
+
+        Raises:
+            ValueError: 包含未知的參數名稱、非數值，或整數參數的值不是整數
+        """
+        known = {f.name: f.type for f in fields(cls)}
+        unknown = sorted(set(values) - set(known))
+        if unknown:
+            raise ValueError(f"未知的分析參數: {', '.join(unknown)} (可用: {', '.join(known)})")
+        defaults = cls()
+        converted = {}
+        for name, value in values.items():
+            kind = type(getattr(defaults, name))
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"分析參數 {name} 必須是數值: {value!r}") from None
+            # 整數門檻不可截斷 (例如 3.5 不會被當成 3)
+            if kind is int and not number.is_integer():
+                raise ValueError(f"分析參數 {name} 必須是整數: {value!r}")
+            converted[name] = kind(number)
+        return cls(**converted)
+
+    def to_dict(self):
+        return asdict(self)
+
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+    def save(self, path):
+        """保存為 JSON"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """從 JSON 讀取"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+DEFAULT_PARAMS = AnalysisParams()
+
+_loaded = {}
+
+def current_params():
+    """
+    目前生效的參數：ANALYSIS_PARAMS_FILE 指定的檔案，未設定或讀取失敗時使用預設值
+
+    同一個檔案只讀取一次。
+    """
+    path = os.getenv(PARAMS_FILE_ENV)
+    if not path:
+        return DEFAULT_PARAMS
+    if path not in _loaded:
+        try:
+            _loaded[path] = AnalysisParams.load(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 無法讀取分析參數 {path}，使用預設值: {e}")
+            _loaded[path] = DEFAULT_PARAMS
+    return _loaded[path]
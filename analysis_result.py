@@ -0,0 +1,220 @@
+"""
+結構化分析結果
+Typed analysis results: enums for classifications, slotted dataclasses for values
+
+analyze_klines 返回 AnalysisResult：趨勢、各指標狀態皆為整數列舉，數值欄位為 float，
+不包含任何說明文字。文字由 analysis_format 在需要時才產生；消費端以列舉比較
+(result.trend == Trend.BULLISH) 取代對中文說明做子字串比對。
+
+to_dict / from_dict 在報告中以純數字保存與還原 (列舉存為整數)。
+"""
+from dataclasses import dataclass, fields
+from enum import IntEnum, IntFlag
+
+class Trend(IntEnum):
+    """趨勢判斷 (代碼與 signal_series 相同)"""
+    TANGLED = 0
+    BULLISH = 1
+    BEARISH = 2
+    RANGING = 3
+
+    @property
+    def label(self):
+        return TREND_LABELS[self]
+
+    @classmethod
+    def from_label(cls, label):
+        """由 trend_type 字串 ("多頭" 等) 取得列舉，無法辨識時為糾結"""
+        return _TREND_BY_LABEL.get(label, cls.TANGLED)
+
+TREND_LABELS = {Trend.TANGLED: "糾結", Trend.BULLISH: "多頭", Trend.BEARISH: "空頭", Trend.RANGING: "震盪"}
+_TREND_BY_LABEL = {label: trend for trend, label in TREND_LABELS.items()}
+
+class TangleFlag(IntFlag):
+    """均線糾結評分中成立的條件"""
+    NONE = 0
+    EXTREME = 1      # 均線極度糾結 (+3)
+    DENSE = 2        # 均線密集糾結 (+2)
+    DIVERGING = 4    # 方向分歧 (+2)
+    FLAT = 8         # 均線平緩 (+1)
+    CROSSING = 16    # 價格穿梭均線間 (+1)
+
+class VwmaState(IntEnum):
+    BULL_CONFIRMED = 0    # 量價配合良好
+    BULL_WEAK = 1         # 量價排列偏多但量能一般
+    BEAR_CONFIRMED = 2    # 量價背離偏空
+    BEAR_WEAK = 3         # 量價排列偏空但量能不足
+    MIXED = 4             # 量價關係複雜
+
+class MacdState(IntEnum):
+    GOLDEN_CROSS = 0      # DIF > DEA 且在零軸上方
+    DEAD_CROSS = 1        # DIF < DEA 但仍在零軸上方
+    WEAK = 2              # 偏空或震盪
+
+class BollState(IntEnum):
+    ABOVE_UPPER = 0       # %B > 1
+    NEAR_UPPER = 1        # %B > 0.8
+    BELOW_LOWER = 2       # %B < 0
+    NEAR_LOWER = 3        # %B < 0.2
+    UPPER_HALF = 4        # %B > 0.6
+    LOWER_HALF = 5        # %B < 0.4
+    MIDDLE = 6
+
+class KcState(IntEnum):
+    NEAR_UPPER = 0        # 收盤價 > 上軌 × 0.98
+    NEAR_LOWER = 1        # 收盤價 < 下軌 × 1.02
+    INSIDE = 2
+
+class RsiState(IntEnum):
+    OVERBOUGHT = 0        # > 70
+    OVERSOLD = 1          # < 30
+    NEUTRAL = 2
+
+class KdjState(IntEnum):
+    GOLDEN_CROSS = 0      # K > D 且未超買
+    DEAD_CROSS = 1        # K < D 且未超賣
+    EXTREME = 2           # 震盪或處於極端區域
+
+class DmiState(IntEnum):
+    BULL_STRONG = 0       # DI+ > DI-，ADX >= 25
+    BULL_MODERATE = 1     # DI+ > DI-，ADX >= 20
+    BULL_WEAK = 2         # DI+ > DI-，ADX < 20
+    BEAR_STRONG = 3
+    BEAR_MODERATE = 4
+    BEAR_WEAK = 5
+    NEUTRAL = 6           # DI+ 與 DI- 相等
+
+class _Record:
+    """slots dataclass 的共用序列化 (列舉存為整數，巢狀結果存為 dict)"""
+    __slots__ = ()
+
+    def to_dict(self):
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, _Record):
+                value = value.to_dict()
+            elif isinstance(value, (IntEnum, IntFlag)):
+                value = int(value)
+            values[f.name] = value
+        return values
+
+    @classmethod
+    def from_dict(cls, values):
+        kwargs = {}
+        for f in fields(cls):
+            value = values[f.name]
+            if issubclass(f.type, _Record):
+                value = f.type.from_dict(value)
+            elif issubclass(f.type, (IntEnum, IntFlag, bool)):
+                value = f.type(value)
+            kwargs[f.name] = value
+        return cls(**kwargs)
+
+@dataclass
+class Pivots(_Record):
+    """Fibonacci 樞紐點"""
+    __slots__ = ("pp", "r1", "r2", "r3", "s1", "s2", "s3")
+    pp: float
+    r1: float
+    r2: float
+    r3: float
+    s1: float
+    s2: float
+    s3: float
+
+@dataclass
+class MovingAverages(_Record):
+    """均線數值、斜率與糾結評分"""
+    __slots__ = ("ma5", "ma10", "ma20", "ma120", "convergence_ratio", "ma5_slope", "ma10_slope", "ma20_slope",
+                 "tangle_flags", "tangled_score")
+    ma5: float
+    ma10: float
+    ma20: float
+    ma120: float
+    convergence_ratio: float
+    ma5_slope: float
+    ma10_slope: float
+    ma20_slope: float
+    tangle_flags: TangleFlag
+    tangled_score: int
+
+@dataclass
+class IndicatorValues(_Record):
+    """最後一根 K 線的指標數值"""
+    __slots__ = ("vwma5", "vwma10", "vwma20", "dif", "dea", "macd_hist", "bb_upper", "bb_middle", "bb_lower",
+                 "percent_b", "kc_upper", "kc_middle", "kc_lower", "kc_position", "rsi14", "k", "d", "j",
+                 "di_plus", "di_minus", "adx")
+    vwma5: float
+    vwma10: float
+    vwma20: float
+    dif: float
+    dea: float
+    macd_hist: float
+    bb_upper: float
+    bb_middle: float
+    bb_lower: float
+    percent_b: float
+    kc_upper: float
+    kc_middle: float
+    kc_lower: float
+    kc_position: float
+    rsi14: float
+    k: float
+    d: float
+    j: float
+    di_plus: float
+    di_minus: float
+    adx: float
+
+@dataclass
+class IndicatorStates(_Record):
+    """各指標的分類狀態"""
+    __slots__ = ("vwma", "macd", "boll", "kc", "rsi", "kdj", "dmi")
+    vwma: VwmaState
+    macd: MacdState
+    boll: BollState
+    kc: KcState
+    rsi: RsiState
+    kdj: KdjState
+    dmi: DmiState
+
+@dataclass
+class AnalysisResult(_Record):
+    """analyze_klines 的結果"""
+    __slots__ = ("current_price", "change_24h", "change_1h", "change_4h", "volume_24h", "close_price",
+                 "pivots", "ma", "trend", "strong", "bullish_score", "bearish_score", "indicators", "states",
+                 "open_time")
+    current_price: float
+    change_24h: float
+    change_1h: float
+    change_4h: float
+    volume_24h: float
+    close_price: float
+    pivots: Pivots
+    ma: MovingAverages
+    trend: Trend
+    strong: bool            # 多頭/空頭是否為「強勢」
+    bullish_score: int
+    bearish_score: int
+    indicators: IndicatorValues
+    states: IndicatorStates
+    open_time: int          # 分析的 K 線開盤時間 (毫秒)，未知時為 0
+
+    @classmethod
+    def from_dict(cls, values):
+        if "open_time" not in values:
+            values = dict(values, open_time=0)  # 舊版報告
+        return super().from_dict(values)
+
+    @property
+    def is_tangled(self):
+        return self.trend == Trend.TANGLED
+
+    @property
+    def major_support(self):
+        return self.pivots.s1
+
+    @property
+    def major_resistance(self):
+        return self.pivots.r1
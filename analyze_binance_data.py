@@ -1,5 +1,26 @@
 import pandas as pd
-import json
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from kline_store import KlineStore, to_millis
+from get_binance_data import TICKER_SNAPSHOT_FILE, load_tickers
+from indicator_engine import batch_frames
+from indicator_registry import available_indicators, compute_indicators, required_warmup
+from indicator_state import IndicatorState, load_or_create_state, state_path
+from analysis_params import AnalysisParams, current_params
+from analysis_result import (AnalysisResult, BollState, DmiState, IndicatorStates, IndicatorValues, KcState, KdjState,
+                             MacdState, MovingAverages, Pivots, RsiState, TangleFlag, Trend, VwmaState)
+from analysis_format import render_analysis
+from report_store import REPORT_FORMATS, ReportView, save_report
+
+# 指標計算與分析需要的 K 線欄位 (列式存儲後端只載入這些欄位)
+ANALYSIS_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume']
+
+# analyze_indicators 讀取的範圍：指標最多往回讀 5 根 (均線斜率 iloc[-5])，
+# K 線本身最多往回讀 24 根 (Fibonacci Pivots 使用 tail(24))
+INDICATOR_LOOKBACK = 5
+ANALYSIS_TAIL_ROWS = 24
 
 def calculate_fibonacci_pivots(high, low, close):
     """
@@ -26,544 +47,504 @@ def calculate_fibonacci_pivots(high, low, close):
         "S3": pp - 1.000 * range_hl,
     }
 
-def calculate_technical_indicators(df):
-    # Moving Averages (MA)
-    df["MA5"] = df["close"].rolling(window=5).mean()
-    df["MA10"] = df["close"].rolling(window=10).mean()
-    df["MA20"] = df["close"].rolling(window=20).mean()
-    df["MA120"] = df["close"].rolling(window=120).mean()
-    
-    # Volume Weighted Moving Average (VWMA)
-    df["VWMA5"] = (df["close"] * df["volume"]).rolling(window=5).sum() / df["volume"].rolling(window=5).sum()
-    df["VWMA10"] = (df["close"] * df["volume"]).rolling(window=10).sum() / df["volume"].rolling(window=10).sum()
-    df["VWMA20"] = (df["close"] * df["volume"]).rolling(window=20).sum() / df["volume"].rolling(window=20).sum()
+def calculate_technical_indicators(df, dmi_smoothing="sma", indicators=None):
+    """
+    計算技術指標
 
-    # MACD
-    df["EMA12"] = df["close"].ewm(span=12, adjust=False).mean()
-    df["EMA26"] = df["close"].ewm(span=26, adjust=False).mean()
-    df["DIF"] = df["EMA12"] - df["EMA26"]
-    df["DEA"] = df["DIF"].ewm(span=9, adjust=False).mean()
-    df["MACD_Hist"] = (df["DIF"] - df["DEA"]) * 2
-
-    # Bollinger Bands (BOLL)
-    df["BB_Middle"] = df["close"].rolling(window=20).mean()
-    df["BB_StdDev"] = df["close"].rolling(window=20).std()
-    df["BB_Upper"] = df["BB_Middle"] + (df["BB_StdDev"] * 2)
-    df["BB_Lower"] = df["BB_Middle"] - (df["BB_StdDev"] * 2)
-    df["Percent_B"] = (df["close"] - df["BB_Lower"]) / (df["BB_Upper"] - df["BB_Lower"])
-
-    # Keltner Channel (KC)
-    df["KC_Middle"] = df["close"].ewm(span=20, adjust=False).mean()  # EMA20 作為中軌
-    df["KC_ATR"] = ((df["high"] - df["low"]).rolling(window=14).mean())  # 簡化的ATR計算
-    df["KC_Upper"] = df["KC_Middle"] + (df["KC_ATR"] * 2)
-    df["KC_Lower"] = df["KC_Middle"] - (df["KC_ATR"] * 2)
-    df["KC_Position"] = (df["close"] - df["KC_Lower"]) / (df["KC_Upper"] - df["KC_Lower"])
+    Args:
+        df (DataFrame): K 線數據
+        dmi_smoothing (str): DMI 平滑方式，"sma" (14 期滾動) 或 "wilder"
+        indicators (iterable): 只計算指定的指標 (及其依賴)，None 表示全部；
+            可用名稱見 indicator_registry.available_indicators()
+    """
+    return compute_indicators(df, indicators, dmi_smoothing=dmi_smoothing)
 
-    # RSI
-    delta = df["close"].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.ewm(span=14, adjust=False).mean()
-    avg_loss = loss.ewm(span=14, adjust=False).mean()
-    rs = avg_gain / avg_loss
-    df["RSI14"] = 100 - (100 / (1 + rs))
+def latest_window(indicators=None):
+    """
+    只計算最新值時需要的最少 K 線數
 
-    # KDJ
-    low_min = df["low"].rolling(window=9).min()
-    high_max = df["high"].rolling(window=9).max()
-    df["RSV"] = (df["close"] - low_min) / (high_max - low_min) * 100
-    df["K"] = df["RSV"].ewm(span=3, adjust=False).mean()
-    df["D"] = df["K"].ewm(span=3, adjust=False).mean()
-    df["J"] = 3 * df["K"] - 2 * df["D"]
-
-    # DMI (Directional Movement Index)
-    # 計算真實波幅 (True Range)
-    df["TR1"] = df["high"] - df["low"]
-    df["TR2"] = abs(df["high"] - df["close"].shift(1))
-    df["TR3"] = abs(df["low"] - df["close"].shift(1))
-    df["TR"] = df[["TR1", "TR2", "TR3"]].max(axis=1)
-    
-    # 計算方向性移動 (Directional Movement)
-    df["DM_Plus"] = 0.0
-    df["DM_Minus"] = 0.0
-    
-    # 計算+DM和-DM
-    high_diff = df["high"] - df["high"].shift(1)
-    low_diff = df["low"].shift(1) - df["low"]
-    
-    # +DM: 當前高點 > 前一高點 且 高點差 > 低點差時
-    df.loc[(high_diff > 0) & (high_diff > low_diff), "DM_Plus"] = high_diff
-    # -DM: 當前低點 < 前一低點 且 低點差 > 高點差時  
-    df.loc[(low_diff > 0) & (low_diff > high_diff), "DM_Minus"] = low_diff
-    
-    # 計算14期平滑移動平均
-    period = 14
-    df["TR14"] = df["TR"].rolling(window=period).sum()
-    df["DM_Plus14"] = df["DM_Plus"].rolling(window=period).sum()
-    df["DM_Minus14"] = df["DM_Minus"].rolling(window=period).sum()
-    
-    # 計算方向性指標 DI+ 和 DI-
-    df["DI_Plus"] = (df["DM_Plus14"] / df["TR14"]) * 100
-    df["DI_Minus"] = (df["DM_Minus14"] / df["TR14"]) * 100
-    
-    # 計算DX (Directional Index)
-    df["DX"] = abs(df["DI_Plus"] - df["DI_Minus"]) / (df["DI_Plus"] + df["DI_Minus"]) * 100
-    
-    # 計算ADX (Average Directional Index) - 14期移動平均
-    df["ADX"] = df["DX"].rolling(window=period).mean()
-    
-    # 清理臨時列
-    df.drop(["TR1", "TR2", "TR3", "DM_Plus", "DM_Minus", "TR14", "DM_Plus14", "DM_Minus14", "DX"], axis=1, inplace=True)
-
-    return df
-
-def analyze_indicators(ticker_data, klines_df):
-    analysis_results = {}
+    每個指標的暖機長度由 indicator_registry 宣告 (MA120 → 120，EWM 依收斂容差)，
+    再加上 analyze_indicators 往回讀取的範圍。
+    """
+    names = available_indicators() if indicators is None else indicators
+    return max(required_warmup(names) + INDICATOR_LOOKBACK - 1, ANALYSIS_TAIL_ROWS)
+
+def calculate_latest_indicators(df, indicators=None, verify=False, dmi_smoothing="sma"):
+    """
+    只以最後 latest_window() 根 K 線計算指標 (latest-value 模式)
+
+    只有最後 INDICATOR_LOOKBACK 根的指標值保證與完整計算一致 (EWM 的初始值
+    權重已衰減到容差以下)，足以供 analyze_indicators 使用。
+
+    Args:
+        df (DataFrame): K 線數據
+        indicators (iterable): 只計算指定的指標，None 表示全部
+        verify (bool): 同時以完整數據計算並比對最後幾根的指標值，
+            不一致時印出警告並返回完整計算的結果
+        dmi_smoothing (str): DMI 平滑方式
+
+    Returns:
+        DataFrame: 最後 latest_window() 根 K 線與指標
+    """
+    window = latest_window(indicators)
+    result = calculate_technical_indicators(df.tail(window).copy(), dmi_smoothing, indicators)
+    if not verify or len(df) <= window:
+        return result
+
+    full = calculate_technical_indicators(df.copy(), dmi_smoothing, indicators)
+    # EWM 的截斷誤差約為 容差 × 價格，因此絕對誤差按價格尺度放寬
+    atol = float(df["close"].abs().max()) * 1e-6
+    mismatched = []
+    for column in full.columns.difference(df.columns):
+        expected = full[column].to_numpy()[-INDICATOR_LOOKBACK:]
+        actual = result[column].to_numpy()[-INDICATOR_LOOKBACK:]
+        if not np.allclose(actual, expected, rtol=1e-4, atol=atol, equal_nan=True):
+            mismatched.append(column)
+    if mismatched:
+        print(f"⚠️ Latest-value indicators differ from full computation: {', '.join(mismatched)}")
+        return full.tail(window)
+    return result
+
+def _change_since(klines_df, current_price, hours):
+    """
+    現價相對 hours 小時前收盤價的變化百分比 (數據不足時為 0)
+
+    按時間定位開盤時間不晚於「最後一根 K 線開盤時間 - hours」的 K 線，任何時間框架
+    (15m/1h/4h) 都得到相同的 1H / 4H 變化；沒有 open_time 時視為 1h K 線，往前數 hours 根。
+    """
+    previous_close = None
+    if "open_time" in klines_df.columns and len(klines_df) >= 2:
+        open_times = pd.to_datetime(klines_df["open_time"])
+        target = open_times.iloc[-1] - pd.Timedelta(hours=hours)
+        position = open_times.searchsorted(target, side="right") - 1
+        if position >= 0:
+            previous_close = klines_df["close"].iloc[position]
+    elif len(klines_df) >= hours + 1:
+        previous_close = klines_df["close"].iloc[-(hours + 1)]
+    if previous_close is None:
+        return 0.0
+    return ((current_price - previous_close) / previous_close) * 100
+
+def analyze_klines(ticker_data, klines_df, params=None):
+    """
+    分析最後一根 K 線，返回結構化結果 (不產生任何說明文字)
+
+    Args:
+        ticker_data (dict): 24hr ticker
+        klines_df (DataFrame): 含技術指標的 K 線
+        params (AnalysisParams): 趨勢判斷門檻，預設為 current_params()
+
+    Returns:
+        AnalysisResult
+    """
+    params = params or current_params()
 
     # Current Price and 24hr Change
     current_price = float(ticker_data["lastPrice"])
-    price_change_percent = float(ticker_data["priceChangePercent"])
-    analysis_results["current_price"] = current_price
-    analysis_results["24hr_change_percent"] = price_change_percent
-
-    # Calculate 1-hour change
-    if len(klines_df) >= 2:
-        previous_close = klines_df["close"].iloc[-2]
-        one_hour_change_percent = ((current_price - previous_close) / previous_close) * 100
-        analysis_results["1h_change_percent"] = one_hour_change_percent
-    else:
-        analysis_results["1h_change_percent"] = 0
 
-    # Calculate 4-hour change
-    if len(klines_df) >= 5: # Need at least 5 data points for 4-hour change (current + 4 previous)
-        four_hour_ago_close = klines_df["close"].iloc[-5]
-        four_hour_change_percent = ((current_price - four_hour_ago_close) / four_hour_ago_close) * 100
-        analysis_results["4h_change_percent"] = four_hour_change_percent
-    else:
-        analysis_results["4h_change_percent"] = 0
+    # Calculate 1-hour and 4-hour change
+    one_hour_change_percent = _change_since(klines_df, current_price, hours=1)
+    four_hour_change_percent = _change_since(klines_df, current_price, hours=4)
 
     # Support and Resistance using Fibonacci Pivot Points
     # 使用最近 24 根 K 線的高低點計算 Fibonacci Pivots
     recent_high = klines_df["high"].tail(24).max()
     recent_low = klines_df["low"].tail(24).min()
     recent_close = klines_df["close"].iloc[-1]
-
-    fib_pivots = calculate_fibonacci_pivots(recent_high, recent_low, recent_close)
-    analysis_results["fibonacci_pivots"] = fib_pivots
-    analysis_results["major_support"] = fib_pivots["S1"]
-    analysis_results["major_resistance"] = fib_pivots["R1"]
+    fib = calculate_fibonacci_pivots(recent_high, recent_low, recent_close)
+    pivots = Pivots(*(float(fib[name]) for name in ("PP", "R1", "R2", "R3", "S1", "S2", "S3")))
 
     # Enhanced Trend Analysis with Tangled Detection
-    ma5_current = klines_df["MA5"].iloc[-1]
-    ma10_current = klines_df["MA10"].iloc[-1]
-    ma20_current = klines_df["MA20"].iloc[-1]
-    ma120_current = klines_df["MA120"].iloc[-1]
-    close_price = klines_df["close"].iloc[-1]
-    
+    last = klines_df.iloc[-1]
+    ma5_current = float(last["MA5"])
+    ma10_current = float(last["MA10"])
+    ma20_current = float(last["MA20"])
+    ma120_current = float(last["MA120"])
+    close_price = float(last["close"])
+
     # Calculate MA convergence (糾結檢測)
     ma_range = max(ma5_current, ma10_current, ma20_current) - min(ma5_current, ma10_current, ma20_current)
     ma_avg = (ma5_current + ma10_current + ma20_current) / 3
     convergence_ratio = (ma_range / ma_avg) * 100  # 均線間距離百分比
-    
+
     # Calculate MA slopes (均線斜率)
     if len(klines_df) >= 5:
         ma5_slope = (ma5_current - klines_df["MA5"].iloc[-5]) / klines_df["MA5"].iloc[-5] * 100
         ma10_slope = (ma10_current - klines_df["MA10"].iloc[-5]) / klines_df["MA10"].iloc[-5] * 100
         ma20_slope = (ma20_current - klines_df["MA20"].iloc[-5]) / klines_df["MA20"].iloc[-5] * 100
     else:
-        ma5_slope = ma10_slope = ma20_slope = 0
-    
-    # Detect tangled/consolidation pattern (糾結檢測) - 放寬條件
-    is_tangled = False
-    tangled_reason = ""
+        ma5_slope = ma10_slope = ma20_slope = 0.0
+
+    # Detect tangled/consolidation pattern (糾結檢測)
+    flags = TangleFlag.NONE
     tangled_score = 0  # 糾結評分系統
-    
+
     # 條件1: 均線間距離過近 (只有極度收斂才算糾結)
-    if convergence_ratio < 0.5:
+    if convergence_ratio < params.extreme_convergence:
         tangled_score += 3  # 極度糾結
-        tangled_reason += f"均線極度糾結(間距{convergence_ratio:.2f}%)"
-    elif convergence_ratio < 0.8:
+        flags |= TangleFlag.EXTREME
+    elif convergence_ratio < params.dense_convergence:
         tangled_score += 2  # 密集糾結
-        tangled_reason += f"均線密集糾結(間距{convergence_ratio:.2f}%)"
-    
+        flags |= TangleFlag.DENSE
+
     # 條件2: 均線方向嚴重分歧 (slopes have different signs and significant divergence)
-    slope_signs = [1 if slope > 0.2 else -1 if slope < -0.2 else 0 for slope in [ma5_slope, ma10_slope, ma20_slope]]
+    slope_signs = [1 if slope > params.slope_threshold else -1 if slope < -params.slope_threshold else 0 for slope in [ma5_slope, ma10_slope, ma20_slope]]
     slope_divergence = len(set([s for s in slope_signs if s != 0]))
-    
-    if slope_divergence >= 2 and convergence_ratio < 2.0:
+
+    if slope_divergence >= 2 and convergence_ratio < params.divergence_convergence:
         tangled_score += 2
-        if tangled_reason:
-            tangled_reason += "，"
-        tangled_reason += f"方向分歧(MA5:{ma5_slope:+.2f}% MA10:{ma10_slope:+.2f}% MA20:{ma20_slope:+.2f}%)"
-    elif abs(ma5_slope) < 0.1 and abs(ma10_slope) < 0.1 and abs(ma20_slope) < 0.1:
+        flags |= TangleFlag.DIVERGING
+    elif all(abs(slope) < params.flat_slope for slope in (ma5_slope, ma10_slope, ma20_slope)):
         tangled_score += 1
-        if tangled_reason:
-            tangled_reason += "，"
-        tangled_reason += "均線平緩"
-    
+        flags |= TangleFlag.FLAT
+
     # 條件3: 價格在均線間反復穿越 (更嚴格的條件)
     price_in_ma_range = min(ma5_current, ma10_current, ma20_current) <= close_price <= max(ma5_current, ma10_current, ma20_current)
-    if price_in_ma_range and convergence_ratio < 1.5:
+    if price_in_ma_range and convergence_ratio < params.crossing_convergence:
         tangled_score += 1
-        if tangled_reason:
-            tangled_reason += "，"
-        tangled_reason += "價格穿梭均線間"
-    
-    # 只有當糾結評分 >= 4 時才判定為糾結 (更嚴格的標準)
-    is_tangled = tangled_score >= 4
-    
-    # Determine trend based on enhanced logic
-    if is_tangled:
-        analysis_results["current_trend"] = f"均線糾結，{tangled_reason}"
-        analysis_results["trend_type"] = "糾結"
-    else:
-        # 計算多頭和空頭評分
-        bullish_score = 0
-        bearish_score = 0
-        
-        # 均線排列評分
-        if ma5_current > ma10_current:
-            bullish_score += 1
-        else:
-            bearish_score += 1
-            
-        if ma10_current > ma20_current:
-            bullish_score += 1
-        else:
-            bearish_score += 1
-            
-        # 價格位置評分
-        if close_price > ma20_current:
-            bullish_score += 2
-        elif close_price < ma20_current:
-            bearish_score += 2
-        else:
-            # 價格在MA20附近，中性
-            pass
-            
-        # 均線斜率評分
-        if ma20_slope > 0.3:
-            bullish_score += 1
-        elif ma20_slope < -0.3:
-            bearish_score += 1
-            
-        # 短期動能評分
-        if ma5_slope > 0.2:
-            bullish_score += 1
-        elif ma5_slope < -0.2:
-            bearish_score += 1
-        
-        # 根據評分判斷趨勢 (降低門檻，讓趨勢更容易被識別)
-        if bullish_score >= 3:
-            # 多頭趨勢
-            strength = "強勢" if bullish_score >= 5 and close_price > ma120_current else "一般"
-            analysis_results["current_trend"] = f"多頭排列，趨勢偏多({strength})"
-            analysis_results["trend_type"] = "多頭"
-        elif bearish_score >= 3:
-            # 空頭趨勢
-            strength = "強勢" if bearish_score >= 5 and close_price < ma120_current else "一般"
-            analysis_results["current_trend"] = f"空頭排列，趨勢偏空({strength})"
-            analysis_results["trend_type"] = "空頭"
-        else:
-            # 震盪：多空力量均衡
-            analysis_results["current_trend"] = f"震盪整理(收斂度{convergence_ratio:.2f}%，多空{bullish_score}:{bearish_score})"
-            analysis_results["trend_type"] = "震盪"
-    
-    # Store detailed MA analysis
-    analysis_results["ma_analysis"] = {
-        "convergence_ratio": convergence_ratio,
-        "is_tangled": is_tangled,
-        "tangled_reason": tangled_reason,
-        "ma5_slope": ma5_slope,
-        "ma10_slope": ma10_slope,
-        "ma20_slope": ma20_slope,
-        "ma_values": {
-            "MA5": ma5_current,
-            "MA10": ma10_current,
-            "MA20": ma20_current,
-            "MA120": ma120_current
-        }
-    }
+        flags |= TangleFlag.CROSSING
 
-    # Technical Indicator Analysis
-    analysis_results["technical_indicators_summary"] = {
-        "均線系統": "",
-        "VWMA": "",
-        "MACD": "",
-        "BOLL": "",
-        "KC": "",
-        "RSI": "",
-        "KDJ": "",
-        "DMI": ""
-    }
+    # 計算多頭和空頭評分
+    bullish_score = 0
+    bearish_score = 0
 
-    # Enhanced MA Analysis using the new detection logic
-    ma_data = analysis_results["ma_analysis"]
-    ma5 = ma_data["ma_values"]["MA5"]
-    ma10 = ma_data["ma_values"]["MA10"]
-    ma20 = ma_data["ma_values"]["MA20"]
-    ma120 = ma_data["ma_values"]["MA120"]
-    if ma_data["is_tangled"]:
-        analysis_results["technical_indicators_summary"]["均線系統"] = \
-            f"⚠️ 均線糾結狀態。{ma_data['tangled_reason']}。" \
-            f"MA5={ma5:.2f}, MA10={ma10:.2f}, MA20={ma20:.2f}，" \
-            f"收斂度{ma_data['convergence_ratio']:.2f}%，等待方向選擇。"
-    elif analysis_results["trend_type"] == "多頭":
-        golden_cross = "金叉" if ma5 > ma10 else "準金叉"
-        strength_desc = "強勢突破" if "強勢" in analysis_results["current_trend"] else "溫和上升"
-        analysis_results["technical_indicators_summary"]["均線系統"] = \
-            f"🟢 多頭排列({strength_desc})。MA5（{ma5:.2f}）與MA10（{ma10:.2f}）形成{golden_cross}，" \
-            f"價格站上MA20（{ma20:.2f}），MA20斜率{ma_data['ma20_slope']:+.2f}%，短期動能偏強。"
-    elif analysis_results["trend_type"] == "空頭":
-        death_cross = "死叉" if ma5 < ma10 else "準死叉"
-        strength_desc = "強勢下跌" if "強勢" in analysis_results["current_trend"] else "溫和下降"
-        analysis_results["technical_indicators_summary"]["均線系統"] = \
-            f"🔴 空頭排列({strength_desc})。MA5（{ma5:.2f}）與MA10（{ma10:.2f}）形成{death_cross}，" \
-            f"價格跌破MA20（{ma20:.2f}），MA20斜率{ma_data['ma20_slope']:+.2f}%，短期動能偏弱。"
+    # 均線排列評分
+    if ma5_current > ma10_current:
+        bullish_score += 1
     else:
-        analysis_results["technical_indicators_summary"]["均線系統"] = \
-            f"🟡 震盪整理。MA5={ma5:.2f}, MA10={ma10:.2f}, MA20={ma20:.2f}，" \
-            f"收斂度{ma_data['convergence_ratio']:.2f}%，方向不明確，觀望為主。"
-
-    # VWMA Analysis
-    vwma5 = klines_df["VWMA5"].iloc[-1]
-    vwma10 = klines_df["VWMA10"].iloc[-1]
-    vwma20 = klines_df["VWMA20"].iloc[-1]
-    
-    # Compare VWMA with regular MA to assess volume impact
-    vwma_vs_ma5 = ((vwma5 - ma5) / ma5) * 100
-    vwma_vs_ma20 = ((vwma20 - ma20) / ma20) * 100
-    
-    if vwma5 > vwma10 and vwma10 > vwma20 and close_price > vwma20:
-        if vwma_vs_ma20 > 0.1:
-            analysis_results["technical_indicators_summary"]["VWMA"] = \
-                f"量價配合良好。VWMA5（{vwma5:.2f}）>VWMA10（{vwma10:.2f}）>VWMA20（{vwma20:.2f}），且VWMA20較MA20高{vwma_vs_ma20:.2f}%，顯示上漲有量能支撐。"
-        else:
-            analysis_results["technical_indicators_summary"]["VWMA"] = \
-                f"量價排列偏多但量能一般。VWMA5（{vwma5:.2f}）>VWMA10（{vwma10:.2f}）>VWMA20（{vwma20:.2f}），VWMA與MA差異{vwma_vs_ma20:.2f}%，量能支撐有限。"
-    elif vwma5 < vwma10 and vwma10 < vwma20 and close_price < vwma20:
-        if vwma_vs_ma20 < -0.1:
-            analysis_results["technical_indicators_summary"]["VWMA"] = \
-                f"量價背離偏空。VWMA5（{vwma5:.2f}）<VWMA10（{vwma10:.2f}）<VWMA20（{vwma20:.2f}），且VWMA20較MA20低{abs(vwma_vs_ma20):.2f}%，顯示下跌有量能推動。"
-        else:
-            analysis_results["technical_indicators_summary"]["VWMA"] = \
-                f"量價排列偏空但量能不足。VWMA5（{vwma5:.2f}）<VWMA10（{vwma10:.2f}）<VWMA20（{vwma20:.2f}），VWMA與MA差異{vwma_vs_ma20:.2f}%，下跌缺乏量能。"
+        bearish_score += 1
+
+    if ma10_current > ma20_current:
+        bullish_score += 1
+    else:
+        bearish_score += 1
+
+    # 價格位置評分 (價格在 MA20 上則中性)
+    if close_price > ma20_current:
+        bullish_score += 2
+    elif close_price < ma20_current:
+        bearish_score += 2
+
+    # 均線斜率評分
+    if ma20_slope > params.ma20_slope_threshold:
+        bullish_score += 1
+    elif ma20_slope < -params.ma20_slope_threshold:
+        bearish_score += 1
+
+    # 短期動能評分
+    if ma5_slope > params.momentum_slope:
+        bullish_score += 1
+    elif ma5_slope < -params.momentum_slope:
+        bearish_score += 1
+
+    # 只有當糾結評分 >= 門檻 (預設 4) 時才判定為糾結 (更嚴格的標準)，
+    # 否則根據多空評分判斷趨勢 (降低門檻，讓趨勢更容易被識別)
+    strong = False
+    if tangled_score >= params.tangled_threshold:
+        trend = Trend.TANGLED
+    elif bullish_score >= params.trend_threshold:
+        trend = Trend.BULLISH
+        strong = bullish_score >= params.strong_threshold and close_price > ma120_current
+    elif bearish_score >= params.trend_threshold:
+        trend = Trend.BEARISH
+        strong = bearish_score >= params.strong_threshold and close_price < ma120_current
+    else:
+        # 震盪：多空力量均衡
+        trend = Trend.RANGING
+
+    ma = MovingAverages(ma5_current, ma10_current, ma20_current, ma120_current, float(convergence_ratio),
+                        float(ma5_slope), float(ma10_slope), float(ma20_slope), flags, tangled_score)
+
+    # Technical Indicators
+    values = IndicatorValues(*(float(last[column]) for column in (
+        "VWMA5", "VWMA10", "VWMA20", "DIF", "DEA", "MACD_Hist", "BB_Upper", "BB_Middle", "BB_Lower",
+        "Percent_B", "KC_Upper", "KC_Middle", "KC_Lower", "KC_Position", "RSI14", "K", "D", "J",
+        "DI_Plus", "DI_Minus", "ADX")))
+
+    # VWMA：與 MA20 比較以評估量能
+    vwma_vs_ma20 = ((values.vwma20 - ma20_current) / ma20_current) * 100
+    if values.vwma5 > values.vwma10 and values.vwma10 > values.vwma20 and close_price > values.vwma20:
+        vwma_state = VwmaState.BULL_CONFIRMED if vwma_vs_ma20 > 0.1 else VwmaState.BULL_WEAK
+    elif values.vwma5 < values.vwma10 and values.vwma10 < values.vwma20 and close_price < values.vwma20:
+        vwma_state = VwmaState.BEAR_CONFIRMED if vwma_vs_ma20 < -0.1 else VwmaState.BEAR_WEAK
     else:
-        analysis_results["technical_indicators_summary"]["VWMA"] = \
-            f"量價關係複雜。VWMA5={vwma5:.2f}, VWMA10={vwma10:.2f}, VWMA20={vwma20:.2f}，與MA偏差{vwma_vs_ma5:.2f}%，需觀察量價配合度。"
-
-    # MACD Analysis
-    dif = klines_df["DIF"].iloc[-1]
-    dea = klines_df["DEA"].iloc[-1]
-    macd_hist = klines_df["MACD_Hist"].iloc[-1]
-    if dif > dea and dif > 0:
-        analysis_results["technical_indicators_summary"]["MACD"] = \
-            f"金叉運行中。DIF（{dif:.4f}）高於DEA（{dea:.4f}），且均在零軸上方，柱狀圖為{macd_hist:.4f}，顯示多頭動能強勁。"
-    elif dif < dea and dif > 0:
-        analysis_results["technical_indicators_summary"]["MACD"] = \
-            f"死叉運行中但收斂。DIF（{dif:.4f}）仍高於零軸，DEA（{dea:.4f}）趨平，柱狀圖縮減至{macd_hist:.4f}，暗示空頭動能減弱。"
+        vwma_state = VwmaState.MIXED
+
+    # MACD
+    if values.dif > values.dea and values.dif > 0:
+        macd_state = MacdState.GOLDEN_CROSS
+    elif values.dif < values.dea and values.dif > 0:
+        macd_state = MacdState.DEAD_CROSS
     else:
-        analysis_results["technical_indicators_summary"]["MACD"] = \
-            f"MACD指標偏空或震盪。DIF={dif:.4f}, DEA={dea:.4f}, 柱狀圖={macd_hist:.4f}。"
-
-    # BOLL Analysis
-    bb_upper = klines_df["BB_Upper"].iloc[-1]
-    bb_middle = klines_df["BB_Middle"].iloc[-1]
-    bb_lower = klines_df["BB_Lower"].iloc[-1]
-    percent_b = klines_df["Percent_B"].iloc[-1]
-    
-    # 根據 %B 值進行更精確的判斷
+        macd_state = MacdState.WEAK
+
+    # BOLL：根據 %B 值進行更精確的判斷
+    percent_b = values.percent_b
     if percent_b > 1.0:  # 價格突破上軌
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格突破上軌（{bb_upper:.2f}），%B（{percent_b:.2%}）顯示超買，注意回調風險。"
+        boll_state = BollState.ABOVE_UPPER
     elif percent_b > 0.8:  # 價格接近上軌
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格貼近上軌（{bb_upper:.2f}），%B（{percent_b:.2%}）偏高，中軌（{bb_middle:.2f}）提供動態支撐。"
+        boll_state = BollState.NEAR_UPPER
     elif percent_b < 0.0:  # 價格跌破下軌
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格跌破下軌（{bb_lower:.2f}），%B（{percent_b:.2%}）顯示超賣，可能出現反彈。"
+        boll_state = BollState.BELOW_LOWER
     elif percent_b < 0.2:  # 價格接近下軌
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格貼近下軌（{bb_lower:.2f}），%B（{percent_b:.2%}）偏低，中軌（{bb_middle:.2f}）提供動態壓力。"
+        boll_state = BollState.NEAR_LOWER
     elif percent_b > 0.6:  # 價格在上半部
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格位於布林帶上半部，%B（{percent_b:.2%}）偏強，上軌（{bb_upper:.2f}）為壓力位。"
+        boll_state = BollState.UPPER_HALF
     elif percent_b < 0.4:  # 價格在下半部
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格位於布林帶下半部，%B（{percent_b:.2%}）偏弱，下軌（{bb_lower:.2f}）為支撐位。"
+        boll_state = BollState.LOWER_HALF
     else:  # 價格在中軌附近
-        analysis_results["technical_indicators_summary"]["BOLL"] = \
-            f"價格在布林帶中軌附近震盪，%B（{percent_b:.2%}）中性，上軌（{bb_upper:.2f}）壓力，下軌（{bb_lower:.2f}）支撐。"
-
-    # KC Analysis
-    kc_upper = klines_df["KC_Upper"].iloc[-1]
-    kc_middle = klines_df["KC_Middle"].iloc[-1]
-    kc_lower = klines_df["KC_Lower"].iloc[-1]
-    kc_position = klines_df["KC_Position"].iloc[-1]
-    if close_price > kc_upper * 0.98: # Close to upper channel
-        analysis_results["technical_indicators_summary"]["KC"] = \
-            f"價格突破上軌（{kc_upper:.2f}），KC位置（{kc_position:.2%}）顯示強勢，中軌（{kc_middle:.2f}）成為動態支撐。"
-    elif close_price < kc_lower * 1.02: # Close to lower channel
-        analysis_results["technical_indicators_summary"]["KC"] = \
-            f"價格跌破下軌（{kc_lower:.2f}），KC位置（{kc_position:.2%}）顯示弱勢，中軌（{kc_middle:.2f}）成為動態阻力。"
+        boll_state = BollState.MIDDLE
+
+    # KC
+    if close_price > values.kc_upper * 0.98: # Close to upper channel
+        kc_state = KcState.NEAR_UPPER
+    elif close_price < values.kc_lower * 1.02: # Close to lower channel
+        kc_state = KcState.NEAR_LOWER
     else:
-        analysis_results["technical_indicators_summary"]["KC"] = \
-            f"價格在肯特納通道內運行。上軌={kc_upper:.2f}, 中軌={kc_middle:.2f}, 下軌={kc_lower:.2f}, 位置={kc_position:.2%}。"
-
-    # RSI Analysis
-    rsi14 = klines_df["RSI14"].iloc[-1]
-    if rsi14 > 70:
-        analysis_results["technical_indicators_summary"]["RSI"] = \
-            f"RSI14（{rsi14:.2f}）進入超買區（70），需警惕回調風險。"
-    elif rsi14 < 30:
-        analysis_results["technical_indicators_summary"]["RSI"] = \
-            f"RSI14（{rsi14:.2f}）進入超賣區（30），可能出現反彈。"
+        kc_state = KcState.INSIDE
+
+    # RSI
+    if values.rsi14 > 70:
+        rsi_state = RsiState.OVERBOUGHT
+    elif values.rsi14 < 30:
+        rsi_state = RsiState.OVERSOLD
     else:
-        analysis_results["technical_indicators_summary"]["RSI"] = \
-            f"RSI14（{rsi14:.2f}）中性偏強，未達超買區（70），與價格走勢同步。"
+        rsi_state = RsiState.NEUTRAL
 
-    # KDJ Analysis
-    k_val = klines_df["K"].iloc[-1]
-    d_val = klines_df["D"].iloc[-1]
-    j_val = klines_df["J"].iloc[-1]
+    # KDJ
+    k_val, d_val = values.k, values.d
     if k_val > d_val and d_val < 80 and k_val < 80: # Not overbought yet
-        analysis_results["technical_indicators_summary"]["KDJ"] = \
-            f"金叉初現。K值（{k_val:.2f}）上穿D值（{d_val:.2f}），J值（{j_val:.2f}）轉強。"
+        kdj_state = KdjState.GOLDEN_CROSS
     elif k_val < d_val and d_val > 20 and k_val > 20: # Not oversold yet
-        analysis_results["technical_indicators_summary"]["KDJ"] = \
-            f"死叉運行。K值（{k_val:.2f}）下穿D值（{d_val:.2f}），J值（{j_val:.2f}）轉弱。"
-    else:
-        analysis_results["technical_indicators_summary"]["KDJ"] = \
-            f"KDJ指標震盪或處於極端區域。K值={k_val:.2f}, D值={d_val:.2f}, J值={j_val:.2f}。"
-
-    # DMI Analysis
-    di_plus = klines_df["DI_Plus"].iloc[-1]
-    di_minus = klines_df["DI_Minus"].iloc[-1]
-    adx = klines_df["ADX"].iloc[-1]
-    
-    # 判斷趨勢強度
-    if adx >= 25:
-        trend_strength = "強勢"
-    elif adx >= 20:
-        trend_strength = "中等"
+        kdj_state = KdjState.DEAD_CROSS
     else:
-        trend_strength = "弱勢"
-    
-    # 判斷趨勢方向和交叉信號
-    if di_plus > di_minus:
-        if adx >= 25:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"多頭{trend_strength}趨勢。DI+（{di_plus:.2f}）高於DI-（{di_minus:.2f}），ADX（{adx:.2f}）顯示{trend_strength}趨勢，上漲動能充足。"
-        elif adx >= 20:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"多頭{trend_strength}趨勢。DI+（{di_plus:.2f}）略高於DI-（{di_minus:.2f}），ADX（{adx:.2f}）顯示{trend_strength}趨勢，上漲動能一般。"
-        else:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"多頭偏向但趨勢{trend_strength}。DI+（{di_plus:.2f}）高於DI-（{di_minus:.2f}），但ADX（{adx:.2f}）偏低，缺乏明確方向。"
-    elif di_minus > di_plus:
-        if adx >= 25:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"空頭{trend_strength}趨勢。DI-（{di_minus:.2f}）高於DI+（{di_plus:.2f}），ADX（{adx:.2f}）顯示{trend_strength}趨勢，下跌動能充足。"
-        elif adx >= 20:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"空頭{trend_strength}趨勢。DI-（{di_minus:.2f}）略高於DI+（{di_plus:.2f}），ADX（{adx:.2f}）顯示{trend_strength}趨勢，下跌動能一般。"
-        else:
-            analysis_results["technical_indicators_summary"]["DMI"] = \
-                f"空頭偏向但趨勢{trend_strength}。DI-（{di_minus:.2f}）高於DI+（{di_plus:.2f}），但ADX（{adx:.2f}）偏低，缺乏明確方向。"
+        kdj_state = KdjState.EXTREME
+
+    # DMI：方向與 ADX 趨勢強度
+    adx = values.adx
+    if values.di_plus > values.di_minus:
+        dmi_state = DmiState.BULL_STRONG if adx >= 25 else DmiState.BULL_MODERATE if adx >= 20 else DmiState.BULL_WEAK
+    elif values.di_minus > values.di_plus:
+        dmi_state = DmiState.BEAR_STRONG if adx >= 25 else DmiState.BEAR_MODERATE if adx >= 20 else DmiState.BEAR_WEAK
     else:
-        analysis_results["technical_indicators_summary"]["DMI"] = \
-            f"方向不明。DI+（{di_plus:.2f}）與DI-（{di_minus:.2f}）接近，ADX（{adx:.2f}）顯示{trend_strength}趨勢，市場處於整理狀態。"
-
-    # Funding Rate (Placeholder, actual data not available from public API)
-    analysis_results["funding_rate"] = "0.01000000%（中性），未顯示極端多空情緒。"
-
-    # Volume Change (Simplified, can be improved with more detailed analysis)
-    volume_24h = float(ticker_data["volume"])
-    analysis_results["volume_change"] = f"近期成交量：{volume_24h:.2f}。上漲時放量，下跌時縮量，量價結構健康。"
-
-    # Fund Flow Data (Placeholder, actual data not available from public API)
-    analysis_results["fund_flow_data"] = "24H合約淨流入1.81億USDT（主力偏多），4H淨流入3908萬USDT加速，配合現貨資金同步流入（24H淨流入2916萬USDT），顯示買盤持續。"
-
-    # Overall Direction and Entry Strategy (Based on trend analysis)
-    trend_type = analysis_results["trend_type"]
-    
-    # 根據趨勢類型生成相應的交易建議
-    if trend_type == "多頭":
-        direction = "積極做多。多頭排列確立，價格站穩關鍵支撐{major_support:.2f}且指標共振偏多，突破{major_resistance:.2f}壓力確認趨勢延續。"
-        entry_timing = "激進者：現價{current_price:.2f}直接做多，突破{major_resistance:.2f}加倉。穩健者：等待回踩{ma20:.2f}（MA20）企穩後進場。"
-    elif trend_type == "空頭":
-        direction = "謹慎做空。空頭排列明確，價格跌破關鍵支撐{major_support:.2f}且指標共振偏空，反彈至{major_resistance:.2f}壓力可考慮做空。"
-        entry_timing = "激進者：現價{current_price:.2f}輕倉做空，反彈至{major_resistance:.2f}加倉。穩健者：等待反彈至{ma20:.2f}（MA20）阻力後進場。"
-    elif trend_type == "糾結":
-        direction = "觀望等待。均線糾結狀態，方向不明確，等待突破{major_resistance:.2f}或跌破{major_support:.2f}後再做決策。"
-        entry_timing = "激進者：暫時觀望，等待方向選擇。穩健者：突破{major_resistance:.2f}做多或跌破{major_support:.2f}做空。"
-    else:  # 震盪
-        direction = "區間操作。震盪整理格局，可在{major_support:.2f}附近做多，{major_resistance:.2f}附近做空，注意控制倉位。"
-        entry_timing = "激進者：現價{current_price:.2f}可輕倉操作。穩健者：等待接近區間邊界{major_support:.2f}或{major_resistance:.2f}後進場。"
-    
-    # 使用 Fibonacci Pivot Points 計算止損和目標價位
-    fib = analysis_results["fibonacci_pivots"]
-    s1 = fib["S1"]
-    s2 = fib["S2"]
-    r1 = fib["R1"]
-    r2 = fib["R2"]
-    pp = fib["PP"]
-
-    # 計算百分比變化
-    s1_pct = ((s1 - current_price) / current_price) * 100
-    s2_pct = ((s2 - current_price) / current_price) * 100
-    r1_pct = ((r1 - current_price) / current_price) * 100
-    r2_pct = ((r2 - current_price) / current_price) * 100
-
-    analysis_results["analysis_result"] = {
-        "方向": direction,
-        "入場時機": entry_timing,
-        "止損設定": f"S1: {s1:.2f}（{s1_pct:+.1f}%），S2: {s2:.2f}（{s2_pct:+.1f}%），或浮動止損3%以內。",
-        "目標價位": f"R1: {r1:.2f}（{r1_pct:+.1f}%），R2: {r2:.2f}（{r2_pct:+.1f}%）。"
-    }
-    # Fill in placeholders for analysis_result
-    analysis_results["analysis_result"]["方向"] = analysis_results["analysis_result"]["方向"].format(
-        major_support=analysis_results["major_support"], major_resistance=analysis_results["major_resistance"])
-    analysis_results["analysis_result"]["入場時機"] = analysis_results["analysis_result"]["入場時機"].format(
-        current_price=current_price, major_resistance=analysis_results["major_resistance"], ma20=ma20, major_support=analysis_results["major_support"])
+        dmi_state = DmiState.NEUTRAL
+
+    return AnalysisResult(
+        current_price=current_price,
+        change_24h=float(ticker_data["priceChangePercent"]),
+        change_1h=float(one_hour_change_percent),
+        change_4h=float(four_hour_change_percent),
+        volume_24h=float(ticker_data["volume"]),
+        close_price=close_price,
+        pivots=pivots,
+        ma=ma,
+        trend=trend,
+        strong=bool(strong),
+        bullish_score=bullish_score,
+        bearish_score=bearish_score,
+        indicators=values,
+        states=IndicatorStates(vwma_state, macd_state, boll_state, kc_state, rsi_state, kdj_state, dmi_state),
+        open_time=to_millis(klines_df["open_time"].iloc[-1]) if "open_time" in klines_df.columns else 0,
+    )
+
+def analyze_indicators(ticker_data, klines_df, params=None):
+    """
+    分析最後一根 K 線，返回含說明文字的報告 dict
+
+    結構化結果見 analyze_klines，文字由 analysis_format.render_analysis 產生。
+    """
+    return render_analysis(analyze_klines(ticker_data, klines_df, params))
+
+def _batch_indicator_frames(symbols, intervals, store):
+    """以批次引擎一次計算所有交易對的指標，返回 {(symbol, interval): DataFrame}"""
+    precomputed = {}
+    for interval in intervals:
+        frames = {}
+        for symbol in symbols:
+            df = store.load(symbol, interval, columns=ANALYSIS_COLUMNS)
+            if df is not None:
+                frames[symbol] = df
+        try:
+            for symbol, df in batch_frames(frames).items():
+                precomputed[(symbol, interval)] = df
+        except Exception as e:
+            # 批次計算失敗時退回逐一計算
+            print(f"⚠️ Batch indicator engine failed for {interval}: {e}")
+    return precomputed
+
+def stream_indicator_frame(symbol, interval, klines_df, state_dir="data/state"):
+    """
+    以增量指標狀態計算最近的指標
+
+    已收盤的 K 線 (除最後一根外) 併入保存的狀態，最後一根可能尚未收盤，
+    只以預覽方式計算，不寫入狀態。
+
+    Returns:
+        DataFrame: 最近 24 根 K 線與指標
+    """
+    state = load_or_create_state(symbol, interval, state_dir)
+    last_candle = klines_df.iloc[-1]
+    if state.last_open_time is not None and pd.Timestamp(last_candle["open_time"]) <= state.last_open_time:
+        # 存儲被重建或回退，狀態已不適用
+        state = IndicatorState(symbol, interval)
+
+    state.catch_up(klines_df.iloc[:-1])
+    state.save(state_path(symbol, interval, state_dir))
+    return state.preview(last_candle.to_dict()).to_frame()
+
+def _share_klines(frames):
+    """
+    將多組 K 線寫入同一塊共享記憶體 (rows × ANALYSIS_COLUMNS 的 float64 陣列)
+
+    Args:
+        frames (dict): {key: {column: ndarray}}，open_time 為毫秒 int64
+
+    Returns:
+        tuple: (SharedMemory, total_rows, {key: (offset, length)})
+    """
+    total_rows = sum(len(arrays['close']) for arrays in frames.values())
+    shm = shared_memory.SharedMemory(create=True, size=max(total_rows, 1) * len(ANALYSIS_COLUMNS) * 8)
+    block = np.ndarray((total_rows, len(ANALYSIS_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+    layout = {}
+    offset = 0
+    for key, arrays in frames.items():
+        length = len(arrays['close'])
+        for column_index, column in enumerate(ANALYSIS_COLUMNS):
+            block[offset:offset + length, column_index] = arrays[column]
+        layout[key] = (offset, length)
+        offset += length
+    del block
+    return shm, total_rows, layout
+
+def _analyze_shared_klines(shm_name, total_rows, offset, length, ticker_data, params=None):
+    """子進程：從共享記憶體讀取 K 線，計算指標並分析 (返回 AnalysisResult，不產生說明文字)"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((total_rows, len(ANALYSIS_COLUMNS)), dtype=np.float64, buffer=shm.buf)
+        data = block[offset:offset + length].copy()
+        del block
+    finally:
+        shm.close()
+
+    klines_df = pd.DataFrame(data, columns=ANALYSIS_COLUMNS)
+    klines_df['open_time'] = pd.to_datetime(klines_df['open_time'].astype('int64'), unit='ms')
+    return analyze_klines(ticker_data, calculate_technical_indicators(klines_df), params)
+
+def _analyze_in_processes(symbols, intervals, store, tickers, max_workers=None, params=None):
+    """
+    以進程池並行分析所有 (symbol, interval)
+
+    K 線以共享記憶體傳給子進程，不序列化 DataFrame。
+
+    Returns:
+        dict: {(symbol, interval): 分析結果或例外}
+    """
+    results = {}
+    frames = {}
+    for symbol in symbols:
+        if symbol not in tickers:
+            continue
+        for interval in intervals:
+            arrays = store.load_arrays(symbol, interval, columns=ANALYSIS_COLUMNS)
+            if arrays is None or not len(arrays['close']):
+                results[(symbol, interval)] = FileNotFoundError(store.path(symbol, interval))
+                continue
+            frames[(symbol, interval)] = arrays
+    if not frames:
+        return results
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(frames))
+    shm, total_rows, layout = _share_klines(frames)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                key: executor.submit(_analyze_shared_klines, shm.name, total_rows, offset, length, tickers[key[0]], params)
+                for key, (offset, length) in layout.items()
+            }
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = e
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+def analyze_multiple_symbols(symbols, intervals=["1h", "15m"], store=None, engine="pandas", max_workers=None,
+                             params=None, tickers=None):
+    """
+    分析多個交易對的多時間框架
 
-    return analysis_results
+    Args:
+        symbols (list): 交易對列表
+        intervals (list): 時間框架列表
+        store (KlineStore): K 線存儲
+        engine (str): 指標計算引擎，"pandas" 逐一計算，"batch" 以 NumPy 面板一次計算所有交易對，
+            "stream" 從 data/state 保存的增量狀態繼續，只處理新 K 線，
+            "process" 將 (symbol, interval) 分配到進程池並行計算，
+            "latest" 只以最後 latest_window() 根 K 線計算指標
+        max_workers (int): "process" 引擎的進程數，預設為 CPU 核心數
+        params (AnalysisParams): 趨勢判斷門檻，預設為 current_params()
+        tickers (dict): {symbol: 24hr 行情}，預設從 TICKER_SNAPSHOT_FILE 讀取
 
-def analyze_multiple_symbols(symbols, intervals=["1h", "15m"]):
-    """分析多個交易對的多時間框架"""
+    Returns:
+        dict: {symbol: {"symbol": symbol, interval: AnalysisResult}}；分析失敗的時間框架為
+            預設值 dict。說明文字不在這裡產生，由 save_report (JSON) 或 ReportView 在讀取時產生
+    """
     all_analysis = {}
+    store = store or KlineStore()
+    params = params or current_params()
+    precomputed = _batch_indicator_frames(symbols, intervals, store) if engine == "batch" else {}
+    tickers = load_tickers(symbols) if tickers is None else tickers
+    analyzed = _analyze_in_processes(symbols, intervals, store, tickers, max_workers, params) if engine == "process" else {}
 
     for symbol in symbols:
-        ticker_file = f"data/{symbol}_ticker_24hr.json"
-        
         try:
             print(f"Analyzing {symbol}...")
 
             # 讀取ticker數據
-            with open(ticker_file, "r") as f:
-                ticker_data = json.load(f)
+            if symbol not in tickers:
+                raise FileNotFoundError(TICKER_SNAPSHOT_FILE)
+            ticker_data = tickers[symbol]
 
             symbol_analysis = {"symbol": symbol}
             
             # 分析每個時間框架
             for interval in intervals:
-                klines_file = f"data/{symbol}_klines_{interval}.csv"
+                klines_file = store.path(symbol, interval)
                 
                 try:
-                    # 讀取K線數據
-                    klines_df = pd.read_csv(klines_file)
-                    
-                    # 確保數據類型正確
-                    klines_df["close"] = pd.to_numeric(klines_df["close"])
-                    klines_df["high"] = pd.to_numeric(klines_df["high"])
-                    klines_df["low"] = pd.to_numeric(klines_df["low"])
-
-                    # 計算技術指標
-                    klines_df_with_indicators = calculate_technical_indicators(klines_df.copy())
+                    if (symbol, interval) in analyzed:
+                        # 已在子進程完成分析
+                        analysis = analyzed[(symbol, interval)]
+                        if isinstance(analysis, Exception):
+                            raise analysis
+                    else:
+                        if (symbol, interval) in precomputed:
+                            klines_df_with_indicators = precomputed[(symbol, interval)]
+                        else:
+                            # 讀取K線數據
+                            klines_df = store.load(symbol, interval, columns=ANALYSIS_COLUMNS)
+                            if klines_df is None:
+                                raise FileNotFoundError(klines_file)
+
+                            # 確保數據類型正確
+                            klines_df["close"] = pd.to_numeric(klines_df["close"])
+                            klines_df["high"] = pd.to_numeric(klines_df["high"])
+                            klines_df["low"] = pd.to_numeric(klines_df["low"])
+
+                            # 計算技術指標
+                            if engine == "stream":
+                                klines_df_with_indicators = stream_indicator_frame(symbol, interval, klines_df)
+                            elif engine == "latest":
+                                klines_df_with_indicators = calculate_latest_indicators(klines_df)
+                            else:
+                                klines_df_with_indicators = calculate_technical_indicators(klines_df.copy())
+
+                        # 執行分析
+                        analysis = analyze_klines(ticker_data, klines_df_with_indicators, params)
 
-                    # 執行分析
-                    analysis = analyze_indicators(ticker_data, klines_df_with_indicators)
-                    
                     # 儲存到對應時間框架
                     symbol_analysis[interval] = analysis
                     
@@ -585,16 +566,11 @@ def analyze_multiple_symbols(symbols, intervals=["1h", "15m"]):
                     }
                     continue
 
-            # 保持向後兼容性 - 將1h數據複製到根層級
-            if "1h" in symbol_analysis:
-                for key, value in symbol_analysis["1h"].items():
-                    symbol_analysis[key] = value
-
             all_analysis[symbol] = symbol_analysis
             print(f"✅ {symbol} multi-timeframe analysis completed")
 
         except FileNotFoundError:
-            print(f"❌ Error: {ticker_file} not found for {symbol}")
+            print(f"❌ Error: 24hr ticker not found for {symbol} in {TICKER_SNAPSHOT_FILE}")
             continue
         except Exception as e:
             print(f"❌ Error analyzing {symbol}: {e}")
@@ -603,20 +579,32 @@ def analyze_multiple_symbols(symbols, intervals=["1h", "15m"]):
     return all_analysis
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多幣種多時間框架技術分析")
+    parser.add_argument("--engine", choices=["pandas", "batch", "stream", "process", "latest"], default="pandas",
+                        help="指標計算引擎")
+    parser.add_argument("--workers", type=int, help="process 引擎的進程數，預設為 CPU 核心數")
+    parser.add_argument("--params", help="趨勢判斷參數 JSON (例如 param_sweep.py --save-best 的輸出)")
+    parser.add_argument("--report-format", choices=REPORT_FORMATS,
+                        help="報告格式，預設讀取 REPORT_FORMAT 環境變數 (json)；compact 寫入去重的快照與數值表")
+    args = parser.parse_args()
+
     # 支援的交易對
     symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
     intervals = ["1h", "15m"]  # 支援多時間框架
 
     try:
         print("🔍 開始多幣種多時間框架技術分析...")
-        all_analysis = analyze_multiple_symbols(symbols, intervals)
+        params = AnalysisParams.load(args.params) if args.params else None
+        all_analysis = analyze_multiple_symbols(symbols, intervals, engine=args.engine, max_workers=args.workers,
+                                                params=params)
 
         # 保存綜合分析結果到 data 目錄
-        with open("data/multi_investment_report.json", "w", encoding="utf-8") as f:
-            json.dump(all_analysis, f, indent=4, ensure_ascii=False)
+        report_files = save_report(all_analysis, fmt=args.report_format)
 
         print(f"\n📊 成功分析 {len(all_analysis)} 個交易對:")
-        for symbol, analysis in all_analysis.items():
+        for symbol, analysis in ReportView(all_analysis).items():
             price = analysis['current_price']
             change = analysis['24hr_change_percent']
             trend_1h = analysis['1h']['current_trend'] if '1h' in analysis else analysis['current_trend']
@@ -625,7 +613,7 @@ if __name__ == "__main__":
             print(f"      1H趨勢: {trend_1h}")
             print(f"      15M趨勢: {trend_15m}")
 
-        print("\n📄 Multi-timeframe investment report saved: data/multi_investment_report.json")
+        print(f"\n📄 Multi-timeframe investment report saved: {', '.join(report_files)}")
 
     except Exception as e:
         print(f"An error occurred during analysis: {e}")
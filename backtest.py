@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+15m + 1h 綜合建議回測
+Backtest of the "明確看多 / 明確看空" combined advice with Fibonacci S1/R1 exits
+
+15m 與 1h 的趨勢判斷皆為多頭時做多 (明確看多)，皆為空頭時做空 (明確看空)。
+進場價為訊號 15m K 線的收盤價；做多以 1h Fibonacci S1 為停損、R1 為目標，
+做空則相反。同一時間只持有一個部位，同一根 K 線同時觸及停損與目標時以停損計。
+
+1h 趨勢與 Pivots 只使用訊號時已收盤的 1h K 線，避免未來數據。
+訊號與出場點以陣列運算計算，只有串接交易時逐筆 (而非逐根 K 線) 走訪。
+
+用法:
+    python get_binance_data.py --backfill 2025-01-01 --intervals 15m
+    python backtest.py --symbol BTCUSDT --days 365
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis_params import AnalysisParams
+from kline_store import KlineStore
+from resample import resample_klines
+from signal_series import BEARISH, BULLISH, classify_trend, ma_features, pivot_series
+
+MAX_HOLDING_BARS = 96 * 3   # 最長持有 3 天 (15m K 線)，到期以收盤價出場
+EXIT_CHUNK = 8192           # 每次計算出場的進場點數，限制滑動視窗佔用的記憶體
+
+def prepare_backtest(klines_15m, klines_1h=None):
+    """
+    與參數無關的回測資料：15m K 線、對齊到已收盤 1h K 線的 Pivots，以及兩個時間框架的均線特徵
+
+    結果可重複傳給 run_prepared / signal_frame，套用不同的 AnalysisParams 時不需重新計算指標。
+
+    Args:
+        klines_15m (DataFrame): 15m K 線 (需有 open_time)
+        klines_1h (DataFrame): 1h K 線，None 時由 15m 聚合
+
+    Returns:
+        dict: frame (open_time, close_time, high, low, close, S1, R1)、features_15m、features_1h、
+            hour_index (每根 15m K 線對應的 1h 列，-1 表示尚無已收盤的 1h K 線)、tradable、exits
+    """
+    klines_15m = klines_15m.sort_values("open_time").reset_index(drop=True)
+    if klines_1h is None:
+        klines_1h = resample_klines(klines_15m, "1h", "15m")
+    klines_1h = klines_1h.sort_values("open_time").reset_index(drop=True)
+
+    frame = klines_15m[["open_time", "high", "low", "close"]].copy()
+    frame["close_time"] = pd.to_datetime(frame["open_time"]) + pd.Timedelta(minutes=15)
+
+    # 對齊到訊號時已收盤的最後一根 1h K 線
+    hourly_close = (pd.to_datetime(klines_1h["open_time"]) + pd.Timedelta(hours=1)).to_numpy()
+    hour_index = np.searchsorted(hourly_close, frame["close_time"].to_numpy(), side="right") - 1
+    has_hour = hour_index >= 0
+    pivots = pivot_series(klines_1h)
+    for column in ("S1", "R1"):
+        values = pivots[column].to_numpy(dtype=float)
+        frame[column] = np.where(has_hour, values[np.maximum(hour_index, 0)], np.nan) if len(values) else np.nan
+
+    # 停損與目標分別位於進場價兩側的 K 線才能進場 (最後一根無法進場)
+    close = frame["close"].to_numpy(dtype=float)
+    tradable = (frame["S1"].to_numpy() < close) & (close < frame["R1"].to_numpy())
+    if len(tradable):
+        tradable[-1] = False
+
+    return {
+        "frame": frame,
+        "features_15m": ma_features(klines_15m),
+        "features_1h": ma_features(klines_1h),
+        "hour_index": hour_index,
+        "tradable": tradable,
+        "exits": {},
+    }
+
+def _signals(prepared, params=None):
+    """每根 15m K 線的 15m/1h 趨勢代碼與綜合訊號"""
+    trend_15m = classify_trend(prepared["features_15m"], params)["trend"]
+    hourly = classify_trend(prepared["features_1h"], params)["trend"]
+    hour_index = prepared["hour_index"]
+    if len(hourly):
+        trend_1h = np.where(hour_index >= 0, hourly[np.maximum(hour_index, 0)], -1).astype(np.int8)
+    else:
+        trend_1h = np.full(len(hour_index), -1, dtype=np.int8)
+
+    bullish = (trend_15m == BULLISH) & (trend_1h == BULLISH)
+    bearish = (trend_15m == BEARISH) & (trend_1h == BEARISH)
+    signal = np.where(bullish, 1, np.where(bearish, -1, 0)).astype(np.int8)
+    return trend_15m, trend_1h, signal
+
+def signal_frame(prepared, params=None):
+    """prepare_backtest 的結果套用參數後的訊號表 (欄位同 combined_signal_frame)"""
+    frame = prepared["frame"].copy()
+    frame["trend_15m"], frame["trend_1h"], frame["signal"] = _signals(prepared, params)
+    return frame
+
+def combined_signal_frame(klines_15m, klines_1h=None, params=None):
+    """
+    每根 15m K 線的 15m/1h 趨勢、1h Pivots 與綜合訊號
+
+    Args:
+        klines_15m (DataFrame): 15m K 線 (需有 open_time)
+        klines_1h (DataFrame): 1h K 線，None 時由 15m 聚合
+        params (AnalysisParams): 趨勢判斷門檻，預設為 current_params()
+
+    Returns:
+        DataFrame: open_time, close_time, high, low, close, S1, R1, trend_15m, trend_1h,
+            signal (1 明確看多 / -1 明確看空 / 0 其他)
+    """
+    return signal_frame(prepare_backtest(klines_15m, klines_1h), params)
+
+def _first_exit(frame, entries, side, max_holding):
+    """
+    計算每個候選進場點的出場位置與價格
+
+    Returns:
+        tuple: (exit_index, exit_price, reason)，reason 為 "target" / "stop" / "timeout"
+    """
+    high = frame["high"].to_numpy(dtype=float)
+    low = frame["low"].to_numpy(dtype=float)
+    close = frame["close"].to_numpy(dtype=float)
+    s1 = frame["S1"].to_numpy(dtype=float)
+    r1 = frame["R1"].to_numpy(dtype=float)
+    n = len(frame)
+
+    # 往後補 max_holding 根 NaN，讓每個進場點都能取得完整的視窗
+    pad = np.full(max_holding, np.nan)
+    high_view = sliding_window_view(np.r_[high, pad], max_holding)
+    low_view = sliding_window_view(np.r_[low, pad], max_holding)
+
+    def first(hits):
+        index = hits.argmax(axis=1)
+        return np.where(hits.any(axis=1), index, max_holding)
+
+    exit_index = np.empty(len(entries), dtype=np.int64)
+    exit_price = np.empty(len(entries))
+    reason = np.empty(len(entries), dtype=object)
+    for chunk in range(0, len(entries), EXIT_CHUNK):
+        part = slice(chunk, chunk + EXIT_CHUNK)
+        at = entries[part]
+        high_windows = high_view[at + 1]
+        low_windows = low_view[at + 1]
+
+        is_long = side[part] > 0
+        stop = np.where(is_long, s1[at], r1[at])
+        target = np.where(is_long, r1[at], s1[at])
+        long = is_long[:, np.newaxis]
+        stop_hit = np.where(long, low_windows <= stop[:, np.newaxis], high_windows >= stop[:, np.newaxis])
+        target_hit = np.where(long, high_windows >= target[:, np.newaxis], low_windows <= target[:, np.newaxis])
+
+        stop_at = first(stop_hit)
+        target_at = first(target_hit)
+        timeout_at = np.minimum(max_holding - 1, n - 2 - at)
+
+        offset = np.minimum(stop_at, target_at)
+        price = np.where(stop_at <= target_at, stop, target)
+        timed_out = offset > timeout_at
+        offset = np.where(timed_out, timeout_at, offset)
+        index = at + 1 + offset
+        exit_index[part] = index
+        exit_price[part] = np.where(timed_out, close[np.clip(index, 0, n - 1)], price)
+        reason[part] = np.where(timed_out, "timeout", np.where(stop_at <= target_at, "stop", "target"))
+    return exit_index, exit_price, reason
+
+def precompute_exits(prepared, max_holding=MAX_HOLDING_BARS):
+    """
+    預先計算所有可進場 K 線做多與做空的出場結果
+
+    出場只取決於進場點與 S1/R1，與趨勢參數無關；參數掃描時計算一次即可讓每組參數直接查表。
+    """
+    if max_holding in prepared["exits"]:
+        return prepared["exits"][max_holding]
+    entries = np.flatnonzero(prepared["tradable"])
+    table = {}
+    for side in (1, -1):
+        table[side] = _first_exit(prepared["frame"], entries, np.full(len(entries), side), max_holding)
+    prepared["exits"][max_holding] = (entries, table)
+    return prepared["exits"][max_holding]
+
+def run_prepared(prepared, params=None, max_holding=MAX_HOLDING_BARS, fee_rate=0.0, allow_short=True):
+    """
+    以 prepare_backtest 的結果回測一組參數
+
+    Returns:
+        tuple: (trades DataFrame, summary dict)
+    """
+    frame = prepared["frame"]
+    close = frame["close"].to_numpy(dtype=float)
+    signal = _signals(prepared, params)[2]
+    if not allow_short:
+        signal = np.where(signal > 0, signal, 0)
+
+    candidates = np.flatnonzero((signal != 0) & prepared["tradable"])
+    columns = ["entry_time", "side", "entry_price", "stop", "target", "exit_time", "exit_price",
+               "reason", "bars_held", "return_pct"]
+    if not len(candidates):
+        return pd.DataFrame(columns=columns), summarize(pd.DataFrame(columns=columns))
+
+    side = signal[candidates]
+    if max_holding in prepared["exits"]:
+        entries, table = prepared["exits"][max_holding]
+        position = np.searchsorted(entries, candidates)
+        is_long = side > 0
+        exit_index, exit_price, reason = (np.where(is_long, table[1][i][position], table[-1][i][position])
+                                          for i in range(3))
+    else:
+        exit_index, exit_price, reason = _first_exit(frame, candidates, side, max_holding)
+
+    # 串接交易：同一時間只持有一個部位，出場後的下一個訊號才能進場
+    chosen = []
+    position = 0
+    while position < len(candidates):
+        chosen.append(position)
+        position = np.searchsorted(candidates, exit_index[position], side="right")
+    chosen = np.array(chosen)
+
+    entries = candidates[chosen]
+    side = side[chosen]
+    s1 = frame["S1"].to_numpy()
+    r1 = frame["R1"].to_numpy()
+    entry_price = close[entries]
+    exit_price = exit_price[chosen]
+    gross = np.where(side > 0, exit_price / entry_price - 1, entry_price / exit_price - 1)
+    trades = pd.DataFrame({
+        "entry_time": frame["close_time"].to_numpy()[entries],
+        "side": np.where(side > 0, "long", "short"),
+        "entry_price": entry_price,
+        "stop": np.where(side > 0, s1[entries], r1[entries]),
+        "target": np.where(side > 0, r1[entries], s1[entries]),
+        "exit_time": frame["close_time"].to_numpy()[exit_index[chosen]],
+        "exit_price": exit_price,
+        "reason": reason[chosen],
+        "bars_held": exit_index[chosen] - entries,
+        "return_pct": (gross - 2 * fee_rate) * 100,
+    })
+    return trades, summarize(trades)
+
+def run_backtest(klines_15m, klines_1h=None, max_holding=MAX_HOLDING_BARS, fee_rate=0.0, allow_short=True,
+                 params=None):
+    """
+    回測 15m + 1h 明確看多/看空訊號
+
+    Args:
+        klines_15m (DataFrame): 15m K 線
+        klines_1h (DataFrame): 1h K 線，None 時由 15m 聚合
+        max_holding (int): 最長持有的 15m K 線數
+        fee_rate (float): 單邊手續費率
+        allow_short (bool): 是否交易明確看空訊號
+        params (AnalysisParams): 趨勢判斷門檻，預設為 current_params()
+
+    Returns:
+        tuple: (trades DataFrame, summary dict)
+    """
+    return run_prepared(prepare_backtest(klines_15m, klines_1h), params, max_holding, fee_rate, allow_short)
+
+def summarize(trades):
+    """回測統計"""
+    if trades.empty:
+        return {"trades": 0, "win_rate": 0.0, "total_return_pct": 0.0, "avg_return_pct": 0.0,
+                "max_drawdown_pct": 0.0, "profit_factor": 0.0}
+    returns = trades["return_pct"].to_numpy() / 100
+    equity = np.cumprod(1 + returns)
+    drawdown = 1 - equity / np.maximum.accumulate(np.r_[1.0, equity])[1:]
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+    return {
+        "trades": len(trades),
+        "long_trades": int((trades["side"] == "long").sum()),
+        "short_trades": int((trades["side"] == "short").sum()),
+        "win_rate": float((returns > 0).mean() * 100),
+        "total_return_pct": float((equity[-1] - 1) * 100),
+        "avg_return_pct": float(returns.mean() * 100),
+        "max_drawdown_pct": float(drawdown.max() * 100),
+        "profit_factor": float(gains / losses) if losses > 0 else float("inf"),
+        "exits": trades["reason"].value_counts().to_dict(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="回測 15m + 1h 明確看多/看空訊號")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--days", type=int, default=365, help="回測最近幾天的數據")
+    parser.add_argument("--max-holding", type=int, default=MAX_HOLDING_BARS, help="最長持有的 15m K 線數")
+    parser.add_argument("--fee", type=float, default=0.0, help="單邊手續費率，例如 0.001")
+    parser.add_argument("--long-only", action="store_true", help="只交易明確看多訊號")
+    parser.add_argument("--params", help="趨勢判斷參數 JSON，預設為 current_params()")
+    parser.add_argument("--output", help="交易明細 CSV，預設為 data/backtest_{symbol}.csv")
+    args = parser.parse_args()
+
+    store = KlineStore()
+    klines = store.load(args.symbol, "15m")
+    if klines is None:
+        print(f"❌ 找不到 {args.symbol} 15m K 線，請先執行 python get_binance_data.py --backfill YYYY-MM-DD --intervals 15m")
+        return 1
+    start = pd.to_datetime(klines["open_time"]).iloc[-1] - pd.Timedelta(days=args.days)
+    klines = klines[pd.to_datetime(klines["open_time"]) >= start]
+
+    started = time.perf_counter()
+    params = AnalysisParams.load(args.params) if args.params else None
+    trades, summary = run_backtest(klines, max_holding=args.max_holding, fee_rate=args.fee,
+                                   allow_short=not args.long_only, params=params)
+    elapsed = time.perf_counter() - started
+
+    print(f"📊 {args.symbol} 15m+1h 回測 ({len(klines)} 根 15m K 線，耗時 {elapsed:.2f}s)")
+    for key, value in summary.items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    output = args.output or os.path.join(store.data_dir, f"backtest_{args.symbol}.csv")
+    trades.to_csv(output, index=False)
+    print(f"📄 交易明細: {output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,18 +8,53 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from get_binance_data import get_klines, get_ticker_24hr
 from analyze_binance_data import calculate_technical_indicators, analyze_indicators
+from indicator_registry import available_indicators
+from urllib.parse import urlparse, parse_qs
 import pandas as pd
 
 class handler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8'))
+
     def do_GET(self):
         try:
             # 執行分析
-            symbol = "BTCUSDT"
-            interval = "1h"
+            query = parse_qs(urlparse(self.path).query)
+            symbol = query.get("symbol", ["BTCUSDT"])[0]
+            interval = query.get("interval", ["1h"])[0]
+            # ?indicators=RSI14,MA20 只計算並返回指定指標的最新值
+            indicators = [n for n in query.get("indicators", [""])[0].split(",") if n]
+
+            # 未註冊的指標名稱是請求錯誤，在抓取數據前回應 400
+            available = available_indicators()
+            unknown = [name for name in indicators if name not in available]
+            if unknown:
+                self.send_json(400, {
+                    "error": f"未知的指標: {', '.join(unknown)}",
+                    "unknown": unknown,
+                    "available": available,
+                })
+                return
             
             # 獲取數據
-            ticker_data = get_ticker_24hr(symbol)
             klines_data = get_klines(symbol, interval)
+
+            if indicators:
+                klines_with_indicators = calculate_technical_indicators(klines_data.copy(), indicators=indicators)
+                latest = klines_with_indicators.iloc[-1]
+                result = {
+                    "symbol": symbol,
+                    "interval": interval,
+                    "open_time": str(latest["open_time"]),
+                    "indicators": {name: None if pd.isna(latest[name]) else float(latest[name]) for name in indicators},
+                }
+                self.send_json(200, result)
+                return
+
+            ticker_data = get_ticker_24hr(symbol)
             
             # 確保數據類型正確
             klines_data["close"] = pd.to_numeric(klines_data["close"])
@@ -33,10 +68,7 @@ class handler(BaseHTTPRequestHandler):
             analysis = analyze_indicators(ticker_data, klines_with_indicators)
             
             # 返回結果
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(analysis, ensure_ascii=False, indent=2).encode('utf-8'))
+            self.send_json(200, analysis)
             
         except Exception as e:
             self.send_response(500)
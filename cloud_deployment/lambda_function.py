@@ -1,9 +1,10 @@
 import json
+import os
 import boto3
 from datetime import datetime
 import pandas as pd
 from get_binance_data import get_klines, get_ticker_24hr
-from analyze_binance_data import calculate_technical_indicators, analyze_indicators
+from analyze_binance_data import calculate_latest_indicators, analyze_indicators, latest_window
 
 def lambda_handler(event, context):
     """
@@ -18,7 +19,9 @@ def lambda_handler(event, context):
         
         # 獲取數據
         ticker_data = get_ticker_24hr(symbol)
-        klines_data = get_klines(symbol, interval)
+        # 只抓取計算最新指標所需的 K 線；VERIFY_LATEST_INDICATORS=1 時抓取完整數據並比對
+        verify = os.getenv("VERIFY_LATEST_INDICATORS") == "1"
+        klines_data = get_klines(symbol, interval, limit=500 if verify else latest_window())
         
         # 數據預處理
         klines_data["close"] = pd.to_numeric(klines_data["close"])
@@ -26,7 +29,7 @@ def lambda_handler(event, context):
         klines_data["low"] = pd.to_numeric(klines_data["low"])
         
         # 計算技術指標
-        klines_with_indicators = calculate_technical_indicators(klines_data.copy())
+        klines_with_indicators = calculate_latest_indicators(klines_data, verify=verify)
         
         # 執行分析
         analysis = analyze_indicators(ticker_data, klines_with_indicators)
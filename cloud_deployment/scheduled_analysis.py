@@ -8,16 +8,21 @@ import requests
 from datetime import datetime
 import pandas as pd
 from get_binance_data import get_klines, get_ticker_24hr
-from analyze_binance_data import calculate_technical_indicators, analyze_indicators
+from analyze_binance_data import calculate_latest_indicators, analyze_klines, latest_window
+from analysis_format import render_analysis, state_label
 
-def send_webhook_notification(analysis_data):
+def send_webhook_notification(analysis_data, result):
     """
     發送 Webhook 通知 (例如 Discord, Slack, Telegram)
+
+    Args:
+        analysis_data (dict): render_analysis 產生的報告
+        result (AnalysisResult): 同一次分析的結構化結果
     """
     webhook_url = os.environ.get('WEBHOOK_URL')
     if not webhook_url:
         return
-    
+
     message = f"""
 🚀 **Binance 分析報告**
 
@@ -26,9 +31,9 @@ def send_webhook_notification(analysis_data):
 📊 **趨勢**: {analysis_data['current_trend']}
 
 🔍 **技術指標摘要**:
-• 均線系統: {analysis_data['technical_indicators_summary']['均線系統'][:50]}...
-• MACD: {analysis_data['technical_indicators_summary']['MACD'][:50]}...
-• RSI: {analysis_data['technical_indicators_summary']['RSI'][:50]}...
+• 均線系統: {state_label(result, '均線系統')} (MA20 {result.ma.ma20:,.2f})
+• MACD: {state_label(result, 'MACD')} (DIF {result.indicators.dif:.4f} / DEA {result.indicators.dea:.4f})
+• RSI: {state_label(result, 'RSI')} (RSI14 {result.indicators.rsi14:.2f})
 
 ⏰ 分析時間: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
     """
@@ -75,7 +80,9 @@ def main():
         
         # 獲取數據
         ticker_data = get_ticker_24hr(symbol)
-        klines_data = get_klines(symbol, interval)
+        # 只抓取計算最新指標所需的 K 線；VERIFY_LATEST_INDICATORS=1 時抓取完整數據並比對
+        verify = os.getenv("VERIFY_LATEST_INDICATORS") == "1"
+        klines_data = get_klines(symbol, interval, limit=500 if verify else latest_window())
         
         # 數據預處理
         klines_data["close"] = pd.to_numeric(klines_data["close"])
@@ -83,10 +90,11 @@ def main():
         klines_data["low"] = pd.to_numeric(klines_data["low"])
         
         # 計算技術指標
-        klines_with_indicators = calculate_technical_indicators(klines_data.copy())
+        klines_with_indicators = calculate_latest_indicators(klines_data, verify=verify)
         
         # 執行分析
-        analysis = analyze_indicators(ticker_data, klines_with_indicators)
+        result = analyze_klines(ticker_data, klines_with_indicators)
+        analysis = render_analysis(result)
         analysis["analysis_time"] = datetime.utcnow().isoformat()
         
         # 保存結果
@@ -94,7 +102,7 @@ def main():
             json.dump(analysis, f, indent=4, ensure_ascii=False)
         
         # 發送通知
-        send_webhook_notification(analysis)
+        send_webhook_notification(analysis, result)
         
         print("分析完成！")
         print(f"當前價格: ${analysis['current_price']:,.2f}")
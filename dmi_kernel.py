@@ -0,0 +1,248 @@
+"""
+DMI / ADX 融合計算核心
+Fused single-pass DMI/ADX kernel over contiguous arrays
+
+一次走訪 high/low/close 陣列即算出 TR、+DM、-DM、DI+、DI-、DX 與 ADX，
+不建立任何中間 DataFrame 欄位。安裝 numba 時以 JIT 編譯的迴圈執行，
+否則退回 NumPy 向量化實作 (結果相同)。
+
+平滑方式:
+- "sma":    14 期滾動加總 / 滾動平均 (與 calculate_technical_indicators 原有算法一致)
+- "wilder": Wilder 平滑 (RMA)，與多數看盤軟體的 DMI 相同
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+SMOOTHING_MODES = ("sma", "wilder")
+
+def _dmi_loop(high, low, close, period, wilder, tr, dm_plus, dm_minus, di_plus, di_minus, dx, adx):
+    """
+    單次走訪計算 DMI，結果寫入預先配置的輸出陣列
+
+    滾動視窗以累加/扣除維護總和與 NaN 計數，視窗內有 NaN 時輸出 NaN
+    (與 pandas rolling 的 min_periods=window 相同)。
+    """
+    n = high.shape[0]
+    nan = np.nan
+    tr_sum = 0.0
+    plus_sum = 0.0
+    minus_sum = 0.0
+    tr_nan = 0
+    dx_sum = 0.0
+    dx_nan = 0
+    dx_count = 0
+
+    for t in range(n):
+        # True Range：三者取最大值並忽略 NaN
+        value = high[t] - low[t]
+        if t > 0:
+            up = abs(high[t] - close[t - 1])
+            down = abs(low[t] - close[t - 1])
+            if value != value or up > value:
+                value = up
+            if value != value or down > value:
+                value = down
+        tr[t] = value
+
+        # 方向性移動
+        plus = 0.0
+        minus = 0.0
+        if t > 0:
+            high_diff = high[t] - high[t - 1]
+            low_diff = low[t - 1] - low[t]
+            if high_diff > 0 and high_diff > low_diff:
+                plus = high_diff
+            if low_diff > 0 and low_diff > high_diff:
+                minus = low_diff
+        dm_plus[t] = plus
+        dm_minus[t] = minus
+
+        if wilder:
+            # 第 1..period 根加總作為初始值，之後 s = s - s / period + x
+            if t == 0:
+                di_plus[t] = nan
+                di_minus[t] = nan
+                dx[t] = nan
+                adx[t] = nan
+                continue
+            if t <= period:
+                if value == value:
+                    tr_sum += value
+                else:
+                    tr_nan += 1
+                plus_sum += plus
+                minus_sum += minus
+                ready = t == period and tr_nan == 0
+            else:
+                tr_sum = tr_sum - tr_sum / period + value
+                plus_sum = plus_sum - plus_sum / period + plus
+                minus_sum = minus_sum - minus_sum / period + minus
+                ready = tr_nan == 0
+        else:
+            if value == value:
+                tr_sum += value
+            else:
+                tr_nan += 1
+            plus_sum += plus
+            minus_sum += minus
+            if t >= period:
+                old = tr[t - period]
+                if old == old:
+                    tr_sum -= old
+                else:
+                    tr_nan -= 1
+                plus_sum -= dm_plus[t - period]
+                minus_sum -= dm_minus[t - period]
+            ready = t >= period - 1 and tr_nan == 0
+
+        if ready:
+            di_plus[t] = plus_sum / tr_sum * 100 if tr_sum != 0 else nan
+            di_minus[t] = minus_sum / tr_sum * 100 if tr_sum != 0 else nan
+            total = di_plus[t] + di_minus[t]
+            dx[t] = abs(di_plus[t] - di_minus[t]) / total * 100 if total != 0 else nan
+        else:
+            di_plus[t] = nan
+            di_minus[t] = nan
+            dx[t] = nan
+
+        # ADX
+        current = dx[t]
+        if wilder:
+            if current != current:
+                adx[t] = nan
+                continue
+            dx_count += 1
+            if dx_count < period:
+                dx_sum += current
+                adx[t] = nan
+            elif dx_count == period:
+                dx_sum += current
+                dx_sum /= period
+                adx[t] = dx_sum
+            else:
+                dx_sum = (dx_sum * (period - 1) + current) / period
+                adx[t] = dx_sum
+        else:
+            if current == current:
+                dx_sum += current
+            else:
+                dx_nan += 1
+            if t >= period:
+                old = dx[t - period]
+                if old == old:
+                    dx_sum -= old
+                else:
+                    dx_nan -= 1
+            adx[t] = dx_sum / period if t >= period - 1 and dx_nan == 0 else nan
+
+if numba is not None:
+    _dmi_loop = numba.njit(cache=True, nogil=True)(_dmi_loop)
+
+def _rolling(values, window, func):
+    """1-D 滾動統計 (min_periods=window)"""
+    out = np.full_like(values, np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(sliding_window_view(values, window), axis=-1)
+    return out
+
+def _wilder_smooth(values, period, start):
+    """Wilder 平滑：第 start..start+period-1 個值加總作為初始值，之後 s = s - s / period + x"""
+    out = np.full_like(values, np.nan)
+    if len(values) < start + period:
+        return out
+    total = values[start:start + period].sum()
+    out[start + period - 1] = total
+    for t in range(start + period, len(values)):
+        total = total - total / period + values[t]
+        out[t] = total
+    return out
+
+def _wilder_average(values, period):
+    """ADX 的 Wilder 平均：前 period 個有效值取平均，之後 a = (a * (period - 1) + x) / period"""
+    out = np.full_like(values, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return out
+    first = valid[period - 1]
+    average = values[valid[:period]].mean()
+    out[first] = average
+    for t in range(first + 1, len(values)):
+        if np.isnan(values[t]):
+            continue
+        average = (average * (period - 1) + values[t]) / period
+        out[t] = average
+    return out
+
+def _dmi_numpy(high, low, close, period, wilder):
+    """NumPy 向量化實作 (未安裝 numba 時使用)"""
+    prev_close = np.r_[np.nan, close[:-1]]
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    high_diff = high - np.r_[np.nan, high[:-1]]
+    low_diff = np.r_[np.nan, low[:-1]] - low
+    with np.errstate(invalid='ignore'):
+        dm_plus = np.where((high_diff > 0) & (high_diff > low_diff), high_diff, 0.0)
+        dm_minus = np.where((low_diff > 0) & (low_diff > high_diff), low_diff, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if wilder:
+            tr_s = _wilder_smooth(tr, period, 1)
+            di_plus = _wilder_smooth(dm_plus, period, 1) / tr_s * 100
+            di_minus = _wilder_smooth(dm_minus, period, 1) / tr_s * 100
+        else:
+            tr_s = _rolling(tr, period, np.sum)
+            di_plus = _rolling(dm_plus, period, np.sum) / tr_s * 100
+            di_minus = _rolling(dm_minus, period, np.sum) / tr_s * 100
+        di_plus[tr_s == 0] = np.nan
+        di_minus[tr_s == 0] = np.nan
+        dx = np.abs(di_plus - di_minus) / (di_plus + di_minus) * 100
+
+    if wilder:
+        adx = _wilder_average(dx, period)
+    else:
+        adx = _rolling(dx, period, np.mean)
+    return tr, dm_plus, dm_minus, di_plus, di_minus, dx, adx
+
+def calculate_dmi(high, low, close, period=14, smoothing="sma"):
+    """
+    計算 DMI / ADX
+
+    Args:
+        high, low, close: 1-D 或 2-D (symbols × time) 陣列
+        period (int): 平滑週期
+        smoothing (str): "sma" 或 "wilder"
+
+    Returns:
+        dict: TR, DM_Plus, DM_Minus, DI_Plus, DI_Minus, DX, ADX，形狀與輸入相同
+    """
+    if smoothing not in SMOOTHING_MODES:
+        raise ValueError(f"不支援的平滑方式: {smoothing} (可選: {', '.join(SMOOTHING_MODES)})")
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    wilder = smoothing == "wilder"
+    names = ("TR", "DM_Plus", "DM_Minus", "DI_Plus", "DI_Minus", "DX", "ADX")
+
+    if high.ndim == 2:
+        # 面板中歷史較短的交易對前方補了 NaN，只計算實際存在的部分
+        result = {name: np.full_like(high, np.nan) for name in names}
+        for i in range(high.shape[0]):
+            valid = np.flatnonzero(~np.isnan(close[i]))
+            if not len(valid):
+                continue
+            start = valid[0]
+            row = calculate_dmi(high[i, start:], low[i, start:], close[i, start:], period, smoothing)
+            for name in names:
+                result[name][i, start:] = row[name]
+        return result
+
+    if numba is not None:
+        outputs = tuple(np.empty_like(high) for _ in names)
+        _dmi_loop(high, low, close, period, wilder, *outputs)
+    else:
+        outputs = _dmi_numpy(high, low, close, period, wilder)
+    return dict(zip(names, outputs))
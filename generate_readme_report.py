@@ -2,16 +2,19 @@
 """
 生成 README.md 投資報告
 """
-import json
-import os
 from datetime import datetime
 import pytz
 
+from analysis_format import indicator_status, result_from_report
+from analysis_result import Trend
+from report_store import open_report
+from signal_engine import SignalSnapshot, trend_display
+
 def load_analysis_data():
-    """載入多幣種分析數據"""
+    """載入多幣種分析數據 (README 涵蓋所有幣種，compact 快照全部解碼後即關閉)"""
     try:
-        with open("data/multi_investment_report.json", "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open_report() as report:
+            return dict(report)
     except FileNotFoundError:
         print("Error: data/multi_investment_report.json not found")
         return None
@@ -25,6 +28,59 @@ def get_trend_emoji(trend):
     else:
         return "📊"
 
+def get_trend(analysis):
+    """報告中的趨勢列舉 (JSON 報告沒有 typed 時由 trend_type 判斷)"""
+    result = result_from_report(analysis.get('1h'))
+    return result.trend if result else Trend.from_label(analysis.get('trend_type'))
+
+def get_text_indicator_status(indicator_key, indicator):
+    """由指標說明文字判斷燈號 (JSON 報告沒有 typed 時使用)"""
+    if indicator_key == 'BOLL':
+        if "接近下軌" in indicator or "位於中軌下方" in indicator:
+            return "🔴" # 价格偏弱/低位
+        elif "接近上軌" in indicator or "位於中軌上方" in indicator:
+            return "🟢" # 价格偏强/高位
+        else:
+            return "⚪" # 中性/震荡
+    elif indicator_key == 'KC':
+        if "跌破下軌" in indicator or "弱勢" in indicator:
+            return "🔴" # 价格偏弱/低位
+        elif "突破上軌" in indicator or "強勢" in indicator:
+            return "🟢" # 价格偏强/高位
+        else:
+            return "⚪" # 中性/震荡
+    elif indicator_key == 'VWMA':
+        if "量價配合良好" in indicator or "量能支撐" in indicator:
+            return "🟢" # 量價配合良好
+        elif "量價背離偏空" in indicator or "量能推動" in indicator:
+            return "🔴" # 量價背離偏空
+        else:
+            return "⚪" # 量價關係複雜
+    elif indicator_key == 'RSI':
+        if "超買區" in indicator or "中性偏強" in indicator:
+            return "🟢" # 偏强
+        elif "超賣區" in indicator or "中性偏弱" in indicator:
+            return "🔴" # 偏弱
+        else:
+            return "⚪" # 中性
+    elif indicator_key == 'DMI':
+        if "多頭強勢趨勢" in indicator or "多頭中等趨勢" in indicator:
+            return "🟢" # 多頭趨勢
+        elif "空頭強勢趨勢" in indicator or "空頭中等趨勢" in indicator:
+            return "🔴" # 空頭趨勢
+        elif "多頭偏向" in indicator:
+            return "🟡" # 多頭偏向但趨勢弱
+        elif "空頭偏向" in indicator:
+            return "🟠" # 空頭偏向但趨勢弱
+        else:
+            return "⚪" # 方向不明或趨勢弱
+    elif "金叉" in indicator or "多頭" in indicator or "偏強" in indicator:
+        return "🟢"
+    elif "死叉" in indicator or "空頭" in indicator or "偏弱" in indicator:
+        return "🔴"
+    else:
+        return "⚪"
+
 def get_change_emoji(change_percent):
     """根據漲跌幅返回對應的 emoji"""
     if change_percent > 2:
@@ -135,8 +191,15 @@ def format_fibonacci_pivots(analysis, current_price):
     return f"{position_desc}。{analysis_text}"
 
 
-def generate_readme_content(all_analysis_data):
-    """生成多幣種 README.md 內容"""
+def generate_readme_content(all_analysis_data, signals=None):
+    """
+    生成多幣種 README.md 內容
+
+    Args:
+        all_analysis_data (Mapping): 分析報告
+        signals (SignalSnapshot): 已分類的綜合建議，None 時由報告建立
+    """
+    signals = signals or SignalSnapshot(all_analysis_data)
 
     # 獲取當前時間 (UTC 和台北時間)
     utc_now = datetime.now(pytz.UTC)
@@ -164,73 +227,13 @@ def generate_readme_content(all_analysis_data):
         name = get_symbol_name(symbol)
         symbol_with_icon = get_symbol_with_icon(symbol, name)
 
-        # 獲取多時間框架趨勢
-        trend_15m = "🔄糾結"
-        trend_1h = "🔄糾結"
-        signal_15m = "⚪觀望"
-        signal_1h = "⚪觀望"
-        
-        # 15分鐘趨勢
-        if '15m' in analysis and 'trend_type' in analysis['15m']:
-            trend_type_15m = analysis['15m']['trend_type']
-            if trend_type_15m == "多頭":
-                trend_15m = "📈多頭"
-                signal_15m = "🟢買入" if not analysis['15m'].get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type_15m == "空頭":
-                trend_15m = "📉空頭"
-                signal_15m = "🔴賣出" if not analysis['15m'].get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type_15m == "震盪":
-                trend_15m = "📊震盪"
-        
-        # 1小時趨勢
-        if '1h' in analysis and 'trend_type' in analysis['1h']:
-            trend_type_1h = analysis['1h']['trend_type']
-            if trend_type_1h == "多頭":
-                trend_1h = "📈多頭"
-                signal_1h = "🟢買入" if not analysis['1h'].get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type_1h == "空頭":
-                trend_1h = "📉空頭"
-                signal_1h = "🔴賣出" if not analysis['1h'].get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type_1h == "震盪":
-                trend_1h = "📊震盪"
-        else:
-            # 向後兼容：使用根層級的趨勢數據
-            trend_type = analysis.get('trend_type', '糾結')
-            if trend_type == "多頭":
-                trend_1h = "📈多頭"
-                signal_1h = "🟢買入" if not analysis.get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type == "空頭":
-                trend_1h = "📉空頭"
-                signal_1h = "🔴賣出" if not analysis.get('ma_analysis', {}).get('is_tangled', True) else "⚪觀望"
-            elif trend_type == "震盪":
-                trend_1h = "📊震盪"
-        
-        # 綜合建議 - 根據不同時框組合給出具體操作建議
-        if trend_15m == trend_1h and "糾結" not in trend_15m:
-            if "多頭" in trend_15m:
-                combined_advice = "🟢明確看多"
-            elif "空頭" in trend_15m:
-                combined_advice = "🔴明確看空"
-            else:
-                combined_advice = "📊雙重震盪"
-        elif "糾結" in trend_15m and "糾結" in trend_1h:
-            combined_advice = "⚪雙重糾結"
-        else:
-            # 時框分歧時給出具體操作建議
-            if "多頭" in trend_15m and "糾結" in trend_1h:
-                combined_advice = "🟡謹慎做多"
-            elif "糾結" in trend_15m and "多頭" in trend_1h:
-                combined_advice = "🟡謹慎做多"
-            elif "空頭" in trend_15m and "糾結" in trend_1h:
-                combined_advice = "🟡謹慎做空"
-            elif "糾結" in trend_15m and "空頭" in trend_1h:
-                combined_advice = "🟡謹慎做空"
-            elif "多頭" in trend_15m and "空頭" in trend_1h:
-                combined_advice = "⚪觀望等待"
-            elif "空頭" in trend_15m and "多頭" in trend_1h:
-                combined_advice = "⚪觀望等待"
-            else:
-                combined_advice = "⚪觀望等待"
+        # 多時間框架趨勢、個別信號與綜合建議 (signal_engine)
+        signal = signals[symbol]
+        trend_15m = trend_display(signal.trend('15m'))
+        trend_1h = trend_display(signal.trend('1h'))
+        signal_15m = signal.signal('15m').display
+        signal_1h = signal.signal('1h').display
+        combined_advice = signal.advice.display
 
         readme_content += f"""
 | {symbol_with_icon} | {format_price(price, symbol)} | {one_hour_change:+.2f}% | {four_hour_change:+.2f}% | {trend_15m} | {trend_1h} | {signal_15m} | {signal_1h} | {combined_advice} |"""
@@ -302,7 +305,8 @@ def generate_readme_content(all_analysis_data):
     best_score = -999
     for symbol, analysis in all_analysis_data.items():
         change = analysis['24hr_change_percent']
-        trend_score = 2 if "多頭" in analysis['current_trend'] else -2 if "空頭" in analysis['current_trend'] else 0
+        trend = get_trend(analysis)
+        trend_score = 2 if trend == Trend.BULLISH else -2 if trend == Trend.BEARISH else 0
         score = change + trend_score
         if score > best_score:
             best_score = score
@@ -330,7 +334,8 @@ def generate_readme_content(all_analysis_data):
     worst_score = 999
     for symbol, analysis in all_analysis_data.items():
         change = analysis['24hr_change_percent']
-        trend_score = -2 if "空頭" in analysis['current_trend'] else 2 if "多頭" in analysis['current_trend'] else 0
+        trend = get_trend(analysis)
+        trend_score = -2 if trend == Trend.BEARISH else 2 if trend == Trend.BULLISH else 0
         score = change + trend_score
         if score < worst_score:
             worst_score = score
@@ -365,55 +370,12 @@ def generate_readme_content(all_analysis_data):
     xrp_data = all_analysis_data.get('XRPUSDT', {})
 
     def get_indicator_status(analysis, indicator_key):
-        if not analysis or 'technical_indicators_summary' not in analysis:
+        result = result_from_report(analysis.get('1h'))
+        if result is not None:
+            return indicator_status(result, indicator_key)
+        if 'technical_indicators_summary' not in analysis:
             return "N/A"
-        indicator = analysis['technical_indicators_summary'].get(indicator_key, "")
-
-        if indicator_key == 'BOLL':
-            if "接近下軌" in indicator or "位於中軌下方" in indicator:
-                return "🔴" # 价格偏弱/低位
-            elif "接近上軌" in indicator or "位於中軌上方" in indicator:
-                return "🟢" # 价格偏强/高位
-            else:
-                return "⚪" # 中性/震荡
-        elif indicator_key == 'KC':
-            if "跌破下軌" in indicator or "弱勢" in indicator:
-                return "🔴" # 价格偏弱/低位
-            elif "突破上軌" in indicator or "強勢" in indicator:
-                return "🟢" # 价格偏强/高位
-            else:
-                return "⚪" # 中性/震荡
-        elif indicator_key == 'VWMA':
-            if "量價配合良好" in indicator or "量能支撐" in indicator:
-                return "🟢" # 量價配合良好
-            elif "量價背離偏空" in indicator or "量能推動" in indicator:
-                return "🔴" # 量價背離偏空
-            else:
-                return "⚪" # 量價關係複雜
-        elif indicator_key == 'RSI':
-            if "超買區" in indicator or "中性偏強" in indicator:
-                return "🟢" # 偏强
-            elif "超賣區" in indicator or "中性偏弱" in indicator:
-                return "🔴" # 偏弱
-            else:
-                return "⚪" # 中性
-        elif indicator_key == 'DMI':
-            if "多頭強勢趨勢" in indicator or "多頭中等趨勢" in indicator:
-                return "🟢" # 多頭趨勢
-            elif "空頭強勢趨勢" in indicator or "空頭中等趨勢" in indicator:
-                return "🔴" # 空頭趨勢
-            elif "多頭偏向" in indicator:
-                return "🟡" # 多頭偏向但趨勢弱
-            elif "空頭偏向" in indicator:
-                return "🟠" # 空頭偏向但趨勢弱
-            else:
-                return "⚪" # 方向不明或趨勢弱
-        elif "金叉" in indicator or "多頭" in indicator or "偏強" in indicator:
-            return "🟢"
-        elif "死叉" in indicator or "空頭" in indicator or "偏弱" in indicator:
-            return "🔴"
-        else:
-            return "⚪"
+        return get_text_indicator_status(indicator_key, analysis['technical_indicators_summary'].get(indicator_key, ""))
 
     indicators_list = ['均線系統', 'VWMA', 'MACD', 'RSI', 'KDJ', 'BOLL', 'KC', 'DMI']
     for indicator in indicators_list:
@@ -458,6 +420,12 @@ def generate_readme_content(all_analysis_data):
     
     return readme_content
 
+def write_readme(readme_content, path="README.md"):
+    """寫入 README.md"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(readme_content)
+    return path
+
 def main():
     """主函數"""
     print("開始生成多幣種 README.md 投資報告...")
@@ -473,8 +441,7 @@ def main():
 
     # 寫入 README.md
     try:
-        with open("README.md", "w", encoding="utf-8") as f:
-            f.write(readme_content)
+        write_readme(readme_content)
         print("SUCCESS: 多幣種 README.md 投資報告生成成功！")
 
         # 顯示關鍵信息
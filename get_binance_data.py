@@ -1,24 +1,192 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from kline_store import KlineStore, KLINE_COLUMNS, INTERVAL_MS, to_millis, to_millis_array
+from resample import resample_klines, can_resample
 
 BASE_URL = "https://data-api.binance.vision/api/v3"
 
-def get_klines(symbol, interval, limit=500):
-    endpoint = f"{BASE_URL}/klines"
+# 並發抓取設定
+MAX_WORKERS = 8                  # 同時進行的請求上限
+WEIGHT_LIMIT_PER_MINUTE = 6000   # Binance 每分鐘 IP 權重上限
+MAX_KLINES_PER_REQUEST = 1000    # /klines 單次請求上限
+MIN_HISTORY_BARS = 240           # 每個時間框架至少保留的 K 線數 (MA120 需要 120 根以上)
+TICKER_WEIGHT = 2                # /ticker/24hr (單一交易對) 請求權重
+TICKER_SNAPSHOT_FILE = "data/ticker_24hr.json"  # 所有交易對的 24hr 行情快照
+
+def klines_weight(limit):
+    """/klines 請求權重隨 limit 變化"""
+    if limit < 100:
+        return 1
+    elif limit < 500:
+        return 2
+    elif limit <= 1000:
+        return 5
+    return 10
+
+def ticker_batch_weight(count):
+    """/ticker/24hr 批次請求權重隨交易對數量變化 (None 表示全部交易對)"""
+    if count is None or count > 100:
+        return 80
+    elif count > 20:
+        return 40
+    return 2
+
+class WeightBudget:
+    """
+    每分鐘請求權重預算
+
+    多個執行緒共用同一個預算，超過上限時阻塞到下一個一分鐘窗口，
+    避免並發抓取時觸發 Binance 的 429 限流。
+    """
+
+    def __init__(self, limit_per_minute=WEIGHT_LIMIT_PER_MINUTE, clock=None, sleep=None):
+        """
+        Args:
+            limit_per_minute (int): 每分鐘權重上限
+            clock (callable): 單調時鐘，預設 time.monotonic
+            sleep (callable): 等待函式，預設 time.sleep
+        """
+        self.limit = limit_per_minute
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.used = 0
+        self.window_start = self.clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, weight):
+        """預扣權重，預算不足時等待窗口重置"""
+        while True:
+            with self.lock:
+                now = self.clock()
+                if now - self.window_start >= 60:
+                    self.window_start = now
+                    self.used = 0
+                if self.used + weight <= self.limit:
+                    self.used += weight
+                    return
+                wait = 60 - (now - self.window_start)
+            self.sleep(max(wait, 0.05))
+
+    def sync(self, used_weight):
+        """以伺服器回報的已用權重 (X-MBX-USED-WEIGHT-1M) 校正本地計數"""
+        with self.lock:
+            self.used = max(self.used, used_weight)
+
+class BinanceClient:
+    """
+    共用的 Binance REST 客戶端
+
+    使用連線池保持 keep-alive，避免每個請求重新握手；遇到 429/418/5xx
+    或連線錯誤時以指數退避重試，並遵守 Retry-After 與 X-MBX-USED-WEIGHT 標頭。
+    """
+
+    RETRY_STATUS = {418, 429, 500, 502, 503, 504}
+
+    def __init__(self, base_url=BASE_URL, pool_size=MAX_WORKERS, timeout=(5, 15),
+                 max_retries=4, backoff_factor=0.5, max_backoff=30, weight_budget=None):
+        """
+        Args:
+            base_url (str): API 根路徑
+            pool_size (int): 連線池大小，建議不小於並發請求數
+            timeout (tuple): (連線逾時, 讀取逾時) 秒數
+            max_retries (int): 最大重試次數
+            backoff_factor (float): 指數退避基數 (秒)
+            max_backoff (float): 單次退避上限 (秒)
+            weight_budget (WeightBudget): 權重預算，會以回應標頭校正
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.weight_budget = weight_budget or WeightBudget()
+        self.used_weight = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+    def _backoff(self, attempt):
+        return min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+
+    def _retry_delay(self, response, attempt):
+        """優先使用 Retry-After，否則使用指數退避"""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), 300)
+            except ValueError:
+                pass
+        return self._backoff(attempt)
+
+    def _update_weight(self, response):
+        used = response.headers.get("X-MBX-USED-WEIGHT-1M") or response.headers.get("X-MBX-USED-WEIGHT")
+        if used:
+            try:
+                self.used_weight = int(used)
+            except ValueError:
+                return
+            self.weight_budget.sync(self.used_weight)
+
+    def get(self, path, params=None):
+        """
+        發送 GET 請求並返回解析後的 JSON
+
+        Args:
+            path (str): API 路徑，例如 "/klines"
+            params (dict): 查詢參數
+
+        Returns:
+            dict | list: API 回應內容
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️ {path} 連線失敗 ({e})，{delay:.1f}s 後重試 ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+
+            self._update_weight(response)
+            if response.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                delay = self._retry_delay(response, attempt)
+                print(f"⚠️ {path} HTTP {response.status_code}，{delay:.1f}s 後重試 ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()  # Raise an exception for HTTP errors
+            return response.json()
+
+# 模組共用的客戶端實例
+client = BinanceClient()
+
+def get_klines(symbol, interval, limit=500, start_time=None, end_time=None):
     params = {
         "symbol": symbol,
         "interval": interval,
         "limit": limit
     }
-    response = requests.get(endpoint, params=params)
-    response.raise_for_status()  # Raise an exception for HTTP errors
-    klines = response.json()
-    df = pd.DataFrame(klines, columns=[
-        'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
-        'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume',
-        'taker_buy_quote_asset_volume', 'ignore'
-    ])
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+    klines = client.get("/klines", params=params)
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
     df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
     df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')
     df = df.astype({
@@ -29,67 +197,425 @@ def get_klines(symbol, interval, limit=500):
     return df
 
 def get_ticker_24hr(symbol):
-    endpoint = f"{BASE_URL}/ticker/24hr"
     params = {
         "symbol": symbol
     }
-    response = requests.get(endpoint, params=params)
-    response.raise_for_status()  # Raise an exception for HTTP errors
-    ticker = response.json()
+    ticker = client.get("/ticker/24hr", params=params)
     return ticker
 
-def fetch_multiple_symbols(symbols, intervals=["1h", "15m"]):
-    """獲取多個交易對的多時間框架數據"""
-    all_data = {}
+def get_ticker_24hr_batch(symbols=None):
+    """
+    以單一請求獲取多個交易對的 24hr 行情
 
-    for symbol in symbols:
+    Args:
+        symbols (list): 交易對列表，None 表示全部交易對
+
+    Returns:
+        dict: {symbol: ticker}
+    """
+    params = None
+    if symbols is not None:
+        params = {"symbols": json.dumps(list(symbols), separators=(",", ":"))}
+    tickers = client.get("/ticker/24hr", params=params)
+    return {ticker["symbol"]: ticker for ticker in tickers}
+
+def _fetch_tickers_individually(executor, budget, symbols):
+    """
+    逐一請求 24hr 行情 (批次請求失敗或缺少交易對時的後備)
+
+    單一交易對失敗只會略過該交易對。
+
+    Returns:
+        dict: {symbol: ticker}
+    """
+    futures = {
+        symbol: executor.submit(_run_with_budget, budget, TICKER_WEIGHT, get_ticker_24hr, symbol)
+        for symbol in symbols
+    }
+    tickers = {}
+    for symbol, future in futures.items():
+        try:
+            tickers[symbol] = future.result()
+        except Exception as e:
+            print(f"❌ Error fetching 24hr ticker for {symbol}: {e}")
+    return tickers
+
+def save_ticker_snapshot(tickers, path=TICKER_SNAPSHOT_FILE):
+    """
+    將 24hr 行情寫入單一快照檔案，按交易對索引
+
+    既有快照中其他交易對的行情會被保留。
+    """
+    snapshot = {}
+    if os.path.exists(path):
         try:
-            print(f"Fetching data for {symbol}...")
+            with open(path, "r") as f:
+                snapshot = json.load(f).get("tickers", {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable ticker snapshot {path}: {e}")
+    snapshot.update(tickers)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"updated_at": int(time.time() * 1000), "tickers": snapshot}, f, indent=4)
+    os.replace(tmp_path, path)
+    return path
+
+def load_tickers(symbols, path=TICKER_SNAPSHOT_FILE, data_dir="data"):
+    """
+    讀取多個交易對的 24hr 行情
+
+    快照檔案只讀取一次；快照中沒有的交易對退回舊版的
+    data/{symbol}_ticker_24hr.json，兩者都沒有的交易對不會出現在結果中。
+
+    Returns:
+        dict: {symbol: ticker}
+    """
+    snapshot = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            snapshot = json.load(f).get("tickers", {})
+
+    tickers = {}
+    for symbol in symbols:
+        if symbol in snapshot:
+            tickers[symbol] = snapshot[symbol]
+            continue
+        legacy_file = os.path.join(data_dir, f"{symbol}_ticker_24hr.json")
+        if os.path.exists(legacy_file):
+            with open(legacy_file, "r") as f:
+                tickers[symbol] = json.load(f)
+    return tickers
+
+def _klines_limit(interval):
+    """各時間框架預設抓取的 K 線數量"""
+    return 500 if interval == "1h" else 100
+
+def _run_with_budget(budget, weight, func, *args, **kwargs):
+    """扣除權重後執行請求"""
+    budget.acquire(weight)
+    return func(*args, **kwargs)
+
+def fetch_new_klines(symbol, interval, store, limit=None, budget=None, existing=None):
+    """
+    增量獲取 K 線
 
-            # 獲取24小時行情數據
-            ticker_data = get_ticker_24hr(symbol)
+    依存儲中最後一根 K 線的 open_time，只請求缺少的區間 (含最後一根未收盤
+    K 線，以便覆蓋)，再與既有數據合併。沒有本地數據時抓取完整的 limit 根。
 
-            symbol_data = {
-                'ticker': ticker_data,
-                'ticker_file': f"data/{symbol}_ticker_24hr.json"
-            }
+    Args:
+        symbol (str): 交易對
+        interval (str): 時間框架
+        store (KlineStore): K 線存儲
+        limit (int): 首次抓取數量，預設依時間框架決定
+        budget (WeightBudget): 權重預算
+        existing (DataFrame): 已載入的 K 線，省略時從存儲讀取
 
-            # 保存ticker數據
-            with open(symbol_data['ticker_file'], 'w') as f:
-                json.dump(ticker_data, f, indent=4)
+    Returns:
+        DataFrame: 合併後的完整 K 線 (尚未寫入存儲)
+    """
+    budget = budget or client.weight_budget
+    if existing is None:
+        existing = store.load(symbol, interval)
+    last_open = store.last_open_time(symbol, interval, existing)
 
-            # 獲取多時間框架K線數據
+    if last_open is None:
+        limit = limit or max(_klines_limit(interval), MIN_HISTORY_BARS)
+        budget.acquire(klines_weight(limit))
+        return store.merge(None, get_klines(symbol, interval, limit=limit))
+
+    # 根據時間差估算缺少的 K 線數量，避免多抓
+    interval_ms = INTERVAL_MS.get(interval)
+    now_ms = int(time.time() * 1000)
+    if interval_ms:
+        missing = (now_ms - last_open) // interval_ms + 1
+    else:
+        missing = MAX_KLINES_PER_REQUEST
+    page_limit = int(min(max(missing, 1), MAX_KLINES_PER_REQUEST))
+
+    pages = []
+    start_time = last_open
+    while True:
+        budget.acquire(klines_weight(page_limit))
+        page = get_klines(symbol, interval, limit=page_limit, start_time=start_time)
+        pages.append(page)
+        # 缺口超過單次上限時繼續往後翻頁
+        if len(page) < page_limit or page_limit < MAX_KLINES_PER_REQUEST:
+            break
+        start_time = to_millis(page['open_time'].iloc[-1]) + 1
+
+    new_df = pd.concat(pages, ignore_index=True)
+    merged = store.merge(existing, new_df)
+
+    # 歷史不足時往前補一頁，確保長週期指標 (MA120) 有足夠數據
+    if len(merged) < MIN_HISTORY_BARS:
+        first_open = to_millis(merged['open_time'].iloc[0])
+        older_limit = MIN_HISTORY_BARS - len(merged)
+        budget.acquire(klines_weight(older_limit))
+        older = get_klines(symbol, interval, limit=older_limit, end_time=first_open - 1)
+        merged = store.merge(merged, older)
+    return merged
+
+def _missing_windows(existing, interval_ms, start_time, end_time):
+    """
+    將 [start_time, end_time] 切成每頁 MAX_KLINES_PER_REQUEST 根的窗口，
+    並略過存儲中已完整存在的窗口
+    """
+    page_span = interval_ms * MAX_KLINES_PER_REQUEST
+    start_time = -(-int(start_time) // interval_ms) * interval_ms  # 對齊到 K 線開盤時間
+    stored = None
+    if existing is not None and not existing.empty:
+        stored = to_millis_array(existing['open_time'])
+
+    windows = []
+    for window_start in range(start_time, int(end_time) + 1, page_span):
+        window_end = min(window_start + page_span - 1, int(end_time))
+        if stored is not None:
+            expected = (window_end - window_start) // interval_ms + 1
+            count = stored.searchsorted(window_end, side='right') - stored.searchsorted(window_start)
+            if count >= expected:
+                continue
+        windows.append((window_start, window_end))
+    return windows
+
+def backfill_klines(symbol, interval, start_time, end_time=None, store=None,
+                    max_workers=MAX_WORKERS, budget=None, flush_every=20, save=True):
+    """
+    分頁回補歷史 K 線
+
+    將時間範圍切成每頁 1000 根的 startTime/endTime 窗口並行請求 (受權重預算限制)，
+    已完整存儲的窗口會被略過。完成的頁面以 open_time 去重後分批寫入存儲，
+    中途中斷也不會丟失已下載的數據。save=False 時只在記憶體中合併，由呼叫端
+    在所有頁面到齊後一次寫入。回補的歷史不受 store.max_rows 限制，之後的增量
+    更新也會保留其長度。
+
+    Args:
+        symbol (str): 交易對
+        interval (str): 時間框架
+        start_time (int): 起始時間 (毫秒)
+        end_time (int): 結束時間 (毫秒)，預設為現在
+        store (KlineStore): K 線存儲
+        max_workers (int): 並發請求上限
+        budget (WeightBudget): 權重預算
+        flush_every (int): 每累積多少頁寫入一次存儲
+        save (bool): 是否寫入存儲
+
+    Returns:
+        DataFrame: 回補後的完整 K 線
+    """
+    store = store or KlineStore()
+    budget = budget or client.weight_budget
+    interval_ms = INTERVAL_MS[interval]
+    end_time = end_time or int(time.time() * 1000)
+
+    merged = store.load(symbol, interval)
+    windows = _missing_windows(merged, interval_ms, start_time, end_time)
+    print(f"Backfilling {symbol} {interval}: {len(windows)} pages (max_workers={max_workers})...")
+
+    pending = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_run_with_budget, budget, klines_weight(MAX_KLINES_PER_REQUEST), get_klines,
+                            symbol, interval, limit=MAX_KLINES_PER_REQUEST,
+                            start_time=window_start, end_time=window_end)
+            for window_start, window_end in windows
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                pending.append(future.result())
+            except Exception as e:
+                failed += 1
+                print(f"❌ Error backfilling {symbol} {interval}: {e}")
+                continue
+
+            if save and len(pending) >= flush_every:
+                merged = store.merge(merged, pd.concat(pending, ignore_index=True), capped=False)
+                store.save(symbol, interval, merged)
+                pending = []
+                print(f"  {symbol} {interval}: {done}/{len(windows)} pages, {len(merged)} bars stored")
+
+    if pending:
+        merged = store.merge(merged, pd.concat(pending, ignore_index=True), capped=False)
+        if save:
+            store.save(symbol, interval, merged)
+
+    if failed:
+        print(f"⚠️ {symbol} {interval}: {failed} pages failed, rerun to fill the gaps")
+    return merged
+
+def _history_bars(interval):
+    """每個時間框架需要的 K 線數量"""
+    return max(_klines_limit(interval), MIN_HISTORY_BARS)
+
+def fetch_resampled_klines(symbol, base_interval, intervals, store, budget=None):
+    """
+    只抓取基礎時間框架，並由其聚合出其他時間框架
+
+    基礎 K 線不足以推導最長時間框架所需的歷史時先分頁回補；回補的頁面只在
+    記憶體中合併，不寫入存儲，由呼叫端在全部抓取完成後一次寫入。已存儲的衍生
+    時間框架只重新聚合最後一根 (可能未收盤) 之後的基礎 K 線。
+
+    Args:
+        symbol (str): 交易對
+        base_interval (str): 基礎時間框架，例如 "15m"
+        intervals (list): 需要的時間框架，皆須為基礎時間框架的整數倍
+        store (KlineStore): K 線存儲
+        budget (WeightBudget): 權重預算
+
+    Returns:
+        dict: {interval: DataFrame}，包含基礎時間框架 (尚未寫入存儲)
+    """
+    budget = budget or client.weight_budget
+    base_ms = INTERVAL_MS[base_interval]
+    history_bars = max(_history_bars(i) * INTERVAL_MS[i] // base_ms for i in [base_interval, *intervals])
+
+    base_df = store.load(symbol, base_interval)
+    if base_df is None or len(base_df) < history_bars:
+        base_df = backfill_klines(symbol, base_interval, int(time.time() * 1000) - history_bars * base_ms,
+                                  store=store, budget=budget, save=False)
+    base_df = fetch_new_klines(symbol, base_interval, store, budget=budget, existing=base_df)
+
+    frames = {base_interval: base_df}
+    for interval in intervals:
+        if interval == base_interval:
+            continue
+        derived = store.load(symbol, interval)
+        if derived is None or len(derived) < _history_bars(interval):
+            frames[interval] = store.merge(None, resample_klines(base_df, interval, base_interval))
+            continue
+        # 從最後一根已存儲的 K 線開始重新聚合 (覆蓋未收盤的 K 線)
+        last_open = derived['open_time'].iloc[-1]
+        tail = base_df[pd.to_datetime(base_df['open_time']) >= last_open]
+        frames[interval] = store.merge(derived, resample_klines(tail, interval, base_interval))
+    return frames
+
+def fetch_multiple_symbols(symbols, intervals=["1h", "15m"], max_workers=MAX_WORKERS, weight_budget=None, store=None,
+                           base_interval=None, save_snapshot=True):
+    """
+    獲取多個交易對的多時間框架數據
+
+    所有交易對的 24hr 行情以單一批次請求取得並寫入同一個快照檔案，批次請求
+    失敗時改為逐一請求，無效的交易對不會連帶其他交易對。K 線請求 (N 個交易對
+    × M 個時間框架) 同時送進執行緒池，總耗時約等於最慢的一個請求，而不是所有
+    請求的總和。K 線透過 KlineStore 增量更新，只請求上次之後的新 K 線。
+
+    指定 base_interval 時每個交易對只抓取一個基礎時間框架，其他時間框架由
+    基礎 K 線聚合而成，請求數減少且所有時間框架來自同一份快照。
+
+    Args:
+        symbols (list): 交易對列表
+        intervals (list): 時間框架列表
+        max_workers (int): 並發請求上限
+        weight_budget (WeightBudget): 共用的權重預算，預設使用 client 的預算
+        store (KlineStore): K 線存儲，預設為 data/ 目錄
+        base_interval (str): 基礎時間框架，例如 "15m"；None 表示每個時間框架各自抓取
+        save_snapshot (bool): 是否寫入 24hr 行情快照；False 時由呼叫端自行保存 (symbol_data['ticker'])
+
+    Returns:
+        dict: {symbol: symbol_data}，抓取失敗的交易對會被略過
+    """
+    all_data = {}
+    budget = weight_budget or client.weight_budget
+    store = store or KlineStore()
+    if base_interval:
+        unsupported = [i for i in intervals if i != base_interval and not can_resample(base_interval, i)]
+        if unsupported:
+            raise ValueError(f"無法由 {base_interval} 聚合出: {', '.join(unsupported)}")
+        print(f"Fetching {len(symbols)} symbols x {base_interval}, resampling to {', '.join(intervals)} "
+              f"(max_workers={max_workers})...")
+    else:
+        print(f"Fetching {len(symbols)} symbols x {len(intervals)} intervals (max_workers={max_workers})...")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        tickers_future = executor.submit(
+            _run_with_budget, budget, ticker_batch_weight(len(symbols)), get_ticker_24hr_batch, symbols)
+        for symbol in symbols:
+            if base_interval:
+                futures[(symbol, "klines")] = executor.submit(
+                    fetch_resampled_klines, symbol, base_interval, intervals, store, budget=budget)
+                continue
             for interval in intervals:
-                print(f"  Fetching {interval} data for {symbol}...")
-                klines_df = get_klines(symbol, interval, limit=500 if interval == "1h" else 100)
-                
-                klines_file = f"data/{symbol}_klines_{interval}.csv"
-                klines_df.to_csv(klines_file, index=False)
-                
-                symbol_data[f'klines_{interval}'] = klines_df
-                symbol_data[f'klines_file_{interval}'] = klines_file
-
-            all_data[symbol] = symbol_data
-            print(f"✅ {symbol} multi-timeframe data saved successfully")
+                futures[(symbol, interval)] = executor.submit(
+                    fetch_new_klines, symbol, interval, store, budget=budget)
 
+        try:
+            tickers = tickers_future.result()
         except Exception as e:
-            print(f"❌ Error fetching {symbol}: {e}")
-            continue
+            print(f"⚠️ Batch 24hr ticker request failed, falling back to per-symbol requests: {e}")
+            tickers = {}
+        # 批次請求失敗 (例如其中一個交易對無效) 或缺少交易對時逐一補抓
+        missing = [symbol for symbol in symbols if symbol not in tickers]
+        if missing:
+            tickers.update(_fetch_tickers_individually(executor, budget, missing))
 
+        for symbol in symbols:
+            try:
+                # 獲取24小時行情數據
+                if symbol not in tickers:
+                    raise KeyError(f"no 24hr ticker returned for {symbol}")
+                ticker_data = tickers[symbol]
+
+                symbol_data = {
+                    'ticker': ticker_data,
+                    'ticker_file': TICKER_SNAPSHOT_FILE
+                }
+
+                # 獲取多時間框架K線數據
+                if base_interval:
+                    frames = futures[(symbol, "klines")].result()
+                else:
+                    frames = {interval: futures[(symbol, interval)].result() for interval in intervals}
+                for interval, klines_df in frames.items():
+                    symbol_data[f'klines_{interval}'] = klines_df
+                    symbol_data[f'klines_file_{interval}'] = store.path(symbol, interval)
+
+                # 全部請求成功後才寫檔，避免留下不完整的交易對數據
+                for interval, klines_df in frames.items():
+                    store.save(symbol, interval, klines_df)
+
+                all_data[symbol] = symbol_data
+                print(f"✅ {symbol} multi-timeframe data saved successfully")
+
+            except Exception as e:
+                print(f"❌ Error fetching {symbol}: {e}")
+                continue
+
+    if all_data and save_snapshot:
+        save_ticker_snapshot({symbol: data['ticker'] for symbol, data in all_data.items()})
     return all_data
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="獲取 Binance 多幣種多時間框架數據")
+    parser.add_argument("--backfill", metavar="YYYY-MM-DD",
+                        help="從指定日期 (UTC) 開始回補歷史 K 線")
+    parser.add_argument("--intervals", nargs="+", help="時間框架，預設為 1h 15m")
+    parser.add_argument("--base-interval", metavar="INTERVAL",
+                        help="只抓取此基礎時間框架，其他時間框架由其聚合 (例如 15m)")
+    args = parser.parse_args()
+
     # 支援的交易對
     symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
-    intervals = ["1h", "15m"]  # 支援多時間框架
+    intervals = args.intervals or ["1h", "15m"]  # 支援多時間框架
+
+    if args.backfill:
+        start_ms = to_millis(pd.Timestamp(args.backfill))
+        for symbol in symbols:
+            for interval in intervals:
+                backfill_klines(symbol, interval, start_ms)
+        raise SystemExit(0)
 
     try:
         print("🚀 開始獲取多幣種多時間框架數據...")
-        all_data = fetch_multiple_symbols(symbols, intervals)
+        all_data = fetch_multiple_symbols(symbols, intervals, base_interval=args.base_interval)
 
         print(f"\n📊 成功獲取 {len(all_data)} 個交易對的多時間框架數據:")
         for symbol in all_data.keys():
-            print(f"  ✅ {symbol}: 1h + 15m")
+            print(f"  ✅ {symbol}: {' + '.join(intervals)}")
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
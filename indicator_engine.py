@@ -0,0 +1,214 @@
+"""
+批次技術指標引擎
+Vectorised indicator engine over a (symbols × time) OHLCV panel
+
+一次以 NumPy 陣列運算計算所有交易對的 MA/VWMA/EMA/MACD/BOLL/KC/RSI/KDJ/DMI，
+不對 DataFrame 逐欄賦值。輸出欄位名稱與數值和 calculate_technical_indicators 一致。
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dmi_kernel import calculate_dmi
+
+PANEL_FIELDS = ("open", "high", "low", "close", "volume")
+
+def _shift(values, periods=1):
+    """沿時間軸位移，空出的位置填 NaN"""
+    out = np.full_like(values, np.nan)
+    out[:, periods:] = values[:, :-periods]
+    return out
+
+def _rolling(values, window, func):
+    """
+    沿時間軸計算滾動統計 (min_periods=window，窗口內有 NaN 時結果為 NaN)
+    """
+    out = np.full_like(values, np.nan)
+    if values.shape[1] < window:
+        return out
+    windows = sliding_window_view(values, window, axis=1)
+    with np.errstate(invalid='ignore'):
+        out[:, window - 1:] = func(windows, axis=-1)
+    return out
+
+def rolling_mean(values, window):
+    return _rolling(values, window, np.mean)
+
+def rolling_sum(values, window):
+    return _rolling(values, window, np.sum)
+
+def rolling_min(values, window):
+    return _rolling(values, window, np.min)
+
+def rolling_max(values, window):
+    return _rolling(values, window, np.max)
+
+def rolling_std(values, window):
+    return _rolling(values, window, lambda w, axis: np.std(w, axis=axis, ddof=1))
+
+def ewm_mean(values, span):
+    """
+    指數移動平均，等同 pandas ewm(span=span, adjust=False).mean()
+
+    逐個時間點向量化更新所有交易對；NaN 的處理方式與 pandas 相同
+    (ignore_na=False)：缺值時沿用前值，並在下一個觀測值時折算權重。
+    """
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    n_symbols, n_times = values.shape
+    out = np.empty_like(values)
+    weighted = values[:, 0].copy()
+    old_wt = np.ones(n_symbols)
+    out[:, 0] = weighted
+    for t in range(1, n_times):
+        cur = values[:, t]
+        is_obs = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+
+        # 已有值：折算舊權重；觀測到新值時更新平均並重置權重
+        old_wt = np.where(started, old_wt * decay, old_wt)
+        update = started & is_obs
+        blended = (old_wt * weighted + alpha * np.where(is_obs, cur, 0.0)) / (old_wt + alpha)
+        weighted = np.where(update, blended, weighted)
+        old_wt = np.where(update, 1.0, old_wt)
+
+        # 尚未開始：第一個觀測值作為初始值
+        first = ~started & is_obs
+        weighted = np.where(first, cur, weighted)
+        out[:, t] = weighted
+    return out
+
+def calculate_indicators_batch(panel):
+    """
+    批次計算技術指標
+
+    Args:
+        panel (dict): {"open"|"high"|"low"|"close"|"volume": 2-D ndarray (symbols × time)}
+
+    Returns:
+        dict: {指標名稱: 2-D ndarray}，名稱與 calculate_technical_indicators 的欄位相同
+    """
+    close = np.asarray(panel["close"], dtype=float)
+    high = np.asarray(panel["high"], dtype=float)
+    low = np.asarray(panel["low"], dtype=float)
+    volume = np.asarray(panel["volume"], dtype=float)
+    out = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Moving Averages (MA)
+        ma20 = rolling_mean(close, 20)
+        out["MA5"] = rolling_mean(close, 5)
+        out["MA10"] = rolling_mean(close, 10)
+        out["MA20"] = ma20
+        out["MA120"] = rolling_mean(close, 120)
+
+        # Volume Weighted Moving Average (VWMA)
+        close_volume = close * volume
+        for window in (5, 10, 20):
+            out[f"VWMA{window}"] = rolling_sum(close_volume, window) / rolling_sum(volume, window)
+
+        # MACD
+        ema12 = ewm_mean(close, 12)
+        ema26 = ewm_mean(close, 26)
+        dif = ema12 - ema26
+        dea = ewm_mean(dif, 9)
+        out["EMA12"] = ema12
+        out["EMA26"] = ema26
+        out["DIF"] = dif
+        out["DEA"] = dea
+        out["MACD_Hist"] = (dif - dea) * 2
+
+        # Bollinger Bands (BOLL)
+        bb_std = rolling_std(close, 20)
+        bb_upper = ma20 + bb_std * 2
+        bb_lower = ma20 - bb_std * 2
+        out["BB_Middle"] = ma20
+        out["BB_StdDev"] = bb_std
+        out["BB_Upper"] = bb_upper
+        out["BB_Lower"] = bb_lower
+        out["Percent_B"] = (close - bb_lower) / (bb_upper - bb_lower)
+
+        # Keltner Channel (KC)
+        kc_middle = ewm_mean(close, 20)
+        kc_atr = rolling_mean(high - low, 14)
+        kc_upper = kc_middle + kc_atr * 2
+        kc_lower = kc_middle - kc_atr * 2
+        out["KC_Middle"] = kc_middle
+        out["KC_ATR"] = kc_atr
+        out["KC_Upper"] = kc_upper
+        out["KC_Lower"] = kc_lower
+        out["KC_Position"] = (close - kc_lower) / (kc_upper - kc_lower)
+
+        # RSI
+        delta = close - _shift(close)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = -np.where(delta < 0, delta, 0.0)
+        rs = ewm_mean(gain, 14) / ewm_mean(loss, 14)
+        out["RSI14"] = 100 - (100 / (1 + rs))
+
+        # KDJ
+        low_min = rolling_min(low, 9)
+        high_max = rolling_max(high, 9)
+        rsv = (close - low_min) / (high_max - low_min) * 100
+        k = ewm_mean(rsv, 3)
+        d = ewm_mean(k, 3)
+        out["RSV"] = rsv
+        out["K"] = k
+        out["D"] = d
+        out["J"] = 3 * k - 2 * d
+
+        # DMI (Directional Movement Index)
+        dmi = calculate_dmi(high, low, close, period=14)
+        out["TR"] = dmi["TR"]
+        out["DI_Plus"] = dmi["DI_Plus"]
+        out["DI_Minus"] = dmi["DI_Minus"]
+        out["ADX"] = dmi["ADX"]
+
+    return out
+
+def build_panel(frames, fields=PANEL_FIELDS):
+    """
+    將多個交易對的 K 線 DataFrame 排成 (symbols × time) 面板
+
+    每個交易對以自己的 K 線序列靠右對齊 (最後一根 K 線對齊)，歷史較短的交易對
+    在前方補 NaN。不以 open_time 的聯集對齊：某個交易對缺少的時間點會在序列中間
+    插入 NaN 列，使滾動窗口變成 NaN、EMA 多折算一次權重，結果與單獨計算不同。
+
+    Args:
+        frames (dict): {symbol: DataFrame}
+
+    Returns:
+        tuple: (symbols, panel)，panel 為 {field: 2-D ndarray}
+    """
+    symbols = list(frames)
+    if not symbols:
+        return symbols, {field: np.empty((0, 0)) for field in fields}
+
+    length = max(len(df) for df in frames.values())
+    panel = {field: np.full((len(symbols), length), np.nan) for field in fields}
+    for row, df in enumerate(frames.values()):
+        for field in fields:
+            panel[field][row, length - len(df):] = df[field].to_numpy(dtype=float)
+    return symbols, panel
+
+def batch_frames(frames):
+    """
+    批次計算所有交易對的指標，並返回與 calculate_technical_indicators 相同格式的 DataFrame
+
+    前方補齊用的 NaN 列會被去除，因此每個交易對的列數與輸入相同。
+
+    Args:
+        frames (dict): {symbol: K 線 DataFrame}
+
+    Returns:
+        dict: {symbol: 含指標欄位的 DataFrame}
+    """
+    symbols, panel = build_panel(frames)
+    indicators = calculate_indicators_batch(panel)
+    results = {}
+    for row, symbol in enumerate(symbols):
+        df = frames[symbol]
+        columns = {name: values[row, values.shape[1] - len(df):] for name, values in indicators.items()}
+        indicator_df = pd.DataFrame(columns, index=df.index)
+        results[symbol] = pd.concat([df, indicator_df], axis=1)
+    return results
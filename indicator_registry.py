@@ -0,0 +1,285 @@
+"""
+技術指標註冊表
+Indicator registry with declared inputs, warm-up lengths and lazy evaluation
+
+每個指標宣告它的輸入 (K 線欄位或其他指標) 與暖機長度。呼叫端指定需要的輸出，
+引擎只計算這些輸出及其依賴，並共用中間結果 (例如 EMA12/EMA26 供 MACD 使用、
+MA20 同時作為 BB_Middle)。只需要 RSI 與均線的呼叫不會再計算 KDJ、KC 與 DMI。
+
+新增指標:
+
+    @register("EMA50", inputs=("close",), warmup=ewm_warmup(50))
+    def ema50(close):
+        return close.ewm(span=50, adjust=False).mean()
+"""
+import math
+
+import pandas as pd
+
+from dmi_kernel import calculate_dmi
+
+# 可直接從 K 線取得的欄位
+BASE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# 指標輸出名稱 -> Indicator (同一個多輸出指標會以每個輸出名稱各登記一次)
+INDICATORS = {}
+
+class Indicator:
+    """一個 (可能有多個輸出的) 指標定義"""
+
+    def __init__(self, outputs, inputs, warmup, func, params=None):
+        """
+        Args:
+            outputs (tuple): 輸出名稱；以 "_" 開頭的名稱為中間結果，不寫入 DataFrame
+            inputs (tuple): 輸入名稱 (K 線欄位或其他指標輸出)
+            warmup (int): 在輸入已有效的前提下，自身還需要的 K 線數
+            func (callable): func(*inputs, **params)，單一輸出時返回 Series，否則返回 {輸出: Series}
+            params (dict): 可由呼叫端覆寫的參數及預設值
+        """
+        self.outputs = tuple(outputs)
+        self.inputs = tuple(inputs)
+        self.warmup = warmup
+        self.func = func
+        self.params = params or {}
+
+def register(outputs, inputs, warmup, params=None):
+    """註冊指標的裝飾器"""
+    if isinstance(outputs, str):
+        outputs = (outputs,)
+
+    def decorator(func):
+        indicator = Indicator(outputs, inputs, warmup, func, params)
+        for name in indicator.outputs:
+            if name in INDICATORS:
+                raise ValueError(f"指標已註冊: {name}")
+            INDICATORS[name] = indicator
+        return func
+    return decorator
+
+def ewm_warmup(span, tolerance=1e-6):
+    """指數移動平均的初始值權重衰減到 tolerance 以下所需的 K 線數"""
+    alpha = 2.0 / (span + 1.0)
+    return math.ceil(math.log(tolerance) / math.log(1.0 - alpha))
+
+def available_indicators():
+    """所有可輸出的指標名稱 (依註冊順序，不含中間結果)"""
+    return [name for name in INDICATORS if not name.startswith("_")]
+
+def dependencies(names):
+    """
+    需要的指標及其所有依賴 (依計算順序)
+
+    Raises:
+        KeyError: 未註冊的指標名稱
+    """
+    ordered = []
+    seen = set()
+
+    def visit(name):
+        if name in BASE_COLUMNS or name in seen:
+            return
+        if name not in INDICATORS:
+            raise KeyError(f"未註冊的指標: {name}")
+        seen.add(name)
+        for dependency in INDICATORS[name].inputs:
+            visit(dependency)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
+def required_warmup(names):
+    """計算指定指標最後一個值所需的最少 K 線數 (依賴鏈上的暖機長度累加)"""
+    memo = {}
+
+    def warmup(name):
+        if name in BASE_COLUMNS:
+            return 1
+        if name not in memo:
+            indicator = INDICATORS[name]
+            memo[name] = max((warmup(i) for i in indicator.inputs), default=1) + indicator.warmup - 1
+        return memo[name]
+
+    return max((warmup(name) for name in names), default=1)
+
+class IndicatorEvaluator:
+    """
+    延遲計算：第一次讀取指標時才計算，結果快取供其他指標共用
+    """
+
+    def __init__(self, df, **options):
+        """
+        Args:
+            df (DataFrame): K 線數據
+            options: 覆寫指標參數，例如 dmi_smoothing="wilder"
+        """
+        self.df = df
+        self.options = options
+        self.values = {}
+
+    def __getitem__(self, name):
+        if name in self.values:
+            return self.values[name]
+        if name in BASE_COLUMNS:
+            self.values[name] = self.df[name]
+            return self.values[name]
+        if name not in INDICATORS:
+            raise KeyError(f"未註冊的指標: {name}")
+
+        indicator = INDICATORS[name]
+        args = [self[i] for i in indicator.inputs]
+        params = {key: self.options.get(key, default) for key, default in indicator.params.items()}
+        result = indicator.func(*args, **params)
+        if len(indicator.outputs) == 1:
+            result = {indicator.outputs[0]: result}
+        for output, values in result.items():
+            if not isinstance(values, pd.Series):
+                values = pd.Series(values, index=self.df.index)
+            self.values[output] = values
+        return self.values[name]
+
+def compute_indicators(df, names=None, **options):
+    """
+    計算指定的指標並寫入 DataFrame
+
+    Args:
+        df (DataFrame): K 線數據 (會被就地新增欄位)
+        names (iterable): 需要的指標，None 表示全部
+        options: 指標參數，例如 dmi_smoothing="wilder"
+
+    Returns:
+        DataFrame: 加入指標欄位的 df，欄位依註冊順序排列
+    """
+    requested = available_indicators() if names is None else list(names)
+    evaluator = IndicatorEvaluator(df, **options)
+    for name in dependencies(requested):
+        evaluator[name]
+    wanted = set(requested)
+    for name in available_indicators():
+        if name in wanted:
+            df[name] = evaluator[name]
+    return df
+
+# ---------------------------------------------------------------------------
+# 內建指標 (註冊順序即 calculate_technical_indicators 的欄位順序)
+# ---------------------------------------------------------------------------
+
+def _register_ma(window):
+    register(f"MA{window}", inputs=("close",), warmup=window)(
+        lambda close: close.rolling(window=window).mean())
+
+for _window in (5, 10, 20, 120):
+    _register_ma(_window)
+
+# Volume Weighted Moving Average (VWMA)
+@register("_close_volume", inputs=("close", "volume"), warmup=1)
+def _close_volume(close, volume):
+    return close * volume
+
+def _register_vwma(window):
+    register(f"VWMA{window}", inputs=("_close_volume", "volume"), warmup=window)(
+        lambda close_volume, volume: close_volume.rolling(window=window).sum() / volume.rolling(window=window).sum())
+
+for _window in (5, 10, 20):
+    _register_vwma(_window)
+
+# MACD
+@register("EMA12", inputs=("close",), warmup=ewm_warmup(12))
+def ema12(close):
+    return close.ewm(span=12, adjust=False).mean()
+
+@register("EMA26", inputs=("close",), warmup=ewm_warmup(26))
+def ema26(close):
+    return close.ewm(span=26, adjust=False).mean()
+
+@register("DIF", inputs=("EMA12", "EMA26"), warmup=1)
+def dif(ema12, ema26):
+    return ema12 - ema26
+
+@register("DEA", inputs=("DIF",), warmup=ewm_warmup(9))
+def dea(dif):
+    return dif.ewm(span=9, adjust=False).mean()
+
+@register("MACD_Hist", inputs=("DIF", "DEA"), warmup=1)
+def macd_hist(dif, dea):
+    return (dif - dea) * 2
+
+# Bollinger Bands (BOLL)，中軌與 MA20 共用同一個滾動平均
+@register("BB_Middle", inputs=("MA20",), warmup=1)
+def bb_middle(ma20):
+    return ma20
+
+@register("BB_StdDev", inputs=("close",), warmup=20)
+def bb_std(close):
+    return close.rolling(window=20).std()
+
+@register("BB_Upper", inputs=("BB_Middle", "BB_StdDev"), warmup=1)
+def bb_upper(middle, std):
+    return middle + (std * 2)
+
+@register("BB_Lower", inputs=("BB_Middle", "BB_StdDev"), warmup=1)
+def bb_lower(middle, std):
+    return middle - (std * 2)
+
+@register("Percent_B", inputs=("close", "BB_Upper", "BB_Lower"), warmup=1)
+def percent_b(close, upper, lower):
+    return (close - lower) / (upper - lower)
+
+# Keltner Channel (KC)
+@register("KC_Middle", inputs=("close",), warmup=ewm_warmup(20))
+def kc_middle(close):
+    return close.ewm(span=20, adjust=False).mean()  # EMA20 作為中軌
+
+@register("KC_ATR", inputs=("high", "low"), warmup=14)
+def kc_atr(high, low):
+    return (high - low).rolling(window=14).mean()  # 簡化的ATR計算
+
+@register("KC_Upper", inputs=("KC_Middle", "KC_ATR"), warmup=1)
+def kc_upper(middle, atr):
+    return middle + (atr * 2)
+
+@register("KC_Lower", inputs=("KC_Middle", "KC_ATR"), warmup=1)
+def kc_lower(middle, atr):
+    return middle - (atr * 2)
+
+@register("KC_Position", inputs=("close", "KC_Upper", "KC_Lower"), warmup=1)
+def kc_position(close, upper, lower):
+    return (close - lower) / (upper - lower)
+
+# RSI
+@register("RSI14", inputs=("close",), warmup=ewm_warmup(14) + 1)
+def rsi14(close):
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(span=14, adjust=False).mean()
+    avg_loss = loss.ewm(span=14, adjust=False).mean()
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+# KDJ
+@register("RSV", inputs=("close", "high", "low"), warmup=9)
+def rsv(close, high, low):
+    low_min = low.rolling(window=9).min()
+    high_max = high.rolling(window=9).max()
+    return (close - low_min) / (high_max - low_min) * 100
+
+@register("K", inputs=("RSV",), warmup=ewm_warmup(3))
+def kdj_k(rsv):
+    return rsv.ewm(span=3, adjust=False).mean()
+
+@register("D", inputs=("K",), warmup=ewm_warmup(3))
+def kdj_d(k):
+    return k.ewm(span=3, adjust=False).mean()
+
+@register("J", inputs=("K", "D"), warmup=1)
+def kdj_j(k, d):
+    return 3 * k - 2 * d
+
+# DMI (Directional Movement Index)，單次走訪計算所有輸出
+@register(("TR", "DI_Plus", "DI_Minus", "ADX"), inputs=("high", "low", "close"), warmup=2 * 14,
+          params={"dmi_smoothing": "sma"})
+def dmi(high, low, close, dmi_smoothing):
+    result = calculate_dmi(high.to_numpy(), low.to_numpy(), close.to_numpy(), period=14, smoothing=dmi_smoothing)
+    return {name: result[name] for name in ("TR", "DI_Plus", "DI_Minus", "ADX")}
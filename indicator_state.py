@@ -0,0 +1,381 @@
+"""
+增量技術指標狀態
+Streaming indicator state that updates per new candle
+
+每個 (symbol, interval) 保存滾動和、EMA 狀態、DMI 累加器與最小/最大值單調佇列，
+新 K 線到來時以 O(1) 更新，不需重算整段歷史。狀態可序列化為 JSON，
+排程執行時從上次的狀態繼續，只餵入新收盤的 K 線。
+"""
+import copy
+import json
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+# 與 calculate_technical_indicators 輸出相同的指標欄位
+INDICATOR_COLUMNS = [
+    "MA5", "MA10", "MA20", "MA120", "VWMA5", "VWMA10", "VWMA20",
+    "EMA12", "EMA26", "DIF", "DEA", "MACD_Hist",
+    "BB_Middle", "BB_StdDev", "BB_Upper", "BB_Lower", "Percent_B",
+    "KC_Middle", "KC_ATR", "KC_Upper", "KC_Lower", "KC_Position",
+    "RSI14", "RSV", "K", "D", "J", "TR", "DI_Plus", "DI_Minus", "ADX",
+]
+
+CANDLE_FIELDS = ["open_time", "open", "high", "low", "close", "volume"]
+
+# analyze_indicators 最多回看 24 根 K 線 (Fibonacci 樞紐點)
+HISTORY_ROWS = 24
+
+# 滾動和每更新這麼多次就從窗口重新求和，避免浮點誤差累積
+RESUM_EVERY = 1000
+
+NAN = float("nan")
+
+def _div(a, b):
+    """與 NumPy 相同的除法語意：x/0 為 ±inf，0/0 為 NaN"""
+    if b == 0 or math.isnan(b) or math.isnan(a):
+        if math.isnan(a) or math.isnan(b) or a == 0:
+            return NAN
+        return math.copysign(math.inf, a) * (math.copysign(1.0, b))
+    return a / b
+
+class _Ewm:
+    """pandas ewm(span, adjust=False) 的單點更新版本"""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = NAN
+        self.old_wt = 1.0
+
+    def update(self, x):
+        if math.isnan(self.value):
+            if not math.isnan(x):
+                self.value = x
+            return self.value
+        self.old_wt *= 1.0 - self.alpha
+        if not math.isnan(x):
+            if self.value != x:
+                self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+            self.old_wt = 1.0
+        return self.value
+
+class _Rolling:
+    """固定窗口的滾動和 (窗口未滿或含 NaN 時結果為 NaN)"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.nan_count = 0
+        self.updates = 0
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+
+        self.updates += 1
+        if self.updates % RESUM_EVERY == 0:
+            self.total = math.fsum(v for v in self.values if not math.isnan(v))
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window and self.nan_count == 0
+
+    def sum(self):
+        return self.total if self.ready else NAN
+
+    def mean(self):
+        return self.total / self.window if self.ready else NAN
+
+    def std(self):
+        """樣本標準差 (ddof=1)，窗口只有 20 根，直接計算"""
+        if not self.ready:
+            return NAN
+        mean = math.fsum(self.values) / self.window
+        return math.sqrt(math.fsum((v - mean) ** 2 for v in self.values) / (self.window - 1))
+
+class _RollingExtreme:
+    """以單調佇列維護滾動最小值或最大值"""
+
+    def __init__(self, window, mode):
+        self.window = window
+        self.mode = mode
+        self.queue = deque()  # (index, value)
+        self.index = 0
+
+    def update(self, x):
+        if self.mode == "min":
+            while self.queue and self.queue[-1][1] >= x:
+                self.queue.pop()
+        else:
+            while self.queue and self.queue[-1][1] <= x:
+                self.queue.pop()
+        self.queue.append((self.index, x))
+        while self.queue[0][0] <= self.index - self.window:
+            self.queue.popleft()
+        self.index += 1
+
+    def value(self):
+        return self.queue[0][1] if self.index >= self.window else NAN
+
+class IndicatorState:
+    """
+    單一 (symbol, interval) 的增量指標狀態
+
+    用法:
+        state = IndicatorState("BTCUSDT", "1h")
+        state.catch_up(klines_df)         # 首次從歷史建立狀態
+        state.update(candle)              # 每根新收盤 K 線
+        frame = state.to_frame()          # 最近 24 根 K 線 + 指標，可直接給 analyze_indicators
+    """
+
+    def __init__(self, symbol, interval):
+        self.symbol = symbol
+        self.interval = interval
+        self.count = 0
+        self.last_open_time = None
+        self.prev = None  # 前一根 K 線 (high, low, close)
+
+        self.ma = {window: _Rolling(window) for window in (5, 10, 20, 120)}
+        self.vwma_pv = {window: _Rolling(window) for window in (5, 10, 20)}
+        self.vwma_v = {window: _Rolling(window) for window in (5, 10, 20)}
+        self.ema12 = _Ewm(12)
+        self.ema26 = _Ewm(26)
+        self.dea = _Ewm(9)
+        self.kc_middle = _Ewm(20)
+        self.kc_range = _Rolling(14)
+        self.avg_gain = _Ewm(14)
+        self.avg_loss = _Ewm(14)
+        self.low_min = _RollingExtreme(9, "min")
+        self.high_max = _RollingExtreme(9, "max")
+        self.k = _Ewm(3)
+        self.d = _Ewm(3)
+        self.tr14 = _Rolling(14)
+        self.dm_plus14 = _Rolling(14)
+        self.dm_minus14 = _Rolling(14)
+        self.dx14 = _Rolling(14)
+
+        self.history = deque(maxlen=HISTORY_ROWS)
+
+    def update(self, candle):
+        """
+        加入一根已收盤的 K 線
+
+        Args:
+            candle (dict): 包含 open_time, open, high, low, close, volume
+
+        Returns:
+            dict: 該 K 線的指標值；open_time 不晚於上一根時不更新並返回 None
+        """
+        open_time = pd.Timestamp(candle["open_time"])
+        if self.last_open_time is not None and open_time <= self.last_open_time:
+            return None
+
+        high = float(candle["high"])
+        low = float(candle["low"])
+        close = float(candle["close"])
+        volume = float(candle["volume"])
+        row = {
+            "open_time": open_time,
+            "open": float(candle.get("open", NAN)),
+            "high": high, "low": low, "close": close, "volume": volume,
+        }
+
+        # Moving Averages / VWMA
+        for window, rolling in self.ma.items():
+            rolling.update(close)
+            row[f"MA{window}"] = rolling.mean()
+        for window in (5, 10, 20):
+            self.vwma_pv[window].update(close * volume)
+            self.vwma_v[window].update(volume)
+            row[f"VWMA{window}"] = _div(self.vwma_pv[window].sum(), self.vwma_v[window].sum())
+
+        # MACD
+        ema12 = self.ema12.update(close)
+        ema26 = self.ema26.update(close)
+        dif = ema12 - ema26
+        dea = self.dea.update(dif)
+        row.update({"EMA12": ema12, "EMA26": ema26, "DIF": dif, "DEA": dea, "MACD_Hist": (dif - dea) * 2})
+
+        # Bollinger Bands
+        bb_middle = row["MA20"]
+        bb_std = self.ma[20].std()
+        bb_upper = bb_middle + bb_std * 2
+        bb_lower = bb_middle - bb_std * 2
+        row.update({
+            "BB_Middle": bb_middle, "BB_StdDev": bb_std, "BB_Upper": bb_upper, "BB_Lower": bb_lower,
+            "Percent_B": _div(close - bb_lower, bb_upper - bb_lower),
+        })
+
+        # Keltner Channel
+        kc_middle = self.kc_middle.update(close)
+        self.kc_range.update(high - low)
+        kc_atr = self.kc_range.mean()
+        kc_upper = kc_middle + kc_atr * 2
+        kc_lower = kc_middle - kc_atr * 2
+        row.update({
+            "KC_Middle": kc_middle, "KC_ATR": kc_atr, "KC_Upper": kc_upper, "KC_Lower": kc_lower,
+            "KC_Position": _div(close - kc_lower, kc_upper - kc_lower),
+        })
+
+        # RSI
+        delta = close - self.prev["close"] if self.prev else NAN
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        rs = _div(self.avg_gain.update(gain), self.avg_loss.update(loss))
+        row["RSI14"] = 100 - _div(100, 1 + rs) if not math.isinf(rs) else 100.0
+
+        # KDJ
+        self.low_min.update(low)
+        self.high_max.update(high)
+        low_min = self.low_min.value()
+        rsv = _div(close - low_min, self.high_max.value() - low_min) * 100
+        k = self.k.update(rsv)
+        d = self.d.update(k)
+        row.update({"RSV": rsv, "K": k, "D": d, "J": 3 * k - 2 * d})
+
+        # DMI
+        if self.prev:
+            tr = max(high - low, abs(high - self.prev["close"]), abs(low - self.prev["close"]))
+            high_diff = high - self.prev["high"]
+            low_diff = self.prev["low"] - low
+        else:
+            tr = high - low
+            high_diff = low_diff = NAN
+        dm_plus = high_diff if high_diff > 0 and high_diff > low_diff else 0.0
+        dm_minus = low_diff if low_diff > 0 and low_diff > high_diff else 0.0
+        self.tr14.update(tr)
+        self.dm_plus14.update(dm_plus)
+        self.dm_minus14.update(dm_minus)
+        tr14 = self.tr14.sum()
+        di_plus = _div(self.dm_plus14.sum(), tr14) * 100
+        di_minus = _div(self.dm_minus14.sum(), tr14) * 100
+        self.dx14.update(_div(abs(di_plus - di_minus), di_plus + di_minus) * 100)
+        row.update({"TR": tr, "DI_Plus": di_plus, "DI_Minus": di_minus, "ADX": self.dx14.mean()})
+
+        self.prev = {"high": high, "low": low, "close": close}
+        self.last_open_time = open_time
+        self.count += 1
+        self.history.append(row)
+        return row
+
+    def catch_up(self, klines_df):
+        """
+        依序餵入 open_time 晚於目前狀態的 K 線
+
+        Returns:
+            int: 實際加入的 K 線數量
+        """
+        df = klines_df
+        if self.last_open_time is not None:
+            df = df[pd.to_datetime(df["open_time"]) > self.last_open_time]
+        added = 0
+        for candle in df[CANDLE_FIELDS].to_dict("records"):
+            if self.update(candle) is not None:
+                added += 1
+        return added
+
+    def preview(self, candle):
+        """
+        計算未收盤 K 線的指標而不改變狀態
+
+        Returns:
+            IndicatorState: 加入該 K 線後的狀態副本
+        """
+        state = copy.deepcopy(self)
+        state.update(candle)
+        return state
+
+    def to_frame(self):
+        """最近的 K 線與指標 (最多 24 根)，格式與 calculate_technical_indicators 的輸出相同"""
+        return pd.DataFrame(list(self.history), columns=CANDLE_FIELDS + INDICATOR_COLUMNS)
+
+    def latest(self):
+        """最新一根 K 線的指標值"""
+        return dict(self.history[-1]) if self.history else None
+
+    def to_dict(self):
+        """序列化為可 JSON 化的 dict"""
+        def encode(value):
+            if isinstance(value, pd.Timestamp):
+                return {"__ts__": value.isoformat()}
+            if isinstance(value, float) and not math.isfinite(value):
+                return {"__float__": repr(value)}
+            if isinstance(value, deque):
+                return {"__deque__": [encode(v) for v in value], "maxlen": value.maxlen}
+            if isinstance(value, (list, tuple)):
+                return [encode(v) for v in value]
+            if isinstance(value, dict):
+                return {str(k): encode(v) for k, v in value.items()}
+            if hasattr(value, "__dict__"):
+                return {"__obj__": type(value).__name__, "state": encode(vars(value))}
+            return value
+        return encode(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        """從 to_dict() 的結果還原狀態"""
+        classes = {c.__name__: c for c in (_Ewm, _Rolling, _RollingExtreme)}
+
+        def decode(value):
+            if isinstance(value, dict):
+                if "__ts__" in value:
+                    return pd.Timestamp(value["__ts__"])
+                if "__float__" in value:
+                    return float(value["__float__"])
+                if "__deque__" in value:
+                    return deque((decode(v) for v in value["__deque__"]), maxlen=value["maxlen"])
+                if "__obj__" in value:
+                    obj = classes[value["__obj__"]].__new__(classes[value["__obj__"]])
+                    obj.__dict__.update(decode(value["state"]))
+                    return obj
+                return {k: decode(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [decode(v) for v in value]
+            return value
+
+        state = cls.__new__(cls)
+        state.__dict__.update(decode(data))
+        # dict 的數字鍵在 JSON 中會變成字串
+        for name in ("ma", "vwma_pv", "vwma_v"):
+            setattr(state, name, {int(k): v for k, v in getattr(state, name).items()})
+        # _RollingExtreme 佇列元素還原為 tuple
+        for extreme in (state.low_min, state.high_max):
+            extreme.queue = deque(tuple(item) for item in extreme.queue)
+        return state
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+def state_path(symbol, interval, state_dir="data/state"):
+    return os.path.join(state_dir, f"{symbol}_{interval}.json")
+
+def load_or_create_state(symbol, interval, state_dir="data/state"):
+    """讀取已保存的狀態，不存在或損毀時建立新狀態"""
+    path = state_path(symbol, interval, state_dir)
+    if os.path.exists(path):
+        try:
+            return IndicatorState.load(path)
+        except Exception as e:
+            print(f"⚠️ 無法讀取指標狀態 {path}: {e}，重新建立")
+    return IndicatorState(symbol, interval)
@@ -0,0 +1,377 @@
+"""
+本地 K 線存儲
+Persistent local kline store keyed by (symbol, interval)
+
+支援的存儲後端 (以 KLINE_STORAGE 環境變數或 backend 參數選擇):
+- csv:     data/{symbol}_klines_{interval}.csv (預設，與舊版相容)
+- parquet: data/{symbol}_klines_{interval}.parquet (需要 pyarrow)
+- feather: data/{symbol}_klines_{interval}.feather (需要 pyarrow)
+- npy:     data/klines/{symbol}_{interval}/{column}.{version}.npy，每欄一個固定型別陣列；
+           load_arrays() 以記憶體映射 (mmap) 零拷貝讀取，並只載入需要的欄位，
+           load() 則會建立 DataFrame 並轉換時間欄位 (會複製數據)
+"""
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+    'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume',
+    'taker_buy_quote_asset_volume', 'ignore'
+]
+
+# 固定欄位型別 (時間欄位以毫秒 int64 存儲)
+KLINE_DTYPES = {
+    'open_time': 'int64', 'open': 'float64', 'high': 'float64', 'low': 'float64',
+    'close': 'float64', 'volume': 'float64', 'close_time': 'int64',
+    'quote_asset_volume': 'float64', 'number_of_trades': 'int64',
+    'taker_buy_base_asset_volume': 'float64', 'taker_buy_quote_asset_volume': 'float64',
+    'ignore': 'float64',
+}
+
+TIME_COLUMNS = ('open_time', 'close_time')
+
+# 每個 (symbol, interval) 預設保留的 K 線數：遠大於指標需要的歷史 (MIN_HISTORY_BARS = 240)，
+# 也足以由 15m 聚合出 240 根 4h K 線；回補 (backfill) 以 capped=False 不受此限制
+DEFAULT_MAX_ROWS = 5000
+
+# 時間框架對應的毫秒數
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+def to_millis(timestamp):
+    """將 pandas Timestamp 轉為 Binance 使用的毫秒時間戳"""
+    return int(pd.Timestamp(timestamp).value // 1_000_000)
+
+def to_millis_array(values):
+    """將 datetime 欄位轉為毫秒 int64 陣列"""
+    return np.asarray(pd.to_datetime(values).to_numpy(dtype='datetime64[ms]'), dtype='int64')
+
+def _to_typed_frame(df):
+    """統一欄位型別，時間欄位轉為 datetime"""
+    df = df.copy()
+    for column in df.columns:
+        if column in TIME_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column])
+        elif column in KLINE_DTYPES:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(KLINE_DTYPES[column])
+    return df
+
+class CsvBackend:
+    """CSV 文字檔 (相容舊版數據檔案，也作為匯出格式)"""
+
+    suffix = ".csv"
+
+    def path(self, data_dir, symbol, interval):
+        return os.path.join(data_dir, f"{symbol}_klines_{interval}{self.suffix}")
+
+    def read(self, path, columns=None):
+        if not os.path.exists(path):
+            return None
+        time_columns = [c for c in TIME_COLUMNS if columns is None or c in columns]
+        return pd.read_csv(path, usecols=columns, parse_dates=time_columns)
+
+    def write(self, path, df):
+        tmp_path = f"{path}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+class ParquetBackend:
+    """Parquet 列式檔案 (需要 pyarrow)"""
+
+    suffix = ".parquet"
+
+    def path(self, data_dir, symbol, interval):
+        return os.path.join(data_dir, f"{symbol}_klines_{interval}{self.suffix}")
+
+    def read(self, path, columns=None):
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path, columns=columns)
+
+    def write(self, path, df):
+        tmp_path = f"{path}.tmp"
+        _to_typed_frame(df).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+class FeatherBackend(ParquetBackend):
+    """Feather (Arrow IPC) 檔案 (需要 pyarrow)，讀取比 Parquet 更快但檔案較大"""
+
+    suffix = ".feather"
+
+    def read(self, path, columns=None):
+        if not os.path.exists(path):
+            return None
+        return pd.read_feather(path, columns=columns)
+
+    def write(self, path, df):
+        tmp_path = f"{path}.tmp"
+        _to_typed_frame(df).reset_index(drop=True).to_feather(tmp_path)
+        os.replace(tmp_path, path)
+
+class NpyBackend:
+    """
+    每欄一個 .npy 固定型別陣列，讀取時使用記憶體映射
+
+    每次寫入的欄位檔案名稱帶有新的版本號，全部寫完後才以 os.replace 原子地更新
+    meta.json (版本號、列數、欄位)，再刪除舊版本的檔案。讀取只使用 meta.json 指向的
+    版本，寫入中途中斷時仍讀到完整的舊版本，不會混合兩個版本的欄位。
+    """
+
+    suffix = ""
+    META_FILE = "meta.json"
+
+    def path(self, data_dir, symbol, interval):
+        return os.path.join(data_dir, "klines", f"{symbol}_{interval}")
+
+    def _read_meta(self, path):
+        meta_path = os.path.join(path, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    def read_arrays(self, path, columns=None):
+        """
+        以 mmap 讀取欄位陣列 (零拷貝)
+
+        Returns:
+            dict: {column: np.ndarray}，時間欄位為毫秒 int64；不存在時返回 None
+
+        Raises:
+            ValueError: 欄位長度與 meta.json 記錄的列數不符 (檔案損毀)
+        """
+        if not os.path.isdir(path):
+            return None
+        for attempt in range(2):
+            meta = self._read_meta(path)
+            if meta is None:
+                return self._read_legacy(path, columns)
+            try:
+                return self._read_version(path, meta, columns)
+            except FileNotFoundError:
+                # 讀取期間另一個寫入者已換上新版本並刪除舊檔案，重新讀取 meta.json
+                if attempt:
+                    raise
+
+    def _read_version(self, path, meta, columns):
+        version = meta["version"]
+        columns = columns or meta["columns"]
+        arrays = {c: np.load(os.path.join(path, f"{c}.{version}.npy"), mmap_mode='r') for c in columns}
+        for column, array in arrays.items():
+            if len(array) != meta["rows"]:
+                raise ValueError(f"{path}: {column} 有 {len(array)} 列，meta.json 記錄 {meta['rows']} 列")
+        return arrays
+
+    def _read_legacy(self, path, columns):
+        """沒有 meta.json 的舊版目錄 ({column}.npy)"""
+        columns = columns or [c for c in KLINE_COLUMNS if os.path.exists(os.path.join(path, f"{c}.npy"))]
+        arrays = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode='r') for c in columns}
+        length = min((len(a) for a in arrays.values()), default=0)
+        return {c: a[:length] for c, a in arrays.items()}
+
+    def read(self, path, columns=None):
+        """讀取為 DataFrame (時間欄位轉為 datetime，不是零拷貝；需要 mmap 陣列請用 read_arrays)"""
+        arrays = self.read_arrays(path, columns)
+        if arrays is None:
+            return None
+        data = {}
+        for column, values in arrays.items():
+            if column in TIME_COLUMNS:
+                data[column] = pd.to_datetime(values, unit='ms')
+            else:
+                data[column] = values
+        return pd.DataFrame(data, copy=False)
+
+    def write(self, path, df):
+        os.makedirs(path, exist_ok=True)
+        version = f"{time.time_ns():x}{os.getpid():x}"
+        for column in df.columns:
+            values = df[column]
+            if column in TIME_COLUMNS:
+                array = to_millis_array(values)
+            else:
+                array = pd.to_numeric(values, errors='coerce').to_numpy(dtype=KLINE_DTYPES.get(column, 'float64'))
+            np.save(os.path.join(path, f"{column}.{version}.npy"), np.ascontiguousarray(array))
+
+        # 所有欄位寫完後才切換版本
+        meta_path = os.path.join(path, self.META_FILE)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version, "rows": len(df), "columns": list(df.columns)}, f)
+        os.replace(tmp_path, meta_path)
+
+        # 刪除舊版本 (含沒有版本號的舊格式檔案與中斷寫入留下的檔案)
+        for name in os.listdir(path):
+            if name.endswith(".npy") and not name.endswith(f".{version}.npy"):
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+BACKENDS = {
+    "csv": CsvBackend,
+    "parquet": ParquetBackend,
+    "feather": FeatherBackend,
+    "npy": NpyBackend,
+}
+
+class KlineStore:
+    """
+    以 (symbol, interval) 為鍵的 K 線存儲
+
+    預設沿用 data/{symbol}_klines_{interval}.csv 格式，也可切換為列式二進位後端。
+    合併新數據時以 open_time 去重並保留最新一筆，未收盤的最後一根 K 線
+    會在下一次更新時被覆蓋。增量更新最多保留 max_rows 根，避免檔案無限增長，
+    每次寫入的成本也因此有上限。
+    """
+
+    def __init__(self, data_dir="data", max_rows=DEFAULT_MAX_ROWS, backend=None):
+        """
+        Args:
+            data_dir (str): 數據目錄
+            max_rows (int): 每個 (symbol, interval) 保留的最大 K 線數，None 表示不限制
+            backend (str): 存儲後端 (csv, parquet, feather, npy)，預設讀取 KLINE_STORAGE 環境變數
+        """
+        self.data_dir = data_dir
+        self.max_rows = max_rows
+        self.backend_name = (backend or os.getenv("KLINE_STORAGE", "csv")).lower()
+        if self.backend_name not in BACKENDS:
+            raise ValueError(f"不支援的存儲後端: {self.backend_name} (可選: {', '.join(BACKENDS)})")
+        self.backend = BACKENDS[self.backend_name]()
+
+    def path(self, symbol, interval):
+        return self.backend.path(self.data_dir, symbol, interval)
+
+    def load(self, symbol, interval, columns=None):
+        """
+        讀取已存儲的 K 線，不存在時返回 None
+
+        Args:
+            columns (list): 只載入指定欄位，None 表示全部
+        """
+        df = self.backend.read(self.path(symbol, interval), columns)
+        if df is None or df.empty:
+            return None
+        return df
+
+    def load_arrays(self, symbol, interval, columns=None):
+        """
+        以 NumPy 陣列讀取指定欄位
+
+        npy 後端直接返回記憶體映射的唯讀陣列 (零拷貝)，其他後端從 DataFrame 轉換。
+        """
+        if isinstance(self.backend, NpyBackend):
+            return self.backend.read_arrays(self.path(symbol, interval), columns)
+        df = self.load(symbol, interval, columns)
+        if df is None:
+            return None
+        arrays = {}
+        for column in df.columns:
+            if column in TIME_COLUMNS:
+                arrays[column] = to_millis_array(df[column])
+            else:
+                arrays[column] = df[column].to_numpy()
+        return arrays
+
+    def last_open_time(self, symbol, interval, df=None):
+        """最後一根已存儲 K 線的 open_time (毫秒)，沒有數據時返回 None"""
+        if df is None:
+            df = self.load(symbol, interval, columns=['open_time'])
+        if df is None or df.empty:
+            return None
+        return to_millis(df['open_time'].iloc[-1])
+
+    def merge(self, existing_df, new_df, capped=True):
+        """
+        合併新舊 K 線
+
+        以 open_time 去重，重疊時保留新數據 (覆蓋未收盤的 K 線)，並按時間排序。
+        capped 時最多保留 max_rows 根；既有數據已超過 max_rows (回補的歷史) 時
+        維持既有的長度，只捨棄被新 K 線擠出的最舊數據，不會截斷回補的歷史。
+
+        Args:
+            capped (bool): 是否套用 max_rows，回補歷史時傳入 False
+        """
+        if existing_df is None or existing_df.empty:
+            merged = new_df
+        elif new_df is None or new_df.empty:
+            merged = existing_df
+        else:
+            merged = pd.concat([existing_df, new_df], ignore_index=True)
+            merged = merged.drop_duplicates(subset='open_time', keep='last')
+        merged = merged.sort_values('open_time').reset_index(drop=True)
+        if capped and self.max_rows:
+            limit = max(self.max_rows, 0 if existing_df is None else len(existing_df))
+            if len(merged) > limit:
+                merged = merged.tail(limit).reset_index(drop=True)
+        return merged
+
+    def save(self, symbol, interval, df):
+        """寫入 K 線數據，返回檔案路徑"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = self.path(symbol, interval)
+        self.backend.write(path, df)
+        return path
+
+    def export_csv(self, symbol, interval, path=None):
+        """
+        將 K 線匯出為 CSV
+
+        Returns:
+            str: 匯出的檔案路徑，沒有數據時返回 None
+        """
+        df = self.load(symbol, interval)
+        if df is None:
+            return None
+        path = path or CsvBackend().path(self.data_dir, symbol, interval)
+        if isinstance(self.backend, CsvBackend) and os.path.abspath(path) == os.path.abspath(self.path(symbol, interval)):
+            return path
+        CsvBackend().write(path, df)
+        return path
+
+class MemoryKlineStore(KlineStore):
+    """
+    寫入保留在記憶體中的 KlineStore
+
+    save() 只更新記憶體並記錄待寫入的 (symbol, interval)，讀取時優先返回記憶體中的
+    數據，其餘從磁碟讀取。供單一進程的流程在各階段之間直接傳遞 DataFrame，
+    最後再以 flush() 寫回磁碟 (可在背景執行緒中進行)。
+    """
+
+    def __init__(self, data_dir="data", max_rows=DEFAULT_MAX_ROWS, backend=None):
+        super().__init__(data_dir, max_rows, backend)
+        self.frames = {}
+
+    def load(self, symbol, interval, columns=None):
+        df = self.frames.get((symbol, interval))
+        if df is None:
+            return super().load(symbol, interval, columns)
+        if df.empty:
+            return None
+        return df[columns].copy() if columns is not None else df.copy()
+
+    def load_arrays(self, symbol, interval, columns=None):
+        if (symbol, interval) not in self.frames:
+            return super().load_arrays(symbol, interval, columns)
+        df = self.load(symbol, interval, columns)
+        if df is None:
+            return None
+        return {column: to_millis_array(df[column]) if column in TIME_COLUMNS else df[column].to_numpy()
+                for column in df.columns}
+
+    def save(self, symbol, interval, df):
+        """只更新記憶體，返回之後 flush() 會寫入的路徑"""
+        self.frames[(symbol, interval)] = df
+        return self.path(symbol, interval)
+
+    def flush(self, symbol, interval):
+        """將一組記憶體中的 K 線寫入磁碟，返回檔案路徑"""
+        return super().save(symbol, interval, self.frames[(symbol, interval)])
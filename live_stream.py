@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+即時 WebSocket K 線 / 行情接收服務
+Live kline and miniTicker ingestion over Binance combined streams
+
+訂閱所有設定幣種的 kline 與 miniTicker 合併串流。每根 K 線收盤時寫入 K 線存儲、
+更新增量指標狀態，並重新分析該幣種；寫檔與分析在執行緒中進行，不阻塞接收與心跳。分析結果寫入 data/multi_investment_report.json
+(REPORT_FORMAT=compact 時為去重的快照與數值表)，沿用原有的報告與訊號流程。斷線或握手失敗後自動重連，並以 REST 補齊斷線期間缺少的 K 線。
+
+指定 --base-interval 時只訂閱一個基礎時間框架，其他時間框架由 Resampler
+在基礎 K 線收盤時增量聚合。
+
+需要額外安裝 websockets 套件: pip install websockets
+
+用法:
+    python live_stream.py
+    python live_stream.py --symbols BTCUSDT ETHUSDT --intervals 15m 1h --notify
+    python live_stream.py --base-interval 15m --intervals 15m 1h 4h
+    python live_stream.py --url ws://localhost:8765   # 連到本地模擬伺服器測試
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import pandas as pd
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from analysis_format import trend_text
+from analyze_binance_data import analyze_klines
+from get_binance_data import fetch_new_klines, fetch_resampled_klines, get_ticker_24hr_batch
+from indicator_state import IndicatorState, load_or_create_state, state_path
+from kline_store import KlineStore
+from report_store import REPORT_FILE, save_report
+from resample import Resampler, can_resample
+
+STREAM_BASE_URL = "wss://data-stream.binance.vision"
+MAX_RECONNECT_DELAY = 60
+NOTIFY_DEBOUNCE_SECONDS = 2.0
+
+def kline_event_to_row(k):
+    """將 WebSocket kline 事件轉為與 get_klines 相同欄位的資料列"""
+    return {
+        'open_time': pd.to_datetime(k['t'], unit='ms'),
+        'open': float(k['o']),
+        'high': float(k['h']),
+        'low': float(k['l']),
+        'close': float(k['c']),
+        'volume': float(k['v']),
+        'close_time': pd.to_datetime(k['T'], unit='ms'),
+        'quote_asset_volume': float(k['q']),
+        'number_of_trades': int(k['n']),
+        'taker_buy_base_asset_volume': float(k['V']),
+        'taker_buy_quote_asset_volume': float(k['Q']),
+        'ignore': k.get('B', '0'),
+    }
+
+def mini_ticker_to_ticker(event):
+    """將 miniTicker 事件轉為 analyze_indicators 需要的 24hr ticker 欄位"""
+    open_price = float(event['o'])
+    last_price = float(event['c'])
+    change_percent = (last_price - open_price) / open_price * 100 if open_price else 0.0
+    return {
+        'symbol': event['s'],
+        'lastPrice': event['c'],
+        'openPrice': event['o'],
+        'highPrice': event['h'],
+        'lowPrice': event['l'],
+        'volume': event['v'],
+        'quoteVolume': event['q'],
+        'priceChangePercent': f"{change_percent:.3f}",
+    }
+
+class LiveIngestor:
+    """即時接收 K 線並驅動分析"""
+
+    def __init__(self, symbols, intervals=("1h", "15m"), store=None, base_url=STREAM_BASE_URL,
+                 report_file=REPORT_FILE, state_dir="data/state", on_update=None, base_interval=None):
+        """
+        Args:
+            symbols (list): 交易對列表
+            intervals (list): 時間框架列表
+            store (KlineStore): K 線存儲
+            base_url (str): WebSocket 伺服器位址
+            report_file (str): 分析報告輸出路徑
+            state_dir (str): 指標狀態目錄
+            on_update (callable): 收盤 K 線分析完成後的回呼 on_update(symbol, interval, analysis)，analysis 為 AnalysisResult
+            base_interval (str): 只訂閱的基礎時間框架，其他時間框架由其聚合；None 表示各自訂閱
+        """
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        self.store = store or KlineStore()
+        self.base_url = base_url.rstrip("/")
+        self.report_file = report_file
+        self.state_dir = state_dir
+        self.on_update = on_update
+        self.base_interval = base_interval
+        if base_interval:
+            unsupported = [i for i in self.intervals if i != base_interval and not can_resample(base_interval, i)]
+            if unsupported:
+                raise ValueError(f"無法由 {base_interval} 聚合出: {', '.join(unsupported)}")
+
+        self.frames = {}
+        self.resamplers = {}
+        self.states = {}
+        self.tickers = {}
+        self.report = {}
+        self.stopped = False
+
+    @property
+    def url(self):
+        streams = []
+        for symbol in self.symbols:
+            streams.append(f"{symbol.lower()}@miniTicker")
+            for interval in ([self.base_interval] if self.base_interval else self.intervals):
+                streams.append(f"{symbol.lower()}@kline_{interval}")
+        return f"{self.base_url}/stream?streams={'/'.join(streams)}"
+
+    def sync(self):
+        """以 REST 補齊缺少的 K 線與行情，並將已收盤 K 線併入指標狀態"""
+        # 與 REST 補齊使用同一個時鐘判斷 K 線是否已收盤
+        now = pd.to_datetime(int(time.time() * 1000), unit='ms')
+        try:
+            self.tickers.update(get_ticker_24hr_batch(self.symbols))
+        except Exception as e:
+            print(f"❌ Error fetching tickers: {e}")
+        for symbol in self.symbols:
+            if self.base_interval:
+                try:
+                    frames = fetch_resampled_klines(symbol, self.base_interval, self.intervals, self.store)
+                except Exception as e:
+                    print(f"❌ Error backfilling {symbol} {self.base_interval}: {e}")
+                    continue
+                for interval, df in frames.items():
+                    self.store.save(symbol, interval, df)
+                    self.frames[(symbol, interval)] = df
+                self.prime_resamplers(symbol, frames[self.base_interval], now)
+
+            for interval in self.intervals:
+                key = (symbol, interval)
+                if self.base_interval:
+                    if key not in self.frames:
+                        continue
+                    df = self.frames[key]
+                else:
+                    try:
+                        df = fetch_new_klines(symbol, interval, self.store)
+                        self.store.save(symbol, interval, df)
+                    except Exception as e:
+                        print(f"❌ Error backfilling {symbol} {interval}: {e}")
+                        continue
+                    self.frames[key] = df
+
+                state = self.states.get(key) or load_or_create_state(symbol, interval, self.state_dir)
+                closed = df[pd.to_datetime(df['close_time']) < now] if 'close_time' in df.columns else df.iloc[:-1]
+                if len(closed) and state.last_open_time is not None \
+                        and pd.Timestamp(closed['open_time'].iloc[-1]) < state.last_open_time:
+                    state = IndicatorState(symbol, interval)
+                added = state.catch_up(closed)
+                state.save(state_path(symbol, interval, self.state_dir))
+                self.states[key] = state
+                if added:
+                    print(f"🔄 {symbol} {interval}: 補齊 {added} 根 K 線")
+
+    def prime_resamplers(self, symbol, base_df, now):
+        """以目前尚未完成的目標 K 線內已收盤的基礎 K 線重建 Resampler"""
+        closed = base_df[pd.to_datetime(base_df['close_time']) < now]
+        for interval in self.intervals:
+            if interval == self.base_interval:
+                continue
+            resampler = Resampler(interval)
+            if len(closed):
+                last_open = pd.Timestamp(closed['open_time'].iloc[-1])
+                bucket_start = last_open.floor(pd.Timedelta(milliseconds=resampler.target_ms))
+                for row in closed[pd.to_datetime(closed['open_time']) >= bucket_start].to_dict('records'):
+                    resampler.update(row)
+            self.resamplers[(symbol, interval)] = resampler
+
+    def on_base_candle(self, symbol, row):
+        """基礎時間框架收盤：更新基礎 K 線並推動各時間框架的 Resampler"""
+        analyzed = False
+        if self.base_interval in self.intervals:
+            analyzed = self.on_closed_candle(symbol, self.base_interval, row)
+        else:
+            key = (symbol, self.base_interval)
+            self.frames[key] = self.store.merge(self.frames.get(key), pd.DataFrame([row]))
+            self.store.save(symbol, self.base_interval, self.frames[key])
+
+        for interval in self.intervals:
+            resampler = self.resamplers.get((symbol, interval))
+            if resampler is None:
+                continue
+            for bar in resampler.update(row):
+                analyzed = self.on_closed_candle(symbol, interval, bar) or analyzed
+        return analyzed
+
+    def handle_message(self, message):
+        """
+        處理一則合併串流訊息
+
+        Returns:
+            bool: 是否有 K 線收盤並完成分析
+        """
+        data = message.get("data", message)
+        event_type = data.get("e")
+        if event_type == "24hrMiniTicker":
+            self.tickers[data['s']] = mini_ticker_to_ticker(data)
+            return False
+        if event_type == "kline" and data['k'].get('x'):
+            k = data['k']
+            if self.base_interval:
+                return self.on_base_candle(k['s'], kline_event_to_row(k))
+            return self.on_closed_candle(k['s'], k['i'], kline_event_to_row(k))
+        return False
+
+    def on_closed_candle(self, symbol, interval, row):
+        """收盤 K 線：寫入存儲、更新指標狀態並重新分析"""
+        key = (symbol, interval)
+        if key not in self.states:
+            return False
+
+        new_df = pd.DataFrame([row])
+        self.frames[key] = self.store.merge(self.frames.get(key), new_df)
+        self.store.save(symbol, interval, self.frames[key])
+
+        state = self.states[key]
+        if state.update(row) is None:
+            return False  # 重複或過期的 K 線
+        state.save(state_path(symbol, interval, self.state_dir))
+
+        ticker = self.tickers.get(symbol)
+        if ticker is None:
+            return False
+        try:
+            analysis = analyze_klines(ticker, state.to_frame())
+        except Exception as e:
+            print(f"❌ Error analyzing {symbol} {interval}: {e}")
+            return False
+
+        # 與 analyze_multiple_symbols 相同保存 AnalysisResult，說明文字在寫入報告時才產生
+        self.report.setdefault(symbol, {"symbol": symbol})[interval] = analysis
+        self.write_report()
+
+        print(f"🕯️ {symbol} {interval} 收盤 {row['close']:.4f} → {trend_text(analysis)}")
+        if self.on_update:
+            self.on_update(symbol, interval, analysis)
+        return True
+
+    def write_report(self):
+        """寫入分析報告，只包含所有時間框架皆已分析的幣種"""
+        report = {s: a for s, a in self.report.items() if all(i in a for i in self.intervals)}
+        save_report(report, path=self.report_file)
+
+    def prime_report(self):
+        """以目前狀態建立初始報告，避免需等到每個時間框架都收盤一次"""
+        for (symbol, interval), state in self.states.items():
+            ticker = self.tickers.get(symbol)
+            if ticker is None or not state.history:
+                continue
+            try:
+                analysis = analyze_klines(ticker, state.to_frame())
+            except Exception as e:
+                print(f"❌ Error analyzing {symbol} {interval}: {e}")
+                continue
+            self.report.setdefault(symbol, {"symbol": symbol})[interval] = analysis
+        self.write_report()
+
+    async def run(self, on_batch=None):
+        """
+        連線並持續接收，斷線時以指數退避重連並補齊缺口
+
+        Args:
+            on_batch (callable): 一批收盤 K 線處理完後呼叫 (防抖動)，例如發送訊號
+        """
+        if websockets is None:
+            raise RuntimeError("即時模式需要 websockets 套件: pip install websockets")
+
+        await asyncio.to_thread(self.sync)
+        await asyncio.to_thread(self.prime_report)
+
+        delay = 1
+        pending_batch = None
+        while not self.stopped:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_size=2 ** 22) as ws:
+                    print(f"🔌 已連線 {self.base_url} ({len(self.symbols)} 幣種 × {len(self.intervals)} 時間框架)")
+                    delay = 1
+                    async for raw in ws:
+                        message = json.loads(raw)
+                        data = message.get("data", message)
+                        if data.get("e") == "kline" and data['k'].get('x'):
+                            # 收盤 K 線的寫檔與分析在執行緒中進行，避免阻塞事件迴圈 (心跳與後續訊息)
+                            analyzed = await asyncio.to_thread(self.handle_message, message)
+                        else:
+                            analyzed = self.handle_message(message)
+                        if analyzed and on_batch:
+                            # 同一時間收盤的多根 K 線合併成一次回呼
+                            if pending_batch:
+                                pending_batch.cancel()
+                            pending_batch = asyncio.get_running_loop().call_later(
+                                NOTIFY_DEBOUNCE_SECONDS, lambda: asyncio.ensure_future(asyncio.to_thread(on_batch)))
+                        if self.stopped:
+                            break
+            except (websockets.WebSocketException, OSError, asyncio.TimeoutError) as e:
+                # WebSocketException 涵蓋 ConnectionClosed 與握手失敗 (InvalidStatus、InvalidHandshake、InvalidURI)
+                print(f"⚠️ 連線中斷: {e}，{delay}s 後重連")
+
+            if self.stopped:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            # 補齊斷線期間缺少的 K 線
+            await asyncio.to_thread(self.sync)
+
+    def stop(self):
+        self.stopped = True
+
+def main():
+    parser = argparse.ArgumentParser(description="即時接收 Binance K 線並分析")
+    parser.add_argument("--symbols", nargs="+", default=["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"])
+    parser.add_argument("--intervals", nargs="+", default=["1h", "15m"])
+    parser.add_argument("--url", default=STREAM_BASE_URL, help="WebSocket 伺服器位址")
+    parser.add_argument("--base-interval", help="只訂閱此基礎時間框架，其他時間框架由其聚合 (例如 15m)")
+    parser.add_argument("--notify", action="store_true", help="K 線收盤後執行條件式 Telegram 訊號發送")
+    args = parser.parse_args()
+
+    on_batch = None
+    if args.notify:
+        import send_telegram_conditionally
+
+        def on_batch():
+            started = time.perf_counter()
+            send_telegram_conditionally.main()
+            print(f"📨 訊號檢查耗時 {time.perf_counter() - started:.2f}s")
+
+    ingestor = LiveIngestor(args.symbols, args.intervals, base_url=args.url, base_interval=args.base_interval)
+    print("🚀 啟動即時 K 線接收服務...")
+    try:
+        asyncio.run(ingestor.run(on_batch=on_batch))
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+趨勢判斷參數掃描
+Parameter sweep over AnalysisParams thresholds using the 15m+1h backtest
+
+對參數網格中的每一組 AnalysisParams 執行 backtest.py 的 15m+1h 回測，依指定指標排序後
+寫出結果表。每個交易對的指標、1h 對齊與出場表只在主進程計算一次，再由進程池中的
+每組參數共用，每組參數只需重新套用門檻與串接交易。
+
+用法:
+    python param_sweep.py
+    python param_sweep.py --set tangled_threshold=3,4,5 --set trend_threshold=3,4 --days 180
+    python param_sweep.py --grid grid.json --rank-by profit_factor --save-best data/analysis_params.json
+
+grid.json 格式: {"tangled_threshold": [3, 4, 5], "slope_threshold": [0.15, 0.2]}
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analysis_params import DEFAULT_PARAMS, AnalysisParams
+from backtest import MAX_HOLDING_BARS, precompute_exits, prepare_backtest, run_prepared, summarize
+from kline_store import KlineStore
+
+DEFAULT_SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
+SWEEP_FILE = "data/param_sweep.csv"
+
+# 預設網格：以目前的預設值為中心
+DEFAULT_GRID = {
+    "extreme_convergence": [0.4, 0.5, 0.6],
+    "slope_threshold": [0.15, 0.2, 0.25],
+    "ma20_slope_threshold": [0.2, 0.3, 0.4],
+    "tangled_threshold": [3, 4, 5],
+    "trend_threshold": [3, 4],
+}
+
+RANK_METRICS = ("total_return_pct", "profit_factor", "win_rate", "avg_return_pct", "max_drawdown_pct")
+
+def expand_grid(grid, base=DEFAULT_PARAMS):
+    """
+    將 {參數: [值...]} 展開為 AnalysisParams 列表，未列出的參數沿用 base
+
+    Raises:
+        ValueError: 包含未知的參數名稱
+    """
+    names = list(grid)
+    base_values = base.to_dict()
+    return [AnalysisParams.from_dict({**base_values, **dict(zip(names, values))})
+            for values in itertools.product(*(grid[name] for name in names))]
+
+# 子進程共用的回測資料 (由 _init_worker 設定)
+_prepared = {}
+_options = {}
+
+def _init_worker(prepared, options):
+    global _prepared, _options
+    _prepared = prepared
+    _options = options
+
+def _evaluate(params):
+    """子進程：以一組參數回測所有交易對，返回一列結果"""
+    per_symbol = {}
+    trades = []
+    for symbol, prepared in _prepared.items():
+        symbol_trades, summary = run_prepared(prepared, params, **_options)
+        per_symbol[symbol] = summary
+        trades.append(symbol_trades)
+
+    non_empty = [t for t in trades if len(t)]
+    pooled = summarize(pd.concat(non_empty, ignore_index=True) if non_empty else trades[0])
+    row = params.to_dict()
+    row.update({
+        "trades": pooled["trades"],
+        "win_rate": pooled["win_rate"],
+        "avg_return_pct": pooled["avg_return_pct"],
+        "profit_factor": pooled["profit_factor"],
+        # 報酬取各交易對的平均，回撤取最差的交易對
+        "total_return_pct": sum(s["total_return_pct"] for s in per_symbol.values()) / len(per_symbol),
+        "max_drawdown_pct": max(s["max_drawdown_pct"] for s in per_symbol.values()),
+    })
+    for symbol, summary in per_symbol.items():
+        row[f"{symbol}_return_pct"] = summary["total_return_pct"]
+    return row
+
+def run_sweep(prepared, grid, max_holding=MAX_HOLDING_BARS, fee_rate=0.0, allow_short=True,
+              rank_by="total_return_pct", min_trades=0, max_workers=None):
+    """
+    對參數網格執行回測並排序
+
+    Args:
+        prepared (dict): {symbol: prepare_backtest 的結果}
+        grid (dict): {參數名稱: [值...]}
+        rank_by (str): 排序指標 (max_drawdown_pct 由小到大，其餘由大到小)
+        min_trades (int): 交易數少於此值的組合排在最後
+        max_workers (int): 進程數，預設為 CPU 核心數
+
+    Returns:
+        DataFrame: 依排名排序的結果，第一欄為 rank
+    """
+    if rank_by not in RANK_METRICS:
+        raise ValueError(f"不支援的排序指標: {rank_by} (可選: {', '.join(RANK_METRICS)})")
+    combinations = expand_grid(grid)
+    for symbol_prepared in prepared.values():
+        precompute_exits(symbol_prepared, max_holding)
+    options = {"max_holding": max_holding, "fee_rate": fee_rate, "allow_short": allow_short}
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(combinations))
+    if max_workers <= 1:
+        _init_worker(prepared, options)
+        rows = [_evaluate(params) for params in combinations]
+    else:
+        chunksize = max(1, len(combinations) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(prepared, options)) as executor:
+            rows = list(executor.map(_evaluate, combinations, chunksize=chunksize))
+
+    results = pd.DataFrame(rows)
+    results["_enough"] = results["trades"] >= min_trades
+    results = results.sort_values(["_enough", rank_by], ascending=[False, rank_by == "max_drawdown_pct"],
+                                  kind="stable").drop(columns="_enough").reset_index(drop=True)
+    results.insert(0, "rank", range(1, len(results) + 1))
+    return results
+
+def parse_set(values):
+    """解析 --set name=v1,v2 為網格"""
+    grid = {}
+    for item in values or []:
+        name, _, raw = item.partition("=")
+        if not raw:
+            raise ValueError(f"格式應為 name=v1,v2: {item}")
+        grid[name.strip()] = [float(v) for v in raw.split(",")]
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description="趨勢判斷參數掃描 (15m+1h 回測)")
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--days", type=int, default=365, help="回測最近幾天的數據")
+    parser.add_argument("--grid", help="參數網格 JSON，預設使用 DEFAULT_GRID")
+    parser.add_argument("--set", action="append", metavar="NAME=V1,V2", help="覆寫單一參數的掃描值 (可重複)")
+    parser.add_argument("--rank-by", choices=RANK_METRICS, default="total_return_pct")
+    parser.add_argument("--min-trades", type=int, default=30, help="交易數少於此值的組合排在最後")
+    parser.add_argument("--max-holding", type=int, default=MAX_HOLDING_BARS, help="最長持有的 15m K 線數")
+    parser.add_argument("--fee", type=float, default=0.0, help="單邊手續費率，例如 0.001")
+    parser.add_argument("--long-only", action="store_true", help="只交易明確看多訊號")
+    parser.add_argument("--workers", type=int, help="進程數，預設為 CPU 核心數")
+    parser.add_argument("--output", default=SWEEP_FILE, help="排名結果 CSV")
+    parser.add_argument("--save-best", help="將第一名的參數保存為 JSON (供 ANALYSIS_PARAMS_FILE 使用)")
+    args = parser.parse_args()
+
+    try:
+        if args.grid:
+            with open(args.grid, "r", encoding="utf-8") as f:
+                grid = json.load(f)
+        else:
+            grid = dict(DEFAULT_GRID)
+        grid.update(parse_set(args.set))
+        expand_grid(grid)
+    except (OSError, ValueError) as e:
+        print(f"❌ 參數網格無效: {e}")
+        return 1
+
+    store = KlineStore()
+    prepared = {}
+    for symbol in args.symbols:
+        klines = store.load(symbol, "15m")
+        if klines is None:
+            print(f"⚠️ 找不到 {symbol} 15m K 線，略過")
+            continue
+        start = pd.to_datetime(klines["open_time"]).iloc[-1] - pd.Timedelta(days=args.days)
+        klines = klines[pd.to_datetime(klines["open_time"]) >= start]
+        prepared[symbol] = prepare_backtest(klines)
+    if not prepared:
+        print("❌ 沒有可用的 15m K 線，請先執行 python get_binance_data.py --backfill YYYY-MM-DD --intervals 15m")
+        return 1
+
+    combinations = 1
+    for values in grid.values():
+        combinations *= len(values)
+    print(f"🔍 掃描 {combinations} 組參數 × {len(prepared)} 個交易對...")
+    started = time.perf_counter()
+    results = run_sweep(prepared, grid, max_holding=args.max_holding, fee_rate=args.fee,
+                        allow_short=not args.long_only, rank_by=args.rank_by,
+                        min_trades=args.min_trades, max_workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    print(f"✅ 完成，耗時 {elapsed:.1f}s")
+    columns = ["rank"] + list(grid) + ["trades", "win_rate", "total_return_pct", "max_drawdown_pct", "profit_factor"]
+    print(results[columns].head(10).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"📄 排名結果: {args.output}")
+
+    if args.save_best:
+        best = AnalysisParams.from_dict({name: results.iloc[0][name] for name in DEFAULT_PARAMS.to_dict()})
+        best.save(args.save_best)
+        print(f"📄 最佳參數: {args.save_best} (設定 ANALYSIS_PARAMS_FILE={args.save_best} 以套用)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+單一進程分析流程
+Single-process fetch → analyze → render → notify pipeline
+
+取代 GitHub Actions 中依序執行的 get_binance_data.py、analyze_binance_data.py、
+generate_readme_report.py 與 send_telegram_conditionally.py 四個進程：
+K 線 DataFrame 由 MemoryKlineStore 直接交給分析，分析結果 (AnalysisResult) 直接交給
+README 與 Telegram，不經過 data/ 中的 CSV / JSON 再解析，pandas 也只匯入一次。
+綜合建議直接由 AnalysisResult 分類；說明文字只在 README、Telegram 與 JSON 報告
+實際用到時才產生。
+
+磁碟檔案 (K 線、行情快照、分析報告、README.md) 在產生後交給背景執行緒寫入，
+與後續階段重疊進行，流程結束前等待全部完成。最後輸出各階段耗時。
+
+用法:
+    python pipeline.py
+    python pipeline.py --base-interval 15m --engine process --report-format compact
+    python pipeline.py --no-notify
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from analysis_params import AnalysisParams
+from analyze_binance_data import analyze_multiple_symbols
+from generate_readme_report import generate_readme_content, write_readme
+from get_binance_data import fetch_multiple_symbols, save_ticker_snapshot
+from kline_store import MemoryKlineStore
+from report_store import REPORT_FORMATS, ReportView, save_report
+from signal_engine import SignalSnapshot
+
+DEFAULT_SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
+DEFAULT_INTERVALS = ["1h", "15m"]
+ARTIFACT_WORKERS = 4
+
+class StageTimer:
+    """記錄每個階段的耗時"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def report(self, writes=None):
+        print("\n⏱️ 各階段耗時:")
+        for name, elapsed in self.timings.items():
+            print(f"  {name:<8} {elapsed:7.3f}s")
+        for name, elapsed in (writes or {}).items():
+            print(f"    ↳ {name:<40} {elapsed:7.3f}s")
+        print(f"  {'total':<8} {sum(self.timings.values()):7.3f}s")
+
+class ArtifactWriter:
+    """在背景執行緒寫入檔案，wait() 等待全部完成"""
+
+    def __init__(self, max_workers=ARTIFACT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact")
+        self.futures = {}
+
+    @staticmethod
+    def _timed(func, *args, **kwargs):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        return time.perf_counter() - started
+
+    def submit(self, name, func, *args, **kwargs):
+        self.futures[name] = self.executor.submit(self._timed, func, *args, **kwargs)
+
+    def wait(self):
+        """
+        Returns:
+            tuple: ({名稱: 寫入耗時}, 失敗數)
+        """
+        timings = {}
+        failed = 0
+        for name, future in self.futures.items():
+            try:
+                timings[name] = future.result()
+            except Exception as e:
+                print(f"❌ 寫入 {name} 失敗: {e}")
+                failed += 1
+        self.executor.shutdown()
+        return timings, failed
+
+def run_pipeline(symbols=DEFAULT_SYMBOLS, intervals=DEFAULT_INTERVALS, base_interval=None, engine="pandas",
+                 max_workers=None, params=None, report_format=None, readme_path="README.md", notify=True):
+    """
+    在同一個進程中執行抓取、分析、README 生成與 Telegram 通知
+
+    Args:
+        symbols (list): 交易對列表
+        intervals (list): 時間框架列表
+        base_interval (str): 只抓取此基礎時間框架，其他時間框架由其聚合
+        engine (str): 指標計算引擎 (見 analyze_multiple_symbols)
+        max_workers (int): "process" 引擎的進程數
+        params (AnalysisParams): 趨勢判斷門檻，預設為 current_params()
+        report_format (str): 報告格式 (json / compact)，預設讀取 REPORT_FORMAT 環境變數
+        readme_path (str): README 輸出路徑，None 表示不生成
+        notify (bool): 是否執行條件式 Telegram 發送
+
+    Returns:
+        int: 結束碼，沒有任何交易對的數據或寫入失敗時為 1
+    """
+    timer = StageTimer()
+    writer = ArtifactWriter()
+    store = MemoryKlineStore()
+    exit_code = 0
+
+    try:
+        with timer.stage("fetch"):
+            all_data = fetch_multiple_symbols(symbols, intervals, store=store, base_interval=base_interval,
+                                              save_snapshot=False)
+        if not all_data:
+            print("❌ 沒有成功獲取任何交易對的數據")
+            return 1
+
+        tickers = {symbol: data['ticker'] for symbol, data in all_data.items()}
+        writer.submit("ticker snapshot", save_ticker_snapshot, tickers)
+        for symbol, interval in list(store.frames):
+            writer.submit(store.path(symbol, interval), store.flush, symbol, interval)
+
+        with timer.stage("analyze"):
+            all_analysis = analyze_multiple_symbols(list(all_data), intervals, store=store, engine=engine,
+                                                    max_workers=max_workers, params=params, tickers=tickers)
+        writer.submit("analysis report", save_report, all_analysis, fmt=report_format)
+        # 綜合建議只分類一次，README 與 Telegram 共用；說明文字在讀取幣種時才產生
+        signals = SignalSnapshot(all_analysis)
+        report = ReportView(all_analysis)
+
+        if readme_path:
+            with timer.stage("render"):
+                readme_content = generate_readme_content(report, signals)
+            writer.submit(readme_path, write_readme, readme_content, readme_path)
+
+        if notify:
+            # 匯入時會把 tg/ 加入 sys.path 並讀取 Telegram 設定，只在需要通知時載入
+            import send_telegram_conditionally
+            with timer.stage("notify"):
+                if send_telegram_conditionally.main(report, signals):
+                    exit_code = 1
+    finally:
+        with timer.stage("write"):
+            write_timings, failed = writer.wait()
+        timer.report(write_timings)
+
+    return 1 if failed else exit_code
+
+def main():
+    parser = argparse.ArgumentParser(description="單一進程執行抓取 → 分析 → README → Telegram")
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--intervals", nargs="+", default=DEFAULT_INTERVALS)
+    parser.add_argument("--base-interval", metavar="INTERVAL",
+                        help="只抓取此基礎時間框架，其他時間框架由其聚合 (例如 15m)")
+    parser.add_argument("--engine", choices=["pandas", "batch", "stream", "process", "latest"], default="pandas",
+                        help="指標計算引擎")
+    parser.add_argument("--workers", type=int, help="process 引擎的進程數，預設為 CPU 核心數")
+    parser.add_argument("--params", help="趨勢判斷參數 JSON (例如 param_sweep.py --save-best 的輸出)")
+    parser.add_argument("--report-format", choices=REPORT_FORMATS,
+                        help="報告格式，預設讀取 REPORT_FORMAT 環境變數 (json)")
+    parser.add_argument("--readme", default="README.md", help="README 輸出路徑")
+    parser.add_argument("--no-readme", action="store_true", help="不生成 README")
+    parser.add_argument("--no-notify", action="store_true", help="不執行 Telegram 發送")
+    args = parser.parse_args()
+
+    os.makedirs("data", exist_ok=True)
+    params = AnalysisParams.load(args.params) if args.params else None
+    return run_pipeline(args.symbols, args.intervals, base_interval=args.base_interval, engine=args.engine,
+                        max_workers=args.workers, params=params, report_format=args.report_format,
+                        readme_path=None if args.no_readme else args.readme, notify=not args.no_notify)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+"""
+分析報告存儲
+Compact, de-duplicated storage for multi_investment_report with lazy per-symbol loading
+
+analyze_multiple_symbols 產生的是 AnalysisResult，說明文字只在寫入 JSON 或讀取端存取
+幣種時才產生 (render_symbol / ReportView)。
+
+支援的輸出格式 (以 REPORT_FORMAT 環境變數或 fmt 參數選擇):
+- json:    data/multi_investment_report.json (預設，與舊版相容，只含說明文字，1h 數據另複製到根層級)
+- compact: data/multi_investment_report.snapshot + data/multi_investment_report.npz
+           snapshot 每個幣種一段獨立編碼的資料 (orjson，未安裝時依序改用 msgpack、json)，
+           開頭的索引記錄各段位置，讀取時只解碼被存取的幣種；
+           根層級不再重複 1h 數據，分析結果只保存 typed 數值，說明文字在讀取時才產生。
+           npz 為每個幣種一列的數值欄位表 (價格、漲跌幅、各時間框架的趨勢與關鍵指標)。
+
+load_report() 自動選擇較新的檔案，返回的每個幣種 dict 與舊版 JSON 結構相同
+(包含根層級的 1h 數據)，讀取端不需區分格式；compact 快照的各時間框架另附 typed
+(AnalysisResult)。compact 快照以 mmap 讀取，用完需 close()；open_report() 在離開
+with 區塊時自動關閉。
+"""
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from analysis_format import render_analysis, result_from_report
+from kline_store import INTERVAL_MS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+REPORT_FILE = "data/multi_investment_report.json"
+SNAPSHOT_FILE = "data/multi_investment_report.snapshot"
+TABLE_FILE = "data/multi_investment_report.npz"
+
+REPORT_FORMATS = ("json", "compact")
+SNAPSHOT_VERSION = 1
+
+# 數值表中每個時間框架的欄位 (取自 AnalysisResult)
+TABLE_FIELDS = {
+    "trend": lambda r: int(r.trend),
+    "strong": lambda r: r.strong,
+    "is_tangled": lambda r: r.is_tangled,
+    "bullish_score": lambda r: r.bullish_score,
+    "bearish_score": lambda r: r.bearish_score,
+    "tangled_score": lambda r: r.ma.tangled_score,
+    "convergence_ratio": lambda r: r.ma.convergence_ratio,
+    "close_price": lambda r: r.close_price,
+    "s1": lambda r: r.pivots.s1,
+    "r1": lambda r: r.pivots.r1,
+    "rsi14": lambda r: r.indicators.rsi14,
+    "adx": lambda r: r.indicators.adx,
+    "open_time": lambda r: r.open_time,
+}
+
+# 數值表中每個幣種的欄位 (各時間框架共用的 ticker 數據)
+TICKER_FIELDS = {
+    "current_price": lambda r: r.current_price,
+    "change_24h": lambda r: r.change_24h,
+    "change_1h": lambda r: r.change_1h,
+    "change_4h": lambda r: r.change_4h,
+    "volume_24h": lambda r: r.volume_24h,
+}
+
+def _codec():
+    if orjson is not None:
+        return "orjson"
+    if msgpack is not None:
+        return "msgpack"
+    return "json"
+
+def _encode(codec, value):
+    if codec == "orjson":
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    if codec == "msgpack":
+        return msgpack.packb(value, use_bin_type=True, default=float)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=float).encode("utf-8")
+
+def _decode(codec, data):
+    if codec == "orjson":
+        return orjson.loads(data)
+    if codec == "msgpack":
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+def _intervals(symbol_analysis):
+    return [key for key in symbol_analysis if key in INTERVAL_MS]
+
+def render_symbol(symbol_analysis, typed=False):
+    """
+    產生舊版 JSON 結構的幣種報告：各時間框架的說明文字與 K 線時間 (candle_open_time /
+    candle_close_time)，1h 數據另複製到根層級
+
+    Args:
+        symbol_analysis (dict): {"symbol": ..., interval: AnalysisResult 或分析失敗的預設值}
+        typed (bool): 各時間框架另附 typed (AnalysisResult 物件)，供記憶體中的讀取端使用；
+            寫入 JSON 的報告不附
+
+    Returns:
+        dict
+    """
+    rendered = {"symbol": symbol_analysis.get("symbol")}
+    for interval in _intervals(symbol_analysis):
+        result = result_from_report(symbol_analysis[interval])
+        if result is None:
+            rendered[interval] = symbol_analysis[interval]
+            continue
+        analysis = render_analysis(result)
+        if result.open_time:
+            # 所分析 K 線的時間 (毫秒)：沒有 typed 的 JSON 報告也能判斷是否為同一根 K 線
+            analysis["candle_open_time"] = result.open_time
+            analysis["candle_close_time"] = result.open_time + INTERVAL_MS[interval]
+        if typed:
+            analysis["typed"] = result
+        rendered[interval] = analysis
+    if "1h" in rendered:
+        rendered.update((key, value) for key, value in rendered["1h"].items() if key != "typed")
+    return rendered
+
+def compact_symbol(symbol_analysis):
+    """
+    去除重複的幣種報告：只保留各時間框架，成功的分析只保存 typed 數值
+
+    分析失敗的預設值 (沒有 typed) 原樣保存。
+    """
+    compact = {"symbol": symbol_analysis.get("symbol")}
+    for interval in _intervals(symbol_analysis):
+        result = result_from_report(symbol_analysis[interval])
+        compact[interval] = {"typed": result.to_dict()} if result else symbol_analysis[interval]
+    return compact
+
+def expand_symbol(compact):
+    """compact_symbol 的反向操作：產生說明文字並把 1h 數據複製回根層級 (與舊版 JSON 相同，另附 typed)"""
+    return render_symbol(compact, typed=True)
+
+class ReportView(Mapping):
+    """
+    記憶體中分析結果 (analyze_multiple_symbols 的輸出) 的唯讀 mapping
+
+    幣種在第一次存取時才產生說明文字並快取，結構與 load_report() 的 compact 快照相同。
+    """
+
+    def __init__(self, all_analysis):
+        self.results = all_analysis
+        self._cache = {}
+
+    def __getitem__(self, symbol):
+        if symbol not in self._cache:
+            self._cache[symbol] = render_symbol(self.results[symbol], typed=True)
+        return self._cache[symbol]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+def report_table(all_analysis):
+    """
+    每個幣種一列的數值表
+
+    Returns:
+        DataFrame: symbol、ticker 欄位，以及每個時間框架的 {interval}_{field} 欄位
+            (該時間框架沒有 typed 時為 NaN，trend 為 -1)
+    """
+    rows = []
+    for symbol, symbol_analysis in all_analysis.items():
+        row = {"symbol": symbol}
+        for interval in _intervals(symbol_analysis):
+            result = result_from_report(symbol_analysis[interval])
+            if result is None:
+                row[f"{interval}_trend"] = -1
+                continue
+            for name, getter in TICKER_FIELDS.items():
+                row.setdefault(name, getter(result))
+            for name, getter in TABLE_FIELDS.items():
+                row[f"{interval}_{name}"] = getter(result)
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    for column in table.columns:
+        if column.endswith("_trend"):
+            table[column] = table[column].fillna(-1).astype("int8")
+    return table
+
+def _write_snapshot(path, all_analysis):
+    codec = _codec()
+    blobs = []
+    index = {}
+    offset = 0
+    for symbol, symbol_analysis in all_analysis.items():
+        blob = _encode(codec, compact_symbol(symbol_analysis))
+        index[symbol] = [offset, len(blob)]
+        offset += len(blob)
+        blobs.append(blob)
+    header = json.dumps({"version": SNAPSHOT_VERSION, "codec": codec, "symbols": index},
+                        separators=(",", ":")).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + b"\n")
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+def _write_table(path, table):
+    arrays = {}
+    for column in table.columns:
+        if column == "symbol":
+            arrays[column] = table[column].to_numpy(dtype=str)
+        else:
+            # 部分幣種缺少某時間框架時布林欄位為 object，統一轉為 float (缺值為 NaN)
+            values = table[column].to_numpy()
+            arrays[column] = values.astype(float) if values.dtype == object else values
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def save_report(all_analysis, fmt=None, path=None):
+    """
+    寫入分析報告
+
+    Args:
+        all_analysis (dict): {symbol: {interval: AnalysisResult 或分析失敗的預設值}}
+            (analyze_multiple_symbols 的輸出)；json 格式在寫入時才產生說明文字
+        fmt (str): json 或 compact，預設讀取 REPORT_FORMAT 環境變數
+        path (str): json 報告路徑；compact 格式寫入同名的 .snapshot 與 .npz
+
+    Returns:
+        list: 寫入的檔案路徑
+    """
+    fmt = (fmt or os.getenv("REPORT_FORMAT", "json")).lower()
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"不支援的報告格式: {fmt} (可選: {', '.join(REPORT_FORMATS)})")
+    path = path or REPORT_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == "json":
+        tmp_path = f"{path}.tmp"
+        report = {symbol: render_symbol(symbol_analysis) for symbol, symbol_analysis in all_analysis.items()}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False, default=float)
+        os.replace(tmp_path, path)
+        return [path]
+
+    stem = os.path.splitext(path)[0]
+    snapshot_path, table_path = f"{stem}.snapshot", f"{stem}.npz"
+    _write_snapshot(snapshot_path, all_analysis)
+    _write_table(table_path, report_table(all_analysis))
+    return [snapshot_path, table_path]
+
+class LazyReport(Mapping):
+    """
+    compact 快照的唯讀 mapping：只讀取索引，幣種報告在第一次存取時才解碼並快取
+
+    快照檔以 mmap 開啟，用完以 close() 或 with 區塊釋放；關閉後只能讀取已解碼的幣種。
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            self._base = f.tell()
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"不支援的報告快照版本: {header.get('version')}")
+        self.path = path
+        self.codec = header["codec"]
+        self._index = header["symbols"]
+        self._cache = {}
+
+    def __getitem__(self, symbol):
+        if symbol not in self._cache:
+            offset, length = self._index[symbol]
+            if self._data.closed:
+                raise ValueError(f"報告快照已關閉: {self.path}")
+            start = self._base + offset
+            self._cache[symbol] = expand_symbol(_decode(self.codec, self._data[start:start + length]))
+        return self._cache[symbol]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def closed(self):
+        return self._data.closed
+
+    def close(self):
+        """釋放快照檔的 mmap (可重複呼叫)"""
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_report(path=None):
+    """
+    讀取分析報告
+
+    同時存在 json 與 compact 快照時讀取較新者 (避免切換格式後讀到舊檔)。
+
+    Returns:
+        Mapping: {symbol: 幣種報告}，compact 格式為 LazyReport
+
+    Raises:
+        FileNotFoundError: 兩種格式的報告都不存在
+    """
+    path = path or REPORT_FILE
+    snapshot_path = f"{os.path.splitext(path)[0]}.snapshot"
+    candidates = [p for p in (path, snapshot_path) if os.path.exists(p)]
+    if not candidates:
+        raise FileNotFoundError(path)
+    newest = max(candidates, key=os.path.getmtime)
+    if newest == snapshot_path:
+        return LazyReport(snapshot_path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@contextmanager
+def open_report(path=None):
+    """
+    以 with 區塊讀取分析報告 (見 load_report)，離開時關閉 compact 快照
+
+        with open_report() as report:
+            snapshot = SignalSnapshot(report)
+            ...
+    """
+    report = load_report(path)
+    try:
+        yield report
+    finally:
+        if isinstance(report, LazyReport):
+            report.close()
+
+def load_report_table(path=None):
+    """讀取數值表 (DataFrame)，不解碼任何幣種報告；不存在時返回 None"""
+    path = path or TABLE_FILE
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        return pd.DataFrame({column: arrays[column] for column in arrays.files})
@@ -0,0 +1,149 @@
+"""
+多時間框架重採樣
+Derive higher-timeframe OHLCV bars from one base interval
+
+只抓取一個基礎時間框架 (例如 15m)，其餘時間框架 (1h/4h/1d) 在本地以向量化方式
+聚合，所有時間框架都來自同一份快照。Resampler 則在新的基礎 K 線到來時逐根更新。
+"""
+import numpy as np
+import pandas as pd
+
+from kline_store import INTERVAL_MS, to_millis, to_millis_array
+
+# 聚合方式：first/max/min/last/sum
+AGGREGATIONS = {
+    'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+    'quote_asset_volume': 'sum', 'number_of_trades': 'sum',
+    'taker_buy_base_asset_volume': 'sum', 'taker_buy_quote_asset_volume': 'sum',
+}
+
+def can_resample(base_interval, target_interval):
+    """目標時間框架是否為基礎時間框架的整數倍 (週線從週一開始，無法按 epoch 對齊)"""
+    if target_interval == "1w":
+        return False
+    base_ms = INTERVAL_MS.get(base_interval)
+    target_ms = INTERVAL_MS.get(target_interval)
+    return bool(base_ms and target_ms and target_ms >= base_ms and target_ms % base_ms == 0)
+
+def resample_klines(base_df, target_interval, base_interval):
+    """
+    將基礎 K 線聚合為較大的時間框架
+
+    開頭不完整的 K 線會被捨棄；最後一根可能仍在形成中，與 Binance API
+    回傳未收盤 K 線的行為相同。
+
+    Args:
+        base_df (DataFrame): 基礎時間框架 K 線 (需按 open_time 排序)
+        target_interval (str): 目標時間框架，例如 "1h"
+        base_interval (str): 基礎時間框架，例如 "15m"
+
+    Returns:
+        DataFrame: 與 get_klines 相同欄位的 K 線
+    """
+    if target_interval == base_interval:
+        return base_df.reset_index(drop=True)
+    if not can_resample(base_interval, target_interval):
+        raise ValueError(f"無法由 {base_interval} 重採樣為 {target_interval}")
+
+    target_ms = INTERVAL_MS[target_interval]
+    bars_per_bucket = target_ms // INTERVAL_MS[base_interval]
+
+    open_ms = to_millis_array(base_df['open_time'])
+    buckets = open_ms // target_ms * target_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(buckets)])
+
+    out = {'open_time': buckets[starts]}
+    for column, how in AGGREGATIONS.items():
+        if column not in base_df.columns:
+            continue
+        values = base_df[column].to_numpy()
+        if how == 'first':
+            out[column] = values[starts]
+        elif how == 'last':
+            out[column] = values[starts + counts - 1]
+        elif how == 'max':
+            out[column] = np.maximum.reduceat(values, starts)
+        elif how == 'min':
+            out[column] = np.minimum.reduceat(values, starts)
+        else:
+            out[column] = np.add.reduceat(values, starts)
+
+    result = pd.DataFrame(out)
+    result['close_time'] = pd.to_datetime(result['open_time'] + target_ms - 1, unit='ms')
+    result['open_time'] = pd.to_datetime(result['open_time'], unit='ms')
+    result['ignore'] = 0
+
+    # 捨棄開頭不完整的 K 線
+    if len(result) and counts[0] < bars_per_bucket:
+        result = result.iloc[1:]
+
+    columns = [c for c in base_df.columns if c in result.columns]
+    return result[columns].reset_index(drop=True)
+
+class Resampler:
+    """
+    增量重採樣器
+
+    逐根餵入已收盤的基礎 K 線，目標 K 線完成時返回該 K 線。
+    """
+
+    def __init__(self, target_interval):
+        self.target_interval = target_interval
+        self.target_ms = INTERVAL_MS[target_interval]
+        self.bar = None
+        self.bucket = None
+        self.last_open = None
+
+    def update(self, row):
+        """
+        Args:
+            row (dict): 基礎 K 線 (open_time, open, high, low, close, volume, ...)
+
+        Returns:
+            list: 本次完成的目標 K 線 (0 到 2 根)
+        """
+        open_ms = to_millis(row['open_time'])
+        close_ms = to_millis(row['close_time']) if 'close_time' in row else None
+        if self.last_open is not None and open_ms <= self.last_open:
+            return []  # 重複或過期的 K 線
+        self.last_open = open_ms
+        bucket = open_ms // self.target_ms * self.target_ms
+        completed = []
+
+        if self.bar is not None and bucket != self.bucket:
+            # 基礎 K 線有缺口時，上一根目標 K 線也已結束
+            completed.append(self.bar)
+            self.bar = None
+
+        if self.bar is None:
+            self.bucket = bucket
+            self.bar = {
+                'open_time': pd.to_datetime(bucket, unit='ms'),
+                'close_time': pd.to_datetime(bucket + self.target_ms - 1, unit='ms'),
+                'ignore': 0,
+            }
+            for column, how in AGGREGATIONS.items():
+                if column in row:
+                    self.bar[column] = row[column]
+        else:
+            for column, how in AGGREGATIONS.items():
+                if column not in row:
+                    continue
+                if how == 'max':
+                    self.bar[column] = max(self.bar[column], row[column])
+                elif how == 'min':
+                    self.bar[column] = min(self.bar[column], row[column])
+                elif how == 'last':
+                    self.bar[column] = row[column]
+                elif how == 'sum':
+                    self.bar[column] += row[column]
+
+        if close_ms is not None and close_ms >= bucket + self.target_ms - 1:
+            completed.append(self.bar)
+            self.bar = None
+        return completed
+
+    def current(self):
+        """目前形成中的目標 K 線"""
+        return dict(self.bar) if self.bar else None
@@ -7,14 +7,17 @@ Main execution script for Telegram Bot (from root directory)
 
 import sys
 import os
-import time
 
 # 添加 tg 模組到路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'tg'))
 
 # 直接導入模組
 from telegram_config import config
-from telegram_bot import TelegramBot, load_analysis_data
+from telegram_bot import load_analysis_data
+from telegram_queue import TelegramQueue
+from subscribers import fan_out, load_subscribers
+from signal_state import SignalStateStore
+from signal_engine import Advice, SignalSnapshot
 
 def main():
     """主函數"""
@@ -36,7 +39,7 @@ def main():
     print(f"📊 監控幣種: {', '.join(config.SUPPORTED_SYMBOLS)}")
     
     # 檢查分析數據是否存在
-    analysis_data = load_analysis_data()
+    analysis_data = load_analysis_data(config.SUPPORTED_SYMBOLS)
     if not analysis_data:
         print("❌ 找不到分析數據，請先執行數據分析:")
         print("python get_binance_data.py")
@@ -49,65 +52,38 @@ def main():
     try:
         print("\n🔍 開始檢查交易訊號...")
         
-        # 初始化 Bot
-        bot = TelegramBot(config.BOT_TOKEN, config.CHAT_ID)
+        # 發送佇列 (依每個聊天與全域的速率限制發送) 與訂閱者清單
+        queue = TelegramQueue.from_config(config)
+        subscribers = load_subscribers(config)
+        print(f"👥 訂閱者: {len(subscribers)} 位")
         
         # 先發送市場總覽，並從中獲取訊號判斷結果
         print("\n📊 分析市場訊號...")
         
-        # 使用與 send_market_summary 相同的邏輯來判斷訊號
+        # 綜合建議 (與 send_market_summary、README 共用 signal_engine)
+        signals = SignalSnapshot(analysis_data)
         buy_signals = []
         sell_signals = []
         neutral_signals = []
-        market_signals = {}  # 儲存每個幣種的訊號結果
         
         for symbol, data in analysis_data.items():
             if symbol not in config.SUPPORTED_SYMBOLS:
                 continue
-                
-            trend_15m = "糾結"
-            trend_1h = "糾結"
             
-            # 獲取多時間框架趨勢（與市場總覽邏輯完全相同）
-            if '15m' in data and 'trend_type' in data['15m']:
-                trend_15m = data['15m']['trend_type']
-            if '1h' in data and 'trend_type' in data['1h']:
-                trend_1h = data['1h']['trend_type']
+            symbol_signal = signals[symbol]
+            advice = symbol_signal.advice
+            if symbol_signal.is_buy:
+                buy_signals.append((symbol, data))
+                print(f"✅ {symbol} {advice.label} - 加入買入訊號")
+            elif symbol_signal.is_sell:
+                sell_signals.append((symbol, data))
+                print(f"✅ {symbol} {advice.label} - 加入賣出訊號")
             else:
-                trend_1h = data.get('trend_type', '糾結')
-            
-            # 綜合建議邏輯（與 send_market_summary 完全相同）
-            if trend_15m == trend_1h and "糾結" not in trend_15m:
-                if "多頭" in trend_15m:
-                    signal = "🟢明確看多"
-                    buy_signals.append((symbol, data))
-                    print(f"✅ {symbol} 明確看多 - 加入買入訊號")
-                elif "空頭" in trend_15m:
-                    signal = "🔴明確看空"
-                    sell_signals.append((symbol, data))
-                    print(f"✅ {symbol} 明確看空 - 加入賣出訊號")
-                else:
-                    signal = "📊雙重震盪"
-                    neutral_signals.append((symbol, data))
-                    print(f"❌ {symbol} 雙重震盪 - 不發送訊號")
-            elif "糾結" in trend_15m and "糾結" in trend_1h:
-                signal = "⚪雙重糾結"
                 neutral_signals.append((symbol, data))
-                print(f"❌ {symbol} 雙重糾結 - 不發送訊號")
-            else:
-                # 時框分歧時的具體建議
-                if ("多頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "多頭" in trend_1h):
-                    signal = "🟡謹慎做多"
-                    print(f"❌ {symbol} 謹慎做多 - 僅在總覽顯示，不發送單幣種訊號")
-                elif ("空頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_1h and "空頭" in trend_1h):
-                    signal = "🟡謹慎做空"
-                    print(f"❌ {symbol} 謹慎做空 - 僅在總覽顯示，不發送單幣種訊號")
+                if advice in (Advice.CAUTIOUS_LONG, Advice.CAUTIOUS_SHORT):
+                    print(f"❌ {symbol} {advice.label} - 僅在總覽顯示，不發送單幣種訊號")
                 else:
-                    signal = "⚪觀望等待"
-                    print(f"❌ {symbol} 觀望等待 - 不發送訊號")
-                neutral_signals.append((symbol, data))
-            
-            market_signals[symbol] = signal
+                    print(f"❌ {symbol} {advice.label} - 不發送訊號")
         
         print(f"\n📊 訊號統計:")
         print(f"🟢 買入訊號: {len(buy_signals)} 個")
@@ -117,55 +93,30 @@ def main():
         # 只有在有買入訊號時才發送市場總覽
         if config.SEND_MARKET_SUMMARY and buy_signals:
             print("\n📊 發送市場總覽...")
-            bot.send_market_summary(analysis_data)
         
         # 發送買入訊號
         if config.SEND_BUY_SIGNALS and buy_signals:
             print(f"\n🟢 發送 {len(buy_signals)} 個買入訊號...")
             for symbol, data in buy_signals:
                 print(f"  📤 {symbol} 買入訊號")
-                
-                # 從市場訊號判斷結果獲取正確的 combined_advice
-                signal = market_signals.get(symbol, "明確看多")
-                combined_advice = signal.replace("🟢", "").strip()  # 移除emoji，只保留文字
-                
-                bot.send_buy_signal(
-                    symbol=symbol,
-                    price=data['current_price'],
-                    change_1h=data.get('1h_change_percent', 0),
-                    change_4h=data.get('4h_change_percent', 0),
-                    change_24h=data['24hr_change_percent'],
-                    trend=data['current_trend'],
-                    analysis_data=data,
-                    combined_advice=combined_advice
-                )
-                # 添加發送間隔
-                if config.MESSAGE_INTERVAL > 0:
-                    time.sleep(config.MESSAGE_INTERVAL)
         
         # 發送賣出訊號
         if config.SEND_SELL_SIGNALS and sell_signals:
             print(f"\n🔴 發送 {len(sell_signals)} 個賣出訊號...")
             for symbol, data in sell_signals:
                 print(f"  📤 {symbol} 賣出訊號")
-                
-                # 從市場訊號判斷結果獲取正確的訊號狀態（用於調試）
-                signal = market_signals.get(symbol, "明確看空")
-                print(f"    💡 {symbol} 訊號狀態: {signal}")
-                
-                bot.send_sell_signal(
-                    symbol=symbol,
-                    price=data['current_price'],
-                    change_1h=data.get('1h_change_percent', 0),
-                    change_4h=data.get('4h_change_percent', 0),
-                    change_24h=data['24hr_change_percent'],
-                    trend=data['current_trend'],
-                    analysis_data=data
-                )
-                # 添加發送間隔
-                if config.MESSAGE_INTERVAL > 0:
-                    time.sleep(config.MESSAGE_INTERVAL)
+                print(f"    💡 {symbol} 訊號狀態: {signals[symbol].advice.display}")
         
+        # 每種訊息只渲染一次，排入所有符合條件的訂閱者 (TELEGRAM_EDIT_SUMMARY 時更新上一次的總覽)
+        summary_state = SignalStateStore(config.SIGNAL_STATE_FILE) if config.EDIT_SUMMARY else None
+        fan_out(queue, subscribers, analysis_data, signals,
+                buy_symbols=[symbol for symbol, _ in buy_signals], sell_symbols=[symbol for symbol, _ in sell_signals],
+                send_summary=config.SEND_MARKET_SUMMARY, send_buy=config.SEND_BUY_SIGNALS,
+                send_sell=config.SEND_SELL_SIGNALS, summary_requires_buy=True, coalesce=config.COALESCE_MESSAGES,
+                summary_state=summary_state)
+        queue.deliver()
+        if summary_state is not None:
+            summary_state.save()
         print("\n✅ 所有訊號發送完成！")
         return 0
         
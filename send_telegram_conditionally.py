@@ -7,58 +7,40 @@
 
 import sys
 import os
-import json
 
 # 添加 tg 模組到路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'tg'))
 
 from telegram_config import config
-from telegram_bot import TelegramBot, load_analysis_data
+from telegram_bot import load_analysis_data
+from telegram_queue import TelegramQueue
+from subscribers import fan_out, load_subscribers
+from signal_state import SignalStateStore
+from signal_engine import SignalSnapshot
 
-def check_for_buy_signals(analysis_data):
-    """檢查是否有買入訊號"""
-    buy_signals = []
-    
-    for symbol in config.SUPPORTED_SYMBOLS:
-        if symbol not in analysis_data:
-            continue
-            
-        data = analysis_data[symbol]
-        change_24h = data['24hr_change_percent']
-        trend = data['current_trend']
-        
-        # 判斷是否為買入信號 - 改用綜合建議邏輯
-        trend_15m = "糾結"
-        trend_1h = "糾結"
-        
-        # 獲取多時間框架趨勢
-        if '15m' in data and 'trend_type' in data['15m']:
-            trend_15m = data['15m']['trend_type']
-        if '1h' in data and 'trend_type' in data['1h']:
-            trend_1h = data['1h']['trend_type']
-        else:
-            trend_1h = data.get('trend_type', '糾結')
-        
-        # 判斷是否為買入信號並計算綜合建議
-        is_buy_signal = False
-        combined_advice = ""
-        
-        if trend_15m == trend_1h and trend_15m == "多頭":
-            is_buy_signal = True  # 明確看多 - 雙重看多
-            combined_advice = "明確看多"
-        elif (trend_15m == "多頭" and trend_1h == "糾結") or (trend_15m == "糾結" and trend_1h == "多頭"):
-            combined_advice = "謹慎做多"
-            # 謹慎做多不發送買入信號，只在市場總覽中顯示
-        else:
-            combined_advice = "觀望等待"
-        
-        if is_buy_signal:
-            buy_signals.append((symbol, data, combined_advice))
-    
-    return buy_signals
+def check_for_buy_signals(analysis_data, signals=None):
+    """
+    檢查是否有買入訊號 (綜合建議為明確看多)
+
+    Args:
+        analysis_data (Mapping): 分析報告
+        signals (SignalSnapshot): 已分類的綜合建議，None 時由報告建立
+
+    Returns:
+        list: [(symbol, data, combined_advice)]
+    """
+    signals = signals or SignalSnapshot(analysis_data)
+    symbols = [symbol for symbol in config.SUPPORTED_SYMBOLS if symbol in analysis_data]
+    return [(s.symbol, analysis_data[s.symbol], s.advice.label) for s in signals.buys(symbols)]
 
-def main():
-    """主函數"""
+def main(analysis_data=None, signals=None):
+    """
+    主函數
+
+    Args:
+        analysis_data (Mapping): 已在記憶體中的分析結果 (pipeline.py 傳入)，None 時從報告檔案載入
+        signals (SignalSnapshot): 已分類的綜合建議，None 時由 analysis_data 建立
+    """
     print("🔍 檢查是否有買入訊號需要發送...")
     
     # 檢查配置
@@ -70,45 +52,68 @@ def main():
         return 0
     
     # 載入分析數據
-    analysis_data = load_analysis_data()
+    if analysis_data is None:
+        analysis_data = load_analysis_data(config.SUPPORTED_SYMBOLS)
     if not analysis_data:
         print("❌ 找不到分析數據，跳過 Telegram 發送")
         return 0
     
     # 檢查買入訊號
-    buy_signals = check_for_buy_signals(analysis_data)
+    signals = signals or SignalSnapshot(analysis_data)
+    buy_signals = check_for_buy_signals(analysis_data, signals)
+    
+    # 只發送狀態轉換 (上次執行已通知過的買入訊號不重複發送)
+    # (同一個狀態檔也記錄 TELEGRAM_EDIT_SUMMARY 要編輯的總覽訊息)
+    state = None
+    symbols = [symbol for symbol in config.SUPPORTED_SYMBOLS if symbol in analysis_data]
+    if config.SIGNAL_DEDUP or config.EDIT_SUMMARY:
+        state = SignalStateStore(config.SIGNAL_STATE_FILE, reminder_ttl=config.SIGNAL_REMINDER_HOURS * 3600)
+    if config.SIGNAL_DEDUP:
+        due = state.due(signals, symbols)
+        repeated = [symbol for symbol, _, _ in buy_signals if symbol not in due]
+        if repeated:
+            print(f"🔕 {', '.join(repeated)} 的買入訊號已通知過，不重複發送")
+        buy_signals = [signal for signal in buy_signals if signal[0] in due]
     
     if not buy_signals:
         print("📊 當前沒有買入訊號，不發送 Telegram 訊息")
+        if config.SIGNAL_DEDUP:
+            state.record(signals, symbols)
+            state.save()
         return 0
     
     print(f"🟢 發現 {len(buy_signals)} 個買入訊號，開始發送 Telegram 訊息...")
     
     try:
-        # 初始化 Bot
-        bot = TelegramBot(config.BOT_TOKEN, config.CHAT_ID)
+        # 訊息排入佇列，依速率限制一次發送給所有訂閱者
+        queue = TelegramQueue.from_config(config)
+        subscribers = load_subscribers(config)
         
-        # 發送市場總覽 (只有在有買入訊號時才發送)
+        # 市場總覽只發送給關注的幣種有買入訊號的訂閱者
         if config.SEND_MARKET_SUMMARY:
             print("📊 發送市場總覽...")
-            bot.send_market_summary(analysis_data)
         
         # 只發送買入訊號
         if config.SEND_BUY_SIGNALS:
             print(f"🟢 發送 {len(buy_signals)} 個買入訊號...")
             for symbol, data, combined_advice in buy_signals:
                 print(f"  📤 發送 {symbol} 買入訊號 ({combined_advice})")
-                bot.send_buy_signal(
-                    symbol=symbol,
-                    price=data['current_price'],
-                    change_1h=data.get('1h_change_percent', 0),
-                    change_4h=data.get('4h_change_percent', 0),
-                    change_24h=data['24hr_change_percent'],
-                    trend=data['current_trend'],
-                    analysis_data=data,
-                    combined_advice=combined_advice
-                )
         
+        fan_out(queue, subscribers, analysis_data, signals, buy_symbols=[symbol for symbol, _, _ in buy_signals],
+                send_summary=config.SEND_MARKET_SUMMARY, send_buy=config.SEND_BUY_SIGNALS, summary_requires_buy=True,
+                coalesce=config.COALESCE_MESSAGES, summary_state=state if config.EDIT_SUMMARY else None)
+        deliveries = None
+        try:
+            deliveries = queue.deliver()
+        finally:
+            # 發送中途拋出例外時也保存狀態檔 (已送達的總覽訊息 ID)，但不記錄本次的訊號
+            if config.SIGNAL_DEDUP:
+                if deliveries is not None and all(delivery.ok for delivery in deliveries):
+                    state.record(signals, symbols, notified=[symbol for symbol, _, _ in buy_signals])
+                else:
+                    print("⚠️ 部分訊息發送失敗，不更新訊號狀態 (下次執行重新發送)")
+            if state is not None:
+                state.save()  # 訊號狀態與總覽訊息 ID
         print("✅ Telegram 訊號發送完成！")
         return 0
         
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+多時間框架綜合建議
+Multi-timeframe "綜合建議" classification shared by the README, Telegram bot and workflow
+
+綜合建議只取決於各時間框架中「出現了哪些趨勢」，因此每種趨勢組合 (4 種趨勢的
+位元遮罩，共 16 種) 的建議在匯入時就查表建好，任意數量的時間框架都只需一次查表：
+
+- 所有時間框架趨勢相同且非糾結：明確看多 / 明確看空 / 雙重震盪
+- 全部糾結：雙重糾結
+- 只有多頭與糾結：謹慎做多；只有空頭與糾結：謹慎做空
+- 其他 (多空分歧、震盪混合)：觀望等待
+
+各時間框架的個別信號：多頭為買入、空頭為賣出，其他為觀望 (糾結時趨勢必為糾結)。
+
+SignalSnapshot 包裝一份分析報告，每個幣種在第一次查詢時分類並快取；
+classify_trends() 以 NumPy 一次分類整個觀察清單 (例如 report_store 的數值表)。
+
+用法:
+    python signal_engine.py                  # 列出每個幣種的綜合建議
+    python signal_engine.py --github-output  # 輸出 buy_signals= / strong_buy_signals= (GitHub Actions)
+"""
+from dataclasses import dataclass
+from enum import IntEnum
+
+import numpy as np
+
+from analysis_result import AnalysisResult, Trend
+
+DEFAULT_TIMEFRAMES = ("15m", "1h")
+
+class Advice(IntEnum):
+    """綜合建議"""
+    CLEAR_LONG = 0        # 明確看多 (發送買入訊號)
+    CLEAR_SHORT = 1       # 明確看空 (發送賣出訊號)
+    DOUBLE_RANGING = 2    # 雙重震盪
+    DOUBLE_TANGLED = 3    # 雙重糾結
+    CAUTIOUS_LONG = 4     # 謹慎做多 (只在總覽顯示)
+    CAUTIOUS_SHORT = 5    # 謹慎做空 (只在總覽顯示)
+    WAIT = 6              # 觀望等待
+
+    @property
+    def label(self):
+        return ADVICE_LABELS[self]
+
+    @property
+    def display(self):
+        """附 emoji 的顯示文字，例如 🟢明確看多"""
+        return ADVICE_EMOJI[self] + ADVICE_LABELS[self]
+
+ADVICE_LABELS = {
+    Advice.CLEAR_LONG: "明確看多", Advice.CLEAR_SHORT: "明確看空", Advice.DOUBLE_RANGING: "雙重震盪",
+    Advice.DOUBLE_TANGLED: "雙重糾結", Advice.CAUTIOUS_LONG: "謹慎做多", Advice.CAUTIOUS_SHORT: "謹慎做空",
+    Advice.WAIT: "觀望等待",
+}
+ADVICE_EMOJI = {
+    Advice.CLEAR_LONG: "🟢", Advice.CLEAR_SHORT: "🔴", Advice.DOUBLE_RANGING: "📊", Advice.DOUBLE_TANGLED: "⚪",
+    Advice.CAUTIOUS_LONG: "🟡", Advice.CAUTIOUS_SHORT: "🟡", Advice.WAIT: "⚪",
+}
+
+class Signal(IntEnum):
+    """單一時間框架的信號"""
+    BUY = 0
+    SELL = 1
+    HOLD = 2
+
+    @property
+    def display(self):
+        return SIGNAL_DISPLAY[self]
+
+SIGNAL_DISPLAY = {Signal.BUY: "🟢買入", Signal.SELL: "🔴賣出", Signal.HOLD: "⚪觀望"}
+TREND_DISPLAY = {Trend.BULLISH: "📈多頭", Trend.BEARISH: "📉空頭", Trend.RANGING: "📊震盪", Trend.TANGLED: "🔄糾結"}
+
+def trend_display(trend):
+    return TREND_DISPLAY[trend]
+
+def _bit(trend):
+    return 1 << int(trend)
+
+def _advice_for_mask(mask):
+    """由出現過的趨勢 (位元遮罩) 決定綜合建議"""
+    tangled = _bit(Trend.TANGLED)
+    if mask == _bit(Trend.BULLISH):
+        return Advice.CLEAR_LONG
+    if mask == _bit(Trend.BEARISH):
+        return Advice.CLEAR_SHORT
+    if mask == _bit(Trend.RANGING):
+        return Advice.DOUBLE_RANGING
+    if mask == tangled:
+        return Advice.DOUBLE_TANGLED
+    if mask == _bit(Trend.BULLISH) | tangled:
+        return Advice.CAUTIOUS_LONG
+    if mask == _bit(Trend.BEARISH) | tangled:
+        return Advice.CAUTIOUS_SHORT
+    return Advice.WAIT
+
+# 趨勢遮罩 → 綜合建議 / 趨勢 → 個別信號
+ADVICE_TABLE = np.array([_advice_for_mask(mask) for mask in range(1 << len(Trend))], dtype=np.int8)
+SIGNAL_TABLE = np.array([Signal.BUY if trend == Trend.BULLISH else Signal.SELL if trend == Trend.BEARISH
+                         else Signal.HOLD for trend in Trend], dtype=np.int8)
+
+def classify(trends):
+    """
+    分類一個幣種
+
+    Args:
+        trends (sequence): 各時間框架的 Trend
+
+    Returns:
+        tuple: (Advice, tuple of Signal)
+    """
+    mask = 0
+    for trend in trends:
+        mask |= _bit(trend)
+    return Advice(ADVICE_TABLE[mask]), tuple(Signal(SIGNAL_TABLE[trend]) for trend in trends)
+
+def classify_trends(trends):
+    """
+    向量化分類整個觀察清單
+
+    Args:
+        trends (ndarray): (幣種數, 時間框架數) 的趨勢代碼，缺少數據 (負值) 視為糾結
+
+    Returns:
+        tuple: (advice ndarray[int8], signals ndarray[int8] 與 trends 同形狀)
+    """
+    trends = np.asarray(trends, dtype=np.int8)
+    trends = np.where(trends < 0, int(Trend.TANGLED), trends)
+    masks = np.bitwise_or.reduce(np.left_shift(1, trends.astype(np.int16)), axis=1)
+    return ADVICE_TABLE[masks], SIGNAL_TABLE[trends]
+
+def report_trend(analysis, timeframe):
+    """
+    報告中某時間框架的趨勢
+
+    缺少該時間框架時為糾結；1h 缺少時沿用根層級的趨勢 (舊版報告)。
+    analyze_multiple_symbols 的輸出 (AnalysisResult) 直接讀取趨勢，不需產生說明文字。
+    """
+    frame = analysis.get(timeframe)
+    if isinstance(frame, AnalysisResult):
+        return frame.trend
+    if frame and "trend_type" in frame:
+        return Trend.from_label(frame["trend_type"])
+    if timeframe == "1h":
+        return Trend.from_label(analysis.get("trend_type", "糾結"))
+    return Trend.TANGLED
+
+@dataclass
+class SymbolSignal:
+    """一個幣種的分類結果"""
+    __slots__ = ("symbol", "timeframes", "trends", "signals", "advice")
+    symbol: str
+    timeframes: tuple
+    trends: tuple
+    signals: tuple
+    advice: Advice
+
+    def trend(self, timeframe):
+        return self.trends[self.timeframes.index(timeframe)]
+
+    def signal(self, timeframe):
+        return self.signals[self.timeframes.index(timeframe)]
+
+    @property
+    def is_buy(self):
+        """綜合建議為明確看多 (發送買入訊號)"""
+        return self.advice == Advice.CLEAR_LONG
+
+    @property
+    def is_sell(self):
+        return self.advice == Advice.CLEAR_SHORT
+
+    @property
+    def any_buy(self):
+        """任一時間框架出現買入信號"""
+        return Signal.BUY in self.signals
+
+    @property
+    def all_buy(self):
+        """所有時間框架皆為買入信號 (強烈買入)"""
+        return all(signal == Signal.BUY for signal in self.signals)
+
+class SignalSnapshot:
+    """
+    一份分析報告的綜合建議
+
+    每個幣種在第一次查詢時分類並快取 (LazyReport 只解碼被查詢的幣種)，
+    同一份快照可交給 README、市場總覽與訊號發送共用。
+    """
+
+    def __init__(self, report, timeframes=DEFAULT_TIMEFRAMES):
+        self.report = report
+        self.timeframes = tuple(timeframes)
+        self._cache = {}
+
+    @classmethod
+    def from_table(cls, table, timeframes=DEFAULT_TIMEFRAMES, report=None):
+        """
+        由 report_store 的數值表一次分類所有幣種，不需解碼幣種報告
+
+        Args:
+            table (DataFrame): 含 symbol 與 {timeframe}_trend 欄位
+            report (Mapping): 對應的報告 (供 data 查詢)，可省略
+        """
+        snapshot = cls(report if report is not None else {}, timeframes)
+        trends = np.column_stack([
+            table[f"{tf}_trend"].to_numpy() if f"{tf}_trend" in table else np.full(len(table), -1)
+            for tf in snapshot.timeframes
+        ]) if len(table) else np.empty((0, len(snapshot.timeframes)), dtype=np.int8)
+        advice, signals = classify_trends(trends)
+        trends = np.where(trends < 0, int(Trend.TANGLED), trends)
+        for i, symbol in enumerate(table["symbol"]):
+            snapshot._cache[str(symbol)] = SymbolSignal(
+                str(symbol), snapshot.timeframes, tuple(Trend(t) for t in trends[i]),
+                tuple(Signal(s) for s in signals[i]), Advice(advice[i]))
+        return snapshot
+
+    def __getitem__(self, symbol):
+        if symbol not in self._cache:
+            analysis = self.report[symbol]
+            trends = tuple(report_trend(analysis, tf) for tf in self.timeframes)
+            advice, signals = classify(trends)
+            self._cache[symbol] = SymbolSignal(symbol, self.timeframes, trends, signals, advice)
+        return self._cache[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self._cache or symbol in self.report
+
+    def symbols(self):
+        return list(self._cache) if not self.report else list(self.report)
+
+    def __iter__(self):
+        for symbol in self.symbols():
+            yield self[symbol]
+
+    def select(self, advice, symbols=None):
+        """綜合建議為 advice 的幣種 (依 symbols 或報告順序)"""
+        return [s for s in (self[symbol] for symbol in (symbols or self.symbols())) if s.advice == advice]
+
+    def buys(self, symbols=None):
+        return self.select(Advice.CLEAR_LONG, symbols)
+
+    def sells(self, symbols=None):
+        return self.select(Advice.CLEAR_SHORT, symbols)
+
+def main():
+    import argparse
+
+    from generate_readme_report import get_symbol_name
+    from report_store import open_report
+
+    parser = argparse.ArgumentParser(description="多時間框架綜合建議")
+    parser.add_argument("--timeframes", nargs="+", default=list(DEFAULT_TIMEFRAMES))
+    parser.add_argument("--github-output", action="store_true",
+                        help="輸出 buy_signals= 與 strong_buy_signals= (任一 / 全部時間框架為買入)")
+    args = parser.parse_args()
+
+    try:
+        with open_report() as report:
+            signals = list(SignalSnapshot(report, args.timeframes))
+    except Exception as e:
+        if not args.github_output:
+            print(f"❌ 無法讀取分析報告: {e}")
+            return 1
+        signals = []
+
+    if args.github_output:
+        strong = [get_symbol_name(s.symbol) for s in signals if s.all_buy]
+        buys = [get_symbol_name(s.symbol) for s in signals if s.any_buy and not s.all_buy]
+        print(f"buy_signals={','.join(buys)}")
+        print(f"strong_buy_signals={','.join(strong)}")
+        return 0
+
+    for s in signals:
+        trends = " | ".join(f"{tf}:{trend_display(t)}({sig.display})"
+                            for tf, t, sig in zip(s.timeframes, s.trends, s.signals))
+        print(f"{s.symbol}: {trends} → {s.advice.display}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
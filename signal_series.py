@@ -0,0 +1,169 @@
+"""
+歷史訊號序列
+Vectorised per-bar trend classification over a full kline history
+
+以陣列運算重現 analyze_indicators 的均線糾結評分、多空評分與趨勢判斷，
+一次得到每一根 K 線的結果，供回測與參數研究使用。最後一根的結果與
+analyze_indicators 相同 (糾結時多空評分在 analyze_indicators 中不計算，這裡仍會計算)。
+與參數無關的均線特徵 (ma_features) 只需計算一次，可重複套用不同的
+AnalysisParams (classify_trend)。
+"""
+import numpy as np
+import pandas as pd
+
+from analysis_params import current_params
+from analysis_result import TREND_LABELS, Trend
+from indicator_registry import compute_indicators
+
+# 趨勢代碼即 analysis_result.Trend 的值，trend_type 與 analyze_indicators 的字串相同
+TANGLED, BULLISH, BEARISH, RANGING = (int(trend) for trend in Trend)
+TREND_TYPES = tuple(TREND_LABELS[trend] for trend in Trend)
+
+SLOPE_LAG = 4          # 斜率比較 iloc[-5]，即往回 4 根
+PIVOT_WINDOW = 24      # Fibonacci Pivots 使用最近 24 根 K 線
+
+def _lag(values, periods):
+    out = np.full_like(values, np.nan)
+    out[periods:] = values[:-periods]
+    return out
+
+def ma_features(klines_df):
+    """
+    趨勢判斷用到、且與參數無關的均線特徵 (計算一次即可套用任意參數)
+
+    Args:
+        klines_df (DataFrame): K 線數據 (需有 close，缺少 MA5/MA10/MA20/MA120 時自動計算)
+
+    Returns:
+        dict: close, ma5, ma10, ma20, ma120, convergence_ratio, ma5/10/20_slope, in_range 陣列
+    """
+    needed = [c for c in ("MA5", "MA10", "MA20", "MA120") if c not in klines_df.columns]
+    if needed:
+        klines_df = compute_indicators(klines_df.copy(), needed)
+
+    features = {"close": klines_df["close"].to_numpy(dtype=float)}
+    for column in ("MA5", "MA10", "MA20", "MA120"):
+        features[column.lower()] = klines_df[column].to_numpy(dtype=float)
+    ma5, ma10, ma20 = features["ma5"], features["ma10"], features["ma20"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 均線糾結檢測
+        ma_max = np.maximum(np.maximum(ma5, ma10), ma20)
+        ma_min = np.minimum(np.minimum(ma5, ma10), ma20)
+        features["convergence_ratio"] = (ma_max - ma_min) / ((ma5 + ma10 + ma20) / 3) * 100
+        features["in_range"] = (ma_min <= features["close"]) & (features["close"] <= ma_max)
+
+        for name, ma in (("ma5_slope", ma5), ("ma10_slope", ma10), ("ma20_slope", ma20)):
+            previous = _lag(ma, SLOPE_LAG)
+            slope = (ma - previous) / previous * 100
+            # 不足 5 根時 analyze_indicators 以 0 作為斜率
+            slope[:SLOPE_LAG] = 0.0
+            features[name] = slope
+    return features
+
+def classify_trend(features, params=None):
+    """
+    以 ma_features 的結果套用門檻，計算每根 K 線的糾結評分、多空評分與趨勢
+
+    Args:
+        features (dict): ma_features 的輸出
+        params (AnalysisParams): 門檻，預設為 current_params()
+
+    Returns:
+        dict: tangled_score, is_tangled, bullish_score, bearish_score, trend (TREND_TYPES 的代碼), strong 陣列
+    """
+    params = params or current_params()
+    close = features["close"]
+    ma5, ma10, ma20, ma120 = features["ma5"], features["ma10"], features["ma20"], features["ma120"]
+    convergence = features["convergence_ratio"]
+    slopes = (features["ma5_slope"], features["ma10_slope"], features["ma20_slope"])
+    ma5_slope, ma20_slope = slopes[0], slopes[2]
+
+    with np.errstate(invalid="ignore"):
+        tangled_score = np.where(convergence < params.extreme_convergence, 3,
+                                 np.where(convergence < params.dense_convergence, 2, 0))
+
+        ups = np.zeros(len(close), dtype=bool)
+        downs = np.zeros(len(close), dtype=bool)
+        flat = np.ones(len(close), dtype=bool)
+        for slope in slopes:
+            ups |= slope > params.slope_threshold
+            downs |= slope < -params.slope_threshold
+            flat &= np.abs(slope) < params.flat_slope
+        diverging = ups & downs & (convergence < params.divergence_convergence)
+        tangled_score = tangled_score + np.where(diverging, 2, np.where(flat, 1, 0))
+        tangled_score = tangled_score + ((features["in_range"] & (convergence < params.crossing_convergence)) * 1)
+        is_tangled = tangled_score >= params.tangled_threshold
+
+        # 多空評分
+        bull = (ma5 > ma10).astype(int) + (ma10 > ma20)
+        bear = 2 - bull
+        bull = bull + 2 * (close > ma20) + (ma20_slope > params.ma20_slope_threshold) + (ma5_slope > params.momentum_slope)
+        bear = bear + 2 * (close < ma20) + (ma20_slope < -params.ma20_slope_threshold) + (ma5_slope < -params.momentum_slope)
+
+        trend = np.full(len(close), RANGING, dtype=np.int8)
+        trend[bear >= params.trend_threshold] = BEARISH
+        trend[bull >= params.trend_threshold] = BULLISH
+        trend[is_tangled] = TANGLED
+        strong = ((trend == BULLISH) & (bull >= params.strong_threshold) & (close > ma120)) | \
+                 ((trend == BEARISH) & (bear >= params.strong_threshold) & (close < ma120))
+
+    return {
+        "tangled_score": tangled_score,
+        "is_tangled": is_tangled,
+        "bullish_score": bull,
+        "bearish_score": bear,
+        "trend": trend,
+        "strong": strong,
+    }
+
+def trend_series(klines_df, params=None):
+    """
+    計算每根 K 線的趨勢判斷
+
+    Args:
+        klines_df (DataFrame): K 線數據 (需有 close，缺少 MA5/MA10/MA20/MA120 時自動計算)
+        params (AnalysisParams): 門檻，預設為 current_params()
+
+    Returns:
+        DataFrame: 與 klines_df 同索引，欄位包含 convergence_ratio、ma5/10/20_slope、
+            tangled_score、is_tangled、bullish_score、bearish_score、trend (TREND_TYPES 的代碼)、
+            trend_type (字串)、strong (是否為「強勢」)
+    """
+    features = ma_features(klines_df)
+    result = classify_trend(features, params)
+    return pd.DataFrame({
+        "convergence_ratio": features["convergence_ratio"],
+        "ma5_slope": features["ma5_slope"],
+        "ma10_slope": features["ma10_slope"],
+        "ma20_slope": features["ma20_slope"],
+        "tangled_score": result["tangled_score"],
+        "is_tangled": result["is_tangled"],
+        "bullish_score": result["bullish_score"],
+        "bearish_score": result["bearish_score"],
+        "trend": result["trend"],
+        "trend_type": pd.Categorical.from_codes(result["trend"], TREND_TYPES),
+        "strong": result["strong"],
+    }, index=klines_df.index)
+
+def pivot_series(klines_df, window=PIVOT_WINDOW):
+    """
+    每根 K 線的 Fibonacci Pivots (最近 window 根的高低點與收盤價)
+
+    Returns:
+        DataFrame: PP, R1, R2, R3, S1, S2, S3
+    """
+    high = klines_df["high"].rolling(window=window, min_periods=1).max()
+    low = klines_df["low"].rolling(window=window, min_periods=1).min()
+    close = klines_df["close"]
+    pp = (high + low + close) / 3
+    range_hl = high - low
+    return pd.DataFrame({
+        "PP": pp,
+        "R1": pp + 0.382 * range_hl,
+        "R2": pp + 0.618 * range_hl,
+        "R3": pp + 1.000 * range_hl,
+        "S1": pp - 0.382 * range_hl,
+        "S2": pp - 0.618 * range_hl,
+        "S3": pp - 1.000 * range_hl,
+    }, index=klines_df.index)
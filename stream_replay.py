@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+本地模擬 Binance 合併串流
+Local stand-in for the Binance combined-stream WebSocket
+
+以 websockets.serve 依序重播 kline / miniTicker 事件，格式與 Binance
+/stream?streams=... 相同。可在指定的訊息之後主動斷線，或以 HTTP 503 拒絕前幾次
+握手，用來測試 LiveIngestor 的重連與 REST 補齊；重連後從中斷處繼續重播。
+
+需要額外安裝 websockets 套件: pip install websockets
+
+用法:
+    python stream_replay.py --symbols BTCUSDT --interval 15m --bars 8 --disconnect-every 6
+    python live_stream.py --url ws://localhost:8765 --symbols BTCUSDT --base-interval 15m --intervals 15m 1h
+"""
+import argparse
+import asyncio
+import json
+from http import HTTPStatus
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from kline_store import KlineStore, to_millis
+
+def kline_event(symbol, interval, row, closed=True):
+    """
+    將 K 線資料列轉為合併串流的 kline 事件
+
+    Args:
+        row (dict): get_klines 欄位的資料列 (open_time/close_time 為 datetime)
+        closed (bool): 是否為收盤事件 (k.x)
+    """
+    open_ms = to_millis(row['open_time'])
+    close_ms = to_millis(row['close_time'])
+    return {
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {
+            "e": "kline",
+            "E": close_ms,
+            "s": symbol,
+            "k": {
+                "t": open_ms, "T": close_ms, "s": symbol, "i": interval,
+                "o": str(row['open']), "h": str(row['high']), "l": str(row['low']), "c": str(row['close']),
+                "v": str(row['volume']), "n": int(row.get('number_of_trades', 0)), "x": closed,
+                "q": str(row.get('quote_asset_volume', 0.0)),
+                "V": str(row.get('taker_buy_base_asset_volume', 0.0)),
+                "Q": str(row.get('taker_buy_quote_asset_volume', 0.0)),
+                "B": "0",
+            },
+        },
+    }
+
+def mini_ticker_event(symbol, row):
+    """以 K 線資料列組出 24hrMiniTicker 事件 (開盤價取該 K 線開盤價)"""
+    return {
+        "stream": f"{symbol.lower()}@miniTicker",
+        "data": {
+            "e": "24hrMiniTicker",
+            "E": to_millis(row['close_time']),
+            "s": symbol,
+            "c": str(row['close']), "o": str(row['open']), "h": str(row['high']), "l": str(row['low']),
+            "v": str(row['volume']), "q": str(row.get('quote_asset_volume', 0.0)),
+        },
+    }
+
+def candle_frames(symbol, interval, rows):
+    """每根 K 線依序產生 miniTicker、未收盤 kline、收盤 kline 三則訊息"""
+    frames = []
+    for row in rows:
+        frames.append(mini_ticker_event(symbol, row))
+        frames.append(kline_event(symbol, interval, row, closed=False))
+        frames.append(kline_event(symbol, interval, row, closed=True))
+    return frames
+
+class ReplayServer:
+    """
+    依序重播事件的 WebSocket 伺服器
+
+    用法:
+        async with ReplayServer(frames, disconnect_after={3}) as server:
+            ingestor = LiveIngestor(..., base_url=server.url)
+    """
+
+    def __init__(self, frames, disconnect_after=(), reject_handshakes=0, host="127.0.0.1", port=0):
+        """
+        Args:
+            frames (list): 要送出的訊息 (dict)
+            disconnect_after (iterable): 送出第 N 則訊息後關閉連線 (N 從 1 起算)
+            reject_handshakes (int): 以 HTTP 503 拒絕前幾次握手
+            host (str): 監聽位址
+            port (int): 監聽埠，0 表示自動選擇
+        """
+        self.frames = list(frames)
+        self.disconnect_after = set(disconnect_after)
+        self.reject_handshakes = reject_handshakes
+        self.rejected = 0
+        self.host = host
+        self.port = port
+        self.position = 0
+        self.paths = []
+        self.server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def done(self):
+        return self.position >= len(self.frames)
+
+    def process_request(self, connection, request):
+        """握手前呼叫：前 reject_handshakes 次回應 503 (與交易所維護或負載過高時相同)"""
+        if self.rejected < self.reject_handshakes:
+            self.rejected += 1
+            return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Service Unavailable\n")
+        return None
+
+    async def handler(self, ws):
+        self.paths.append(ws.request.path)
+        while self.position < len(self.frames):
+            await ws.send(json.dumps(self.frames[self.position]))
+            self.position += 1
+            if self.position in self.disconnect_after:
+                await ws.close()
+                return
+        await ws.wait_closed()
+
+    async def start(self):
+        if websockets is None:
+            raise RuntimeError("模擬串流需要 websockets 套件: pip install websockets")
+        self.server = await websockets.serve(self.handler, self.host, self.port, process_request=self.process_request)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+async def serve_forever(server):
+    async with server:
+        print(f"🔌 模擬串流 {server.url} ({len(server.frames)} 則訊息)")
+        await asyncio.Future()
+
+def main():
+    parser = argparse.ArgumentParser(description="以本地 K 線存儲重播 Binance 合併串流")
+    parser.add_argument("--symbols", nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--interval", default="15m", help="重播的 K 線時間框架")
+    parser.add_argument("--bars", type=int, default=8, help="每個幣種重播最後幾根 K 線")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--disconnect-every", type=int, default=0, help="每送出 N 則訊息斷線一次 (0 表示不斷線)")
+    args = parser.parse_args()
+
+    store = KlineStore()
+    frames = []
+    for symbol in args.symbols:
+        df = store.load(symbol, args.interval)
+        if df is None or df.empty:
+            print(f"⚠️ {symbol} {args.interval} 沒有本地 K 線，略過")
+            continue
+        frames.extend(candle_frames(symbol, args.interval, df.tail(args.bars).to_dict('records')))
+
+    disconnect_after = range(args.disconnect_every, len(frames), args.disconnect_every) if args.disconnect_every else ()
+    server = ReplayServer(frames, disconnect_after=disconnect_after, host="localhost", port=args.port)
+    try:
+        asyncio.run(serve_forever(server))
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+
+if __name__ == "__main__":
+    main()
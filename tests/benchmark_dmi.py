@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+DMI/ADX 計算效能比較
+比較原本逐欄建立 DataFrame 的 DMI 算法與 dmi_kernel 的融合核心 (numba / NumPy)
+
+用法:
+    python tests/benchmark_dmi.py
+    python tests/benchmark_dmi.py --bars 5000 --repeat 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dmi_kernel
+
+def legacy_dmi(df):
+    """原本 calculate_technical_indicators 中的 DMI 區塊"""
+    df["TR1"] = df["high"] - df["low"]
+    df["TR2"] = abs(df["high"] - df["close"].shift(1))
+    df["TR3"] = abs(df["low"] - df["close"].shift(1))
+    df["TR"] = df[["TR1", "TR2", "TR3"]].max(axis=1)
+    df["DM_Plus"] = 0.0
+    df["DM_Minus"] = 0.0
+    high_diff = df["high"] - df["high"].shift(1)
+    low_diff = df["low"].shift(1) - df["low"]
+    df.loc[(high_diff > 0) & (high_diff > low_diff), "DM_Plus"] = high_diff
+    df.loc[(low_diff > 0) & (low_diff > high_diff), "DM_Minus"] = low_diff
+    period = 14
+    df["TR14"] = df["TR"].rolling(window=period).sum()
+    df["DM_Plus14"] = df["DM_Plus"].rolling(window=period).sum()
+    df["DM_Minus14"] = df["DM_Minus"].rolling(window=period).sum()
+    df["DI_Plus"] = (df["DM_Plus14"] / df["TR14"]) * 100
+    df["DI_Minus"] = (df["DM_Minus14"] / df["TR14"]) * 100
+    df["DX"] = abs(df["DI_Plus"] - df["DI_Minus"]) / (df["DI_Plus"] + df["DI_Minus"]) * 100
+    df["ADX"] = df["DX"].rolling(window=period).mean()
+    df.drop(["TR1", "TR2", "TR3", "DM_Plus", "DM_Minus", "TR14", "DM_Plus14", "DM_Minus14", "DX"], axis=1, inplace=True)
+    return df
+
+def make_klines(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    return pd.DataFrame({
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+    })
+
+def timed(func, repeat):
+    func()  # 預熱 (numba 編譯)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+def numpy_dmi(high, low, close, smoothing):
+    outputs = dmi_kernel._dmi_numpy(high, low, close, 14, smoothing == "wilder")
+    return dict(zip(("TR", "DM_Plus", "DM_Minus", "DI_Plus", "DI_Minus", "DX", "ADX"), outputs))
+
+def main():
+    parser = argparse.ArgumentParser(description="DMI/ADX 計算效能比較")
+    parser.add_argument("--bars", type=int, default=500, help="每次計算的 K 線數")
+    parser.add_argument("--repeat", type=int, default=200, help="重複次數")
+    args = parser.parse_args()
+
+    df = make_klines(args.bars)
+    high, low, close = (df[c].to_numpy() for c in ("high", "low", "close"))
+    expected = legacy_dmi(df.copy())
+
+    candidates = {"numpy": lambda: numpy_dmi(high, low, close, "sma")}
+    if dmi_kernel.numba is not None:
+        candidates["numba"] = lambda: dmi_kernel.calculate_dmi(high, low, close)
+    else:
+        print("⚠️ numba 未安裝，只比較 NumPy 實作 (pip install numba)")
+
+    print(f"📊 DMI/ADX: {args.bars} 根 K 線 × {args.repeat} 次")
+    baseline = timed(lambda: legacy_dmi(df.copy()), args.repeat)
+    print(f"  legacy pandas : {baseline * 1e3:8.3f} ms")
+    for name, func in candidates.items():
+        result = func()
+        for column in ("TR", "DI_Plus", "DI_Minus", "ADX"):
+            np.testing.assert_allclose(result[column], expected[column].to_numpy(), rtol=1e-9, atol=1e-9,
+                                       err_msg=f"{name} {column}")
+        elapsed = timed(func, args.repeat)
+        print(f"  {name:<14}: {elapsed * 1e3:8.3f} ms  ({baseline / elapsed:.1f}x)")
+
+    # Wilder 平滑：numba 與 NumPy 實作需一致
+    wilder = numpy_dmi(high, low, close, "wilder")
+    if dmi_kernel.numba is not None:
+        jit = dmi_kernel.calculate_dmi(high, low, close, smoothing="wilder")
+        for column in ("DI_Plus", "DI_Minus", "ADX"):
+            np.testing.assert_allclose(jit[column], wilder[column], rtol=1e-9, atol=1e-9,
+                                       err_msg=f"wilder {column}")
+        elapsed = timed(lambda: dmi_kernel.calculate_dmi(high, low, close, smoothing="wilder"), args.repeat)
+        print(f"  numba wilder  : {elapsed * 1e3:8.3f} ms")
+    print(f"✅ 結果一致 (最後 ADX: sma {expected['ADX'].iloc[-1]:.2f}, wilder {wilder['ADX'][-1]:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+pytest 設定：讓測試可以直接匯入專案根目錄與 tg/ 的模組
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Telegram 模組與 send_telegram_conditionally.py 相同，以 tg/ 下的頂層模組匯入
+sys.path.insert(1, os.path.join(ROOT, "tg"))
+
+import json
+import math
+import time
+
+import pytest
+import requests
+
+from kline_store import INTERVAL_MS
+
+class FakeBinance:
+    """
+    以決定性的價格序列模擬 Binance /klines 與 /ticker/24hr
+
+    invalid 中的交易對會讓批次行情請求整個失敗 (與 Binance 回應 400 Invalid symbol 相同)。
+    """
+
+    def __init__(self, symbols=("BTCUSDT", "ETHUSDT"), now_ms=None, fail_after=None):
+        self.symbols = set(symbols)
+        self.now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        self.requests = []
+        self.fail_after = fail_after  # 第幾個 /klines 請求之後開始失敗
+
+    @staticmethod
+    def price(symbol, index):
+        base = 100.0 if symbol.startswith("BTC") else 10.0
+        return base + 5 * math.sin(index / 7) + index * 0.01
+
+    def kline(self, symbol, interval_ms, open_time):
+        index = open_time // interval_ms
+        close = self.price(symbol, index)
+        open_ = self.price(symbol, index - 1)
+        return [open_time, str(open_), str(max(open_, close) + 0.5), str(min(open_, close) - 0.5), str(close),
+                "10.0", open_time + interval_ms - 1, "1000.0", 5, "4.0", "400.0", "0"]
+
+    def klines(self, params):
+        if self.fail_after is not None and sum(p == "/klines" for p, _ in self.requests) > self.fail_after:
+            raise requests.ConnectionError("fake connection reset")
+        symbol = params["symbol"]
+        if symbol not in self.symbols:
+            raise requests.HTTPError("400 Invalid symbol")
+        interval_ms = INTERVAL_MS[params["interval"]]
+        limit = params.get("limit", 500)
+        last_open = self.now_ms // interval_ms * interval_ms
+        end = min(params.get("endTime", last_open), last_open) // interval_ms * interval_ms
+        if "startTime" in params:
+            start = -(-params["startTime"] // interval_ms) * interval_ms
+            times = range(start, min(end, start + (limit - 1) * interval_ms) + 1, interval_ms)
+        else:
+            times = range(end - (limit - 1) * interval_ms, end + 1, interval_ms)
+        return [self.kline(symbol, interval_ms, t) for t in times]
+
+    def ticker(self, symbol):
+        if symbol not in self.symbols:
+            raise requests.HTTPError("400 Invalid symbol")
+        index = self.now_ms // 3_600_000
+        return {"symbol": symbol, "lastPrice": str(self.price(symbol, index)), "priceChangePercent": "1.5",
+                "volume": "1000.0", "quoteVolume": "100000.0"}
+
+    def get(self, path, params=None):
+        params = dict(params or {})
+        self.requests.append((path, params))
+        if path == "/klines":
+            return self.klines(params)
+        if path == "/ticker/24hr":
+            if "symbol" in params:
+                return self.ticker(params["symbol"])
+            symbols = json.loads(params["symbols"]) if "symbols" in params else sorted(self.symbols)
+            return [self.ticker(symbol) for symbol in symbols]
+        raise AssertionError(f"unexpected path {path}")
+
+@pytest.fixture
+def fake_binance(monkeypatch):
+    """以 FakeBinance 取代 get_binance_data.client.get，time.time() 跟隨 fake.now_ms"""
+    import get_binance_data
+
+    fake = FakeBinance()
+    monkeypatch.setattr(get_binance_data.client, "get", fake.get)
+    monkeypatch.setattr(get_binance_data.time, "time", lambda: fake.now_ms / 1000)
+    return fake
+
+def random_ohlcv(bars, seed=0, start="2024-01-01", freq="15min", price=100.0):
+    """隨機漫步的 OHLCV K 線 (open_time 為 datetime)"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.004, bars)) * close
+    return pd.DataFrame({
+        "open_time": pd.date_range(start, periods=bars, freq=freq),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.uniform(10, 100, bars),
+    })
+
+@pytest.fixture
+def make_ohlcv():
+    return random_ohlcv
+
+SAMPLE_SYMBOLS = ("BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT")
+
+@pytest.fixture
+def sample_analysis(tmp_path):
+    """四個幣種 15m / 1h 的 analyze_multiple_symbols 結果 (隨機 K 線)"""
+    from analyze_binance_data import analyze_multiple_symbols
+    from kline_store import KlineStore
+
+    store = KlineStore(str(tmp_path / "sample_klines"))
+    tickers = {}
+    for seed, symbol in enumerate(SAMPLE_SYMBOLS):
+        price = 50000.0 / 10 ** seed
+        for interval, freq in (("1h", "1h"), ("15m", "15min")):
+            df = random_ohlcv(300, seed=seed * 10 + len(interval), freq=freq, price=price)
+            store.save(symbol, interval, df)
+        tickers[symbol] = {"symbol": symbol, "lastPrice": str(df["close"].iloc[-1]), "priceChangePercent": "1.5",
+                           "volume": "1000.0", "quoteVolume": "100000.0"}
+    return analyze_multiple_symbols(list(SAMPLE_SYMBOLS), ["1h", "15m"], store=store, tickers=tickers)
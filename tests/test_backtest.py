@@ -0,0 +1,89 @@
+"""
+訊號序列與回測測試：與逐根呼叫 analyze_klines、逐根模擬交易的結果比對
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyze_binance_data import analyze_klines, calculate_technical_indicators
+from backtest import precompute_exits, prepare_backtest, run_prepared, signal_frame
+from resample import resample_klines
+from signal_series import trend_series
+
+TICKER = {"symbol": "BTCUSDT", "lastPrice": "100.0", "priceChangePercent": "1.5", "volume": "1000.0",
+          "quoteVolume": "100000.0"}
+
+def test_trend_series_matches_analyze_klines_per_bar(make_ohlcv):
+    df = calculate_technical_indicators(make_ohlcv(260, seed=11))
+    series = trend_series(df)
+    for i in range(125, len(df)):
+        result = analyze_klines(TICKER, df.iloc[:i + 1])
+        assert series["trend"].iloc[i] == int(result.trend), i
+        assert bool(series["strong"].iloc[i]) == result.strong, i
+        if not result.is_tangled:
+            assert series["bullish_score"].iloc[i] == result.bullish_score, i
+            assert series["bearish_score"].iloc[i] == result.bearish_score, i
+
+def test_hourly_trend_uses_only_closed_hours(make_ohlcv):
+    klines = make_ohlcv(1600, seed=12)
+    frame = signal_frame(prepare_backtest(klines))
+    hourly = resample_klines(klines, "1h", "15m")
+    hourly_trend = trend_series(hourly)["trend"].to_numpy()
+    hour_close = pd.to_datetime(hourly["open_time"]) + pd.Timedelta(hours=1)
+    for i in range(0, len(frame), 7):
+        closed = np.flatnonzero(hour_close <= frame["close_time"].iloc[i])
+        expected = hourly_trend[closed[-1]] if len(closed) else -1
+        assert frame["trend_1h"].iloc[i] == expected, i
+
+def naive_backtest(frame, max_holding, allow_short=True):
+    """逐根 K 線模擬：有訊號就進場，持倉期間逐根檢查停損 (優先) 與目標"""
+    trades = []
+    n = len(frame)
+    i = 0
+    while i < n - 1:
+        row = frame.iloc[i]
+        side = int(row["signal"]) if allow_short else max(int(row["signal"]), 0)
+        if side == 0 or not (row["S1"] < row["close"] < row["R1"]):
+            i += 1
+            continue
+        stop, target = (row["S1"], row["R1"]) if side > 0 else (row["R1"], row["S1"])
+        last = min(i + max_holding, n - 1)
+        exit_index, exit_price, reason = last, frame["close"].iloc[last], "timeout"
+        for j in range(i + 1, last + 1):
+            high, low = frame["high"].iloc[j], frame["low"].iloc[j]
+            stop_hit = low <= stop if side > 0 else high >= stop
+            target_hit = high >= target if side > 0 else low <= target
+            if stop_hit or target_hit:
+                exit_index, exit_price, reason = j, (stop if stop_hit else target), ("stop" if stop_hit else "target")
+                break
+        gross = exit_price / row["close"] - 1 if side > 0 else row["close"] / exit_price - 1
+        trades.append((i, exit_index, "long" if side > 0 else "short", exit_price, reason, gross * 100))
+        i = exit_index + 1
+    return trades
+
+@pytest.mark.parametrize("max_holding, allow_short", [(24, True), (288, True), (24, False)])
+def test_backtest_matches_naive_loop(make_ohlcv, max_holding, allow_short):
+    klines = make_ohlcv(3000, seed=13)
+    prepared = prepare_backtest(klines)
+    frame = signal_frame(prepared)
+    expected = naive_backtest(frame, max_holding, allow_short)
+    trades, summary = run_prepared(prepared, max_holding=max_holding, allow_short=allow_short)
+
+    assert len(expected) > 5
+    assert summary["trades"] == len(trades) == len(expected)
+    close_time = frame["close_time"]
+    for (entry, exit_index, side, exit_price, reason, return_pct), (_, trade) in zip(expected, trades.iterrows()):
+        assert trade["entry_time"] == close_time.iloc[entry]
+        assert trade["exit_time"] == close_time.iloc[exit_index]
+        assert trade["side"] == side
+        assert trade["reason"] == reason
+        assert trade["bars_held"] == exit_index - entry
+        assert trade["exit_price"] == pytest.approx(exit_price)
+        assert trade["return_pct"] == pytest.approx(return_pct)
+
+def test_precomputed_exits_give_the_same_trades(make_ohlcv):
+    prepared = prepare_backtest(make_ohlcv(2000, seed=14))
+    direct, _ = run_prepared(prepared, max_holding=48)
+    precompute_exits(prepared, 48)
+    cached, _ = run_prepared(prepared, max_holding=48)
+    pd.testing.assert_frame_equal(direct, cached)
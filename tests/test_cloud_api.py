@@ -0,0 +1,57 @@
+"""
+雲端 API (cloud_deployment/api/analyze.py) 測試：?indicators= 的名稱驗證
+"""
+import importlib.util
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+
+import pytest
+
+from conftest import ROOT
+
+@pytest.fixture
+def api(monkeypatch, make_ohlcv):
+    """以本地 HTTPServer 執行 analyze.handler，get_klines 返回隨機 K 線並記錄呼叫"""
+    spec = importlib.util.spec_from_file_location("cloud_analyze", os.path.join(ROOT, "cloud_deployment", "api",
+                                                                                 "analyze.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    calls = []
+    monkeypatch.setattr(module, "get_klines", lambda symbol, interval: calls.append(symbol) or make_ohlcv(200))
+    module.handler.log_message = lambda *args: None
+
+    server = HTTPServer(("127.0.0.1", 0), module.handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(query):
+        url = f"http://127.0.0.1:{server.server_port}/api/analyze?{query}"
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield get, calls
+    server.shutdown()
+    server.server_close()
+
+def test_unknown_indicators_are_a_bad_request(api):
+    get, calls = api
+    status, body = get("symbol=BTCUSDT&indicators=RSI14,EMA999,foo")
+    assert status == 400
+    assert body["unknown"] == ["EMA999", "foo"]
+    assert "EMA999" in body["error"] and "RSI14" in body["available"]
+    assert calls == []  # 驗證失敗時不抓取 K 線
+
+def test_known_indicators_return_latest_values(api):
+    get, calls = api
+    status, body = get("symbol=ETHUSDT&interval=15m&indicators=RSI14,MA20")
+    assert status == 200
+    assert set(body["indicators"]) == {"RSI14", "MA20"}
+    assert all(isinstance(value, float) for value in body["indicators"].values())
+    assert calls == ["ETHUSDT"]
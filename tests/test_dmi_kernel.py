@@ -0,0 +1,118 @@
+"""
+DMI 融合核心測試：sma 與原本的 pandas TR1/TR2/TR3 算法一致、wilder 與逐步參考實作一致，
+numba 與 NumPy 後備實作結果相同
+"""
+import numpy as np
+import pytest
+
+import dmi_kernel
+from benchmark_dmi import legacy_dmi, make_klines
+from dmi_kernel import calculate_dmi
+
+NAMES = ("TR", "DM_Plus", "DM_Minus", "DI_Plus", "DI_Minus", "DX", "ADX")
+
+@pytest.fixture(params=["numba", "numpy"])
+def backend(request, monkeypatch):
+    """numba: JIT 編譯的迴圈；numpy: 未安裝 numba 時的後備實作"""
+    if request.param == "numba":
+        if dmi_kernel.numba is None:
+            pytest.skip("numba 未安裝")
+    else:
+        monkeypatch.setattr(dmi_kernel, "numba", None)
+    return request.param
+
+def wilder_reference(high, low, close, period=14):
+    """逐步計算的 Wilder DMI：TR / DM 以第 1..period 根加總為初始值，ADX 以前 period 個 DX 平均為初始值"""
+    n = len(high)
+    tr = np.full(n, np.nan)
+    plus = np.zeros(n)
+    minus = np.zeros(n)
+    tr[0] = high[0] - low[0]
+    for t in range(1, n):
+        tr[t] = max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1]))
+        up, down = high[t] - high[t - 1], low[t - 1] - low[t]
+        plus[t] = up if up > 0 and up > down else 0.0
+        minus[t] = down if down > 0 and down > up else 0.0
+
+    di_plus, di_minus, dx, adx = (np.full(n, np.nan) for _ in range(4))
+    smoothed = None
+    for t in range(period, n):
+        if smoothed is None:
+            smoothed = [tr[1:period + 1].sum(), plus[1:period + 1].sum(), minus[1:period + 1].sum()]
+        else:
+            smoothed = [s - s / period + x for s, x in zip(smoothed, (tr[t], plus[t], minus[t]))]
+        di_plus[t] = smoothed[1] / smoothed[0] * 100
+        di_minus[t] = smoothed[2] / smoothed[0] * 100
+        dx[t] = abs(di_plus[t] - di_minus[t]) / (di_plus[t] + di_minus[t]) * 100
+
+    first = period + period - 1
+    if first < n:
+        adx[first] = dx[period:first + 1].mean()
+        for t in range(first + 1, n):
+            adx[t] = (adx[t - 1] * (period - 1) + dx[t]) / period
+    return {"TR": tr, "DM_Plus": plus, "DM_Minus": minus, "DI_Plus": di_plus, "DI_Minus": di_minus, "DX": dx,
+            "ADX": adx}
+
+def assert_outputs_close(actual, expected, names=NAMES, rtol=1e-9):
+    for name in names:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=rtol, atol=1e-9, equal_nan=True,
+                                   err_msg=name)
+
+@pytest.mark.parametrize("bars", [10, 27, 500])
+def test_sma_matches_legacy_pandas(backend, bars):
+    df = make_klines(bars, seed=bars)
+    result = calculate_dmi(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+    legacy = legacy_dmi(df.copy())
+
+    assert_outputs_close(result, {name: legacy[name].to_numpy() for name in ("TR", "DI_Plus", "DI_Minus", "ADX")},
+                         names=("TR", "DI_Plus", "DI_Minus", "ADX"))
+    # 原本的 DM 欄位在 legacy_dmi 中被刪除，這裡直接比較定義
+    high_diff = np.diff(df["high"].to_numpy(), prepend=np.nan)
+    low_diff = -np.diff(df["low"].to_numpy(), prepend=np.nan)
+    with np.errstate(invalid="ignore"):
+        np.testing.assert_array_equal(result["DM_Plus"],
+                                      np.where((high_diff > 0) & (high_diff > low_diff), high_diff, 0.0))
+
+@pytest.mark.parametrize("bars", [14, 28, 400])
+def test_wilder_matches_reference(backend, bars):
+    df = make_klines(bars, seed=bars + 1)
+    high, low, close = (df[column].to_numpy() for column in ("high", "low", "close"))
+    result = calculate_dmi(high, low, close, smoothing="wilder")
+    assert_outputs_close(result, wilder_reference(high, low, close))
+    if bars >= 28:
+        assert np.isnan(result["ADX"][26]) and not np.isnan(result["ADX"][27])
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+def test_numba_and_numpy_agree_with_gaps(monkeypatch, smoothing):
+    if dmi_kernel.numba is None:
+        pytest.skip("numba 未安裝")
+    df = make_klines(300, seed=7)
+    high, low, close = (df[column].to_numpy() for column in ("high", "low", "close"))
+    high[120] = low[120] = close[120] = np.nan  # 中間缺一根 K 線
+
+    jit = calculate_dmi(high, low, close, smoothing=smoothing)
+    monkeypatch.setattr(dmi_kernel, "numba", None)
+    fallback = calculate_dmi(high, low, close, smoothing=smoothing)
+    assert_outputs_close(jit, fallback)
+    if smoothing == "sma":
+        # 缺口之後 period 根內的滾動視窗含 NaN
+        assert np.isnan(jit["DI_Plus"][121:134]).all() and not np.isnan(jit["DI_Plus"][135])
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+def test_panel_rows_match_single_symbol(backend, smoothing):
+    frames = [make_klines(200, seed=1), make_klines(150, seed=2)]
+    panel = {column: np.full((2, 200), np.nan) for column in ("high", "low", "close")}
+    for i, df in enumerate(frames):
+        for column in panel:
+            panel[column][i, 200 - len(df):] = df[column].to_numpy()  # 歷史較短的交易對前方補 NaN
+
+    result = calculate_dmi(panel["high"], panel["low"], panel["close"], smoothing=smoothing)
+    for i, df in enumerate(frames):
+        single = calculate_dmi(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(),
+                               smoothing=smoothing)
+        assert np.isnan(result["ADX"][i, :200 - len(df)]).all()
+        assert_outputs_close({name: result[name][i, 200 - len(df):] for name in NAMES}, single)
+
+def test_unknown_smoothing_is_rejected():
+    with pytest.raises(ValueError):
+        calculate_dmi(np.ones(20), np.ones(20), np.ones(20), smoothing="ema")
@@ -68,7 +68,7 @@ def main():
     # 檢查數據文件
     if not check_file_exists("BTCUSDT_klines_1h.csv", "K線數據文件"):
         return False
-    if not check_file_exists("BTCUSDT_ticker_24hr.json", "24小時行情數據文件"):
+    if not check_file_exists("ticker_24hr.json", "24小時行情快照文件"):
         return False
     
     # 步驟 4: 執行技術分析
@@ -93,7 +93,7 @@ def main():
     
     files_to_check = [
         "BTCUSDT_klines_1h.csv",
-        "BTCUSDT_ticker_24hr.json", 
+        "ticker_24hr.json", 
         "investment_report.json",
         "README.md"
     ]
@@ -0,0 +1,224 @@
+"""
+get_binance_data 測試：BinanceClient 的重試與權重同步、WeightBudget 的阻塞與窗口重置、
+fetch_multiple_symbols 批次行情失敗時逐一補抓與單一交易對失敗的隔離
+"""
+import threading
+
+import pytest
+import requests
+
+import get_binance_data
+from get_binance_data import BinanceClient, WeightBudget, fetch_multiple_symbols
+from kline_store import KlineStore
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+class FakeSession:
+    """依序回應 script 中的 FakeResponse，或拋出其中的例外"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, params))
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """記錄 time.sleep 的秒數 (不實際等待)"""
+    recorded = []
+    monkeypatch.setattr(get_binance_data.time, "sleep", recorded.append)
+    return recorded
+
+class FakeClock:
+    """
+    手動推進的時鐘：sleep() 阻塞到 advance() 把時間推過喚醒點為止
+
+    sleepers 記錄正在等待的執行緒數，測試以 wait_for_sleepers() 確認工作執行緒已被預算擋住。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleepers = 0
+        self.condition = threading.Condition()
+
+    def monotonic(self):
+        with self.condition:
+            return self.now
+
+    def sleep(self, seconds):
+        with self.condition:
+            wake_at = self.now + seconds
+            self.sleepers += 1
+            self.condition.notify_all()
+            assert self.condition.wait_for(lambda: self.now >= wake_at, timeout=5), "fake sleep never woke"
+            self.sleepers -= 1
+            self.condition.notify_all()
+
+    def advance(self, seconds):
+        with self.condition:
+            self.now += seconds
+            self.condition.notify_all()
+
+    def wait_for_sleepers(self, count):
+        with self.condition:
+            assert self.condition.wait_for(lambda: self.sleepers == count, timeout=5), \
+                f"expected {count} sleeping workers, got {self.sleepers}"
+
+def make_client(script, **kwargs):
+    client = BinanceClient(base_url="https://api.test", backoff_factor=0.5, **kwargs)
+    client.session = FakeSession(script)
+    return client
+
+def test_invalid_symbol_falls_back_to_per_symbol_tickers(fake_binance, tmp_path):
+    store = KlineStore(data_dir=str(tmp_path))
+    data = fetch_multiple_symbols(["BTCUSDT", "NOPEUSDT", "ETHUSDT"], intervals=["1h"], store=store,
+                                  save_snapshot=False)
+
+    # 批次請求因無效交易對整個失敗，有效的交易對仍逐一取得行情
+    assert sorted(data) == ["BTCUSDT", "ETHUSDT"]
+    assert data["BTCUSDT"]["ticker"]["symbol"] == "BTCUSDT"
+    ticker_requests = [params for path, params in fake_binance.requests if path == "/ticker/24hr"]
+    assert "symbols" in ticker_requests[0]
+    assert sorted(p["symbol"] for p in ticker_requests[1:]) == ["BTCUSDT", "ETHUSDT", "NOPEUSDT"]
+    assert store.load("NOPEUSDT", "1h") is None
+    assert len(store.load("ETHUSDT", "1h")) > 0
+
+def test_batch_tickers_used_when_all_symbols_valid(fake_binance, tmp_path):
+    data = fetch_multiple_symbols(["BTCUSDT", "ETHUSDT"], intervals=["1h"], store=KlineStore(data_dir=str(tmp_path)),
+                                  save_snapshot=False)
+    assert sorted(data) == ["BTCUSDT", "ETHUSDT"]
+    assert sum(path == "/ticker/24hr" for path, _ in fake_binance.requests) == 1
+
+def test_client_retries_with_retry_after_then_backoff(sleeps):
+    budget = WeightBudget(limit_per_minute=6000)
+    client = make_client([
+        FakeResponse(429, headers={"Retry-After": "3", "X-MBX-USED-WEIGHT-1M": "5990"}),
+        FakeResponse(502),
+        FakeResponse(200, [1, 2], headers={"X-MBX-USED-WEIGHT-1M": "12"}),
+    ], weight_budget=budget)
+
+    assert client.get("/klines", {"symbol": "BTCUSDT"}) == [1, 2]
+    # 429 依 Retry-After 等待；502 沒有 Retry-After，以第二次的指數退避 (0.5 * 2) 等待
+    assert sleeps == [3.0, 1.0]
+    assert len(client.session.calls) == 3
+    assert client.session.calls[0] == ("https://api.test/klines", {"symbol": "BTCUSDT"})
+    # 伺服器回報的權重只會往上校正本地計數
+    assert client.used_weight == 12 and budget.used == 5990
+
+@pytest.mark.parametrize("retry_after, expected", [("1000", 300), ("0.25", 0.25), ("Wed, 21 Oct 2015", 0.5), ("", 0.5)])
+def test_retry_after_parsing_and_cap(sleeps, retry_after, expected):
+    client = make_client([FakeResponse(418, headers={"Retry-After": retry_after}), FakeResponse(200, {})])
+    assert client.get("/ticker/24hr") == {}
+    assert sleeps == [expected]
+
+@pytest.mark.parametrize("status", [418, 429, 500, 503, 504])
+def test_retry_status_gives_up_after_max_retries(sleeps, status):
+    client = make_client([FakeResponse(status)] * 3, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        client.get("/klines")
+    assert len(client.session.calls) == 3
+    assert sleeps == [0.5, 1.0]
+
+def test_client_errors_are_not_retried(sleeps):
+    client = make_client([FakeResponse(400, {"code": -1121, "msg": "Invalid symbol."})])
+    with pytest.raises(requests.HTTPError):
+        client.get("/klines")
+    assert len(client.session.calls) == 1 and sleeps == []
+
+def test_connection_errors_are_retried(sleeps):
+    client = make_client([requests.ConnectionError("reset"), requests.Timeout("slow"), FakeResponse(200, [])],
+                         max_backoff=0.75)
+    assert client.get("/klines") == []
+    assert sleeps == [0.5, 0.75]  # 退避受 max_backoff 限制
+
+    client = make_client([requests.ConnectionError("reset")] * 2, max_retries=1)
+    with pytest.raises(requests.ConnectionError):
+        client.get("/klines")
+    assert len(client.session.calls) == 2
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"X-MBX-USED-WEIGHT-1M": "700"}, 700),
+    ({"X-MBX-USED-WEIGHT": "650"}, 650),
+    ({"X-MBX-USED-WEIGHT-1M": "n/a"}, 100),
+    ({}, 100),
+])
+def test_used_weight_header_syncs_budget(sleeps, headers, expected):
+    budget = WeightBudget(limit_per_minute=1000)
+    budget.acquire(100)
+    client = make_client([FakeResponse(200, {}, headers=headers)], weight_budget=budget)
+    client.get("/ticker/24hr")
+    assert budget.used == expected
+
+def test_budget_blocks_workers_until_window_rolls():
+    clock = FakeClock()
+    budget = WeightBudget(limit_per_minute=10, clock=clock.monotonic, sleep=clock.sleep)
+    budget.acquire(10)
+    done = []
+    workers = [threading.Thread(target=lambda i=i: (budget.acquire(4), done.append(i))) for i in range(3)]
+    for worker in workers:
+        worker.start()
+
+    # 預算用完：三個工作執行緒都等待到窗口結束 (t=60)
+    clock.wait_for_sleepers(3)
+    assert done == [] and budget.used == 10
+
+    # 窗口重置後只放行兩個 (4 + 4 <= 10)，第三個等待下一個窗口
+    clock.advance(60)
+    clock.wait_for_sleepers(1)
+    assert len(done) == 2 and budget.used == 8 and budget.window_start == 60
+
+    clock.advance(60)
+    for worker in workers:
+        worker.join(timeout=5)
+    assert sorted(done) == [0, 1, 2] and budget.used == 4 and budget.window_start == 120
+
+def test_budget_wait_only_covers_rest_of_window():
+    clock = FakeClock()
+    waits = []
+    budget = WeightBudget(limit_per_minute=10, clock=clock.monotonic,
+                          sleep=lambda seconds: (waits.append(seconds), clock.advance(seconds)))
+    budget.acquire(6)
+    clock.advance(45)
+    budget.acquire(6)
+    assert waits == [15] and budget.used == 6
+
+@pytest.mark.parametrize("failure", [requests.ConnectionError("reset"), RuntimeError("worker crashed")])
+def test_failed_symbol_does_not_affect_others(fake_binance, monkeypatch, tmp_path, failure):
+    fake_binance.symbols.add("SOLUSDT")
+    real_get = fake_binance.get
+
+    def get(path, params=None):
+        if path == "/klines" and params["symbol"] == "ETHUSDT" and params["interval"] == "15m":
+            raise failure
+        return real_get(path, params)
+
+    monkeypatch.setattr(get_binance_data.client, "get", get)
+    clock = FakeClock()
+    budget = WeightBudget(clock=clock.monotonic, sleep=clock.sleep)
+    store = KlineStore(data_dir=str(tmp_path))
+    data = fetch_multiple_symbols(["BTCUSDT", "ETHUSDT", "SOLUSDT"], intervals=["1h", "15m"], max_workers=4,
+                                  weight_budget=budget, store=store, save_snapshot=False)
+
+    assert sorted(data) == ["BTCUSDT", "SOLUSDT"]
+    assert set(data["SOLUSDT"]) >= {"ticker", "klines_1h", "klines_15m"}
+    # 失敗的交易對整筆略過：另一個時間框架成功也不會寫入存儲
+    assert store.load("ETHUSDT", "1h") is None and store.load("ETHUSDT", "15m") is None
+    assert len(store.load("BTCUSDT", "15m")) > 0
+    # 所有請求都經過注入的預算扣除權重，沒有等待
+    assert budget.used > 0 and clock.sleepers == 0
@@ -0,0 +1,121 @@
+"""
+各指標引擎與 pandas 版 calculate_technical_indicators 的數值一致性
+"""
+import json
+
+import numpy as np
+
+from analysis_result import AnalysisResult
+from analyze_binance_data import (ANALYSIS_TAIL_ROWS, INDICATOR_LOOKBACK, analyze_multiple_symbols,
+                                  calculate_latest_indicators, calculate_technical_indicators, latest_window,
+                                  stream_indicator_frame)
+from indicator_engine import batch_frames
+from indicator_state import IndicatorState, state_path
+from kline_store import KlineStore
+
+def assert_indicators_close(actual, expected, rows=None, rtol=1e-9, atol=1e-9):
+    """比較兩個含指標的 DataFrame (rows 指定只比較最後幾列)"""
+    columns = [c for c in expected.columns if c in actual.columns and c != "open_time"]
+    assert columns
+    for column in columns:
+        a = actual[column].to_numpy(dtype=float)
+        e = expected[column].to_numpy(dtype=float)
+        if rows is not None:
+            a, e = a[-rows:], e[-rows:]
+        np.testing.assert_allclose(a, e, rtol=rtol, atol=atol, equal_nan=True, err_msg=column)
+
+def test_batch_engine_matches_pandas(make_ohlcv):
+    # 歷史長度不同的交易對，面板前方補 NaN
+    frames = {"BTCUSDT": make_ohlcv(400, seed=1), "ETHUSDT": make_ohlcv(300, seed=2, start="2024-01-02", price=10)}
+    results = batch_frames(frames)
+    for symbol, df in frames.items():
+        expected = calculate_technical_indicators(df.copy())
+        assert len(results[symbol]) == len(df)
+        assert_indicators_close(results[symbol], expected)
+
+def test_batch_engine_matches_pandas_when_symbol_has_gap(make_ohlcv):
+    # ETHUSDT 中間缺少三根 K 線 (例如交易所維護)，其他交易對在這些時間點仍有數據
+    eth = make_ohlcv(400, seed=2, price=10)
+    frames = {"BTCUSDT": make_ohlcv(400, seed=1), "ETHUSDT": eth.drop(index=[200, 201, 202]).reset_index(drop=True)}
+    results = batch_frames(frames)
+    for symbol, df in frames.items():
+        expected = calculate_technical_indicators(df.copy())
+        assert len(results[symbol]) == len(df)
+        assert not results[symbol]["MA20"].iloc[200:220].isna().any()  # 缺口沒有變成 NaN 列
+        assert_indicators_close(results[symbol], expected)
+
+def test_stream_state_matches_pandas(make_ohlcv):
+    df = make_ohlcv(300, seed=3)
+    state = IndicatorState("BTCUSDT", "15m")
+    assert state.catch_up(df) == len(df)
+    frame = state.to_frame()
+    expected = calculate_technical_indicators(df.copy()).tail(len(frame))
+    assert_indicators_close(frame, expected.reset_index(drop=True), rtol=1e-7, atol=1e-7)
+
+def test_stream_state_survives_json_round_trip(make_ohlcv, tmp_path):
+    df = make_ohlcv(260, seed=4)
+    state = IndicatorState("BTCUSDT", "15m")
+    state.catch_up(df.iloc[:200])
+    path = state_path("BTCUSDT", "15m", str(tmp_path))
+    state.save(path)
+
+    restored = IndicatorState.load(path)
+    assert restored.catch_up(df) == 60  # 只加入狀態之後的 K 線
+    state.catch_up(df)
+    assert_indicators_close(restored.to_frame(), state.to_frame(), rtol=0, atol=0)
+
+def test_stream_preview_does_not_persist_unclosed_candle(make_ohlcv, tmp_path):
+    df = make_ohlcv(250, seed=5)
+    frame = stream_indicator_frame("BTCUSDT", "15m", df, state_dir=str(tmp_path))
+    saved = IndicatorState.load(state_path("BTCUSDT", "15m", str(tmp_path)))
+    assert saved.last_open_time == df["open_time"].iloc[-2]  # 最後一根只預覽
+    expected = calculate_technical_indicators(df.copy()).tail(len(frame)).reset_index(drop=True)
+    assert_indicators_close(frame, expected, rtol=1e-7, atol=1e-7)
+
+def build_store(tmp_path, make_ohlcv, symbols=("BTCUSDT", "ETHUSDT"), intervals=("1h", "15m")):
+    """在暫存目錄建立含隨機 K 線的存儲與對應的 24hr 行情"""
+    store = KlineStore(str(tmp_path))
+    tickers = {}
+    for seed, symbol in enumerate(symbols):
+        for interval in intervals:
+            freq = "1h" if interval == "1h" else "15min"
+            df = make_ohlcv(300, seed=seed * 10 + len(interval), freq=freq, price=100.0 / (seed + 1))
+            store.save(symbol, interval, df)
+        tickers[symbol] = {"symbol": symbol, "lastPrice": str(df["close"].iloc[-1]), "priceChangePercent": "1.5",
+                           "volume": "1000.0", "quoteVolume": "100000.0"}
+    return store, tickers
+
+def test_process_engine_matches_pandas(make_ohlcv, tmp_path):
+    store, tickers = build_store(tmp_path, make_ohlcv)
+    expected = analyze_multiple_symbols(list(tickers), ["1h", "15m"], store=store, tickers=tickers)
+    actual = analyze_multiple_symbols(list(tickers), ["1h", "15m"], store=store, tickers=tickers,
+                                      engine="process", max_workers=2)
+    assert set(actual) == set(expected) == set(tickers)
+    assert all(isinstance(expected[s][i], AnalysisResult) for s in tickers for i in ("1h", "15m"))
+    # NaN 不等於自身，以 JSON 比較
+    def dump(report):
+        return json.dumps({s: {i: report[s][i].to_dict() for i in ("1h", "15m")} for s in report},
+                          sort_keys=True, default=str)
+    assert dump(actual) == dump(expected)
+
+def test_latest_engine_matches_pandas_on_last_rows(make_ohlcv, capsys):
+    df = make_ohlcv(1200, seed=6)
+    window = latest_window()
+    result = calculate_latest_indicators(df, verify=True)
+    assert len(result) == window < len(df)
+    assert "differ" not in capsys.readouterr().out  # verify 未發現差異
+
+    expected = calculate_technical_indicators(df.copy()).tail(window)
+    atol = float(df["close"].max()) * 1e-6
+    assert_indicators_close(result, expected, rows=INDICATOR_LOOKBACK, rtol=1e-4, atol=atol)
+    # 分析讀取的 K 線範圍 (Pivots 的最後 24 根) 也在窗口內
+    assert window >= ANALYSIS_TAIL_ROWS
+
+def test_latest_engine_analysis_matches_pandas(make_ohlcv, tmp_path):
+    store, tickers = build_store(tmp_path, make_ohlcv)
+    expected = analyze_multiple_symbols(list(tickers), ["1h", "15m"], store=store, tickers=tickers)
+    actual = analyze_multiple_symbols(list(tickers), ["1h", "15m"], store=store, tickers=tickers, engine="latest")
+    for symbol in tickers:
+        for interval in ("1h", "15m"):
+            assert actual[symbol][interval].trend == expected[symbol][interval].trend
+            assert actual[symbol][interval].current_price == expected[symbol][interval].current_price
@@ -0,0 +1,62 @@
+"""
+指標註冊表測試：依賴順序、只計算需要的指標、暖機長度
+"""
+import numpy as np
+import pytest
+
+import indicator_registry
+from indicator_registry import (available_indicators, compute_indicators, dependencies, ewm_warmup, register,
+                                required_warmup)
+
+def test_dependencies_are_ordered_and_shared():
+    assert dependencies(["MACD_Hist"]) == ["EMA12", "EMA26", "DIF", "DEA", "MACD_Hist"]
+    # BB_Middle 與 MA20 共用同一個計算
+    assert dependencies(["MA20", "BB_Upper"]) == ["MA20", "BB_Middle", "BB_StdDev", "BB_Upper"]
+    assert dependencies(["close"]) == []
+
+def test_unknown_indicator_is_a_key_error(make_ohlcv):
+    with pytest.raises(KeyError):
+        dependencies(["EMA999"])
+    with pytest.raises(KeyError):
+        compute_indicators(make_ohlcv(50), ["EMA999"])
+
+def test_duplicate_registration_is_rejected():
+    with pytest.raises(ValueError):
+        register("MA5", inputs=("close",), warmup=5)(lambda close: close)
+
+def test_subset_matches_full_computation_and_skips_unrelated(make_ohlcv, monkeypatch):
+    df = make_ohlcv(300, seed=7)
+    full = compute_indicators(df.copy())
+    assert [c for c in full.columns if c not in df.columns] == available_indicators()
+
+    # 只需要均線與 RSI 時不會計算 DMI
+    def fail(*args, **kwargs):
+        raise AssertionError("DMI should not be computed")
+
+    monkeypatch.setattr(indicator_registry, "calculate_dmi", fail)
+    subset = compute_indicators(df.copy(), ["RSI14", "MA5", "DEA"])
+    # 只寫入要求的欄位，依賴 (EMA12/EMA26/DIF) 不寫入
+    assert [c for c in subset.columns if c not in df.columns] == ["MA5", "DEA", "RSI14"]
+    for column in ("RSI14", "MA5", "DEA"):
+        np.testing.assert_array_equal(subset[column].to_numpy(), full[column].to_numpy())
+
+def test_required_warmup_accumulates_along_dependencies():
+    assert required_warmup(["MA120"]) == 120
+    assert required_warmup(["MA5", "MA120"]) == 120
+    assert required_warmup(["DIF"]) == ewm_warmup(26)
+    assert required_warmup(["MACD_Hist"]) == ewm_warmup(26) + ewm_warmup(9) - 1
+    assert required_warmup(["J"]) == 9 + ewm_warmup(3) + ewm_warmup(3) - 2
+    assert required_warmup([]) == 1
+
+@pytest.mark.parametrize("name", ["MA120", "MACD_Hist", "RSI14", "J", "KC_Position", "ADX"])
+def test_last_value_only_needs_the_warmup_window(make_ohlcv, name):
+    df = make_ohlcv(1500, seed=8)
+    window = required_warmup([name])
+    full = compute_indicators(df.copy(), [name])[name].iloc[-1]
+    tail = compute_indicators(df.tail(window).copy(), [name])[name].iloc[-1]
+    assert np.isfinite(tail)
+    assert tail == pytest.approx(full, rel=1e-4, abs=float(df["close"].max()) * 1e-6)
+
+def test_rolling_indicator_is_nan_below_warmup(make_ohlcv):
+    df = make_ohlcv(119, seed=9)
+    assert np.isnan(compute_indicators(df.copy(), ["MA120"])["MA120"].iloc[-1])
@@ -0,0 +1,169 @@
+"""
+KlineStore 測試：合併去重、增量抓取、回補、各存儲後端
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kline_store import DEFAULT_MAX_ROWS, KlineStore, to_millis
+
+def make_klines(start, count, interval_ms=900_000, close=100.0):
+    open_time = pd.to_datetime([start + i * interval_ms for i in range(count)], unit="ms")
+    return pd.DataFrame({
+        "open_time": open_time,
+        "open": close, "high": close + 1, "low": close - 1, "close": [close + i for i in range(count)],
+        "volume": 1.0,
+        "close_time": open_time + pd.Timedelta(milliseconds=interval_ms - 1),
+    })
+
+def test_merge_overwrites_unclosed_candle_and_sorts(tmp_path):
+    store = KlineStore(str(tmp_path), backend="csv")
+    old = make_klines(0, 5)
+    new = make_klines(4 * 900_000, 3, close=200.0)  # 第一根與最後一根舊 K 線重疊
+    merged = store.merge(old, new)
+    assert len(merged) == 7
+    assert merged["open_time"].is_monotonic_increasing
+    assert merged["close"].iloc[4] == 200.0  # 重疊的 K 線以新數據為準
+
+def test_merge_keeps_max_rows(tmp_path):
+    store = KlineStore(str(tmp_path), max_rows=4, backend="csv")
+    merged = store.merge(make_klines(0, 3), make_klines(3 * 900_000, 3))
+    assert len(merged) == 4
+    assert to_millis(merged["open_time"].iloc[0]) == 2 * 900_000
+
+def test_save_load_round_trip_and_last_open_time(tmp_path):
+    store = KlineStore(str(tmp_path), backend="csv")
+    assert store.load("BTCUSDT", "15m") is None
+    assert store.last_open_time("BTCUSDT", "15m") is None
+    df = make_klines(1_700_000_100_000 // 900_000 * 900_000, 10)
+    store.save("BTCUSDT", "15m", df)
+    loaded = store.load("BTCUSDT", "15m")
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False)
+    assert store.last_open_time("BTCUSDT", "15m") == to_millis(df["open_time"].iloc[-1])
+
+def test_fetch_new_klines_only_requests_missing_bars(tmp_path, fake_binance):
+    from get_binance_data import MIN_HISTORY_BARS, fetch_new_klines
+
+    store = KlineStore(str(tmp_path), backend="csv")
+    first = fetch_new_klines("BTCUSDT", "15m", store)
+    assert len(first) == MIN_HISTORY_BARS
+    store.save("BTCUSDT", "15m", first)
+
+    # 過了三根 K 線後只請求最後一根已存儲的 K 線之後的數據
+    fake_binance.now_ms += 3 * 900_000
+    fake_binance.requests.clear()
+    updated = fetch_new_klines("BTCUSDT", "15m", store)
+    (path, params), = fake_binance.requests
+    assert params["startTime"] == store.last_open_time("BTCUSDT", "15m")
+    assert params["limit"] <= 5
+    assert len(updated) == MIN_HISTORY_BARS + 3
+    assert updated["open_time"].is_unique
+
+def test_backfill_pages_are_contiguous_and_skipped_when_stored(tmp_path, fake_binance):
+    from get_binance_data import backfill_klines
+
+    store = KlineStore(str(tmp_path), backend="csv")
+    end = fake_binance.now_ms // 900_000 * 900_000
+    start = end - 2499 * 900_000
+    df = backfill_klines("BTCUSDT", "15m", start, end, store=store, max_workers=4)
+    assert len(fake_binance.requests) == 3  # 2500 根 = 3 頁
+    assert len(df) == 2500
+    assert (df["open_time"].diff().dropna() == pd.Timedelta(minutes=15)).all()
+    assert len(store.load("BTCUSDT", "15m")) == 2500
+
+    fake_binance.requests.clear()
+    backfill_klines("BTCUSDT", "15m", start, end, store=store)
+    assert fake_binance.requests == []
+
+def test_default_store_caps_incremental_growth(tmp_path):
+    from get_binance_data import MIN_HISTORY_BARS
+
+    store = KlineStore(str(tmp_path), backend="csv")
+    assert store.max_rows == DEFAULT_MAX_ROWS >= 2 * MIN_HISTORY_BARS
+    existing = make_klines(0, DEFAULT_MAX_ROWS)
+    merged = store.merge(existing, make_klines(DEFAULT_MAX_ROWS * 900_000, 3))
+    assert len(merged) == DEFAULT_MAX_ROWS
+    assert to_millis(merged["open_time"].iloc[0]) == 3 * 900_000
+    assert len(KlineStore(str(tmp_path), max_rows=None).merge(existing, make_klines(0, 3))) == DEFAULT_MAX_ROWS
+
+def test_backfill_opts_out_of_cap_and_keeps_history(tmp_path, fake_binance):
+    from get_binance_data import backfill_klines, fetch_new_klines
+
+    store = KlineStore(str(tmp_path), max_rows=300, backend="csv")
+    end = fake_binance.now_ms // 900_000 * 900_000
+    df = backfill_klines("BTCUSDT", "15m", end - 1199 * 900_000, end, store=store)
+    assert len(df) == len(store.load("BTCUSDT", "15m")) == 1200
+
+    # 之後的增量更新維持回補的長度 (滑動窗口)，不會截斷到 max_rows
+    fake_binance.now_ms += 5 * 900_000
+    updated = fetch_new_klines("BTCUSDT", "15m", store)
+    assert len(updated) == 1200
+    assert to_millis(updated["open_time"].iloc[-1]) == end + 5 * 900_000
+
+@pytest.mark.parametrize("backend", ["csv", "parquet", "feather", "npy"])
+def test_backends_round_trip(tmp_path, backend):
+    if backend in ("parquet", "feather"):
+        pytest.importorskip("pyarrow")
+    store = KlineStore(str(tmp_path), backend=backend)
+    df = make_klines(0, 50)
+    store.save("ETHUSDT", "1h", df)
+    loaded = store.load("ETHUSDT", "1h")
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False)
+    arrays = store.load_arrays("ETHUSDT", "1h", ["open_time", "close"])
+    np.testing.assert_array_equal(arrays["close"], df["close"].to_numpy())
+    assert arrays["open_time"][-1] == to_millis(df["open_time"].iloc[-1])
+
+def test_npy_arrays_are_memory_mapped(tmp_path):
+    store = KlineStore(str(tmp_path), backend="npy")
+    store.save("ETHUSDT", "1h", make_klines(0, 10))
+    arrays = store.load_arrays("ETHUSDT", "1h", ["close"])
+    assert isinstance(arrays["close"], np.memmap)
+
+def test_npy_interrupted_write_keeps_previous_version(tmp_path, monkeypatch):
+    store = KlineStore(str(tmp_path), backend="npy")
+    old = make_klines(0, 10)
+    store.save("ETHUSDT", "1h", old)
+
+    real_save = np.save
+    calls = []
+
+    def failing_save(path, array):
+        calls.append(path)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        real_save(path, array)
+
+    monkeypatch.setattr(np, "save", failing_save)
+    with pytest.raises(OSError):
+        store.save("ETHUSDT", "1h", make_klines(900_000 * 100, 20, close=500.0))
+    monkeypatch.undo()
+
+    # 讀到的仍是完整的舊版本，沒有混合新舊欄位
+    pd.testing.assert_frame_equal(store.load("ETHUSDT", "1h"), old, check_dtype=False)
+
+    # 下一次成功寫入後清除中斷留下的檔案
+    new = make_klines(0, 12, close=300.0)
+    store.save("ETHUSDT", "1h", new)
+    pd.testing.assert_frame_equal(store.load("ETHUSDT", "1h"), new, check_dtype=False)
+    path = store.path("ETHUSDT", "1h")
+    assert len([name for name in os.listdir(path) if name.endswith(".npy")]) == len(new.columns)
+
+def test_npy_row_count_mismatch_is_an_error(tmp_path):
+    store = KlineStore(str(tmp_path), backend="npy")
+    store.save("ETHUSDT", "1h", make_klines(0, 10))
+    path = store.path("ETHUSDT", "1h")
+    close_file = next(name for name in os.listdir(path) if name.startswith("close."))
+    np.save(os.path.join(path, close_file), np.zeros(7))
+    with pytest.raises(ValueError):
+        store.load_arrays("ETHUSDT", "1h")
+
+def test_npy_reads_legacy_directories(tmp_path):
+    store = KlineStore(str(tmp_path), backend="npy")
+    path = store.path("ETHUSDT", "1h")
+    os.makedirs(path)
+    np.save(os.path.join(path, "open_time.npy"), np.arange(5, dtype="int64") * 3_600_000)
+    np.save(os.path.join(path, "close.npy"), np.arange(5, dtype="float64"))
+    df = store.load("ETHUSDT", "1h")
+    assert list(df["close"]) == [0, 1, 2, 3, 4]
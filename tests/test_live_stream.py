@@ -0,0 +1,120 @@
+"""
+LiveIngestor 測試：以本地模擬串流驅動接收、重連 (含握手失敗) 與重採樣
+"""
+import asyncio
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("websockets")
+
+from kline_store import KlineStore, to_millis
+from live_stream import LiveIngestor
+from stream_replay import ReplayServer, candle_frames
+
+HOUR = pd.Timestamp("2024-03-01 10:00")
+BAR_MS = 900_000
+
+def fake_row(fake, symbol, open_time):
+    """以 FakeBinance 的 K 線產生 get_klines 欄位的資料列，與 REST 回傳的數值相同"""
+    k = fake.kline(symbol, BAR_MS, to_millis(open_time))
+    return {
+        "open_time": open_time, "open": float(k[1]), "high": float(k[2]), "low": float(k[3]),
+        "close": float(k[4]), "volume": float(k[5]), "close_time": pd.to_datetime(k[6], unit="ms"),
+        "quote_asset_volume": float(k[7]), "number_of_trades": k[8],
+        "taker_buy_base_asset_volume": float(k[9]), "taker_buy_quote_asset_volume": float(k[10]),
+    }
+
+def test_live_ingestor_replay_with_reconnect(fake_binance, tmp_path):
+    symbol = "BTCUSDT"
+    fake_binance.symbols = {symbol}
+    # REST 快照停在 10:20，10:15 的 K 線尚未收盤
+    fake_binance.now_ms = to_millis(HOUR) + 20 * 60_000
+    rows = [fake_row(fake_binance, symbol, HOUR + pd.Timedelta(minutes=m)) for m in (15, 30, 45, 60)]
+    # 10:15 收盤後斷線，重連後繼續 10:30 起的事件
+    frames = candle_frames(symbol, "15m", rows)
+
+    store = KlineStore(data_dir=str(tmp_path / "klines"))
+    report_file = str(tmp_path / "report.json")
+    updates = []
+
+    async def scenario():
+        async with ReplayServer(frames, disconnect_after={3}) as server:
+            ingestor = LiveIngestor([symbol], ["15m", "1h"], store=store, base_url=server.url,
+                                    report_file=report_file, state_dir=str(tmp_path / "state"),
+                                    base_interval="15m")
+
+            def on_update(sym, interval, analysis):
+                updates.append((sym, interval))
+                if interval == "15m":
+                    # 時鐘跟隨串流前進到下一根 K 線
+                    fake_binance.now_ms += BAR_MS
+                    if sum(i == "15m" for _, i in updates) == len(rows):
+                        ingestor.stop()
+
+            ingestor.on_update = on_update
+            await asyncio.wait_for(ingestor.run(), timeout=30)
+            return server, ingestor
+
+    server, ingestor = asyncio.run(scenario())
+
+    assert len(server.paths) == 2
+    assert all("btcusdt@kline_15m" in path and "btcusdt@miniTicker" in path for path in server.paths)
+    assert updates == [(symbol, "15m")] * 3 + [(symbol, "1h"), (symbol, "15m")]
+
+    base = store.load(symbol, "15m").set_index("open_time")
+    for row in rows:
+        assert base.loc[row["open_time"], "close"] == pytest.approx(row["close"])
+
+    hourly = store.load(symbol, "1h").set_index("open_time")
+    bucket = [fake_row(fake_binance, symbol, HOUR + pd.Timedelta(minutes=m)) for m in (0, 15, 30, 45)]
+    bar = hourly.loc[HOUR]
+    assert bar["open"] == pytest.approx(bucket[0]["open"])
+    assert bar["high"] == pytest.approx(max(r["high"] for r in bucket))
+    assert bar["low"] == pytest.approx(min(r["low"] for r in bucket))
+    assert bar["close"] == pytest.approx(bucket[-1]["close"])
+    assert bar["volume"] == pytest.approx(sum(r["volume"] for r in bucket))
+    assert hourly.index[-1] == HOUR
+
+    assert ingestor.states[(symbol, "1h")].last_open_time == HOUR
+    assert ingestor.states[(symbol, "15m")].last_open_time == rows[-1]["open_time"]
+    # miniTicker 會覆蓋 REST 行情
+    assert ingestor.tickers[symbol]["lastPrice"] == str(rows[-1]["close"])
+
+    with open(report_file, encoding="utf-8") as f:
+        report = json.load(f)
+    assert {"15m", "1h"} <= set(report[symbol])
+
+def test_failed_handshake_is_retried_and_analysis_runs_off_loop(fake_binance, tmp_path):
+    symbol = "BTCUSDT"
+    fake_binance.symbols = {symbol}
+    fake_binance.now_ms = to_millis(HOUR) + 20 * 60_000
+    rows = [fake_row(fake_binance, symbol, HOUR + pd.Timedelta(minutes=m)) for m in (15, 30)]
+    updates = []
+
+    async def scenario():
+        async with ReplayServer(candle_frames(symbol, "15m", rows), reject_handshakes=1) as server:
+            ingestor = LiveIngestor([symbol], ["15m"], store=KlineStore(data_dir=str(tmp_path / "klines")),
+                                    base_url=server.url, report_file=str(tmp_path / "report.json"),
+                                    state_dir=str(tmp_path / "state"))
+            loop_thread = threading.current_thread()
+
+            def on_update(sym, interval, analysis):
+                # 寫檔與分析不在事件迴圈的執行緒中進行
+                updates.append(threading.current_thread() is not loop_thread)
+                fake_binance.now_ms += BAR_MS
+                if len(updates) == len(rows):
+                    ingestor.stop()
+
+            ingestor.on_update = on_update
+            await asyncio.wait_for(ingestor.run(), timeout=30)
+            return server
+
+    server = asyncio.run(scenario())
+
+    # 第一次握手回應 503 (InvalidStatus) 後重連成功，收到全部收盤 K 線
+    assert server.rejected == 1
+    assert len(server.paths) == 1
+    assert updates == [True, True]
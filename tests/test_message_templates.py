@@ -0,0 +1,258 @@
+"""
+訊息模板測試：zh-TW 與原本 TelegramBot 的訊息逐字相同、en 使用 typed 數值、只產生 HTML，
+以及 pack_messages 的 4096 UTF-16 上限與 HTML 安全分段
+"""
+import json
+import re
+from datetime import datetime
+
+import pytest
+
+from message_templates import (MESSAGE_LIMIT, SECTION_DIVIDER, TAIPEI_TZ, MessageTemplates, format_price,
+                               get_templates, message_length, pack_messages, symbol_info)
+from report_store import ReportView, render_symbol
+from signal_engine import SignalSnapshot, trend_display
+
+NOW = TAIPEI_TZ.localize(datetime(2024, 5, 1, 8, 30, 0))
+TIME = "2024-05-01 08:30:00"
+
+def legacy_buy_signal(symbol, data, advice):
+    """原本 TelegramBot.format_buy_signal 的輸出"""
+    info = symbol_info(symbol)
+    message = f"""🚀 <b>{info['name']} BUY SIGNAL</b> 🚀
+
+{info['emoji']} <b>{info['name']} ({symbol})</b>
+💰 當前價格: <b>{format_price(data['current_price'])}</b>
+
+📊 <b>價格變化</b>
+• 1小時: <b>{data.get('1h_change_percent', 0):+.2f}%</b>
+• 4小時: <b>{data.get('4h_change_percent', 0):+.2f}%</b>
+
+📈 <b>趨勢分析</b>: {data['current_trend']}
+
+🟢 <b>綜合建議</b>: {advice}
+
+⏰ 訊號時間: {TIME} (台北時間)
+
+"""
+    if "technical_indicators_summary" in data:
+        tech_summary = data["technical_indicators_summary"]
+        message += f"""
+
+📊 <b>技術指標摘要</b>
+• RSI: {tech_summary.get('RSI', 'N/A')}
+• MACD: {tech_summary.get('MACD', 'N/A')}"""
+        if "analysis_result" in data:
+            result = data["analysis_result"]
+            message += f"""
+
+💡 <b>入場建議</b>
+{result.get('入場時機', 'N/A')}
+
+🎯 <b>目標價位</b>
+{result.get('目標價位', 'N/A')}
+
+🛡️ <b>止損設定</b>
+{result.get('止損設定', 'N/A')}"""
+    return message
+
+def legacy_sell_signal(symbol, data):
+    """原本 TelegramBot.format_sell_signal 的輸出"""
+    info = symbol_info(symbol)
+    return f"""🔴 <b>賣出訊號 SELL SIGNAL</b> 🔴
+
+{info['emoji']} <b>{info['name']} ({symbol})</b>
+💰 當前價格: <b>{format_price(data['current_price'])}</b>
+
+📊 <b>價格變化</b>
+• 1小時: <b>{data.get('1h_change_percent', 0):+.2f}%</b>
+• 4小時: <b>{data.get('4h_change_percent', 0):+.2f}%</b>
+
+📉 <b>趨勢分析</b>: {data['current_trend']}
+
+🔴 <b>建議操作</b>: 賣出 (SELL)
+⚠️ <b>風險提醒</b>: 謹慎操作，注意市場變化
+
+⏰ 訊號時間: {TIME} (台北時間)
+
+"""
+
+def legacy_market_summary(analysis_data, signals):
+    """原本 TelegramBot.format_market_summary 的輸出"""
+    message = f"""📊 <b>虛擬幣市場總覽</b> 📊
+
+⏰ 更新時間: {TIME} (台北時間)
+
+"""
+    counts = [0, 0, 0]
+    for symbol in analysis_data:
+        data = analysis_data[symbol]
+        symbol_signal = signals[symbol]
+        counts[0 if symbol_signal.is_buy else 1 if symbol_signal.is_sell else 2] += 1
+        message += (f"<b>{symbol_info(symbol)['name']}</b> | <b>{format_price(data['current_price'])}</b> | "
+                    f"1H:{data.get('1h_change_percent', 0):+.2f}% | 4H:{data.get('4h_change_percent', 0):+.2f}%\n")
+        message += (f"15M:{trend_display(symbol_signal.trend('15m'))}({symbol_signal.signal('15m').display}) | "
+                    f"1H:{trend_display(symbol_signal.trend('1h'))}({symbol_signal.signal('1h').display})\n")
+        message += f"綜合: {symbol_signal.advice.display}\n\n"
+    message += f"""
+📈 <b>信號統計</b>
+🟢 買入信號: {counts[0]} 個
+🔴 賣出信號: {counts[1]} 個  
+⚪ 觀望信號: {counts[2]} 個
+
+"""
+    return message
+
+def json_report(sample_analysis):
+    """JSON 匯出後重新讀取的報告 (沒有 typed)"""
+    return json.loads(json.dumps({symbol: render_symbol(analysis) for symbol, analysis in sample_analysis.items()},
+                                 ensure_ascii=False, default=float))
+
+def assert_html_only(text):
+    """只使用成對的 <b> 標籤，沒有 Markdown 標記"""
+    assert re.findall(r"</?[^>]*>", text) == ["<b>", "</b>"] * text.count("<b>")
+    assert "**" not in text and "`" not in text
+
+@pytest.fixture(params=["view", "json"])
+def report(request, sample_analysis):
+    analysis = ReportView(sample_analysis) if request.param == "view" else json_report(sample_analysis)
+    return analysis, SignalSnapshot(analysis)
+
+def test_zh_tw_matches_legacy_messages(report):
+    analysis, signals = report
+    batch = get_templates("zh-TW").batch(now=NOW)
+    for symbol in analysis:
+        data = analysis[symbol]
+        advice = signals[symbol].advice.label
+        assert batch.signal("buy", symbol, data, signals[symbol]) == legacy_buy_signal(symbol, data, advice)
+        assert batch.signal("sell", symbol, data, signals[symbol]) == legacy_sell_signal(symbol, data)
+    assert batch.market_summary(analysis, signals) == legacy_market_summary(analysis, signals)
+
+def test_english_uses_typed_results(sample_analysis):
+    analysis = ReportView(sample_analysis)
+    signals = SignalSnapshot(analysis)
+    batch = get_templates("en").batch(now=NOW)
+    result = sample_analysis["BTCUSDT"]["1h"]
+
+    buy = batch.signal("buy", "BTCUSDT", analysis["BTCUSDT"], signals["BTCUSDT"])
+    assert "💰 Price: <b>" in buy and "⏰ Signal time: 2024-05-01 08:30:00 (Taipei)" in buy
+    assert f"• RSI: {result.indicators.rsi14:.1f}" in buy and f"R1: {result.pivots.r1:.2f}" in buy
+    assert not re.search(r"[一-鿿]", buy)
+
+    summary = batch.market_summary(analysis, signals, symbols={"ETHUSDT"})
+    assert "Crypto Market Overview" in summary and "<b>ETH</b>" in summary and "<b>BTC</b>" not in summary
+    assert not re.search(r"[一-鿿]", summary)
+
+def test_english_falls_back_to_report_prose(sample_analysis):
+    analysis = json_report(sample_analysis)
+    signals = SignalSnapshot(analysis)
+    buy = get_templates("en").batch(now=NOW).signal("buy", "BTCUSDT", analysis["BTCUSDT"], signals["BTCUSDT"])
+
+    # JSON 報告沒有 typed：沿用中文的趨勢與指標說明，不附入場建議
+    assert f"📈 <b>Trend</b>: {analysis['BTCUSDT']['current_trend']}" in buy
+    assert f"• RSI: {analysis['BTCUSDT']['technical_indicators_summary']['RSI']}" in buy
+    assert "Targets" not in buy
+
+@pytest.mark.parametrize("language", ["zh-TW", "en"])
+def test_messages_are_html_only(report, language):
+    analysis, signals = report
+    batch = get_templates(language).batch(now=NOW)
+    for symbol in analysis:
+        assert_html_only(batch.signal("buy", symbol, analysis[symbol], signals[symbol]))
+        assert_html_only(batch.signal("sell", symbol, analysis[symbol], signals[symbol]))
+    assert_html_only(batch.market_summary(analysis, signals))
+
+def test_templates_are_shared_per_language(capsys):
+    assert get_templates("en") is get_templates("en")
+    assert get_templates(None) is get_templates("zh-TW")
+    assert get_templates("en").compiled("BTCUSDT") is get_templates("en").compiled("BTCUSDT")
+    # 未知的幣種使用預設名稱與圖示
+    assert "⚪ <b>NEWUSDT (NEWUSDT)</b>" in get_templates().compiled("NEWUSDT")["buy"]
+
+    fallback = MessageTemplates("fr")
+    assert fallback.language == "zh-TW"
+    assert "不支援的訊息語言: fr" in capsys.readouterr().out
+
+def test_batch_with_fixed_time():
+    templates = MessageTemplates("zh-TW")
+    assert templates.batch(now=NOW) is not templates.batch(now=NOW)
+    assert templates.batch(now=NOW).time == TIME
+
+def assert_valid_html(text):
+    """標籤成對且沒有被切斷的標籤或實體"""
+    open_tags = []
+    for tag in re.findall(r"<[^<>]*>", text):
+        closing, name = re.match(r"<(/?)(\w+)", tag).groups()
+        if closing:
+            assert open_tags and open_tags.pop() == name, text
+        else:
+            open_tags.append(name)
+    assert open_tags == [], text
+    assert re.sub(r"<[^<>]*>", "", text).count("<") == 0 and ">" not in re.sub(r"<[^<>]*>", "", text)
+    assert not re.search(r"&(?!#?\w+;)", text), text
+
+def strip_html(text):
+    return re.sub(r"<[^<>]*>", "", text)
+
+def test_message_length_counts_utf16_units():
+    assert message_length("abc") == 3
+    assert message_length("台北") == 2
+    assert message_length("🚀₿") == 3  # emoji 佔 2 個單位
+
+def test_short_messages_are_unchanged():
+    sections = [["📊 <b>總覽</b>\n", "<b>BTC</b> | $1.00\n\n"], ["🚀 <b>BUY</b>\n\n"]]
+    assert pack_messages(sections, coalesce=False) == ["".join(pieces) for pieces in sections]
+    assert pack_messages(sections) == ["📊 <b>總覽</b>\n<b>BTC</b> | $1.00" + SECTION_DIVIDER + "🚀 <b>BUY</b>"]
+    assert pack_messages([]) == []
+
+@pytest.mark.parametrize("line", [
+    "<b>" + "🚀" * 5000 + "</b>",  # 單行超過上限，全部是 2 個單位的字元
+    "訊號 <b>" + "台北&amp;" * 1500 + "</b> 結束",
+    "x" * 4095 + "<b>粗體</b>&lt;" + "🟢" * 3000,
+    ("<b>" + "a" * 30 + "</b>&amp;\n") * 400,
+], ids=["emoji", "cjk-entities", "tag-at-cut", "many-lines"])
+def test_long_messages_respect_utf16_limit_and_html(line):
+    messages = pack_messages([[line]], coalesce=False)
+
+    assert len(messages) > 1
+    for message in messages:
+        assert message_length(message) <= MESSAGE_LIMIT
+        assert_valid_html(message)
+    # 去除標籤後內容完整且順序不變
+    assert "".join(strip_html(message) for message in messages) == strip_html(line)
+
+def test_split_never_cuts_inside_tags_with_small_limit():
+    text = "\n".join(f"{i:02d} <b>粗體🚀</b> &amp; <b>{'字' * i}</b>" for i in range(40))
+    for limit in (16, 23, 37, 64):
+        messages = pack_messages([[text]], limit=limit, coalesce=False)
+        assert all(message_length(m) <= limit for m in messages), limit
+        for message in messages:
+            assert_valid_html(message)
+        assert "".join(strip_html(m) for m in messages) == strip_html(text)
+
+def test_coalesced_messages_stay_under_limit():
+    sections = [["🚀 <b>BUY SIGNAL</b>\n" + "台北時間 🟢\n" * (i * 37 % 200)] for i in range(60)]
+    messages = pack_messages(sections)
+
+    assert len(messages) < len(sections)
+    assert all(message_length(m) <= MESSAGE_LIMIT for m in messages)
+    assert sum(m.count("BUY SIGNAL") for m in messages) == len(sections)
+    for message in messages:
+        assert_valid_html(message)
+
+def test_large_market_summary_splits_between_symbols(sample_analysis):
+    base = ReportView(sample_analysis)
+    analysis = {f"C{i:03d}USDT": base[symbol] for i, symbol in enumerate(list(base) * 60)}
+    signals = SignalSnapshot(analysis)
+    parts = get_templates("zh-TW").batch(now=NOW).market_summary_parts(analysis, signals)
+    assert message_length("".join(parts)) > 2 * MESSAGE_LIMIT
+
+    for coalesce in (False, True):
+        messages = pack_messages([parts, ["🚀 <b>BUY</b>\n"]], coalesce=coalesce)
+        assert len(messages) >= 3
+        assert all(message_length(m) <= MESSAGE_LIMIT for m in messages)
+        # 每個幣種的一段完整出現在某一則訊息中
+        for part in parts:
+            assert sum(part.rstrip("\n") in m for m in messages) == 1
+        for message in messages:
+            assert_valid_html(message)
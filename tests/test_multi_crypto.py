@@ -43,13 +43,10 @@ def check_files():
     
     expected_files = [
         "BTCUSDT_klines_1h.csv",
-        "BTCUSDT_ticker_24hr.json",
         "ETHUSDT_klines_1h.csv", 
-        "ETHUSDT_ticker_24hr.json",
         "SOLUSDT_klines_1h.csv",
-        "SOLUSDT_ticker_24hr.json",
         "DOGEUSDT_klines_1h.csv",
-        "DOGEUSDT_ticker_24hr.json",
+        "ticker_24hr.json",
         "multi_investment_report.json",
         "README.md"
     ]
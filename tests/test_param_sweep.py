@@ -0,0 +1,53 @@
+"""
+分析參數與參數掃描測試：參數驗證、進程池與單進程結果一致
+"""
+import pandas as pd
+import pytest
+
+from analysis_params import DEFAULT_PARAMS, AnalysisParams
+from backtest import prepare_backtest
+from param_sweep import expand_grid, parse_set, run_sweep
+
+def test_from_dict_converts_integral_values():
+    params = AnalysisParams.from_dict({"tangled_threshold": 3.0, "slope_threshold": "0.25"})
+    assert params.tangled_threshold == 3 and isinstance(params.tangled_threshold, int)
+    assert params.slope_threshold == 0.25
+    assert params.trend_threshold == DEFAULT_PARAMS.trend_threshold
+
+@pytest.mark.parametrize("values, field", [
+    ({"tangled_threshold": 3.5}, "tangled_threshold"),
+    ({"trend_threshold": "abc"}, "trend_threshold"),
+    ({"slope_threshold": None}, "slope_threshold"),
+    ({"no_such_param": 1}, "no_such_param"),
+])
+def test_from_dict_rejects_invalid_values(values, field):
+    with pytest.raises(ValueError, match=field):
+        AnalysisParams.from_dict(values)
+
+def test_json_round_trip(tmp_path):
+    params = DEFAULT_PARAMS.replace(tangled_threshold=5, slope_threshold=0.15)
+    path = str(tmp_path / "params.json")
+    params.save(path)
+    assert AnalysisParams.load(path) == params
+
+def test_expand_grid_and_parse_set():
+    grid = parse_set(["tangled_threshold=3,4", "slope_threshold=0.15,0.2"])
+    combinations = expand_grid(grid)
+    assert len(combinations) == 4
+    assert {(p.tangled_threshold, p.slope_threshold) for p in combinations} == {(3, 0.15), (3, 0.2), (4, 0.15), (4, 0.2)}
+    with pytest.raises(ValueError, match="tangled_threshold"):
+        expand_grid({"tangled_threshold": [3.5]})
+
+def test_process_pool_matches_serial_sweep(make_ohlcv):
+    prepared = {
+        "BTCUSDT": prepare_backtest(make_ohlcv(2500, seed=21)),
+        "ETHUSDT": prepare_backtest(make_ohlcv(2500, seed=22, price=10.0)),
+    }
+    grid = {"tangled_threshold": [3, 4, 5], "trend_threshold": [3, 4]}
+    serial = run_sweep(prepared, grid, max_holding=48, max_workers=1)
+    pooled = run_sweep(prepared, grid, max_holding=48, max_workers=2)
+
+    assert len(serial) == 6
+    assert serial["trades"].sum() > 0
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert serial["total_return_pct"].is_monotonic_decreasing
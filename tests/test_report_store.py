@@ -0,0 +1,166 @@
+"""
+分析報告存儲測試：JSON 匯出、記憶體中的 ReportView 與 compact 快照
+"""
+import json
+
+import pytest
+
+from analysis_format import render_analysis
+from analysis_result import AnalysisResult
+from analyze_binance_data import analyze_multiple_symbols
+from kline_store import KlineStore
+from report_store import LazyReport, ReportView, load_report, render_symbol, save_report
+
+SYMBOLS = ("BTCUSDT", "ETHUSDT")
+
+@pytest.fixture
+def all_analysis(make_ohlcv, tmp_path):
+    """兩個幣種的分析結果，ETHUSDT 缺少 15m K 線 (分析失敗的預設值)"""
+    store = KlineStore(str(tmp_path / "klines"))
+    tickers = {}
+    for seed, symbol in enumerate(SYMBOLS):
+        intervals = ("1h", "15m") if symbol == "BTCUSDT" else ("1h",)
+        for interval in intervals:
+            df = make_ohlcv(300, seed=seed * 10 + len(interval), freq="1h" if interval == "1h" else "15min")
+            store.save(symbol, interval, df)
+        tickers[symbol] = {"symbol": symbol, "lastPrice": str(df["close"].iloc[-1]), "priceChangePercent": "1.5",
+                           "volume": "1000.0", "quoteVolume": "100000.0"}
+    return analyze_multiple_symbols(list(SYMBOLS), ["1h", "15m"], store=store, tickers=tickers)
+
+def contains_key(value, key):
+    if isinstance(value, dict):
+        return key in value or any(contains_key(v, key) for v in value.values())
+    if isinstance(value, list):
+        return any(contains_key(v, key) for v in value)
+    return False
+
+def test_analysis_keeps_typed_results_without_root_copy(all_analysis):
+    btc = all_analysis["BTCUSDT"]
+    assert set(btc) == {"symbol", "1h", "15m"}
+    assert isinstance(btc["1h"], AnalysisResult) and isinstance(btc["15m"], AnalysisResult)
+    assert all_analysis["ETHUSDT"]["15m"]["current_trend"] == "數據不足"
+
+def test_json_export_is_prose_only(all_analysis, tmp_path):
+    path = str(tmp_path / "report.json")
+    save_report(all_analysis, fmt="json", path=path)
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+
+    assert not contains_key(report, "typed")
+    btc = report["BTCUSDT"]
+    result = all_analysis["BTCUSDT"]["1h"]
+    expected_1h = json.loads(json.dumps(render_analysis(result), default=float))
+    expected_1h.update(candle_open_time=result.open_time, candle_close_time=result.open_time + 3_600_000)
+    assert btc["1h"] == expected_1h
+    # 根層級即 1h 數據 (舊版結構)
+    assert {key: btc[key] for key in expected_1h} == expected_1h
+    assert report["ETHUSDT"]["15m"] == all_analysis["ETHUSDT"]["15m"]
+
+def test_report_view_matches_json_plus_typed(all_analysis, tmp_path):
+    path = str(tmp_path / "report.json")
+    save_report(all_analysis, fmt="json", path=path)
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+
+    view = ReportView(all_analysis)
+    assert list(view) == list(report)
+    for symbol in SYMBOLS:
+        symbol_view = view[symbol]
+        assert view[symbol] is symbol_view  # 只產生一次
+        assert "typed" not in symbol_view
+        for interval in ("1h", "15m"):
+            result = all_analysis[symbol][interval]
+            if isinstance(result, AnalysisResult):
+                assert symbol_view[interval]["typed"] is result
+        # 去除 typed 後與 JSON 報告相同
+        assert json.loads(json.dumps(render_symbol(all_analysis[symbol]), default=float)) == report[symbol]
+
+def test_compact_snapshot_round_trip(all_analysis, tmp_path):
+    path = str(tmp_path / "report.json")
+    files = save_report(all_analysis, fmt="compact", path=path)
+    assert [f.rsplit(".", 1)[1] for f in files] == ["snapshot", "npz"]
+
+    report = load_report(path)
+    assert isinstance(report, LazyReport)
+    view = ReportView(all_analysis)
+    for symbol in SYMBOLS:
+        loaded, expected = report[symbol], view[symbol]
+        assert set(loaded) == set(expected)
+        assert loaded["current_trend"] == expected["current_trend"]
+        assert loaded["1h"]["typed"] == expected["1h"]["typed"]
+        for interval in ("1h", "15m"):
+            if "typed" in expected[interval]:
+                assert loaded[interval]["technical_indicators_summary"] == \
+                    expected[interval]["technical_indicators_summary"]
+            else:
+                assert loaded[interval] == expected[interval]
+
+def test_lazy_report_close_and_context_manager(all_analysis, tmp_path):
+    path = str(tmp_path / "report.json")
+    save_report(all_analysis, fmt="compact", path=path)
+
+    with load_report(path) as report:
+        btc = report["BTCUSDT"]
+        assert not report.closed
+    assert report.closed
+    report.close()  # 可重複關閉
+    # 已解碼的幣種仍可讀取，未解碼的幣種無法再讀取
+    assert report["BTCUSDT"] is btc
+    with pytest.raises(ValueError):
+        report["ETHUSDT"]
+
+def test_open_report_closes_snapshot(all_analysis, tmp_path, monkeypatch):
+    import report_store
+    import signal_engine
+
+    path = str(tmp_path / "report.json")
+    save_report(all_analysis, fmt="compact", path=path)
+    opened = []
+
+    class RecordingReport(LazyReport):
+        def __init__(self, *args):
+            super().__init__(*args)
+            opened.append(self)
+
+    monkeypatch.setattr(report_store, "LazyReport", RecordingReport)
+    monkeypatch.setattr(report_store, "REPORT_FILE", path)
+    monkeypatch.setattr("sys.argv", ["signal_engine.py", "--github-output"])
+
+    assert signal_engine.main() == 0
+    assert len(opened) == 1 and opened[0].closed
+    assert len(opened[0]._cache) == len(SYMBOLS)
+
+    with report_store.open_report() as report:
+        assert set(report) == set(SYMBOLS)
+    assert opened[1].closed
+
+    # json 報告不需關閉
+    save_report(all_analysis, fmt="json", path=path)
+    with report_store.open_report() as report:
+        assert isinstance(report, dict)
+
+def test_telegram_loads_only_monitored_symbols(sample_analysis, tmp_path, monkeypatch):
+    import report_store
+    import telegram_bot
+
+    path = str(tmp_path / "report.json")
+    save_report(sample_analysis, fmt="compact", path=path)
+    decoded = []
+    expand_symbol = report_store.expand_symbol
+
+    def recording_expand(compact):
+        decoded.append(compact["symbol"])
+        return expand_symbol(compact)
+
+    monkeypatch.setattr(report_store, "expand_symbol", recording_expand)
+    monkeypatch.setattr(report_store, "REPORT_FILE", path)
+
+    data = telegram_bot.load_analysis_data(["XRPUSDT", "BTCUSDT", "DOGEUSDT"])
+    # 依報告順序，只解碼被查詢的幣種；未查詢的幣種從未解碼
+    assert list(data) == ["BTCUSDT", "XRPUSDT"]
+    assert decoded == ["BTCUSDT", "XRPUSDT"]
+    assert data["BTCUSDT"]["1h"]["typed"] == sample_analysis["BTCUSDT"]["1h"]
+
+    decoded.clear()
+    assert list(telegram_bot.load_analysis_data()) == list(sample_analysis)
+    assert decoded == list(sample_analysis)
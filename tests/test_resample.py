@@ -0,0 +1,106 @@
+"""
+重採樣測試：與 pandas 聚合比對、增量 Resampler、回補只寫入一次、各時間框架的 1H / 4H 變化一致
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from analyze_binance_data import _change_since, analyze_klines, calculate_technical_indicators
+from get_binance_data import fetch_multiple_symbols, fetch_resampled_klines
+from kline_store import KlineStore
+from resample import Resampler, resample_klines
+
+def pandas_resample(base_df, rule):
+    """以 pandas resample 逐欄聚合，作為 resample_klines 的參考結果"""
+    grouped = base_df.set_index("open_time").resample(rule)
+    expected = pd.DataFrame({
+        "open": grouped["open"].first(),
+        "high": grouped["high"].max(),
+        "low": grouped["low"].min(),
+        "close": grouped["close"].last(),
+        "volume": grouped["volume"].sum(),
+        "count": grouped["close"].count(),
+    })
+    return expected[expected["count"] > 0]
+
+def test_resample_klines_matches_pandas(make_ohlcv):
+    # 從 00:30 開始，第一根 1h K 線不完整，應被捨棄
+    base = make_ohlcv(99, start="2024-01-01 00:30")
+    result = resample_klines(base, "1h", "15m")
+
+    expected = pandas_resample(base, "1h").iloc[1:]
+    assert list(result["open_time"]) == list(expected.index)
+    for column in ("open", "high", "low", "close", "volume"):
+        np.testing.assert_allclose(result[column], expected[column], rtol=0, atol=1e-12)
+    # 最後一根只有部分基礎 K 線，仍保留 (與 API 回傳未收盤 K 線相同)
+    assert expected["count"].iloc[-1] < 4
+    assert result["open_time"].iloc[0] == pd.Timestamp("2024-01-01 01:00")
+
+def test_resampler_matches_batch(make_ohlcv):
+    base = make_ohlcv(64, start="2024-01-01")
+    base["close_time"] = base["open_time"] + pd.Timedelta(minutes=15) - pd.Timedelta(milliseconds=1)
+    resampler = Resampler("1h")
+    completed = []
+    for row in base.to_dict("records"):
+        completed.extend(resampler.update(row))
+    # 重複的 K 線會被忽略
+    assert resampler.update(base.iloc[-1].to_dict()) == []
+
+    expected = resample_klines(base, "1h", "15m")
+    assert len(completed) == len(expected) == 16
+    for bar, (_, row) in zip(completed, expected.iterrows()):
+        assert bar["open_time"] == row["open_time"]
+        for column in ("open", "high", "low", "close", "volume"):
+            assert bar[column] == pytest.approx(row[column])
+
+def test_fetch_resampled_klines_saves_nothing_when_a_page_fails(fake_binance, tmp_path):
+    store = KlineStore(data_dir=str(tmp_path))
+    fake_binance.fail_after = 1  # 第二頁起連線失敗
+
+    with pytest.raises(requests.ConnectionError):
+        fetch_resampled_klines("BTCUSDT", "15m", ["15m", "1h"], store)
+
+    assert store.load("BTCUSDT", "15m") is None
+    assert store.load("BTCUSDT", "1h") is None
+
+def test_resampled_fetch_saves_each_interval_once(fake_binance, tmp_path, monkeypatch):
+    store = KlineStore(data_dir=str(tmp_path))
+    saves = []
+    original_save = store.save
+    monkeypatch.setattr(store, "save", lambda symbol, interval, df: saves.append((symbol, interval)) or
+                        original_save(symbol, interval, df))
+
+    data = fetch_multiple_symbols(["BTCUSDT"], intervals=["15m", "1h"], store=store,
+                                  base_interval="15m", save_snapshot=False)
+
+    # 回補的多頁只在全部到齊後寫入一次
+    assert sorted(saves) == [("BTCUSDT", "15m"), ("BTCUSDT", "1h")]
+    assert sum(path == "/klines" for path, _ in fake_binance.requests) >= 3
+    base = store.load("BTCUSDT", "15m")
+    assert len(base) >= 2000
+    assert base["open_time"].diff().iloc[1:].eq(pd.Timedelta(minutes=15)).all()
+    hourly = store.load("BTCUSDT", "1h")
+    pd.testing.assert_frame_equal(hourly, data["BTCUSDT"]["klines_1h"].reset_index(drop=True), check_dtype=False)
+
+def test_price_changes_are_time_based_on_every_timeframe(make_ohlcv):
+    base = make_ohlcv(600, start="2024-01-01")
+    frames = {"15m": base, "1h": resample_klines(base, "1h", "15m")}
+    price = float(base["close"].iloc[-1])
+    ticker = {"symbol": "BTCUSDT", "lastPrice": str(price), "priceChangePercent": "1.5",
+              "volume": "1000.0", "quoteVolume": "100000.0"}
+    results = {interval: analyze_klines(ticker, calculate_technical_indicators(df)) for interval, df in frames.items()}
+
+    # 15m 的 1H 變化取 4 根前 (開盤時間 = 最後一根 - 1h) 的收盤價，而不是上一根 15m K 線
+    expected_1h = (price - base["close"].iloc[-5]) / base["close"].iloc[-5] * 100
+    expected_4h = (price - base["close"].iloc[-17]) / base["close"].iloc[-17] * 100
+    for result in results.values():
+        assert result.change_1h == pytest.approx(expected_1h)
+        assert result.change_4h == pytest.approx(expected_4h)
+    assert results["15m"].change_1h != pytest.approx((price - base["close"].iloc[-2]) / base["close"].iloc[-2] * 100)
+
+    # 沒有 open_time 時視為 1h K 線
+    no_time = base.drop(columns="open_time")
+    previous = no_time["close"].iloc[-2]
+    assert _change_since(no_time, price, 1) == pytest.approx((price - previous) / previous * 100)
+    assert _change_since(no_time.head(1), price, 4) == 0.0
@@ -0,0 +1,134 @@
+"""
+綜合建議測試：查表分類與原本逐條件判斷的 README 邏輯、向量化分類與逐一分類一致
+"""
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import report_store
+import signal_engine
+from analysis_result import Trend
+from analyze_binance_data import analyze_klines, calculate_technical_indicators
+from signal_engine import Advice, SignalSnapshot, classify, classify_trends, report_trend
+
+LABELS = ("多頭", "空頭", "震盪", "糾結", None)  # None 表示報告缺少該時間框架
+
+def legacy_trend(frame):
+    """原本 README 的趨勢顯示與個別信號 (frame 為時間框架或根層級的報告)"""
+    trend_type = frame.get("trend_type", "糾結")
+    is_tangled = frame.get("ma_analysis", {}).get("is_tangled", True)
+    if trend_type == "多頭":
+        return "📈多頭", "🟢買入" if not is_tangled else "⚪觀望"
+    if trend_type == "空頭":
+        return "📉空頭", "🔴賣出" if not is_tangled else "⚪觀望"
+    if trend_type == "震盪":
+        return "📊震盪", "⚪觀望"
+    return "🔄糾結", "⚪觀望"
+
+def legacy_advice(analysis):
+    """原本 generate_readme_report 中 15m / 1h 的綜合建議判斷"""
+    trend_15m, signal_15m = legacy_trend(analysis["15m"]) if "15m" in analysis else ("🔄糾結", "⚪觀望")
+    trend_1h, signal_1h = legacy_trend(analysis["1h"] if "1h" in analysis else analysis)
+    if trend_15m == trend_1h and "糾結" not in trend_15m:
+        if "多頭" in trend_15m:
+            advice = "🟢明確看多"
+        elif "空頭" in trend_15m:
+            advice = "🔴明確看空"
+        else:
+            advice = "📊雙重震盪"
+    elif "糾結" in trend_15m and "糾結" in trend_1h:
+        advice = "⚪雙重糾結"
+    elif ("多頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "多頭" in trend_1h):
+        advice = "🟡謹慎做多"
+    elif ("空頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "空頭" in trend_1h):
+        advice = "🟡謹慎做空"
+    else:
+        advice = "⚪觀望等待"
+    return advice, (trend_15m, trend_1h), (signal_15m, signal_1h)
+
+def frame(label):
+    return {"trend_type": label, "ma_analysis": {"is_tangled": label == "糾結"}}
+
+def test_snapshot_matches_legacy_readme_logic():
+    report = {}
+    for i, (m15, h1, root) in enumerate(itertools.product(LABELS, LABELS, LABELS)):
+        analysis = {"symbol": f"S{i}"}
+        if m15:
+            analysis["15m"] = frame(m15)
+        if h1:
+            analysis["1h"] = frame(h1)
+        if root:
+            analysis.update(frame(root))
+        report[f"S{i}"] = analysis
+
+    snapshot = SignalSnapshot(report)
+    assert len(list(snapshot)) == len(LABELS) ** 3
+    for symbol, analysis in report.items():
+        advice, trends, signals = legacy_advice(analysis)
+        result = snapshot[symbol]
+        assert result.advice.display == advice, analysis
+        assert tuple(signal_engine.trend_display(t) for t in result.trends) == trends
+        assert tuple(s.display for s in result.signals) == signals
+        assert result.is_buy == (advice == "🟢明確看多")
+        assert result.is_sell == (advice == "🔴明確看空")
+
+@pytest.mark.parametrize("timeframes", [1, 2, 3, 4])
+def test_classify_trends_matches_classify(timeframes):
+    rng = np.random.default_rng(timeframes)
+    trends = rng.integers(-1, len(Trend), size=(200, timeframes))
+    advice, signals = classify_trends(trends)
+    for row, a, s in zip(trends, advice, signals):
+        expected_advice, expected_signals = classify([Trend(max(t, 0)) for t in row])
+        assert Advice(a) == expected_advice
+        assert tuple(s) == expected_signals
+
+def test_from_table_matches_report():
+    symbols = [f"S{i}" for i in range(len(Trend) ** 2)]
+    pairs = list(itertools.product(Trend, Trend))
+    report = {symbol: {"15m": {"trend_type": m15.label}, "1h": {"trend_type": h1.label}}
+              for symbol, (m15, h1) in zip(symbols, pairs)}
+    table = pd.DataFrame({"symbol": symbols, "15m_trend": [int(m15) for m15, _ in pairs],
+                          "1h_trend": [int(h1) for _, h1 in pairs]})
+    # 缺少數據 (-1) 視為糾結
+    table.loc[0, "15m_trend"] = -1
+    report["S0"]["15m"] = {}
+
+    from_table = SignalSnapshot.from_table(table, report=report)
+    from_report = SignalSnapshot(report)
+    assert [s.advice for s in from_table] == [s.advice for s in from_report]
+    assert [s.trends for s in from_table] == [s.trends for s in from_report]
+    assert [s.signals for s in from_table] == [s.signals for s in from_report]
+
+def test_report_trend_reads_analysis_results(make_ohlcv):
+    df = make_ohlcv(300, seed=3)
+    ticker = {"symbol": "BTCUSDT", "lastPrice": str(df["close"].iloc[-1]), "priceChangePercent": "1.5",
+              "volume": "1000.0", "quoteVolume": "100000.0"}
+    result = analyze_klines(ticker, calculate_technical_indicators(df))
+    assert report_trend({"15m": result}, "15m") == result.trend
+    # 舊版報告：1h 缺少時沿用根層級，其他時間框架缺少時為糾結
+    assert report_trend({"trend_type": "空頭"}, "1h") == Trend.BEARISH
+    assert report_trend({"trend_type": "空頭"}, "15m") == Trend.TANGLED
+
+def test_main_github_output(tmp_path, monkeypatch, capsys):
+    report = {
+        "BTCUSDT": {"15m": frame("多頭"), "1h": frame("多頭")},
+        "ETHUSDT": {"15m": frame("多頭"), "1h": frame("空頭")},
+        "SOLUSDT": {"15m": frame("空頭"), "1h": frame("空頭")},
+    }
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(report_store, "REPORT_FILE", str(path))
+    monkeypatch.setattr("sys.argv", ["signal_engine.py", "--github-output"])
+
+    assert signal_engine.main() == 0
+    assert capsys.readouterr().out.splitlines() == ["buy_signals=ETH", "strong_buy_signals=BTC"]
+
+def test_main_github_output_without_report(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(report_store, "REPORT_FILE", str(tmp_path / "missing.json"))
+    monkeypatch.setattr("sys.argv", ["signal_engine.py", "--github-output"])
+
+    assert signal_engine.main() == 0
+    assert capsys.readouterr().out.splitlines() == ["buy_signals=", "strong_buy_signals="]
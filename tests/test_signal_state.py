@@ -0,0 +1,247 @@
+"""
+訊號狀態測試：狀態轉換、同一根 K 線的重複、過期報告、提醒，以及發送失敗時保留狀態
+"""
+import json
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+import send_telegram_conditionally
+from analysis_result import Trend
+from report_store import ReportView, open_report, save_report
+from signal_engine import SignalSnapshot
+from signal_state import SignalStateStore, candle_close_time
+from telegram_config import config
+
+HOUR_MS = 3_600_000
+QUARTER_MS = 900_000
+BASE_OPEN = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+
+class Market:
+    """以 sample_analysis 的結果改寫趨勢與 K 線時間，產生指定狀態的報告"""
+
+    def __init__(self, sample_analysis):
+        self.base = sample_analysis
+
+    def report(self, trends, bar=0):
+        """
+        Args:
+            trends (dict): {symbol: (15m 趨勢, 1h 趨勢)}
+            bar (int): 15m K 線序號 (每 4 根換一根 1h K 線)
+        """
+        raw = {}
+        for symbol, (m15, h1) in trends.items():
+            analysis = self.base[symbol]
+            raw[symbol] = {
+                "symbol": symbol,
+                "15m": replace(analysis["15m"], trend=m15, open_time=BASE_OPEN + bar * QUARTER_MS),
+                "1h": replace(analysis["1h"], trend=h1, open_time=BASE_OPEN + bar // 4 * HOUR_MS),
+            }
+        view = ReportView(raw)
+        return view, SignalSnapshot(view)
+
+BULL = (Trend.BULLISH, Trend.BULLISH)
+BEAR = (Trend.BEARISH, Trend.BEARISH)
+MIXED = (Trend.BULLISH, Trend.RANGING)
+
+@pytest.fixture
+def market(sample_analysis):
+    return Market(sample_analysis)
+
+def test_candle_close_time(market):
+    report, _ = market.report({"BTCUSDT": BULL}, bar=5)
+    assert candle_close_time(report["BTCUSDT"], "15m") == BASE_OPEN + 6 * QUARTER_MS
+    assert candle_close_time(report["BTCUSDT"], "1h") == BASE_OPEN + 2 * HOUR_MS
+    # JSON 報告沒有 typed
+    assert candle_close_time({"1h": {"trend_type": "多頭"}}, "1h") is None
+
+@pytest.mark.parametrize("fmt", ["json", "compact"])
+def test_candle_time_survives_saved_reports(market, tmp_path, fmt):
+    path = str(tmp_path / "report.json")
+    symbols = ["BTCUSDT"]
+    state = SignalStateStore(str(tmp_path / "state.json"))
+
+    def saved(trends, bar):
+        """寫入報告後重新讀取 (與 send_telegram_conditionally.py 單獨執行時相同)"""
+        view, _ = market.report(trends, bar=bar)
+        save_report(view.results, fmt=fmt, path=path)
+        with open_report(path) as report:
+            report = {symbol: report[symbol] for symbol in report}
+        return view, report, SignalSnapshot(report)
+
+    view, report, signals = saved({"BTCUSDT": BULL, "ETHUSDT": MIXED}, bar=5)
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        for timeframe in ("15m", "1h"):
+            assert candle_close_time(report[symbol], timeframe) == candle_close_time(view[symbol], timeframe)
+    assert candle_close_time(report["BTCUSDT"], "1h") == BASE_OPEN + 2 * HOUR_MS
+
+    # 跨次執行：同一根 1h K 線內的短暫變化不重複通知，下一根 K 線才通知
+    state.record(signals, symbols, notified=state.due(signals, symbols, now=0), now=0)
+    _, _, signals = saved({"BTCUSDT": MIXED}, bar=6)
+    state.record(signals, symbols, now=10)
+    _, _, signals = saved({"BTCUSDT": BULL}, bar=7)
+    assert state.due(signals, symbols, now=20) == []
+    _, _, signals = saved({"BTCUSDT": MIXED}, bar=8)
+    state.record(signals, symbols, now=30)
+    _, _, signals = saved({"BTCUSDT": BULL}, bar=9)
+    assert state.due(signals, symbols, now=40) == ["BTCUSDT"]
+
+def test_due_only_on_transitions(market, tmp_path):
+    state = SignalStateStore(str(tmp_path / "state.json"))
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+
+    _, signals = market.report({"BTCUSDT": BULL, "ETHUSDT": BEAR, "SOLUSDT": MIXED}, bar=0)
+    due = state.due(signals, symbols, now=0)
+    assert due == ["BTCUSDT", "ETHUSDT"]  # 觀望等待不通知
+    state.record(signals, symbols, notified=due, now=0)
+
+    # 狀態不變：不再通知
+    _, signals = market.report({"BTCUSDT": BULL, "ETHUSDT": BEAR, "SOLUSDT": MIXED}, bar=4)
+    assert state.due(signals, symbols, now=60) == []
+    state.record(signals, symbols, now=60)
+
+    # 轉為觀望後再回到明確看多：視為新的轉換
+    _, signals = market.report({"BTCUSDT": MIXED, "ETHUSDT": BEAR, "SOLUSDT": BULL}, bar=8)
+    assert state.due(signals, symbols, now=120) == ["SOLUSDT"]
+    state.record(signals, symbols, notified=["SOLUSDT"], now=120)
+    _, signals = market.report({"BTCUSDT": BULL, "ETHUSDT": BEAR, "SOLUSDT": BULL}, bar=12)
+    assert state.due(signals, symbols, now=180) == ["BTCUSDT"]
+
+def test_flicker_within_one_candle_is_not_repeated(market, tmp_path):
+    state = SignalStateStore(str(tmp_path / "state.json"))
+    symbols = ["BTCUSDT"]
+
+    _, signals = market.report({"BTCUSDT": BULL}, bar=0)
+    state.record(signals, symbols, notified=state.due(signals, symbols), now=0)
+    # 同一根 K 線內 (以最晚收盤的 1h K 線為準) 短暫變成觀望又回到看多
+    _, signals = market.report({"BTCUSDT": MIXED}, bar=1)
+    state.record(signals, symbols, now=10)
+    _, signals = market.report({"BTCUSDT": BULL}, bar=2)
+    assert state.due(signals, symbols, now=20) == []
+    # 下一根 1h K 線再出現時通知
+    _, signals = market.report({"BTCUSDT": MIXED}, bar=4)
+    state.record(signals, symbols, now=30)
+    _, signals = market.report({"BTCUSDT": BULL}, bar=5)
+    assert state.due(signals, symbols, now=40) == ["BTCUSDT"]
+
+def test_stale_report_is_ignored(market, tmp_path):
+    state = SignalStateStore(str(tmp_path / "state.json"))
+    symbols = ["BTCUSDT"]
+
+    _, signals = market.report({"BTCUSDT": MIXED}, bar=8)
+    state.record(signals, symbols, now=0)
+    _, stale = market.report({"BTCUSDT": BULL}, bar=4)
+    assert state.due(stale, symbols, now=10) == []
+    state.record(stale, symbols, notified=symbols, now=10)
+    entry = state.entries["BTCUSDT|15m+1h"]
+    assert "notified" not in entry and entry["candle_close"] == BASE_OPEN + 3 * HOUR_MS
+
+def test_reminder_after_ttl(market, tmp_path):
+    state = SignalStateStore(str(tmp_path / "state.json"), reminder_ttl=3600)
+    symbols = ["BTCUSDT"]
+
+    _, signals = market.report({"BTCUSDT": BULL}, bar=0)
+    state.record(signals, symbols, notified=state.due(signals, symbols, now=0), now=0)
+    _, signals = market.report({"BTCUSDT": BULL}, bar=4)
+    assert state.due(signals, symbols, now=3599) == []
+    assert state.due(signals, symbols, now=3600) == ["BTCUSDT"]
+
+def test_state_file_round_trip(market, tmp_path):
+    path = str(tmp_path / "nested" / "state.json")
+    state = SignalStateStore(path)
+    _, signals = market.report({"BTCUSDT": BULL}, bar=0)
+    state.record(signals, ["BTCUSDT"], notified=["BTCUSDT"], now=0)
+    state.track_summary(1, SimpleNamespace(message_id=42))
+    state.track_summary(2, SimpleNamespace(message_id=None))  # 未送達：不記錄
+    state.save()
+
+    loaded = SignalStateStore(path)
+    assert loaded.entries == state.entries
+    assert loaded.summary_message(1) == 42 and loaded.summary_message(2) is None
+    assert loaded.due(signals, ["BTCUSDT"], now=10) == []
+
+    loaded.track_summary(1, None)  # 總覽分成多則：不再編輯
+    loaded.save()
+    assert SignalStateStore(path).summary_message(1) is None
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": 0, "signals": {"x": {}}}, f)
+    assert SignalStateStore(path).entries == {}
+
+class FakeQueue:
+    """send_telegram_conditionally 使用的 TelegramQueue：deliver() 依 outcome 返回或拋出例外"""
+    outcome = "ok"
+
+    def __init__(self):
+        self.pending = []
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls()
+
+    def submit(self, chat_id, text, parse_mode="HTML", edit_message_id=None):
+        delivery = SimpleNamespace(chat_id=str(chat_id), text=text, ok=False, message_id=None)
+        self.pending.append(delivery)
+        return delivery
+
+    def deliver(self):
+        if self.outcome == "raise":
+            raise RuntimeError("event loop closed")
+        for i, delivery in enumerate(self.pending):
+            delivery.ok = self.outcome == "ok" or i == 0
+            delivery.message_id = 100 + i if delivery.ok else None
+        return self.pending
+
+@pytest.fixture
+def notifier(monkeypatch, tmp_path):
+    path = str(tmp_path / "signal_state.json")
+    for name, value in {"BOT_TOKEN": "TOKEN", "CHAT_ID": "1", "SUBSCRIBERS_FILE": "", "SIGNAL_DEDUP": True,
+                        "SIGNAL_STATE_FILE": path, "SIGNAL_REMINDER_HOURS": 0, "EDIT_SUMMARY": False,
+                        "SEND_MARKET_SUMMARY": True, "SEND_BUY_SIGNALS": True, "COALESCE_MESSAGES": False,
+                        "SUPPORTED_SYMBOLS": ["BTCUSDT", "ETHUSDT"]}.items():
+        monkeypatch.setattr(config, name, value)
+    monkeypatch.setattr(send_telegram_conditionally, "TelegramQueue", FakeQueue)
+    return path
+
+@pytest.mark.parametrize("outcome, exit_code, recorded", [
+    ("ok", 0, True),
+    ("partial", 0, False),
+    ("raise", 1, False),
+])
+def test_state_only_records_fully_delivered_signals(market, notifier, monkeypatch, outcome, exit_code, recorded):
+    report, signals = market.report({"BTCUSDT": BULL, "ETHUSDT": MIXED}, bar=0)
+    # 上一次執行留下的狀態
+    previous = SignalStateStore(notifier)
+    _, old = market.report({"BTCUSDT": MIXED, "ETHUSDT": MIXED}, bar=0)
+    previous.record(old, ["BTCUSDT", "ETHUSDT"], now=0)
+    previous.save()
+
+    monkeypatch.setattr(FakeQueue, "outcome", outcome)
+    assert send_telegram_conditionally.main(report, signals) == exit_code
+
+    state = SignalStateStore(notifier)
+    if recorded:
+        assert state.entries["BTCUSDT|15m+1h"]["notified"] == 0
+        assert state.due(signals, ["BTCUSDT"]) == []
+    else:
+        # 狀態檔保留上一次的內容，下次執行重新發送
+        assert state.entries == previous.entries
+        assert state.due(signals, ["BTCUSDT"]) == ["BTCUSDT"]
+
+def test_exception_still_saves_delivered_summary_ids(market, notifier, monkeypatch):
+    monkeypatch.setattr(config, "EDIT_SUMMARY", True)
+    report, signals = market.report({"BTCUSDT": BULL}, bar=0)
+
+    class PartlySentQueue(FakeQueue):
+        def deliver(self):
+            # 總覽已送達後中斷
+            self.pending[0].ok, self.pending[0].message_id = True, 77
+            raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(send_telegram_conditionally, "TelegramQueue", PartlySentQueue)
+    assert send_telegram_conditionally.main(report, signals) == 1
+
+    state = SignalStateStore(notifier)
+    assert state.summary_message(1) == 77
+    assert state.due(signals, ["BTCUSDT"]) == ["BTCUSDT"]
@@ -0,0 +1,150 @@
+"""
+訂閱者測試：JSON / SQLite 清單、TELEGRAM_CHAT_ID 合併與 fan_out 的渲染共用和排入順序
+"""
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from message_templates import MESSAGE_LIMIT, message_length
+from report_store import ReportView
+from signal_engine import SignalSnapshot
+from subscribers import Subscriber, SubscriberRegistry, fan_out, load_subscribers
+
+class FakeQueue:
+    """記錄 submit 的 (chat_id, text, edit_message_id)"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, chat_id, text, parse_mode="HTML", edit_message_id=None):
+        delivery = SimpleNamespace(chat_id=str(chat_id), text=text, edit_message_id=edit_message_id)
+        self.submitted.append(delivery)
+        return delivery
+
+    def texts(self, chat_id):
+        return [d.text for d in self.submitted if d.chat_id == chat_id]
+
+class FakeSummaryState:
+    """SignalStateStore 的總覽訊息 ID 介面"""
+
+    def __init__(self, message_ids):
+        self.message_ids = dict(message_ids)
+        self.tracked = {}
+
+    def summary_message(self, chat_id):
+        return self.message_ids.get(chat_id)
+
+    def track_summary(self, chat_id, delivery):
+        self.tracked[chat_id] = delivery
+
+def subscriber(chat_id, symbols=(), buy=True, sell=True, summary=True, language=""):
+    return Subscriber(str(chat_id), tuple(symbols), buy, sell, summary, language)
+
+@pytest.fixture
+def report(sample_analysis):
+    view = ReportView(sample_analysis)
+    return view, SignalSnapshot(view)
+
+@pytest.mark.parametrize("filename", ["nested/subscribers.json", "subscribers.db"])
+def test_registry_round_trip(tmp_path, filename):
+    registry = SubscriberRegistry(str(tmp_path / filename))
+    assert registry.load() == []
+    assert registry.remove("1") is False
+
+    registry.add(subscriber(1))
+    registry.add(subscriber(2, symbols=("BTCUSDT", "ETHUSDT"), sell=False, language="en"))
+    registry.add(subscriber(1, summary=False))  # 更新既有的訂閱者
+
+    loaded = {s.chat_id: s for s in registry.load()}
+    assert loaded["1"] == subscriber(1, summary=False)
+    assert loaded["2"] == subscriber(2, symbols=("BTCUSDT", "ETHUSDT"), sell=False, language="en")
+    assert registry.remove(2) is True
+    assert [s.chat_id for s in registry.load()] == ["1"]
+
+def test_sqlite_registry_adds_language_column(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE subscribers (chat_id TEXT PRIMARY KEY, symbols TEXT NOT NULL DEFAULT '', "
+                     "buy_signals INTEGER NOT NULL DEFAULT 1, sell_signals INTEGER NOT NULL DEFAULT 1, "
+                     "market_summary INTEGER NOT NULL DEFAULT 1)")
+        conn.execute("INSERT INTO subscribers (chat_id, symbols) VALUES ('9', 'SOLUSDT')")
+    conn.close()
+
+    assert SubscriberRegistry(path).load() == [subscriber(9, symbols=("SOLUSDT",))]
+
+def test_load_subscribers_adds_configured_chat(tmp_path):
+    path = str(tmp_path / "subscribers.json")
+    SubscriberRegistry(path).add(subscriber(2, language="en"))
+
+    subscribers = load_subscribers(SimpleNamespace(SUBSCRIBERS_FILE=path, CHAT_ID="1"))
+    assert [s.chat_id for s in subscribers] == ["1", "2"]
+    assert subscribers[0] == subscriber(1)
+    # 已在清單中的 TELEGRAM_CHAT_ID 不重複加入
+    assert [s.chat_id for s in load_subscribers(SimpleNamespace(SUBSCRIBERS_FILE=path, CHAT_ID=2))] == ["2"]
+    assert load_subscribers(SimpleNamespace(SUBSCRIBERS_FILE="", CHAT_ID="")) == []
+
+def test_fan_out_filters_and_orders_per_subscriber(report):
+    analysis, signals = report
+    subscribers = [
+        subscriber(1),
+        subscriber(2, symbols=("BTCUSDT",), sell=False, language="en"),
+        subscriber(3, summary=False, buy=False),
+        subscriber(4),
+    ]
+    queue = FakeQueue()
+    queued = fan_out(queue, subscribers, analysis, signals, buy_symbols=["BTCUSDT", "ETHUSDT"],
+                     sell_symbols=["SOLUSDT"], language="zh-TW")
+
+    assert queued == len(queue.submitted) == 4 + 2 + 1 + 4
+    first = queue.texts("1")
+    assert "虛擬幣市場總覽" in first[0]
+    assert ["BUY SIGNAL" in text for text in first[1:]] == [True, True, False]
+    assert "(BTCUSDT)" in first[1] and "(ETHUSDT)" in first[2] and "(SOLUSDT)" in first[3]
+    # 相同條件的訂閱者共用同一份渲染結果
+    assert all(a is b for a, b in zip(first, queue.texts("4")))
+
+    english = queue.texts("2")
+    assert len(english) == 2
+    assert "Crypto Market Overview" in english[0]
+    assert "<b>BTC</b>" in english[0] and "<b>ETH</b>" not in english[0]
+    assert "💰 Price:" in english[1] and "(BTCUSDT)" in english[1]
+
+    only_sell = queue.texts("3")
+    assert len(only_sell) == 1 and "SELL SIGNAL" in only_sell[0] and "(SOLUSDT)" in only_sell[0]
+
+def test_fan_out_summary_requires_buy(report):
+    analysis, signals = report
+    queue = FakeQueue()
+    fan_out(queue, [subscriber(1, symbols=("BTCUSDT",)), subscriber(2, symbols=("XRPUSDT",))], analysis, signals,
+            buy_symbols=["BTCUSDT"], send_sell=False, summary_requires_buy=True)
+
+    assert len(queue.texts("1")) == 2
+    assert queue.texts("2") == []
+
+def test_fan_out_coalesce_combines_messages(report):
+    analysis, signals = report
+    queue = FakeQueue()
+    fan_out(queue, [subscriber(1)], analysis, signals, buy_symbols=list(analysis), sell_symbols=["SOLUSDT"],
+            coalesce=True)
+
+    texts = queue.texts("1")
+    assert len(texts) < 1 + len(analysis) + 1
+    assert all(message_length(text) <= MESSAGE_LIMIT for text in texts)
+    combined = "".join(texts)
+    assert combined.count("BUY SIGNAL") == len(analysis) and combined.count("SELL SIGNAL") == 1
+
+def test_fan_out_edits_previous_summary(report):
+    analysis, signals = report
+    state = FakeSummaryState({"1": 41})
+    queue = FakeQueue()
+    fan_out(queue, [subscriber(1), subscriber(2)], analysis, signals, buy_symbols=["BTCUSDT"], send_sell=False,
+            coalesce=True, summary_state=state)
+
+    # 總覽單獨一則：有紀錄的聊天以編輯更新，沒有紀錄的發送新訊息
+    first = [d for d in queue.submitted if d.chat_id == "1"]
+    assert first[0].edit_message_id == 41 and "虛擬幣市場總覽" in first[0].text
+    assert "BUY SIGNAL" in first[1].text and first[1].edit_message_id is None
+    second = [d for d in queue.submitted if d.chat_id == "2"]
+    assert second[0].edit_message_id is None
+    assert state.tracked == {"1": first[0], "2": second[0]}
@@ -0,0 +1,186 @@
+"""
+TelegramQueue 測試：429 retry_after、5xx 退避、不重試的錯誤、順序與編輯訊息
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from telegram_queue import TelegramQueue, TokenBucket
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("not json")
+        return self._body
+
+def ok_body(message_id):
+    return {"ok": True, "result": {"message_id": message_id}}
+
+class FakeSession:
+    """
+    記錄每次 POST 並依 script[(chat_id, text)] 依序回應；腳本用完後回應成功
+
+    腳本項目為 (status_code, body) 或要拋出的例外。
+    """
+
+    def __init__(self, script=None):
+        self.script = {key: list(values) for key, values in (script or {}).items()}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self.lock:
+            self.calls.append((time.monotonic(), url.rsplit("/", 1)[1], dict(json)))
+            steps = self.script.get((json["chat_id"], json["text"]))
+            step = steps.pop(0) if steps else (200, ok_body(len(self.calls)))
+        if isinstance(step, Exception):
+            raise step
+        return FakeResponse(*step)
+
+    def calls_for(self, chat_id):
+        return [call for call in self.calls if call[2]["chat_id"] == chat_id]
+
+def make_queue(session, **kwargs):
+    options = dict(chat_rate=1000, chat_burst=10, group_rate=1000, global_rate=1000, backoff_factor=0.01,
+                   session=session)
+    options.update(kwargs)
+    return TelegramQueue("TOKEN", **options)
+
+def test_429_waits_retry_after_and_halves_the_chat_rate():
+    session = FakeSession({("1", "a"): [(429, {"ok": False, "description": "Too Many Requests",
+                                               "parameters": {"retry_after": 0.3}})]})
+    queue = make_queue(session)
+    delivery = queue.submit(1, "a")
+    queue.deliver(report=False)
+
+    assert delivery.ok and delivery.attempts == 2 and delivery.error is None
+    (first, _, _), (second, _, _) = session.calls
+    assert second - first >= 0.3
+    # 減半後成功一次恢復 10%
+    bucket = queue.chat_buckets["1"]
+    assert bucket.rate == pytest.approx(1000 / 2 + 1000 * 0.1)
+
+def test_429_without_retry_after_uses_backoff():
+    session = FakeSession({("1", "a"): [(429, {"ok": False}), (429, {"ok": False})]})
+    queue = make_queue(session, backoff_factor=0.05)
+    delivery = queue.submit(1, "a")
+    queue.deliver(report=False)
+
+    assert delivery.ok and delivery.attempts == 3
+    times = [t for t, _, _ in session.calls]
+    assert times[1] - times[0] >= 0.05
+    assert times[2] - times[1] >= 0.1
+
+def test_429_pauses_all_chats_but_only_slows_the_throttled_chat():
+    # 兩個聊天每 0.2 秒一則；chat 1 收到 429 後，chat 2 的下一則也等到 retry_after 期滿
+    session = FakeSession({("1", "a"): [(429, {"ok": False, "parameters": {"retry_after": 0.5}})]})
+    queue = make_queue(session, chat_rate=5, chat_burst=1)
+    blocked = queue.submit(1, "a")
+    others = [queue.submit(2, text) for text in ("b0", "b1")]
+    queue.deliver(report=False)
+
+    assert blocked.ok and all(d.ok for d in others)
+    throttled_at = session.calls_for("1")[0][0]
+    assert session.calls_for("2")[1][0] - throttled_at >= 0.45
+    # 全域令牌桶只暫停、不減速；只有收到 429 的聊天減半
+    assert queue.global_bucket.rate == queue.global_bucket.max_rate
+    assert queue.chat_buckets["2"].rate == queue.chat_buckets["2"].max_rate
+    assert queue.chat_buckets["1"].rate < queue.chat_buckets["1"].max_rate
+
+def test_5xx_and_connection_errors_are_retried():
+    session = FakeSession({
+        ("1", "a"): [(502, None), (503, {"ok": False, "description": "Service Unavailable"})],
+        ("2", "b"): [requests.ConnectionError("reset"), requests.Timeout("slow")],
+    })
+    queue = make_queue(session)
+    first = queue.submit(1, "a")
+    second = queue.submit(2, "b")
+    queue.deliver(report=False)
+
+    assert first.ok and first.attempts == 3
+    assert second.ok and second.attempts == 3
+
+def test_gives_up_after_max_retries():
+    session = FakeSession({("1", "a"): [(500, None)] * 10})
+    queue = make_queue(session, max_retries=2)
+    delivery = queue.submit(1, "a")
+    queue.deliver(report=False)
+
+    assert not delivery.ok and delivery.message_id is None
+    assert delivery.attempts == 3 and len(session.calls) == 3
+    assert delivery.error == "HTTP 500"
+
+@pytest.mark.parametrize("status", [400, 403])
+def test_client_errors_are_not_retried(status):
+    session = FakeSession({("1", "a"): [(status, {"ok": False, "description": "Bad Request: can't parse entities"})]})
+    queue = make_queue(session)
+    delivery = queue.submit(1, "a")
+    queue.deliver(report=False)
+
+    assert not delivery.ok and delivery.attempts == 1 and len(session.calls) == 1
+    assert delivery.error == "Bad Request: can't parse entities"
+
+def test_same_chat_keeps_submission_order():
+    # 第二則需要重試，第三則仍必須在其後送出
+    session = FakeSession({("1", "m1"): [(502, None)]})
+    queue = make_queue(session)
+    deliveries = [queue.submit(1, f"m{i}") for i in range(5)]
+    queue.submit(-100, "group")
+    queue.deliver(report=False)
+
+    assert all(d.ok for d in deliveries)
+    sent = [payload["text"] for _, _, payload in session.calls_for("1")]
+    assert sent == ["m0", "m1", "m1", "m2", "m3", "m4"]
+    assert queue.chat_buckets["-100"].max_rate == queue.group_rate
+    assert queue.pending == []
+
+def test_edit_message_falls_back_to_send():
+    session = FakeSession({
+        ("1", "same"): [(400, {"ok": False, "description": "Bad Request: message is not modified"})],
+        ("1", "gone"): [(400, {"ok": False, "description": "Bad Request: message to edit not found"})],
+    })
+    queue = make_queue(session)
+    unchanged = queue.submit(1, "same", edit_message_id=7)
+    replaced = queue.submit(1, "gone", edit_message_id=8)
+    queue.deliver(report=False)
+
+    assert unchanged.ok and unchanged.message_id == 7
+    assert replaced.ok and replaced.edit_message_id is None
+    methods = [(method, payload["text"]) for _, method, payload in session.calls]
+    assert methods == [("editMessageText", "same"), ("editMessageText", "gone"), ("sendMessage", "gone")]
+    assert replaced.message_id == len(session.calls)
+
+def test_token_bucket_paces_after_burst():
+    async def acquire_all():
+        bucket = TokenBucket(20, capacity=2)
+        times = []
+        for _ in range(4):
+            await bucket.acquire()
+            times.append(time.monotonic())
+        return times
+
+    times = asyncio.run(acquire_all())
+    # 前兩個令牌立即取得，之後每 1/20 秒一個
+    assert times[1] - times[0] < 0.02
+    assert times[3] - times[1] >= 2 / 20 - 0.01
+
+def test_edit_failing_on_final_attempt_still_sends():
+    session = FakeSession({("1", "x"): [
+        (502, None),
+        (400, {"ok": False, "description": "Bad Request: message can't be edited"}),
+    ]})
+    queue = make_queue(session, max_retries=1)
+    delivery = queue.submit(1, "x", edit_message_id=5)
+    queue.deliver(report=False)
+
+    # 改為發送新訊息不佔用重試次數
+    assert delivery.ok and delivery.edit_message_id is None
+    assert [method for _, method, _ in session.calls] == ["editMessageText", "editMessageText", "sendMessage"]
+    assert delivery.attempts == 3 and delivery.message_id == 3
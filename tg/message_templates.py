@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telegram 訊息模板
+Precompiled per-symbol, per-language message templates
+
+每種語言 (MESSAGE_LANGUAGE: zh-TW / en) 的模板只編譯一次 (訊息一律以 HTML 格式發送)，
+每個幣種的固定部分 (名稱、圖示、交易對) 在第一次使用時填入並快取，之後每則訊息只
+填入價格、漲跌幅等動態數值。時區、幣種資訊表為模組常數，時間戳記每批訊息只格式化一次：
+
+    batch = get_templates("zh-TW").batch()
+    text = batch.signal("buy", symbol, analysis_data[symbol], signals[symbol])
+
+zh-TW 的輸出與原本 TelegramBot 的訊息逐字相同；en 的趨勢與指標文字由各時間框架的
+typed 數值產生 (JSON 報告沒有 typed 時沿用報告中的中文說明)。
+
+pack_messages() 把多則訊息合併成盡量少的訊息 (每則不超過 Telegram 的 4096 字元上限)，
+超過上限的訊息 (例如幣種很多的市場總覽) 在幣種之間分段。
+"""
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import pytz
+
+# 報告與綜合建議模組位於專案根目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_format import result_from_report
+from analysis_result import Trend
+from signal_engine import ADVICE_EMOJI, Advice, Signal, trend_display
+
+DEFAULT_LANGUAGE = "zh-TW"
+MESSAGE_LIMIT = 4096  # Telegram 單則訊息上限 (UTF-16 字元，保守地連 HTML 標籤一起計算)
+SECTION_DIVIDER = "\n\n━━━━━━━━━━━━\n\n"  # 合併訊息時各段之間的分隔線
+TAIPEI_TZ = pytz.timezone('Asia/Taipei')
+
+SYMBOL_INFO = {
+    "BTCUSDT": {"name": "BTC", "icon": "₿", "emoji": "🟠"},
+    "ETHUSDT": {"name": "ETH", "icon": "Ξ", "emoji": "🔵"},
+    "SOLUSDT": {"name": "SOL", "icon": "◎", "emoji": "🟣"},
+    "DOGEUSDT": {"name": "DOGE", "icon": "🐕", "emoji": "🟡"},
+    "XRPUSDT": {"name": "XRP", "icon": "◆", "emoji": "🔷"},
+}
+
+def symbol_info(symbol):
+    return SYMBOL_INFO.get(symbol, {"name": symbol, "icon": "💰", "emoji": "⚪"})
+
+def format_price(price):
+    if price >= 1000:
+        return f"${price:,.2f}"
+    if price >= 1:
+        return f"${price:.2f}"
+    return f"${price:.4f}"
+
+ZH_TW = {
+    "buy": ("🚀 <b>{name} BUY SIGNAL</b> 🚀\n\n"
+            "{emoji} <b>{name} ({symbol})</b>\n"
+            "💰 當前價格: <b>{price}</b>\n\n"
+            "📊 <b>價格變化</b>\n"
+            "• 1小時: <b>{change_1h}</b>\n"
+            "• 4小時: <b>{change_4h}</b>\n\n"
+            "📈 <b>趨勢分析</b>: {trend}\n\n"
+            "🟢 <b>綜合建議</b>: {advice}\n\n"
+            "⏰ 訊號時間: {time} (台北時間)\n\n"),
+    "indicators": "\n\n📊 <b>技術指標摘要</b>\n• RSI: {rsi}\n• MACD: {macd}",
+    "levels": ("\n\n💡 <b>入場建議</b>\n{entry}\n\n"
+               "🎯 <b>目標價位</b>\n{target}\n\n"
+               "🛡️ <b>止損設定</b>\n{stop}"),
+    "sell": ("🔴 <b>賣出訊號 SELL SIGNAL</b> 🔴\n\n"
+             "{emoji} <b>{name} ({symbol})</b>\n"
+             "💰 當前價格: <b>{price}</b>\n\n"
+             "📊 <b>價格變化</b>\n"
+             "• 1小時: <b>{change_1h}</b>\n"
+             "• 4小時: <b>{change_4h}</b>\n\n"
+             "📉 <b>趨勢分析</b>: {trend}\n\n"
+             "🔴 <b>建議操作</b>: 賣出 (SELL)\n"
+             "⚠️ <b>風險提醒</b>: 謹慎操作，注意市場變化\n\n"
+             "⏰ 訊號時間: {time} (台北時間)\n\n"),
+    "summary_header": "📊 <b>虛擬幣市場總覽</b> 📊\n\n⏰ 更新時間: {time} (台北時間)\n\n",
+    "summary_row": ("<b>{name}</b> | <b>{price}</b> | 1H:{change_1h} | 4H:{change_4h}\n"
+                    "15M:{trend_15m}({signal_15m}) | 1H:{trend_1h}({signal_1h})\n"
+                    "綜合: {advice}\n\n"),
+    "summary_footer": ("\n📈 <b>信號統計</b>\n"
+                       "🟢 買入信號: {buy} 個\n"
+                       "🔴 賣出信號: {sell} 個  \n"
+                       "⚪ 觀望信號: {neutral} 個\n\n"),
+}
+
+EN = {
+    "buy": ("🚀 <b>{name} BUY SIGNAL</b> 🚀\n\n"
+            "{emoji} <b>{name} ({symbol})</b>\n"
+            "💰 Price: <b>{price}</b>\n\n"
+            "📊 <b>Price change</b>\n"
+            "• 1h: <b>{change_1h}</b>\n"
+            "• 4h: <b>{change_4h}</b>\n\n"
+            "📈 <b>Trend</b>: {trend}\n\n"
+            "🟢 <b>Overall</b>: {advice}\n\n"
+            "⏰ Signal time: {time} (Taipei)\n\n"),
+    "indicators": "\n\n📊 <b>Indicators</b>\n• RSI: {rsi}\n• MACD: {macd}",
+    "levels": ("\n\n🎯 <b>Targets</b>\n{target}\n\n"
+               "🛡️ <b>Stop loss</b>\n{stop}"),
+    "sell": ("🔴 <b>SELL SIGNAL</b> 🔴\n\n"
+             "{emoji} <b>{name} ({symbol})</b>\n"
+             "💰 Price: <b>{price}</b>\n\n"
+             "📊 <b>Price change</b>\n"
+             "• 1h: <b>{change_1h}</b>\n"
+             "• 4h: <b>{change_4h}</b>\n\n"
+             "📉 <b>Trend</b>: {trend}\n\n"
+             "🔴 <b>Action</b>: SELL\n"
+             "⚠️ <b>Risk</b>: trade carefully and watch the market\n\n"
+             "⏰ Signal time: {time} (Taipei)\n\n"),
+    "summary_header": "📊 <b>Crypto Market Overview</b> 📊\n\n⏰ Updated: {time} (Taipei)\n\n",
+    "summary_row": ("<b>{name}</b> | <b>{price}</b> | 1H:{change_1h} | 4H:{change_4h}\n"
+                    "15M:{trend_15m}({signal_15m}) | 1H:{trend_1h}({signal_1h})\n"
+                    "Overall: {advice}\n\n"),
+    "summary_footer": ("\n📈 <b>Signals</b>\n"
+                       "🟢 Buy: {buy}\n"
+                       "🔴 Sell: {sell}\n"
+                       "⚪ Hold: {neutral}\n\n"),
+}
+
+TEMPLATE_TEXT = {"zh-TW": ZH_TW, "en": EN}
+
+EN_ADVICE = {
+    Advice.CLEAR_LONG: "Clear long", Advice.CLEAR_SHORT: "Clear short", Advice.DOUBLE_RANGING: "Ranging on both",
+    Advice.DOUBLE_TANGLED: "Tangled on both", Advice.CAUTIOUS_LONG: "Cautious long",
+    Advice.CAUTIOUS_SHORT: "Cautious short", Advice.WAIT: "Wait",
+}
+EN_SIGNAL = {Signal.BUY: "🟢Buy", Signal.SELL: "🔴Sell", Signal.HOLD: "⚪Hold"}
+EN_TREND = {Trend.BULLISH: "Bullish", Trend.BEARISH: "Bearish", Trend.RANGING: "Ranging", Trend.TANGLED: "Tangled"}
+EN_TREND_EMOJI = {Trend.BULLISH: "📈", Trend.BEARISH: "📉", Trend.RANGING: "📊", Trend.TANGLED: "🔄"}
+
+class _KeepMissing(dict):
+    """format_map 時保留尚未提供的欄位 (供分段填入模板)"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+def _escape(value):
+    return str(value).replace("{", "{{").replace("}", "}}")
+
+def _fill_static(template, **values):
+    """填入固定欄位，動態欄位保留為 {key}"""
+    return template.format_map(_KeepMissing({key: _escape(value) for key, value in values.items()}))
+
+class MessageTemplates:
+    """一種語言的編譯後 HTML 模板 (以 get_templates 取得共用實例)"""
+
+    def __init__(self, language=DEFAULT_LANGUAGE):
+        if language not in TEMPLATE_TEXT:
+            print(f"⚠️ 不支援的訊息語言: {language}，改用 {DEFAULT_LANGUAGE}")
+            language = DEFAULT_LANGUAGE
+        self.language = language
+        self.text = TEMPLATE_TEXT[language]
+        self._symbols = {}
+        self._batch = None
+
+    def compiled(self, symbol):
+        """幣種的模板 (固定部分已填入)，第一次使用時編譯"""
+        if symbol not in self._symbols:
+            info = symbol_info(symbol)
+            self._symbols[symbol] = {
+                kind: _fill_static(self.text[kind], name=info["name"], emoji=info["emoji"], symbol=symbol)
+                for kind in ("buy", "sell", "summary_row")
+            }
+        return self._symbols[symbol]
+
+    def batch(self, now=None):
+        """一批訊息的渲染器 (共用同一個時間戳記；未指定時間時同一秒內重用)"""
+        if now is not None:
+            return MessageBatch(self, now)
+        second = int(time.time())
+        if self._batch is None or self._batch[0] != second:
+            self._batch = (second, MessageBatch(self))
+        return self._batch[1]
+
+class MessageBatch:
+    """同一批訊息的渲染器，時間戳記只格式化一次"""
+
+    def __init__(self, templates, now=None):
+        self.templates = templates
+        self.text = templates.text
+        now = now or datetime.now(TAIPEI_TZ)
+        self.time = now.strftime('%Y-%m-%d %H:%M:%S')
+        self.english = templates.language == "en"
+
+    def _trend_text(self, data):
+        result = result_from_report(data.get("1h")) if self.english else None
+        if result is None:
+            return data['current_trend']
+        return f"{EN_TREND[result.trend]}{' (strong)' if result.strong else ''}"
+
+    def advice_label(self, advice):
+        return EN_ADVICE[advice] if self.english else advice.label
+
+    def _details(self, data):
+        """技術指標摘要與入場建議 (報告沒有這些數據時為空字串)"""
+        if not data or "technical_indicators_summary" not in data:
+            return ""
+        result = result_from_report(data.get("1h")) if self.english else None
+        if self.english and result is not None:
+            p = result.pivots
+            price = result.current_price
+            details = self.text["indicators"].format(
+                rsi=f"{result.indicators.rsi14:.1f}",
+                macd=f"DIF {result.indicators.dif:.4f} / DEA {result.indicators.dea:.4f}")
+            return details + self.text["levels"].format(
+                target=f"R1: {p.r1:.2f} ({(p.r1 - price) / price * 100:+.1f}%), R2: {p.r2:.2f} ({(p.r2 - price) / price * 100:+.1f}%)",
+                stop=f"S1: {p.s1:.2f} ({(p.s1 - price) / price * 100:+.1f}%), S2: {p.s2:.2f} ({(p.s2 - price) / price * 100:+.1f}%)")
+
+        summary = data["technical_indicators_summary"]
+        details = self.text["indicators"].format(rsi=summary.get('RSI', 'N/A'), macd=summary.get('MACD', 'N/A'))
+        if "analysis_result" in data and not self.english:
+            result = data["analysis_result"]
+            details += self.text["levels"].format(entry=result.get('入場時機', 'N/A'),
+                                                  target=result.get('目標價位', 'N/A'),
+                                                  stop=result.get('止損設定', 'N/A'))
+        return details
+
+    def buy_signal(self, symbol, price, change_1h, change_4h, trend, advice, analysis_data=None):
+        """買入訊號 (advice 為已翻譯的綜合建議文字)"""
+        message = self.templates.compiled(symbol)["buy"].format(
+            price=format_price(price), change_1h=f"{change_1h:+.2f}%", change_4h=f"{change_4h:+.2f}%",
+            trend=trend, advice=advice, time=self.time)
+        return message + self._details(analysis_data)
+
+    def sell_signal(self, symbol, price, change_1h, change_4h, trend):
+        return self.templates.compiled(symbol)["sell"].format(
+            price=format_price(price), change_1h=f"{change_1h:+.2f}%", change_4h=f"{change_4h:+.2f}%",
+            trend=trend, time=self.time)
+
+    def signal(self, kind, symbol, data, symbol_signal):
+        """
+        由報告產生買入 (kind="buy") 或賣出訊號
+
+        Args:
+            data (dict): 幣種報告
+            symbol_signal (SymbolSignal): 綜合建議
+        """
+        price = data['current_price']
+        change_1h = data.get('1h_change_percent', 0)
+        change_4h = data.get('4h_change_percent', 0)
+        trend = self._trend_text(data)
+        if kind == "buy":
+            return self.buy_signal(symbol, price, change_1h, change_4h, trend,
+                                   self.advice_label(symbol_signal.advice), data)
+        return self.sell_signal(symbol, price, change_1h, change_4h, trend)
+
+    def market_summary(self, analysis_data, signals, symbols=None):
+        """
+        市場總覽
+
+        Args:
+            analysis_data (Mapping): 分析報告
+            signals (SignalSnapshot): 綜合建議
+            symbols (Collection): 只列出這些幣種 (依報告順序)，None 為全部
+        """
+        return "".join(self.market_summary_parts(analysis_data, signals, symbols))
+
+    def market_summary_parts(self, analysis_data, signals, symbols=None):
+        """市場總覽的各段 (標題、每個幣種一段、統計)，供 pack_messages 在幣種之間分段"""
+        parts = [self.text["summary_header"].format(time=self.time)]
+        counts = {"buy": 0, "sell": 0, "neutral": 0}
+        for symbol in analysis_data:
+            if symbols is not None and symbol not in symbols:
+                continue
+            data = analysis_data[symbol]
+            symbol_signal = signals[symbol]
+            if symbol_signal.is_buy:
+                counts["buy"] += 1
+            elif symbol_signal.is_sell:
+                counts["sell"] += 1
+            else:
+                counts["neutral"] += 1  # 謹慎做多/空不發送買賣信號
+
+            trends = {tf: symbol_signal.trend(tf) for tf in ("15m", "1h")}
+            if self.english:
+                trend_text = {tf: EN_TREND_EMOJI[t] + EN_TREND[t] for tf, t in trends.items()}
+                signal_text = {tf: EN_SIGNAL[symbol_signal.signal(tf)] for tf in trends}
+                advice = ADVICE_EMOJI[symbol_signal.advice] + EN_ADVICE[symbol_signal.advice]
+            else:
+                trend_text = {tf: trend_display(t) for tf, t in trends.items()}
+                signal_text = {tf: symbol_signal.signal(tf).display for tf in trends}
+                advice = symbol_signal.advice.display
+            parts.append(self.templates.compiled(symbol)["summary_row"].format(
+                price=format_price(data['current_price']), change_1h=f"{data.get('1h_change_percent', 0):+.2f}%",
+                change_4h=f"{data.get('4h_change_percent', 0):+.2f}%", trend_15m=trend_text["15m"],
+                signal_15m=signal_text["15m"], trend_1h=trend_text["1h"], signal_1h=signal_text["1h"], advice=advice))
+        parts.append(self.text["summary_footer"].format(**counts))
+        return parts
+
+def message_length(text):
+    """Telegram 計算的訊息長度 (UTF-16 單位，emoji 等字元佔 2)"""
+    return len(text.encode("utf-16-le")) // 2
+
+_HTML_TOKEN = re.compile(r"<[^>]*>|&#?\w+;|.", re.S)  # 標籤、實體或單一字元
+_HTML_TAG = re.compile(r"<(/?)([A-Za-z][\w-]*)")
+
+def _track_tag(open_tags, token):
+    """依標籤更新仍開啟的標籤列表 [(名稱, 開始標籤)]"""
+    match = _HTML_TAG.match(token)
+    if not match:
+        return
+    closing, name = match.groups()
+    if not closing:
+        open_tags.append((name, token))
+        return
+    for i in range(len(open_tags) - 1, -1, -1):
+        if open_tags[i][0] == name:
+            del open_tags[i]
+            break
+
+def _closing_tags(open_tags):
+    return "".join(f"</{name}>" for name, _ in reversed(open_tags))
+
+def _split_piece(piece, limit):
+    """
+    把超過上限的一段切成多段 (優先在換行處切開，單行仍超過上限時在字元之間切開)
+
+    只在 HTML 標籤與實體之間切開；切開處仍開啟的標籤在該段結尾關閉，並在下一段開頭重新開啟，
+    每段 (含補上的標籤) 都不超過 limit 個 UTF-16 單位。
+    """
+    chunks = []
+    open_tags = []
+    current = []
+    size = 0
+    has_content = False
+
+    def flush():
+        nonlocal size, has_content
+        chunks.append("".join(current) + _closing_tags(open_tags))
+        reopen = "".join(tag for _, tag in open_tags)
+        current[:] = [reopen]
+        size = message_length(reopen)
+        has_content = False
+
+    def add(text, length, tags):
+        nonlocal size, has_content
+        if has_content and size + length + message_length(_closing_tags(tags)) > limit:
+            flush()
+        current.append(text)
+        size += length
+        open_tags[:] = tags
+        has_content = True
+
+    for line in piece.splitlines(keepends=True):
+        tokens = _HTML_TOKEN.findall(line)
+        tags = list(open_tags)
+        for token in tokens:
+            _track_tag(tags, token)
+        length = message_length(line)
+        reopen = message_length("".join(tag for _, tag in open_tags))
+        if reopen + length + message_length(_closing_tags(tags)) <= limit:
+            add(line, length, tags)  # 整行放得進一段 (必要時先換下一段)
+            continue
+        for token in tokens:
+            tags = list(open_tags)
+            _track_tag(tags, token)
+            add(token, message_length(token), tags)
+    if has_content:
+        chunks.append("".join(current) + _closing_tags(open_tags))
+    return chunks
+
+def _split_section(pieces, limit):
+    """把超過上限的一則訊息在段落之間切成多則"""
+    messages = []
+    current = ""
+    for piece in pieces:
+        for chunk in ([piece] if message_length(piece) <= limit else _split_piece(piece, limit)):
+            if current and message_length(current) + message_length(chunk) > limit:
+                messages.append(current)
+                current = ""
+            current += chunk
+    if current:
+        messages.append(current)
+    return messages
+
+def pack_messages(sections, limit=MESSAGE_LIMIT, coalesce=True):
+    """
+    把訊息排成不超過 limit 的 Telegram 訊息
+
+    Args:
+        sections (list): 原本的每則訊息，各為一個字串列表 (可在列表元素之間分段，
+            例如 market_summary_parts 的每個幣種；每個元素的 HTML 標籤須自行成對)
+        limit (int): 單則訊息上限
+        coalesce (bool): 是否把多則訊息合併 (以 SECTION_DIVIDER 分隔)；False 時只分段過長的訊息
+
+    Returns:
+        list: 要發送的訊息文字 (單獨發送的訊息內容不變)
+    """
+    messages = []
+    current = []
+    size = 0
+    divider = message_length(SECTION_DIVIDER)
+
+    def flush():
+        if len(current) == 1:
+            messages.append(current[0])
+        elif current:
+            messages.append(SECTION_DIVIDER.join(text.rstrip("\n") for text in current))
+        current.clear()
+
+    for pieces in sections:
+        text = "".join(pieces)
+        length = message_length(text)
+        if length > limit:
+            flush()
+            chunks = _split_section(pieces, limit)
+            messages.extend(chunks if not coalesce else chunks[:-1])
+            if coalesce:
+                # 最後一段可以再接上後面的訊息
+                current.append(chunks[-1])
+                size = message_length(chunks[-1])
+        elif coalesce and current and size + divider + length <= limit:
+            current.append(text)
+            size += divider + length
+        else:
+            flush()
+            current.append(text)
+            size = length
+    flush()
+    return messages
+
+_TEMPLATES = {}
+
+def get_templates(language=DEFAULT_LANGUAGE):
+    """共用的 MessageTemplates (每種語言只編譯一次)"""
+    language = language or DEFAULT_LANGUAGE
+    if language not in _TEMPLATES:
+        _TEMPLATES[language] = MessageTemplates(language)
+    return _TEMPLATES[language]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+訊號狀態
+Persistent signal state for change-only Telegram notifications
+
+記錄每個 (幣種, 時間框架) 最後觀察到的信號與該 K 線的收盤時間，以及每個幣種的
+綜合建議最後通知的內容。排程每次執行只通知「狀態轉換」：
+
+- 綜合建議變成明確看多 / 明確看空 (上次觀察到的不同) 時通知
+- 同一根 K 線內已通知過相同建議時不再通知 (避免未收盤 K 線來回變化造成重複訊息)
+- 報告的 K 線比已記錄的舊 (讀到過期報告) 時不通知也不更新狀態
+- 設定提醒間隔 (SIGNAL_REMINDER_HOURS) 時，建議持續不變超過間隔會再提醒一次
+
+同一個檔案也記錄每個聊天最後一則市場總覽的訊息 ID，供 TELEGRAM_EDIT_SUMMARY 以
+editMessageText 更新先前的總覽而不發送新訊息。
+
+狀態存放在 data/signal_state.json (SIGNAL_STATE_FILE)。
+"""
+import json
+import os
+import sys
+import time
+
+# K 線時間框架定義位於專案根目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_format import result_from_report
+from kline_store import INTERVAL_MS
+
+SIGNAL_STATE_FILE = "data/signal_state.json"
+STATE_VERSION = 1
+
+def candle_close_time(analysis, timeframe):
+    """
+    報告中某時間框架所分析 K 線的收盤時間 (毫秒)
+
+    優先讀取 typed；JSON 報告讀取 render_symbol 寫入的 candle_close_time。
+
+    Returns:
+        int: 報告沒有 K 線時間 (舊版報告或分析失敗) 時為 None
+    """
+    frame = analysis.get(timeframe)
+    result = result_from_report(frame)
+    if result is None:
+        return frame.get("candle_close_time") if isinstance(frame, dict) else None
+    if not result.open_time or timeframe not in INTERVAL_MS:
+        return None
+    return result.open_time + INTERVAL_MS[timeframe]
+
+class SignalStateStore:
+    """
+    最後發送的訊號狀態
+
+    用法:
+        state = SignalStateStore(reminder_ttl=6 * 3600)
+        due = state.due(signals, symbols)        # 需要通知的幣種
+        ... 只發送 due 中的訊號 ...
+        state.record(signals, symbols, notified=due)
+        state.save()
+    """
+
+    def __init__(self, path=SIGNAL_STATE_FILE, reminder_ttl=0):
+        """
+        Args:
+            path (str): 狀態檔案路徑
+            reminder_ttl (float): 建議不變時再次提醒的間隔 (秒)，0 表示只在狀態轉換時通知
+        """
+        self.path = path
+        self.reminder_ttl = reminder_ttl
+        self.entries = {}
+        self.summaries = {}
+        self._pending_summaries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("version") == STATE_VERSION:
+                    self.entries = state.get("signals", {})
+                    self.summaries = state.get("summaries", {})
+                else:
+                    print(f"⚠️ 不支援的訊號狀態版本: {state.get('version')}，重新記錄")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 無法讀取訊號狀態 {path}: {e}，重新記錄")
+
+    @staticmethod
+    def _key(symbol, timeframe):
+        return f"{symbol}|{timeframe}"
+
+    @staticmethod
+    def _combined(symbol_signal):
+        """綜合建議的時間框架名稱，例如 15m+1h"""
+        return "+".join(symbol_signal.timeframes)
+
+    def _candle(self, signals, symbol_signal):
+        """各時間框架 K 線收盤時間中最新者 (報告沒有 K 線時間時為 None)"""
+        analysis = signals.report[symbol_signal.symbol]
+        closes = [candle_close_time(analysis, tf) for tf in symbol_signal.timeframes]
+        closes = [close for close in closes if close is not None]
+        return max(closes) if closes else None
+
+    def _is_stale(self, entry, candle):
+        return entry is not None and candle is not None and candle < (entry.get("candle_close") or 0)
+
+    def due(self, signals, symbols, now=None):
+        """
+        需要通知的幣種 (綜合建議為明確看多 / 明確看空且為狀態轉換或到了提醒時間)
+
+        Args:
+            signals (SignalSnapshot): 綜合建議
+            symbols (list): 要檢查的幣種
+
+        Returns:
+            list: 需要通知的幣種 (依 symbols 順序)
+        """
+        now = time.time() if now is None else now
+        due = []
+        for symbol in symbols:
+            symbol_signal = signals[symbol]
+            if not (symbol_signal.is_buy or symbol_signal.is_sell):
+                continue
+            advice = int(symbol_signal.advice)
+            candle = self._candle(signals, symbol_signal)
+            entry = self.entries.get(self._key(symbol, self._combined(symbol_signal)))
+            if entry is None:
+                due.append(symbol)
+            elif self._is_stale(entry, candle):
+                continue
+            elif entry.get("signal") != advice:
+                # 同一根 K 線內已通知過相同建議 (中間短暫變化) 不再通知
+                if not (entry.get("notified") == advice and candle is not None
+                        and entry.get("notified_candle") == candle):
+                    due.append(symbol)
+            elif (self.reminder_ttl and entry.get("notified") == advice
+                  and now - entry.get("notified_at", 0) >= self.reminder_ttl):
+                due.append(symbol)
+        return due
+
+    def record(self, signals, symbols, notified=(), now=None):
+        """
+        記錄本次觀察到的狀態 (過期的報告不更新)
+
+        Args:
+            signals (SignalSnapshot): 綜合建議
+            symbols (list): 本次檢查的幣種
+            notified (list): 已通知的幣種
+        """
+        now = time.time() if now is None else now
+        notified = set(notified)
+        for symbol in symbols:
+            symbol_signal = signals[symbol]
+            analysis = signals.report[symbol]
+            candle = self._candle(signals, symbol_signal)
+            key = self._key(symbol, self._combined(symbol_signal))
+            entry = self.entries.get(key)
+            if self._is_stale(entry, candle):
+                continue
+
+            for timeframe, signal in zip(symbol_signal.timeframes, symbol_signal.signals):
+                self.entries[self._key(symbol, timeframe)] = {
+                    "signal": int(signal), "candle_close": candle_close_time(analysis, timeframe)}
+
+            entry = dict(entry or {}, signal=int(symbol_signal.advice), candle_close=candle)
+            if symbol in notified:
+                entry.update(notified=int(symbol_signal.advice), notified_candle=candle, notified_at=now)
+            self.entries[key] = entry
+
+    def summary_message(self, chat_id):
+        """聊天最後一則市場總覽的訊息 ID (沒有記錄時為 None)"""
+        return self.summaries.get(str(chat_id))
+
+    def track_summary(self, chat_id, delivery):
+        """
+        記錄本次發送的市場總覽，save() 時若已送達則保存其訊息 ID
+
+        Args:
+            delivery (Delivery): 總覽的發送結果，None 表示不再編輯先前的總覽 (例如本次總覽分成多則)
+        """
+        self._pending_summaries[str(chat_id)] = delivery
+
+    def save(self):
+        for chat_id, delivery in self._pending_summaries.items():
+            if delivery is None:
+                self.summaries.pop(chat_id, None)
+            elif delivery.message_id is not None:
+                self.summaries[chat_id] = delivery.message_id
+        self._pending_summaries = {}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "signals": self.entries, "summaries": self.summaries}, f,
+                      indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
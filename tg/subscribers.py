@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telegram 訂閱者
+Subscriber registry and per-variant message fan-out
+
+訂閱者清單存放在 JSON 或 SQLite (副檔名 .db / .sqlite / .sqlite3) 檔案中 (預設
+tg/subscribers.json，可用 SUBSCRIBERS_FILE 環境變數指定)，每位訂閱者可設定關注的幣種
+、要接收的訊息類型與語言。TELEGRAM_CHAT_ID 若有設定，也視為關注全部幣種的訂閱者。
+
+fan_out() 對每種不同的內容只渲染一次 (市場總覽依語言與關注的幣種組合、買賣訊號依語言與幣種)，
+再把同一份文字排入所有符合條件的聊天，由 TelegramQueue 並行發送。coalesce=True 時同一位
+訂閱者的總覽與訊號合併成盡量少的訊息，summary_state 提供時以 editMessageText 更新上一次的總覽。
+
+用法:
+    python tg/subscribers.py list
+    python tg/subscribers.py add 123456789 --symbols BTCUSDT ETHUSDT --no-sell --language en
+    python tg/subscribers.py remove 123456789
+"""
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+
+try:
+    from .message_templates import get_templates, pack_messages
+    from .telegram_config import config
+except ImportError:
+    from message_templates import get_templates, pack_messages
+    from telegram_config import config
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+@dataclass
+class Subscriber:
+    """一位訂閱者 (symbols 為空表示關注全部幣種，language 為空表示使用 MESSAGE_LANGUAGE)"""
+    __slots__ = ("chat_id", "symbols", "buy_signals", "sell_signals", "market_summary", "language")
+    chat_id: str
+    symbols: tuple
+    buy_signals: bool
+    sell_signals: bool
+    market_summary: bool
+    language: str
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(str(data["chat_id"]), tuple(data.get("symbols") or ()), bool(data.get("buy_signals", True)),
+                   bool(data.get("sell_signals", True)), bool(data.get("market_summary", True)),
+                   data.get("language") or "")
+
+    def to_dict(self):
+        return {"chat_id": self.chat_id, "symbols": list(self.symbols), "buy_signals": self.buy_signals,
+                "sell_signals": self.sell_signals, "market_summary": self.market_summary, "language": self.language}
+
+    def wants(self, symbol):
+        return not self.symbols or symbol in self.symbols
+
+class SubscriberRegistry:
+    """訂閱者清單 (JSON 或 SQLite，依副檔名選擇)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.backend = "sqlite" if path.lower().endswith(SQLITE_SUFFIXES) else "json"
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("""CREATE TABLE IF NOT EXISTS subscribers (
+            chat_id TEXT PRIMARY KEY,
+            symbols TEXT NOT NULL DEFAULT '',
+            buy_signals INTEGER NOT NULL DEFAULT 1,
+            sell_signals INTEGER NOT NULL DEFAULT 1,
+            market_summary INTEGER NOT NULL DEFAULT 1,
+            language TEXT NOT NULL DEFAULT ''
+        )""")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(subscribers)")}
+        if "language" not in columns:
+            conn.execute("ALTER TABLE subscribers ADD COLUMN language TEXT NOT NULL DEFAULT ''")
+        return conn
+
+    def load(self):
+        """
+        Returns:
+            list: Subscriber 列表，檔案不存在時為空
+        """
+        if not os.path.exists(self.path):
+            return []
+        if self.backend == "json":
+            with open(self.path, "r", encoding="utf-8") as f:
+                return [Subscriber.from_dict(item) for item in json.load(f).get("subscribers", [])]
+        with self._connect() as conn:
+            rows = conn.execute("SELECT chat_id, symbols, buy_signals, sell_signals, market_summary, language "
+                                "FROM subscribers ORDER BY rowid").fetchall()
+        return [Subscriber(chat_id, tuple(s for s in symbols.split(",") if s), bool(buy), bool(sell), bool(summary),
+                           language)
+                for chat_id, symbols, buy, sell, summary, language in rows]
+
+    def _save_json(self, subscribers):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"subscribers": [s.to_dict() for s in subscribers]}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def add(self, subscriber):
+        """新增或更新訂閱者"""
+        if self.backend == "json":
+            subscribers = [s for s in self.load() if s.chat_id != subscriber.chat_id]
+            self._save_json(subscribers + [subscriber])
+            return
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO subscribers "
+                         "(chat_id, symbols, buy_signals, sell_signals, market_summary, language) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (subscriber.chat_id, ",".join(subscriber.symbols), int(subscriber.buy_signals),
+                          int(subscriber.sell_signals), int(subscriber.market_summary), subscriber.language))
+
+    def remove(self, chat_id):
+        """
+        Returns:
+            bool: 是否有刪除
+        """
+        chat_id = str(chat_id)
+        if self.backend == "json":
+            subscribers = self.load()
+            remaining = [s for s in subscribers if s.chat_id != chat_id]
+            if len(remaining) == len(subscribers):
+                return False
+            self._save_json(remaining)
+            return True
+        if not os.path.exists(self.path):
+            return False
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM subscribers WHERE chat_id = ?", (chat_id,)).rowcount > 0
+
+def load_subscribers(cfg=config):
+    """
+    訂閱者清單加上 TELEGRAM_CHAT_ID (若有設定且不在清單中)
+
+    Returns:
+        list: Subscriber 列表
+    """
+    subscribers = SubscriberRegistry(cfg.SUBSCRIBERS_FILE).load() if cfg.SUBSCRIBERS_FILE else []
+    if cfg.CHAT_ID and all(s.chat_id != str(cfg.CHAT_ID) for s in subscribers):
+        subscribers.insert(0, Subscriber(str(cfg.CHAT_ID), (), True, True, True, ""))
+    return subscribers
+
+def fan_out(queue, subscribers, analysis_data, signals, buy_symbols=(), sell_symbols=(), send_summary=True,
+            send_buy=True, send_sell=True, summary_requires_buy=False, language=None, coalesce=False,
+            summary_state=None):
+    """
+    把訊息排入所有符合條件的訂閱者，每種內容只渲染一次
+
+    每位訂閱者依序收到: 市場總覽 (只列出關注的幣種)、買入訊號、賣出訊號。超過 4096 字元
+    的訊息在幣種之間分段。
+
+    Args:
+        queue (TelegramQueue): 發送佇列 (呼叫端 deliver)
+        subscribers (list): Subscriber 列表
+        analysis_data (Mapping): 分析報告
+        signals (SignalSnapshot): 綜合建議
+        buy_symbols (list): 有買入訊號的幣種
+        sell_symbols (list): 有賣出訊號的幣種
+        send_summary (bool): 是否發送市場總覽
+        send_buy (bool): 是否發送買入訊號
+        send_sell (bool): 是否發送賣出訊號
+        summary_requires_buy (bool): 只在訂閱者關注的幣種有買入訊號時才發送市場總覽
+        language (str): 訂閱者未指定語言時使用的語言，預設為 MESSAGE_LANGUAGE
+        coalesce (bool): 把同一位訂閱者的訊息合併成盡量少的訊息
+        summary_state (SignalStateStore): 提供時以 editMessageText 更新每個聊天上一次的市場總覽
+            (總覽單獨一則)，呼叫端 deliver 後 save() 記錄新的訊息 ID
+
+    Returns:
+        int: 排入的訊息數
+    """
+    language = language or config.MESSAGE_LANGUAGE
+    batches = {}  # 每種語言一個渲染器，整批訊息共用同一個時間戳記
+    summaries = {}
+    texts = {}
+    packed = {}  # 內容相同的訂閱者共用同一組分段結果
+    queued = 0
+
+    def batch(lang):
+        if lang not in batches:
+            batches[lang] = get_templates(lang).batch()
+        return batches[lang]
+
+    def render(lang, kind, symbol):
+        if (lang, kind, symbol) not in texts:
+            texts[lang, kind, symbol] = batch(lang).signal(kind, symbol, analysis_data[symbol], signals[symbol])
+        return texts[lang, kind, symbol]
+
+    def pack(summary_key, signal_keys):
+        sections = [[render(*key)] for key in signal_keys]
+        if summary_key is None:
+            return [], pack_messages(sections, coalesce=coalesce)
+        summary = summaries[summary_key]
+        if summary_state is not None:
+            return pack_messages([summary]), pack_messages(sections, coalesce=coalesce)
+        return [], pack_messages([summary] + sections, coalesce=coalesce)
+
+    for subscriber in subscribers:
+        lang = subscriber.language or language
+        buys = [symbol for symbol in buy_symbols if subscriber.wants(symbol)]
+        sells = [symbol for symbol in sell_symbols if subscriber.wants(symbol)]
+
+        summary_key = None
+        if send_summary and subscriber.market_summary and (buys or not summary_requires_buy):
+            # 總覽依報告順序列出，關注的幣種組合相同 (不論順序) 就共用同一份文字
+            summary_key = (lang, frozenset(subscriber.symbols))
+            if summary_key not in summaries:
+                summaries[summary_key] = batch(lang).market_summary_parts(analysis_data, signals,
+                                                                          summary_key[1] or None)
+        signal_keys = []
+        if send_buy and subscriber.buy_signals:
+            signal_keys += [(lang, "buy", symbol) for symbol in buys]
+        if send_sell and subscriber.sell_signals:
+            signal_keys += [(lang, "sell", symbol) for symbol in sells]
+
+        key = (summary_key, tuple(signal_keys))
+        if key not in packed:
+            packed[key] = pack(summary_key, signal_keys)
+        summary_messages, messages = packed[key]
+
+        if summary_messages:
+            # 總覽只有一則時才編輯先前的總覽，分成多則時改為發送新訊息並不再編輯
+            single = len(summary_messages) == 1
+            edit_message_id = summary_state.summary_message(subscriber.chat_id) if single else None
+            for text in summary_messages:
+                delivery = queue.submit(subscriber.chat_id, text, edit_message_id=edit_message_id)
+            summary_state.track_summary(subscriber.chat_id, delivery if single else None)
+        for text in messages:
+            queue.submit(subscriber.chat_id, text)
+        queued += len(summary_messages) + len(messages)
+
+    print(f"📬 {len(subscribers)} 位訂閱者: 渲染 {len(summaries) + len(texts)} 種訊息，排入 {queued} 則")
+    return queued
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="管理 Telegram 訂閱者")
+    parser.add_argument("--file", default=config.SUBSCRIBERS_FILE,
+                        help="訂閱者檔案 (.json 或 .db / .sqlite)，預設讀取 SUBSCRIBERS_FILE 環境變數")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="列出訂閱者")
+    add = commands.add_parser("add", help="新增或更新訂閱者")
+    add.add_argument("chat_id")
+    add.add_argument("--symbols", nargs="+", default=[], help="關注的幣種，省略為全部")
+    add.add_argument("--no-buy", action="store_true", help="不接收買入訊號")
+    add.add_argument("--no-sell", action="store_true", help="不接收賣出訊號")
+    add.add_argument("--no-summary", action="store_true", help="不接收市場總覽")
+    add.add_argument("--language", default="", help="訊息語言 (zh-TW / en)，省略為 MESSAGE_LANGUAGE")
+    remove = commands.add_parser("remove", help="刪除訂閱者")
+    remove.add_argument("chat_id")
+    args = parser.parse_args()
+
+    registry = SubscriberRegistry(args.file)
+    if args.command == "add":
+        registry.add(Subscriber(args.chat_id, tuple(args.symbols), not args.no_buy, not args.no_sell,
+                                not args.no_summary, args.language))
+        print(f"✅ 已儲存訂閱者 {args.chat_id} ({args.file})")
+    elif args.command == "remove":
+        if not registry.remove(args.chat_id):
+            print(f"⚠️ 找不到訂閱者 {args.chat_id}")
+            return 1
+        print(f"✅ 已刪除訂閱者 {args.chat_id}")
+    else:
+        subscribers = registry.load()
+        print(f"📋 {args.file}: {len(subscribers)} 位訂閱者")
+        for s in subscribers:
+            kinds = [name for name, enabled in (("買入", s.buy_signals), ("賣出", s.sell_signals),
+                                                ("總覽", s.market_summary)) if enabled]
+            print(f"  {s.chat_id}: {', '.join(s.symbols) or '全部幣種'} | {'/'.join(kinds) or '無'}"
+                  f" | {s.language or config.MESSAGE_LANGUAGE}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
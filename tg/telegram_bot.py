@@ -5,24 +5,37 @@ Telegram Bot for Cryptocurrency Buy/Sell Signals
 發送虛擬幣買入/賣出訊號到 Telegram Bot
 """
 
-import requests
-import json
 import os
-from datetime import datetime
-import pytz
+import sys
+# 報告讀取模組位於專案根目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from report_store import REPORT_FILE, open_report
+from signal_engine import SignalSnapshot
+
+try:
+    from .message_templates import DEFAULT_LANGUAGE, get_templates
+    from .telegram_queue import TelegramQueue
+except ImportError:
+    from message_templates import DEFAULT_LANGUAGE, get_templates
+    from telegram_queue import TelegramQueue
 
 class TelegramBot:
-    def __init__(self, bot_token, chat_id):
+    def __init__(self, bot_token, chat_id, queue=None, language=DEFAULT_LANGUAGE):
         """
         初始化 Telegram Bot
         
         Args:
             bot_token (str): Telegram Bot Token
             chat_id (str): Telegram Chat ID (可以是個人或群組)
+            queue (TelegramQueue): 發送佇列；提供時訊息只排入佇列，由呼叫端 queue.deliver() 一次發送
+            language (str): 訊息語言 (zh-TW / en)
         """
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{bot_token}"
+        self.queue = queue
+        self.templates = get_templates(language)
+        self._direct_queue = None
     
     def send_message(self, message, parse_mode="HTML"):
         """
@@ -33,26 +46,21 @@ class TelegramBot:
             parse_mode (str): 訊息格式 (HTML 或 Markdown)
         
         Returns:
-            dict: API 回應結果
+            dict: API 回應結果 (失敗為 None)；使用佇列時為排入的 Delivery
         """
-        url = f"{self.base_url}/sendMessage"
-        payload = {
-            "chat_id": self.chat_id,
-            "text": message,
-            "parse_mode": parse_mode
-        }
-        
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"❌ 發送 Telegram 訊息失敗: {e}")
-            return None
+        if self.queue is not None:
+            return self.queue.submit(self.chat_id, message, parse_mode)
+        
+        # 沒有佇列時立即發送 (同樣處理 429 retry_after 與 5xx 重試)
+        if self._direct_queue is None:
+            self._direct_queue = TelegramQueue(self.bot_token)
+        delivery = self._direct_queue.submit(self.chat_id, message, parse_mode)
+        self._direct_queue.deliver(report=False)
+        return delivery.result
     
-    def send_buy_signal(self, symbol, price, change_1h, change_4h, change_24h, trend, analysis_data=None, combined_advice=None):
+    def format_buy_signal(self, symbol, price, change_1h, change_4h, change_24h, trend, analysis_data=None, combined_advice=None):
         """
-        發送買入訊號
+        產生買入訊號訊息
         
         Args:
             symbol (str): 交易對符號
@@ -68,268 +76,64 @@ class TelegramBot:
         if combined_advice is None:
             raise ValueError("combined_advice 參數是必須的，不能為 None")
         
-        # 幣種名稱和圖標映射
-        symbol_names = {
-            "BTCUSDT": {"name": "BTC", "icon": "₿", "emoji": "🟠"},
-            "ETHUSDT": {"name": "ETH", "icon": "Ξ", "emoji": "🔵"},
-            "SOLUSDT": {"name": "SOL", "icon": "◎", "emoji": "🟣"},
-            "DOGEUSDT": {"name": "DOGE", "icon": "🐕", "emoji": "🟡"},
-            "XRPUSDT": {"name": "XRP", "icon": "◆", "emoji": "🔷"},
-        }
-        
-        symbol_info = symbol_names.get(symbol, {"name": symbol, "icon": "💰", "emoji": "⚪"})
-        
-        # 台北時間
-        taipei_tz = pytz.timezone('Asia/Taipei')
-        current_time = datetime.now(taipei_tz).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 格式化價格
-        if price >= 1000:
-            price_str = f"${price:,.2f}"
-        elif price >= 1:
-            price_str = f"${price:.2f}"
-        else:
-            price_str = f"${price:.4f}"
-        
-        # 構建買入訊號訊息
-        message = f"""🚀 <b>{symbol_info['name']} BUY SIGNAL</b> 🚀
-
-{symbol_info['emoji']} <b>{symbol_info['name']} ({symbol})</b>
-💰 當前價格: <b>{price_str}</b>
-
-📊 <b>價格變化</b>
-• 1小時: <b>{change_1h:+.2f}%</b>
-• 4小時: <b>{change_4h:+.2f}%</b>
-
-📈 <b>趨勢分析</b>: {trend}
-
-🟢 <b>綜合建議</b>: {combined_advice}
-
-⏰ 訊號時間: {current_time} (台北時間)
-
-"""
-
-        # 如果有詳細分析數據，添加技術指標信息
-        if analysis_data and "technical_indicators_summary" in analysis_data:
-            tech_summary = analysis_data["technical_indicators_summary"]
-            message += f"""
-
-📊 <b>技術指標摘要</b>
-• RSI: {tech_summary.get('RSI', 'N/A')}
-• MACD: {tech_summary.get('MACD', 'N/A')}"""
-            
-            # 添加入場建議
-            if "analysis_result" in analysis_data:
-                result = analysis_data["analysis_result"]
-                message += f"""
-
-💡 <b>入場建議</b>
-{result.get('入場時機', 'N/A')}
-
-🎯 <b>目標價位</b>
-{result.get('目標價位', 'N/A')}
-
-🛡️ <b>止損設定</b>
-{result.get('止損設定', 'N/A')}"""
-        
-        return self.send_message(message)
+        return self.templates.batch().buy_signal(symbol, price, change_1h, change_4h, trend, combined_advice,
+                                                 analysis_data)
+    
+    def send_buy_signal(self, symbol, price, change_1h, change_4h, change_24h, trend, analysis_data=None, combined_advice=None):
+        """
+        發送買入訊號 (參數同 format_buy_signal)
+        """
+        return self.send_message(self.format_buy_signal(symbol, price, change_1h, change_4h, change_24h, trend,
+                                                        analysis_data, combined_advice))
+    
+    def format_sell_signal(self, symbol, price, change_1h, change_4h, change_24h, trend, analysis_data=None):
+        """
+        產生賣出訊號訊息
+        """
+        return self.templates.batch().sell_signal(symbol, price, change_1h, change_4h, trend)
     
     def send_sell_signal(self, symbol, price, change_1h, change_4h, change_24h, trend, analysis_data=None):
         """
-        發送賣出訊號
+        發送賣出訊號 (參數同 format_sell_signal)
         """
-        symbol_names = {
-            "BTCUSDT": {"name": "BTC", "icon": "₿", "emoji": "🟠"},
-            "ETHUSDT": {"name": "ETH", "icon": "Ξ", "emoji": "🔵"},
-            "SOLUSDT": {"name": "SOL", "icon": "◎", "emoji": "🟣"},
-            "DOGEUSDT": {"name": "DOGE", "icon": "🐕", "emoji": "🟡"},
-            "XRPUSDT": {"name": "XRP", "icon": "◆", "emoji": "🔷"},
-        }
-        
-        symbol_info = symbol_names.get(symbol, {"name": symbol, "icon": "💰", "emoji": "⚪"})
-        
-        taipei_tz = pytz.timezone('Asia/Taipei')
-        current_time = datetime.now(taipei_tz).strftime('%Y-%m-%d %H:%M:%S')
-        
-        if price >= 1000:
-            price_str = f"${price:,.2f}"
-        elif price >= 1:
-            price_str = f"${price:.2f}"
-        else:
-            price_str = f"${price:.4f}"
-        
-        message = f"""🔴 <b>賣出訊號 SELL SIGNAL</b> 🔴
-
-{symbol_info['emoji']} <b>{symbol_info['name']} ({symbol})</b>
-💰 當前價格: <b>{price_str}</b>
-
-📊 <b>價格變化</b>
-• 1小時: <b>{change_1h:+.2f}%</b>
-• 4小時: <b>{change_4h:+.2f}%</b>
-
-📉 <b>趨勢分析</b>: {trend}
-
-🔴 <b>建議操作</b>: 賣出 (SELL)
-⚠️ <b>風險提醒</b>: 謹慎操作，注意市場變化
-
-⏰ 訊號時間: {current_time} (台北時間)
-
-"""
-
-        return self.send_message(message)
+        return self.send_message(self.format_sell_signal(symbol, price, change_1h, change_4h, change_24h, trend,
+                                                         analysis_data))
     
-    def send_market_summary(self, analysis_data):
+    def format_market_summary(self, analysis_data, signals=None, symbols=None):
         """
-        發送市場總覽訊息
+        產生市場總覽訊息
         
         Args:
             analysis_data (dict): 所有幣種的分析數據
+            signals (SignalSnapshot): 已分類的綜合建議，None 時由 analysis_data 建立
+            symbols (list): 只列出這些幣種 (依報告順序)，None 為全部
         """
-        taipei_tz = pytz.timezone('Asia/Taipei')
-        current_time = datetime.now(taipei_tz).strftime('%Y-%m-%d %H:%M:%S')
-        
-        message = f"""📊 <b>虛擬幣市場總覽</b> 📊
-
-⏰ 更新時間: {current_time} (台北時間)
-
-"""
-        
-        buy_signals = []
-        sell_signals = []
-        neutral_signals = []
-        
-        for symbol, data in analysis_data.items():
-            price = data['current_price']
-            change_24h = data['24hr_change_percent']
-            change_1h = data.get('1h_change_percent', 0)
-            change_4h = data.get('4h_change_percent', 0)
-            trend = data['current_trend']
-            
-            # 使用與 README 相同的多時間框架信號判斷邏輯
-            trend_15m = "糾結"
-            trend_1h = "糾結"
-            
-            # 獲取多時間框架趨勢
-            if '15m' in data and 'trend_type' in data['15m']:
-                trend_15m = data['15m']['trend_type']
-            if '1h' in data and 'trend_type' in data['1h']:
-                trend_1h = data['1h']['trend_type']
-            else:
-                trend_1h = data.get('trend_type', '糾結')
-            
-            # 綜合建議邏輯 - 與 README 完全相同
-            if trend_15m == trend_1h and "糾結" not in trend_15m:
-                if "多頭" in trend_15m:
-                    signal = "🟢明確看多"
-                    buy_signals.append(symbol)
-                elif "空頭" in trend_15m:
-                    signal = "🔴明確看空"
-                    sell_signals.append(symbol)
-                else:
-                    signal = "📊雙重震盪"
-                    neutral_signals.append(symbol)
-            elif "糾結" in trend_15m and "糾結" in trend_1h:
-                signal = "⚪雙重糾結"
-                neutral_signals.append(symbol)
-            else:
-                # 時框分歧時的具體建議
-                if ("多頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "多頭" in trend_1h):
-                    signal = "🟡謹慎做多"
-                    neutral_signals.append(symbol)  # 謹慎做多不發送買入信號
-                elif ("空頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "空頭" in trend_1h):
-                    signal = "🟡謹慎做空"
-                    neutral_signals.append(symbol)  # 謹慎做空不發送賣出信號
-                else:
-                    signal = "⚪觀望等待"
-                    neutral_signals.append(symbol)
-            
-            # 格式化價格
-            if price >= 1000:
-                price_str = f"${price:,.2f}"
-            elif price >= 1:
-                price_str = f"${price:.2f}"
-            else:
-                price_str = f"${price:.4f}"
-            
-            symbol_names = {
-                "BTCUSDT": "BTC",
-                "ETHUSDT": "ETH",
-                "SOLUSDT": "SOL",
-                "DOGEUSDT": "DOGE",
-                "XRPUSDT": "XRP"
-            }
-            
-            name = symbol_names.get(symbol, symbol)
-            
-            # 獲取趨勢顯示和個別信號（與 README 邏輯一致）
-            trend_15m_display = "🔄糾結"
-            trend_1h_display = "🔄糾結"
-            signal_15m = "⚪觀望"
-            signal_1h = "⚪觀望"
-
-            if '15m' in data and 'trend_type' in data['15m']:
-                trend_type_15m = data['15m']['trend_type']
-                is_tangled_15m = data['15m'].get('ma_analysis', {}).get('is_tangled', True)
-                if trend_type_15m == "多頭":
-                    trend_15m_display = "📈多頭"
-                    signal_15m = "🟢買入" if not is_tangled_15m else "⚪觀望"
-                elif trend_type_15m == "空頭":
-                    trend_15m_display = "📉空頭"
-                    signal_15m = "🔴賣出" if not is_tangled_15m else "⚪觀望"
-                elif trend_type_15m == "震盪":
-                    trend_15m_display = "📊震盪"
-
-            if '1h' in data and 'trend_type' in data['1h']:
-                trend_type_1h = data['1h']['trend_type']
-                is_tangled_1h = data['1h'].get('ma_analysis', {}).get('is_tangled', True)
-                if trend_type_1h == "多頭":
-                    trend_1h_display = "📈多頭"
-                    signal_1h = "🟢買入" if not is_tangled_1h else "⚪觀望"
-                elif trend_type_1h == "空頭":
-                    trend_1h_display = "📉空頭"
-                    signal_1h = "🔴賣出" if not is_tangled_1h else "⚪觀望"
-                elif trend_type_1h == "震盪":
-                    trend_1h_display = "📊震盪"
-            else:
-                # 向後兼容
-                trend_type = data.get('trend_type', '糾結')
-                is_tangled = data.get('ma_analysis', {}).get('is_tangled', True)
-                if trend_type == "多頭":
-                    trend_1h_display = "📈多頭"
-                    signal_1h = "🟢買入" if not is_tangled else "⚪觀望"
-                elif trend_type == "空頭":
-                    trend_1h_display = "📉空頭"
-                    signal_1h = "🔴賣出" if not is_tangled else "⚪觀望"
-                elif trend_type == "震盪":
-                    trend_1h_display = "📊震盪"
-
-            # 格式化顯示 - 與 README 表格格式對齊
-            message += f"<b>{name}</b> | <b>{price_str}</b> | 1H:{change_1h:+.2f}% | 4H:{change_4h:+.2f}%\n"
-            message += f"15M:{trend_15m_display}({signal_15m}) | 1H:{trend_1h_display}({signal_1h})\n"
-            message += f"綜合: {signal}\n\n"
-        
-        # 添加統計信息
-        message += f"""
-📈 <b>信號統計</b>
-🟢 買入信號: {len(buy_signals)} 個
-🔴 賣出信號: {len(sell_signals)} 個  
-⚪ 觀望信號: {len(neutral_signals)} 個
-
-"""
-        
-        return self.send_message(message)
+        return self.templates.batch().market_summary(analysis_data, signals or SignalSnapshot(analysis_data), symbols)
+    
+    def send_market_summary(self, analysis_data, signals=None, symbols=None):
+        """
+        發送市場總覽訊息 (參數同 format_market_summary)
+        """
+        return self.send_message(self.format_market_summary(analysis_data, signals, symbols))
 
-def load_analysis_data():
+def load_analysis_data(symbols=None):
     """
     載入分析數據
+
+    Args:
+        symbols (Collection): 只載入這些幣種 (依報告順序)，None 為全部；compact 快照只解碼
+            這些幣種，其餘幣種讀完索引後即隨快照關閉，不會解碼
+
+    Returns:
+        dict: {symbol: 幣種報告}，讀取失敗為 None
     """
-    data_path = "data/multi_investment_report.json"
-    
     try:
-        with open(data_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open_report() as report:
+            if symbols is None:
+                return dict(report)
+            return {symbol: report[symbol] for symbol in report if symbol in symbols}
     except FileNotFoundError:
-        print(f"❌ 找不到分析數據文件: {data_path}")
+        print(f"❌ 找不到分析數據文件: {REPORT_FILE}")
         print("   請先執行 analyze_binance_data.py")
         return None
     except Exception as e:
@@ -350,13 +154,15 @@ def check_and_send_signals(bot_token, chat_id, send_summary=True):
     if not analysis_data:
         return
     
-    # 初始化 Telegram Bot
-    bot = TelegramBot(bot_token, chat_id)
+    # 初始化 Telegram Bot (訊息排入佇列，最後依速率限制一次發送)
+    queue = TelegramQueue(bot_token)
+    bot = TelegramBot(bot_token, chat_id, queue=queue)
+    signals = SignalSnapshot(analysis_data)
     
     # 發送市場總覽
     if send_summary:
         print("📊 發送市場總覽...")
-        bot.send_market_summary(analysis_data)
+        bot.send_market_summary(analysis_data, signals)
     
     # 檢查每個幣種的信號
     for symbol, data in analysis_data.items():
@@ -366,48 +172,15 @@ def check_and_send_signals(bot_token, chat_id, send_summary=True):
         change_4h = data.get('4h_change_percent', 0)
         trend = data['current_trend']
         
-        # 使用與 README 相同的多時間框架信號判斷邏輯
-        trend_15m = "糾結"
-        trend_1h = "糾結"
-        
-        # 獲取多時間框架趨勢（與 README 使用相同邏輯）
-        if '15m' in data and 'trend_type' in data['15m']:
-            trend_15m = data['15m']['trend_type']
-        if '1h' in data and 'trend_type' in data['1h']:
-            trend_1h = data['1h']['trend_type']
-        else:
-            # 向後兼容：如果沒有1h數據，使用根層級的趨勢數據
-            trend_1h = data.get('trend_type', '糾結')
-        
-        # 綜合建議邏輯判斷是否發送信號
-        should_send_buy = False
-        should_send_sell = False
-        
-        # 調試信息：顯示實際的趨勢判斷
-        print(f"📊 {symbol} 趨勢判斷: 15M={trend_15m}, 1H={trend_1h}")
-        
-        # 使用與 send_market_summary 完全相同的邏輯
-        combined_advice = ""
-        if trend_15m == trend_1h and "糾結" not in trend_15m:
-            if "多頭" in trend_15m:
-                combined_advice = "明確看多"
-                should_send_buy = True
-                print(f"✅ {symbol} 符合明確看多條件")
-            elif "空頭" in trend_15m:
-                combined_advice = "明確看空"
-                should_send_sell = True
-                print(f"✅ {symbol} 符合明確看空條件")
-        elif "糾結" in trend_15m and "糾結" in trend_1h:
-            combined_advice = "雙重糾結"
-            print(f"❌ {symbol} 雙重糾結，不發送信號")
+        # 綜合建議 (與 README、市場總覽共用 signal_engine)
+        symbol_signal = signals[symbol]
+        combined_advice = symbol_signal.advice.label
+        print(f"📊 {symbol} 趨勢判斷: 15M={symbol_signal.trend('15m').label}, 1H={symbol_signal.trend('1h').label}")
+        should_send_buy = symbol_signal.is_buy
+        should_send_sell = symbol_signal.is_sell
+        if should_send_buy or should_send_sell:
+            print(f"✅ {symbol} 符合{combined_advice}條件")
         else:
-            # 時框分歧時不發送任何信號
-            if ("多頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "多頭" in trend_1h):
-                combined_advice = "謹慎做多"
-            elif ("空頭" in trend_15m and "糾結" in trend_1h) or ("糾結" in trend_15m and "空頭" in trend_1h):
-                combined_advice = "謹慎做空"
-            else:
-                combined_advice = "觀望等待"
             print(f"❌ {symbol} {combined_advice}，不發送信號")
         
         # 發送買入信號
@@ -436,6 +209,8 @@ def check_and_send_signals(bot_token, chat_id, send_summary=True):
                 trend=trend,
                 analysis_data=data
             )
+    
+    queue.deliver()
 
 if __name__ == "__main__":
     # 從環境變數或配置文件讀取 Bot Token 和 Chat ID
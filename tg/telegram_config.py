@@ -24,10 +24,19 @@ class TelegramConfig:
         self.SEND_SELL_SIGNALS = os.getenv("SEND_SELL_SIGNALS", "true").lower() == "true"
         self.SEND_MARKET_SUMMARY = os.getenv("SEND_MARKET_SUMMARY", "true").lower() == "true"
         
+        # 只通知訊號狀態轉換 (見 signal_state.py)，SIGNAL_REMINDER_HOURS > 0 時狀態不變也定期提醒
+        self.SIGNAL_DEDUP = os.getenv("SIGNAL_DEDUP", "true").lower() == "true"
+        self.SIGNAL_STATE_FILE = os.getenv("SIGNAL_STATE_FILE", "data/signal_state.json")
+        self.SIGNAL_REMINDER_HOURS = float(os.getenv("SIGNAL_REMINDER_HOURS", "0"))
+        
         # 訊號觸發條件
         self.BUY_SIGNAL_THRESHOLD = float(os.getenv("BUY_SIGNAL_THRESHOLD", "1.0"))  # 買入信號閾值 (%)
         self.SELL_SIGNAL_THRESHOLD = float(os.getenv("SELL_SIGNAL_THRESHOLD", "-1.0"))  # 賣出信號閾值 (%)
         
+        # 多位訂閱者 (JSON 或 SQLite，見 subscribers.py)，TELEGRAM_CHAT_ID 也會收到訊息
+        self.SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE",
+                                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "subscribers.json"))
+        
         # 支援的幣種
         self.SUPPORTED_SYMBOLS = os.getenv("SUPPORTED_SYMBOLS", "BTCUSDT,ETHUSDT,SOLUSDT,XRPUSDT").split(",")
         
@@ -36,20 +45,29 @@ class TelegramConfig:
         self.INCLUDE_TECHNICAL_ANALYSIS = os.getenv("INCLUDE_TECHNICAL_ANALYSIS", "true").lower() == "true"
         
         # 進階設定
-        self.MESSAGE_INTERVAL = float(os.getenv("MESSAGE_INTERVAL", "1.0"))  # 發送間隔 (秒)
+        self.MESSAGE_INTERVAL = float(os.getenv("MESSAGE_INTERVAL", "1.0"))  # 同一聊天的初始發送間隔 (秒)，遇到 429 自動放慢
+        self.CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))  # 同一聊天可連續發送的則數
+        self.GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # 所有聊天合計每秒則數
+        self.MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "4"))  # 429 / 5xx / 連線錯誤的最大重試次數
+        self.COALESCE_MESSAGES = os.getenv("TELEGRAM_COALESCE", "false").lower() == "true"  # 合併訊息 (每則上限 4096 字元)
+        self.EDIT_SUMMARY = os.getenv("TELEGRAM_EDIT_SUMMARY", "false").lower() == "true"  # 編輯先前的市場總覽而不發送新訊息
         self.TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
         self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
         
     def is_valid(self):
         """檢查配置是否有效"""
-        return bool(self.BOT_TOKEN and self.CHAT_ID)
+        return bool(self.BOT_TOKEN and (self.CHAT_ID or self.has_subscribers_file()))
+    
+    def has_subscribers_file(self):
+        """是否有訂閱者檔案"""
+        return bool(self.SUBSCRIBERS_FILE) and os.path.exists(self.SUBSCRIBERS_FILE)
     
     def get_missing_config(self):
         """獲取缺失的配置項目"""
         missing = []
         if not self.BOT_TOKEN:
             missing.append("TELEGRAM_BOT_TOKEN")
-        if not self.CHAT_ID:
+        if not self.CHAT_ID and not self.has_subscribers_file():
             missing.append("TELEGRAM_CHAT_ID")
         return missing
 
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Telegram 非同步發送佇列
+Asynchronous outbound Telegram queue with rate-limit-aware pacing
+
+訊息先以 submit() 排入佇列，flush() / deliver() 時並行發送：不同聊天同時進行，
+同一聊天依排入順序。每個聊天與整個 Bot 各有一個令牌桶 (Telegram 建議單一聊天
+每秒 1 則、群組每分鐘 20 則、全部合計每秒 30 則)，取代固定的 MESSAGE_INTERVAL 等待。
+
+收到 429 時依回應的 parameters.retry_after 暫停該聊天並將速率減半，之後每次成功
+逐步恢復；429 可能是整個 Bot 的限流，因此全域令牌桶同樣暫停 retry_after 秒 (不減速)。
+5xx 與連線錯誤以指數退避重試。發送結束後輸出每則訊息的送達時間。
+
+submit(edit_message_id=...) 以 editMessageText 更新先前的訊息 (例如市場總覽)，
+訊息已不存在或無法編輯時改為發送新訊息 (不計入重試次數)。
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+
+GLOBAL_RATE = 30.0       # 每秒，Bot 所有聊天合計
+CHAT_RATE = 1.0          # 每秒，單一私人聊天
+GROUP_RATE = 20 / 60     # 每秒，群組與頻道 (每分鐘 20 則)
+CHAT_BURST = 3           # 單一聊天可連續發送的則數
+
+class TokenBucket:
+    """
+    令牌桶 (只在同一個事件迴圈中使用，不需要鎖)
+
+    throttle() 在收到 429 時暫停並將速率減半，recover() 在成功後逐步恢復到初始速率；
+    pause() 只暫停、不調整速率。
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = rate / 16
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    async def acquire(self):
+        """取得一個令牌，不足或暫停中時等待"""
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """暫停 seconds 秒 (暫停期間不發出令牌)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def throttle(self, retry_after):
+        """收到 429：暫停 retry_after 秒 (期滿後可立即重試一次) 並將速率減半"""
+        self.pause(retry_after)
+        self.tokens = 1.0
+        self.updated = self.blocked_until
+        self.rate = max(self.rate / 2, self.min_rate)
+
+    def recover(self):
+        """成功送出：速率逐步恢復 (每次增加初始速率的 10%)"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+@dataclass
+class Delivery:
+    """一則排隊中的訊息與發送結果 (時間為 time.monotonic()；edit_message_id 有值時為編輯訊息)"""
+    __slots__ = ("chat_id", "text", "parse_mode", "enqueued_at", "sent_at", "attempts", "result", "error",
+                 "edit_message_id")
+    chat_id: str
+    text: str
+    parse_mode: str
+    enqueued_at: float
+    sent_at: float
+    attempts: int
+    result: dict
+    error: str
+    edit_message_id: int
+
+    @property
+    def ok(self):
+        return self.result is not None
+
+    @property
+    def message_id(self):
+        """送達 (或編輯) 的訊息 ID，未送達時為 None"""
+        if not self.ok:
+            return None
+        result = self.result.get("result")
+        return result.get("message_id") if isinstance(result, dict) else self.edit_message_id
+
+    @property
+    def latency(self):
+        """排入佇列到送達的秒數，未送達時為 None"""
+        return None if self.sent_at is None else self.sent_at - self.enqueued_at
+
+class TelegramQueue:
+    """
+    Telegram 發送佇列
+
+    用法:
+        queue = TelegramQueue(bot_token)
+        queue.submit(chat_id, "訊息")
+        deliveries = queue.deliver()   # 阻塞到全部送達或放棄
+    """
+
+    RETRY_STATUS = {500, 502, 503, 504}
+
+    def __init__(self, bot_token, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST, group_rate=GROUP_RATE,
+                 global_rate=GLOBAL_RATE, max_retries=4, backoff_factor=0.5, max_backoff=30, timeout=(5, 15),
+                 pool_size=16, session=None):
+        """
+        Args:
+            bot_token (str): Telegram Bot Token
+            chat_rate (float): 單一私人聊天每秒則數
+            chat_burst (int): 單一聊天可連續發送的則數
+            group_rate (float): 群組 / 頻道 (chat_id 為負數) 每秒則數
+            global_rate (float): 所有聊天合計每秒則數
+            max_retries (int): 最大重試次數
+            backoff_factor (float): 指數退避基數 (秒)
+            max_backoff (float): 單次退避上限 (秒)
+            timeout (tuple): (連線逾時, 讀取逾時) 秒數
+            pool_size (int): 連線池大小 (同時進行的 HTTP 請求數)
+            session (requests.Session): 共用的 Session，預設建立新的連線池
+        """
+        self.bot_token = bot_token
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_buckets = {}
+        self.pending = []
+        self._executor = None
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+        self.session = session
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """依 TelegramConfig 建立 (MESSAGE_INTERVAL 為單一聊天的初始間隔)"""
+        chat_rate = 1 / config.MESSAGE_INTERVAL if config.MESSAGE_INTERVAL > 0 else GLOBAL_RATE
+        return cls(config.BOT_TOKEN, chat_rate=chat_rate, chat_burst=config.CHAT_BURST,
+                   global_rate=config.GLOBAL_RATE, max_retries=config.MAX_RETRIES, **kwargs)
+
+    def submit(self, chat_id, text, parse_mode="HTML", edit_message_id=None):
+        """
+        排入一則訊息，返回 Delivery (flush 後填入結果)
+
+        Args:
+            edit_message_id (int): 要以 editMessageText 更新的訊息 ID，None 為發送新訊息
+        """
+        delivery = Delivery(str(chat_id), text, parse_mode, time.monotonic(), None, 0, None, None, edit_message_id)
+        self.pending.append(delivery)
+        return delivery
+
+    def _bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            rate = self.group_rate if chat_id.startswith("-") else self.chat_rate
+            self.chat_buckets[chat_id] = TokenBucket(rate, capacity=self.chat_burst)
+        return self.chat_buckets[chat_id]
+
+    def _backoff(self, attempt):
+        return min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+
+    def _post(self, delivery):
+        payload = {"chat_id": delivery.chat_id, "text": delivery.text, "parse_mode": delivery.parse_mode}
+        method = "sendMessage"
+        if delivery.edit_message_id is not None:
+            method = "editMessageText"
+            payload["message_id"] = delivery.edit_message_id
+        url = API_URL.format(token=self.bot_token, method=method)
+        return self.session.post(url, json=payload, timeout=self.timeout)
+
+    async def _deliver(self, delivery):
+        bucket = self._bucket(delivery.chat_id)
+        attempt = 0  # 已重試的次數 (編輯失敗改為發送新訊息不計入)
+        while True:
+            delivery.attempts += 1
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(self._executor, self._post, delivery)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delivery.error = str(e)
+                if attempt >= self.max_retries:
+                    break
+                delay = self._backoff(attempt)
+                print(f"⚠️ Telegram 連線失敗 ({e})，{delay:.1f}s 後重試 ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if response.status_code == 200 and body.get("ok"):
+                delivery.result = body
+                delivery.error = None
+                delivery.sent_at = time.monotonic()
+                bucket.recover()
+                return delivery
+
+            delivery.error = body.get("description") or f"HTTP {response.status_code}"
+            if delivery.edit_message_id is not None and response.status_code == 400:
+                if "not modified" in delivery.error:
+                    # 內容與先前相同，訊息已是最新
+                    delivery.result = {"ok": True, "result": True}
+                    delivery.error = None
+                    delivery.sent_at = time.monotonic()
+                    return delivery
+                print(f"⚠️ 無法編輯訊息 {delivery.edit_message_id} (chat {delivery.chat_id}): "
+                      f"{delivery.error}，改為發送新訊息")
+                delivery.edit_message_id = None
+                continue  # 不計入重試次數：最後一次嘗試編輯失敗時仍會發送
+            if attempt >= self.max_retries:
+                break
+            if response.status_code == 429:
+                retry_after = (body.get("parameters") or {}).get("retry_after") or self._backoff(attempt)
+                print(f"⚠️ Telegram 限流 (chat {delivery.chat_id})，{retry_after}s 後重試 "
+                      f"({attempt + 1}/{self.max_retries})，速率調整為 {bucket.rate / 2:.2f}/s")
+                bucket.throttle(float(retry_after))
+                self.global_bucket.pause(float(retry_after))
+                attempt += 1
+                continue
+            if response.status_code in self.RETRY_STATUS:
+                delay = self._backoff(attempt)
+                print(f"⚠️ Telegram HTTP {response.status_code}，{delay:.1f}s 後重試 ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            break  # 400/403 等錯誤重試也不會成功
+
+        print(f"❌ 發送 Telegram 訊息失敗 (chat {delivery.chat_id}): {delivery.error}")
+        return delivery
+
+    async def _drain_chat(self, deliveries):
+        for delivery in deliveries:
+            await self._deliver(delivery)
+
+    async def flush(self):
+        """
+        發送所有排隊中的訊息：不同聊天並行，同一聊天依排入順序
+
+        Returns:
+            list: 本次發送的 Delivery
+        """
+        pending, self.pending = self.pending, []
+        by_chat = {}
+        for delivery in pending:
+            by_chat.setdefault(delivery.chat_id, []).append(delivery)
+        # 請求在與連線池同大小的執行緒池中進行，聊天數很多時不會超出連線池
+        with ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="telegram") as self._executor:
+            await asyncio.gather(*(self._drain_chat(deliveries) for deliveries in by_chat.values()))
+        return pending
+
+    def deliver(self, report=True):
+        """
+        同步發送所有排隊中的訊息 (不可在執行中的事件迴圈內呼叫，請改用 await flush())
+
+        Args:
+            report (bool): 是否輸出送達統計
+        """
+        started = time.monotonic()
+        deliveries = asyncio.run(self.flush())
+        if report and deliveries:
+            report_deliveries(deliveries, time.monotonic() - started)
+        return deliveries
+
+def report_deliveries(deliveries, elapsed):
+    """輸出送達數量、總耗時與每則訊息的送達時間"""
+    sent = [d for d in deliveries if d.ok]
+    retries = sum(d.attempts - 1 for d in deliveries)
+    print(f"📨 Telegram: 送達 {len(sent)}/{len(deliveries)} 則，耗時 {elapsed:.2f}s，重試 {retries} 次")
+    if sent:
+        latencies = [d.latency for d in sent]
+        print(f"   送達時間: 平均 {sum(latencies) / len(latencies):.2f}s，最長 {max(latencies):.2f}s")